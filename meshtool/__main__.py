@@ -1,9 +1,9 @@
+import os
 import sys
 import argparse
 from collections import defaultdict
 import meshtool.filters as filters
-from meshtool.filters.base_filters import FilterException, OpFilter, LoadFilter
-import collada
+from meshtool.chain import ChainException, resolve_chain, run_chain
 
 def usage_exit(parser, s):
     parser.print_usage()
@@ -26,11 +26,13 @@ class CustomFormatter(argparse.HelpFormatter):
         
         for action in actions:
             if not isinstance(action, CustomAction):
+                if not isinstance(action, argparse._HelpAction):
+                    action_list['Options'].append(action)
                 continue
             filter_name = action.dest
-            inst = filters.factory.getInstance(filter_name)
+            category = filters.factory.getCategory(filter_name)
             
-            action_list[inst.CATEGORY].append(action)
+            action_list[category].append(action)
         
         order = ['Loading',
                  'Printing',
@@ -39,7 +41,8 @@ class CustomFormatter(argparse.HelpFormatter):
                  'Visualizations',
                  'Meta',
                  'Operations',
-                 'Saving']
+                 'Saving',
+                 'Options']
         
         for section_name in order:
             loaders = action_list[section_name]
@@ -50,47 +53,145 @@ class CustomFormatter(argparse.HelpFormatter):
         
         self.start_section('')
 
-def main():
+def build_parser():
+    """Builds the command line parser from the static filter manifest,
+    without importing any of the filter modules"""
     parser = argparse.ArgumentParser(
         description='Tool for manipulating mesh data using pycollada.',
         formatter_class=CustomFormatter,
         usage='meshtool --load_filter [--operation] [--save_filter]')
     for filter_name in filters.factory.getFilterNames():
-        inst = filters.factory.getInstance(filter_name)
+        arguments = filters.factory.getArguments(filter_name)
         parser.add_argument('--' + filter_name, required=False,
-                            nargs=len(inst.arguments), help=inst.description,
-                            metavar=tuple([arg.name for arg in inst.arguments]), action=CustomAction)
-        
+                            nargs=len(arguments), help=filters.factory.getDescription(filter_name),
+                            metavar=tuple([arg.name for arg in arguments]), action=CustomAction)
+    
+    parser.add_argument('--batch', metavar='inputs',
+                        help='Runs the filter chain on every file matched by the given glob pattern or listed in the given ' +
+                             'manifest file (one path per line). Filter arguments can use {input}, {dirname}, {basename}, ' +
+                             '{name}, {ext} and {index}, e.g. --load_collada {input} --save_collada out/{name}.dae')
+    parser.add_argument('--batch_workers', metavar='N', type=int, default=None,
+                        help='Number of worker processes to use with --batch. Defaults to the number of CPUs')
+    parser.add_argument('--batch_report', metavar='file', default=None,
+                        help='File to write per-file JSON result records to with --batch. Defaults to stdout')
+    parser.add_argument('--profile', metavar='file', default=None,
+                        help='Records wall time, CPU time, peak memory growth and mesh statistics before and after ' +
+                             'each filter (including the filters run by meta filters) and saves them as JSON to file')
+    parser.add_argument('--serve', metavar='address',
+                        help='Runs a job server with a pool of warm worker processes instead of a single chain. ' +
+                             'The address is a path to a Unix domain socket or host:port for HTTP. Jobs are POSTed ' +
+                             'to /jobs as JSON with an input file and a chain in the same form as with --batch, and ' +
+                             'GET /health reports queue depth and per-filter latency')
+    parser.add_argument('--serve_workers', metavar='N', type=int, default=None,
+                        help='Number of worker processes to use with --serve. Defaults to the number of CPUs')
+    parser.add_argument('--serve_queue', metavar='N', type=int, default=32,
+                        help='Maximum number of jobs waiting for a worker with --serve. Jobs sent when the queue ' +
+                             'is full are rejected with HTTP 503. Defaults to 32')
+    parser.add_argument('--serve_timeout', metavar='seconds', type=float, default=None,
+                        help='Default number of seconds a job may run with --serve before it is killed')
+    parser.add_argument('--workers', metavar='N', type=int, default=None,
+                        help='Number of worker processes filters may spread independent parts of a mesh over, ' +
+                             'e.g. the charts in sander_simplify. Results are the same for any number. Defaults to 1')
+    parser.add_argument('--time_budget', metavar='seconds', type=float, default=None,
+                        help='Number of seconds filters that support it, e.g. sander_simplify, may run for. Each ' +
+                             'of their phases that can stop early finishes with the best result so far once it ' +
+                             'uses up its share, and the phases that did are reported. Defaults to no limit')
+    parser.add_argument('--telemetry', action='store_true', default=False,
+                        help='Makes filters that support it, e.g. sander_simplify, save the wall time, CPU time, ' +
+                             'peak memory and counters such as heap operations and rejected merges of each of ' +
+                             'their phases as JSON next to their output, e.g. model.telemetry.json for model.pdae')
+    parser.add_argument('--resume', action='store_true', default=False,
+                        help='Makes filters that support it, e.g. sander_simplify, save a checkpoint in the cache ' +
+                             'directory after each of their major stages, and continue from the last one saved if ' +
+                             'they are run again on the same input with the same settings, e.g. after a crash. ' +
+                             'Checkpoints are removed once the filter finishes')
+    parser.add_argument('--cache_dir', metavar='dir', default=None,
+                        help='Directory to cache the files written by save filters in. When the same chain is run ' +
+                             'again on an unchanged input, the cached files are copied instead of running the chain. ' +
+                             'Defaults to $MESHTOOL_CACHE_DIR or ~/.cache/meshtool')
+    parser.add_argument('--cache_size', metavar='MB', type=int, default=1024,
+                        help='Maximum size of the cache in megabytes. Least recently used entries are removed ' +
+                             'when it grows larger. Defaults to 1024')
+    parser.add_argument('--no_cache', action='store_true', default=False,
+                        help="Don't look up or store results in the cache")
+    return parser
+
+def main():
+    parser = build_parser()
     args = parser.parse_args()
     
+    if args.workers is not None:
+        if args.workers < 1:
+            usage_exit(parser, "--workers must be at least 1")
+        # passed through the environment so worker processes of --batch and --serve see it too
+        os.environ['MESHTOOL_WORKERS'] = str(args.workers)
+    
+    if args.time_budget is not None:
+        if args.time_budget <= 0:
+            usage_exit(parser, "--time_budget must be more than 0")
+        os.environ['MESHTOOL_TIME_BUDGET'] = repr(args.time_budget)
+    
+    if args.telemetry:
+        os.environ['MESHTOOL_TELEMETRY'] = '1'
+    
+    if args.resume:
+        from meshtool.cache import default_cache_dir
+        cache_dir = args.cache_dir if args.cache_dir is not None else default_cache_dir()
+        os.environ['MESHTOOL_RESUME'] = os.path.join(os.path.abspath(cache_dir), 'checkpoints')
+    
+    # profiling and telemetry are only meaningful if the filters actually run,
+    # and results cut short by a time budget depend on how fast they ran
+    cache = None
+    if not args.no_cache and args.profile is None and args.time_budget is None and not args.telemetry:
+        from meshtool.cache import ResultCache
+        cache = ResultCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    
+    if args.serve is not None:
+        if 'ordered_args' in args or args.batch is not None or args.profile is not None:
+            usage_exit(parser, "--serve takes its filter chains from the jobs sent to it")
+        from meshtool.serve import main_serve
+        try:
+            sys.exit(main_serve(args.serve, workers=args.serve_workers, queue_size=args.serve_queue,
+                                timeout=args.serve_timeout, cache=cache))
+        except ValueError as e:
+            usage_exit(parser, str(e))
+    
     if not 'ordered_args' in args:
         usage_exit(parser, "no arguments given")
     
     ordered_args = args.ordered_args
-
-    (load_filter_name, load_filter_args) = ordered_args.pop(0)
-    load_filter_inst = filters.factory.getInstance(load_filter_name)
-    if load_filter_inst is None or not isinstance(load_filter_inst, LoadFilter):
-        usage_exit(parser, "first argument must be a load filter")
+    
+    if args.batch is not None:
+        if args.profile is not None:
+            usage_exit(parser, "--profile can't be used with --batch")
+        from meshtool.batch import main_batch
+        try:
+            sys.exit(main_batch(ordered_args, args.batch, workers=args.batch_workers,
+                                report_path=args.batch_report, cache=cache))
+        except ChainException as e:
+            usage_exit(parser, str(e))
+    
     try:
-        collada_inst = load_filter_inst.apply(*load_filter_args)
-    except FilterException as e:
-        sys.exit("Error: (argument %d) '%s': %s" % (1,load_filter_name,str(e)))
-    if not isinstance(collada_inst, collada.Collada):
-        sys.exit("Error: got an incorrect return value from filter (argument %d) '%s' " % (1, load_filter_name))
+        steps = resolve_chain(ordered_args)
+    except ChainException as e:
+        usage_exit(parser, str(e))
 
-    for i, arg in enumerate(ordered_args):
-        filter_name = arg[0]
-        arguments = arg[1]
-        inst = filters.factory.getInstance(filter_name)
-        if inst is None or not isinstance(inst, OpFilter):
-            usage_exit(parser, "specified filter (argument %d:'%s') is not an operation filter" % (i+1, filter_name))
-        try:
-            collada_inst = inst.apply(collada_inst, *arguments)
-        except FilterException as e:
-            sys.exit("Error: (argument %d) '%s': %s" % (i+1, filter_name, str(e)))
-        if not isinstance(collada_inst, collada.Collada):
-            sys.exit("Error: got an incorrect return value from filter (argument %d) '%s' " % (i+1, filter_name))
+    profiler = None
+    if args.profile is not None:
+        from meshtool.profiling import FilterProfiler
+        profiler = FilterProfiler()
+
+    try:
+        if cache is not None:
+            from meshtool.cache import run_cached
+            run_cached(steps, cache)
+        else:
+            run_chain(steps, profiler=profiler)
+    except ChainException as e:
+        sys.exit("Error: " + str(e))
+    finally:
+        if profiler is not None:
+            profiler.save(args.profile)
 
 if __name__ == "__main__":
     main()
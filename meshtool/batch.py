@@ -0,0 +1,295 @@
+"""Runs a single filter chain over many input files using a process pool
+
+Filter arguments in the chain are templates that get formatted for each
+input file with these variables:
+
+ - ``{input}`` - path of the input file
+ - ``{dirname}`` - directory containing the input file
+ - ``{basename}`` - file name of the input file
+ - ``{name}`` - file name of the input file without its extension
+ - ``{ext}`` - extension of the input file, including the dot
+ - ``{index}`` - position of the input file in the batch
+
+For example::
+
+    meshtool --batch 'models/*.dae' --load_collada {input} \\
+             --medium_optimizations --save_collada_zip out/{name}.zip
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import signal
+import traceback
+import threading
+import multiprocessing
+from queue import Queue, Empty
+import meshtool.filters as filters
+from meshtool.chain import ChainException, FilterStep, resolve_chain
+from meshtool.cache import run_cached
+
+def expand_inputs(source):
+    """Returns the list of input files for a batch source, which is either
+    a manifest file containing one input path per line, or a glob pattern.
+    Relative paths in a manifest are relative to the manifest's directory."""
+    if os.path.isfile(source) and not glob.has_magic(source):
+        manifest_dir = os.path.dirname(source)
+        inputs = []
+        with open(source, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if len(line) == 0 or line.startswith('#'):
+                    continue
+                inputs.append(os.path.join(manifest_dir, line))
+        return inputs
+    return sorted(glob.glob(source))
+
+def template_variables(input_path, index):
+    basename = os.path.basename(input_path)
+    name, ext = os.path.splitext(basename)
+    return {'input': input_path,
+            'dirname': os.path.dirname(input_path),
+            'basename': basename,
+            'name': name,
+            'ext': ext,
+            'index': index}
+
+def format_steps(steps, variables):
+    """Returns a copy of the resolved steps with their argument
+    templates filled in for a single input file"""
+    formatted = []
+    for step in steps:
+        try:
+            arguments = [arg.format(**variables) for arg in step.arguments]
+        except (KeyError, IndexError, ValueError) as e:
+            raise ChainException("(argument %d) '%s': invalid argument template: %s" % (step.index, step.name, str(e)),
+                                 step.index, step.name)
+        formatted.append(FilterStep(step.index, step.name, step.inst, arguments))
+    return formatted
+
+def make_output_dirs(steps):
+    """Creates the parent directory of the file given to each save filter"""
+    for step in steps:
+        if filters.factory.getCategory(step.name) != 'Saving' or len(step.arguments) == 0:
+            continue
+        dirname = os.path.dirname(step.arguments[0])
+        if dirname and not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:
+                # another worker may have created it since the check
+                if not os.path.isdir(dirname):
+                    raise
+
+def failed_filter_name(steps, timings):
+    """The filter that was running when an exception escaped run_chain"""
+    if len(timings) < len(steps):
+        return steps[len(timings)].name
+    return None
+
+def process_file(steps, input_path, index, cache=None):
+    """Runs the chain on one input file, never raising. Returns a
+    result record dict with status, error and per-filter timings"""
+    record = {'index': index,
+              'input': input_path,
+              'status': 'ok',
+              'error': None,
+              'filter': None,
+              'cached': False,
+              'timings': []}
+    timings = []
+    start = time.time()
+    try:
+        file_steps = format_steps(steps, template_variables(input_path, index))
+        make_output_dirs(file_steps)
+        record['cached'] = run_cached(file_steps, cache, timings)
+    except ChainException as e:
+        record['status'] = 'error'
+        record['error'] = str(e)
+        record['filter'] = e.filter_name
+    except Exception as e:
+        # isolate unexpected failures to the file that caused them
+        record['status'] = 'error'
+        record['error'] = ''.join(traceback.format_exception_only(type(e), e)).strip()
+        record['filter'] = failed_filter_name(steps, timings)
+    record['timings'] = [{'filter': name, 'seconds': seconds} for name, seconds in timings]
+    record['seconds'] = time.time() - start
+    return record
+
+class JobTimeout(Exception):
+    pass
+
+def _worker_loop(conn, cache):
+    # ctrl-c goes to the whole process group, the parent stops its workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # pay for the heavy imports once, before the first job arrives
+    import numpy
+    import collada
+    # filter instances are resolved once per chain and reused for every file
+    steps_args = None
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        ordered_args, input_path, index = job
+        try:
+            if ordered_args != steps_args:
+                steps = resolve_chain(ordered_args)
+                steps_args = ordered_args
+            record = process_file(steps, input_path, index, cache)
+        except ChainException as e:
+            record = {'index': index, 'input': input_path, 'status': 'error', 'error': str(e),
+                      'filter': e.filter_name, 'cached': False, 'timings': [], 'seconds': 0.0}
+        conn.send(record)
+
+class WorkerProcess(object):
+    """A worker process that runs one job at a time, a job being a tuple
+    of (ordered_args, input_path, index). A worker whose job times out is
+    killed and replaced by a fresh one, and so is one that dies, whether
+    running a job or idle. A job sent to a worker that died while idle
+    is run by its replacement."""
+    def __init__(self, cache=None):
+        self.cache = cache
+        self.process = None
+        self.conn = None
+        self.start()
+
+    def start(self):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_worker_loop, args=(child_conn, self.cache))
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+
+    def restart(self):
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.conn.close()
+        self.start()
+
+    def run(self, job, timeout=None):
+        """Returns the record of running job. Raises JobTimeout if it took
+        too long, or EOFError if the worker died running it, e.g. from
+        running out of memory. Either way the worker is replaced."""
+        try:
+            self.conn.send(job)
+            sent = True
+        except OSError:
+            # sending fails if the worker died while idle. it never got the
+            # job, so the job goes to its replacement instead
+            self.restart()
+            sent = False
+        try:
+            if not sent:
+                self.conn.send(job)
+            if not self.conn.poll(timeout):
+                self.restart()
+                raise JobTimeout()
+            return self.conn.recv()
+        except (EOFError, OSError):
+            self.restart()
+            raise EOFError('worker process exited unexpectedly')
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (IOError, OSError):
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+def run_batch(ordered_args, inputs, workers=None, report=None, cache=None):
+    """Applies the filter chain to each of the inputs
+
+    :param ordered_args: list of (filter_name, argument_templates) tuples
+    :param inputs: list of input file paths
+    :param workers: number of worker processes. Defaults to the number of
+                    CPUs. If 1, files are processed in the current process.
+                    A file that crashes its worker process gets an error
+                    record, and the worker is replaced for the rest.
+    :param report: optional file-like object that gets one JSON result
+                   record per line, in completion order
+    :param cache: optional :class:`meshtool.cache.ResultCache` to look up
+                  and store the output files of each input in
+
+    :returns: a list of result records, ordered the same as inputs
+    """
+    # resolve once in the parent so chain errors are reported before any
+    # work starts, and so forked workers inherit the imported filter modules
+    steps = resolve_chain(ordered_args)
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    jobs = list(enumerate(inputs))
+    records = [None] * len(jobs)
+
+    def collect(record):
+        records[record['index']] = record
+        if report is not None:
+            report.write(json.dumps(record) + "\n")
+            report.flush()
+
+    if workers <= 1 or len(jobs) <= 1:
+        for index, input_path in jobs:
+            collect(process_file(steps, input_path, index, cache))
+    else:
+        # each worker has its own pipe, so one that dies only loses its own file
+        pending = Queue()
+        for job in jobs:
+            pending.put(job)
+        lock = threading.Lock()
+        def dispatch(worker):
+            while True:
+                try:
+                    index, input_path = pending.get_nowait()
+                except Empty:
+                    break
+                try:
+                    record = worker.run((ordered_args, input_path, index))
+                except EOFError:
+                    record = {'index': index, 'input': input_path, 'status': 'error',
+                              'error': 'worker process exited unexpectedly',
+                              'filter': None, 'cached': False, 'timings': [], 'seconds': 0.0}
+                with lock:
+                    collect(record)
+
+        pool = [WorkerProcess(cache) for i in range(min(workers, len(jobs)))]
+        try:
+            threads = [threading.Thread(target=dispatch, args=(worker,)) for worker in pool]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            for worker in pool:
+                worker.stop()
+
+    return records
+
+def main_batch(ordered_args, source, workers=None, report_path=None, cache=None):
+    """Entry point for --batch from the command line. Returns the
+    process exit code."""
+    inputs = expand_inputs(source)
+    if len(inputs) == 0:
+        sys.stderr.write("meshtool: warning: no input files matched '%s'\n" % source)
+        return 0
+
+    report = sys.stdout if report_path is None else open(report_path, 'w')
+    try:
+        records = run_batch(ordered_args, inputs, workers=workers, report=report, cache=cache)
+    finally:
+        if report is not sys.stdout:
+            report.close()
+
+    num_failed = sum(1 for r in records if r['status'] != 'ok')
+    sys.stderr.write("Processed %d files: %d succeeded, %d failed\n" % (len(records), len(records) - num_failed, num_failed))
+    return 1 if num_failed > 0 else 0
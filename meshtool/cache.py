@@ -0,0 +1,269 @@
+"""On-disk cache of the files written by a filter chain
+
+The cache key is a hash of the meshtool version, the content of the input
+file and of the auxiliary files it references (MTL files and textures),
+and the ordered names and arguments of the filters in the chain. The
+files written by the chain's save filters are stored under that key, so
+running an unchanged chain on an unchanged input again just copies the
+stored files into place without loading the mesh.
+
+Entries are evicted least recently used first once the total size of the
+cache exceeds its limit.
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import meshtool
+import meshtool.filters as filters
+from meshtool.args import FileArgument
+from meshtool.chain import run_chain
+
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+
+#filters that write files that aren't passed to them as their first
+# argument, or whose output isn't a file at all
+UNCACHEABLE_CATEGORIES = ['Printing', 'Visualizations']
+UNCACHEABLE_FILTERS = ['save_mipmaps']
+
+def default_cache_dir():
+    if 'MESHTOOL_CACHE_DIR' in os.environ:
+        return os.environ['MESHTOOL_CACHE_DIR']
+    cache_home = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_home, 'meshtool')
+
+def _lines(data):
+    for line in data.decode('utf8', 'replace').splitlines():
+        splitup = line.strip().split(None, 1)
+        if len(splitup) == 2:
+            yield splitup
+
+def obj_aux_files(data):
+    """Returns the auxiliary files referenced by an OBJ file as a list of
+    (command, path) tuples, with paths as they get passed to the aux_file_loader"""
+    refs = []
+    for command, line in _lines(data):
+        if command == 'mtllib':
+            refs.append(('mtllib', line))
+    return refs
+
+def mtl_aux_files(data):
+    refs = []
+    for command, line in _lines(data):
+        if command in ('map_Kd', 'map_Ka', 'map_Ks', 'map_bump', 'bump'):
+            refs.append((command, line))
+    return refs
+
+_init_from_re = re.compile(br'<init_from>\s*([^<]*?)\s*</init_from>')
+def collada_aux_files(data):
+    return [('init_from', ref.decode('utf8', 'replace')) for ref in _init_from_re.findall(data)]
+
+def hash_input(load_filter, filename):
+    """Hashes the content of an input file and the auxiliary files it
+    references, resolved the same way the load filter resolves them.
+    Returns None if the load filter is unknown to the cache."""
+    from meshtool.filters.load_filters.load_obj import filepath_loader
+
+    with open(filename, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256()
+    digest.update(data)
+
+    if load_filter == 'load_obj':
+        refs = obj_aux_files(data)
+    elif load_filter == 'load_collada':
+        refs = collada_aux_files(data)
+    else:
+        return None
+
+    aux_loader = filepath_loader(filename)
+    while len(refs) > 0:
+        command, ref = refs.pop(0)
+        aux_data = aux_loader(ref)
+        digest.update(("\0%s\0%s\0" % (command, ref)).encode('utf8'))
+        if aux_data is None:
+            digest.update(b'missing')
+            continue
+        digest.update(hashlib.sha256(aux_data).digest())
+        if command == 'mtllib':
+            refs.extend(mtl_aux_files(aux_data))
+
+    return digest.hexdigest()
+
+def output_files(step):
+    """Files written by a save filter step"""
+    filename = step.arguments[0]
+    outputs = [filename]
+    if step.name == 'save_obj':
+        dotloc = filename.rfind('.')
+        outputs.append((filename if dotloc == -1 else filename[:dotloc]) + '.mtl')
+    return outputs
+
+def is_cacheable(steps):
+    """A chain can be cached if all of its effects are files written by
+    save filters, and none of its operation filters read or write other
+    files. It must also have something to save."""
+    has_output = False
+    for step in steps[1:]:
+        category = filters.factory.getCategory(step.name)
+        if category in UNCACHEABLE_CATEGORIES or step.name in UNCACHEABLE_FILTERS:
+            return False
+        arguments = filters.factory.getArguments(step.name)
+        if category == 'Saving':
+            if len(step.arguments) == 0:
+                return False
+            has_output = True
+            arguments = arguments[1:]
+        if any(isinstance(arg, FileArgument) for arg in arguments):
+            return False
+    return has_output
+
+def chain_key(steps):
+    """Returns the cache key for a resolved chain, or None if the chain
+    can't be cached"""
+    if len(steps) == 0 or len(steps[0].arguments) != 1 or not is_cacheable(steps):
+        return None
+    if not os.path.isfile(steps[0].arguments[0]):
+        return None
+
+    input_hash = hash_input(steps[0].name, steps[0].arguments[0])
+    if input_hash is None:
+        return None
+
+    chain = {'version': meshtool.__version__,
+             'input': input_hash,
+             'filters': [[step.name] + list(step.arguments) for step in steps[1:]],
+             'load': steps[0].name}
+    return hashlib.sha256(json.dumps(chain, sort_keys=True).encode('utf8')).hexdigest()
+
+class ResultCache(object):
+    """Directory of cached chain outputs, one subdirectory per key"""
+    def __init__(self, cache_dir=None, max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = cache_dir if cache_dir is not None else default_cache_dir()
+        self.max_size = max_size
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key, outputs):
+        """Copies the files stored under key to the given output paths.
+        Returns True on a hit."""
+        entry_dir = self._entry_dir(key)
+        meta_file = os.path.join(entry_dir, 'meta.json')
+        try:
+            with open(meta_file, 'r') as f:
+                meta = json.load(f)
+        except (IOError, OSError, ValueError):
+            return False
+        if meta.get('num_outputs') != len(outputs):
+            return False
+
+        copied = []
+        try:
+            for i, output in enumerate(outputs):
+                dirname = os.path.dirname(output)
+                if dirname:
+                    os.makedirs(dirname, exist_ok=True)
+                shutil.copyfile(os.path.join(entry_dir, str(i)), output)
+                copied.append(output)
+        except (IOError, OSError):
+            # entry was evicted part way through by another process
+            for output in copied:
+                os.remove(output)
+            return False
+
+        #mtime of the metadata file is the last access time used for eviction
+        try:
+            os.utime(meta_file, None)
+        except OSError:
+            pass
+        return True
+
+    def put(self, key, outputs):
+        """Stores copies of the output files under key. Failing to write
+        the cache is ignored, since the outputs themselves are already saved."""
+        entry_dir = self._entry_dir(key)
+        if os.path.isdir(entry_dir):
+            return
+
+        tmp_dir = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # written to a temporary directory first so other processes
+            # never see a partial entry
+            tmp_dir = tempfile.mkdtemp(prefix='tmp-', dir=self.cache_dir)
+            size = 0
+            for i, output in enumerate(outputs):
+                shutil.copyfile(output, os.path.join(tmp_dir, str(i)))
+                size += os.path.getsize(output)
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+                json.dump({'num_outputs': len(outputs), 'size': size, 'created': time.time()}, f)
+            os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            pass
+        finally:
+            if tmp_dir is not None and os.path.isdir(tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self.evict()
+
+    def entries(self):
+        """Returns a list of (last_access, size, entry_dir) for every entry"""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            if len(prefix) != 2 or not os.path.isdir(prefix_dir):
+                continue
+            for key in os.listdir(prefix_dir):
+                entry_dir = os.path.join(prefix_dir, key)
+                meta_file = os.path.join(entry_dir, 'meta.json')
+                try:
+                    with open(meta_file, 'r') as f:
+                        size = json.load(f)['size']
+                    entries.append((os.path.getmtime(meta_file), size, entry_dir))
+                except (IOError, OSError, ValueError, KeyError):
+                    continue
+        return entries
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits in max_size"""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in entries:
+            if total <= self.max_size:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+
+def run_cached(steps, cache, timings=None):
+    """Runs a resolved chain like :func:`meshtool.chain.run_chain`, but
+    first looks for its outputs in cache. Returns True if the outputs were
+    copied from the cache, in which case the chain wasn't run at all."""
+    key = chain_key(steps) if cache is not None else None
+    if key is None:
+        run_chain(steps, timings)
+        return False
+
+    outputs = []
+    for step in steps[1:]:
+        if filters.factory.getCategory(step.name) == 'Saving':
+            outputs.extend(output_files(step))
+
+    # let the save filters report existing files the same way they always have
+    if not any(os.path.exists(output) for output in outputs):
+        start = time.time()
+        if cache.get(key, outputs):
+            if timings is not None:
+                timings.append(('cache', time.time() - start))
+            return True
+
+    run_chain(steps, timings)
+    cache.put(key, outputs)
+    return False
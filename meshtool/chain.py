@@ -0,0 +1,82 @@
+import time
+import meshtool.filters as filters
+from meshtool.filters.base_filters import FilterException, OpFilter, LoadFilter
+
+class ChainException(Exception):
+    """Exception thrown when a filter chain can't be set up or run
+
+    If ``usage`` is True, the chain itself is malformed (e.g. it does not
+    start with a load filter), otherwise a filter failed while running."""
+    def __init__(self, message, index=None, filter_name=None, usage=False):
+        super(ChainException, self).__init__(message)
+        self.index = index
+        self.filter_name = filter_name
+        self.usage = usage
+
+class FilterStep(object):
+    """A single filter in a chain, with the instance that runs it and
+    the arguments to pass to it"""
+    def __init__(self, index, name, inst, arguments):
+        self.index = index
+        self.name = name
+        self.inst = inst
+        self.arguments = arguments
+
+def resolve_chain(ordered_args):
+    """Looks up the filter instances for a list of (filter_name, arguments)
+    tuples as produced by the command line parser. The first filter must be
+    a load filter and the rest operation filters.
+
+    :returns: a list of :class:`FilterStep`
+    """
+    if len(ordered_args) == 0:
+        raise ChainException("no arguments given", usage=True)
+
+    steps = []
+    for i, (filter_name, arguments) in enumerate(ordered_args):
+        inst = filters.factory.getInstance(filter_name)
+        if i == 0:
+            if inst is None or not isinstance(inst, LoadFilter):
+                raise ChainException("first argument must be a load filter", 1, filter_name, usage=True)
+        elif inst is None or not isinstance(inst, OpFilter):
+            raise ChainException("specified filter (argument %d:'%s') is not an operation filter" % (i, filter_name),
+                                 i, filter_name, usage=True)
+        steps.append(FilterStep(i, filter_name, inst, list(arguments)))
+    return steps
+
+def apply_step(step, collada_inst):
+    if step.index == 0:
+        return step.inst.apply(*step.arguments)
+    return step.inst.apply(collada_inst, *step.arguments)
+
+def run_chain(steps, timings=None, profiler=None):
+    """Runs a resolved filter chain, returning the resulting Collada instance
+
+    :param steps: list of :class:`FilterStep` from :func:`resolve_chain`
+    :param timings: optional list that gets a (filter_name, seconds) tuple
+                    appended for each filter that was run
+    :param profiler: optional :class:`meshtool.profiling.FilterProfiler`
+                     that records each filter
+    """
+    import collada
+
+    collada_inst = None
+    for step in steps:
+        # the load filter is reported as argument 1, and operation
+        # filters are numbered starting from 1 after it
+        argnum = step.index if step.index > 0 else 1
+        start = time.time()
+        try:
+            if profiler is not None:
+                collada_inst = profiler.run(step.name, step.arguments, collada_inst,
+                                            lambda: apply_step(step, collada_inst))
+            else:
+                collada_inst = apply_step(step, collada_inst)
+        except FilterException as e:
+            raise ChainException("(argument %d) '%s': %s" % (argnum, step.name, str(e)), argnum, step.name)
+        if timings is not None:
+            timings.append((step.name, time.time() - start))
+        if not isinstance(collada_inst, collada.Collada):
+            raise ChainException("got an incorrect return value from filter (argument %d) '%s' " % (argnum, step.name),
+                                 argnum, step.name)
+    return collada_inst
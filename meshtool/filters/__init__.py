@@ -1,116 +1,158 @@
-from meshtool.filters.base_filters import FilterFactory
-import sys
+from meshtool.filters.base_filters import FilterFactory, FilterManifestEntry
+from meshtool.args import FileArgument, FilterArgument
+import importlib.util
 
-try:
-    import panda3d
-    HAS_PANDA = True
-except ImportError:
-    HAS_PANDA = False
+# Only check whether panda3d is installed here. Importing it (and every other
+# filter dependency) is deferred until a filter that needs it is requested.
+HAS_PANDA = importlib.util.find_spec('panda3d') is not None
 factory = FilterFactory()
 
-def warn(name, e):
-    sys.stderr.write("Warning: filter '%s' disabled because of ImportError: %s\n" % (name, str(e)))
+def declare(name, module, category, description, arguments=None):
+    factory.declare(FilterManifestEntry(name, 'meshtool.filters.' + module, category, description, arguments))
+
+def load_args():
+    return [FileArgument("file", "Path of the file to load")]
+
+def save_args(*extra):
+    return [FileArgument("file", "Path where the file should be saved to")] + list(extra)
+
+#Static manifest of all filters. The order here is the order they are
+# listed in the command line help. Each filter's module is only imported
+# when FilterFactory.getInstance is called for it.
 
 #Load filters first
-try: import meshtool.filters.load_filters.load_collada
-except ImportError as e: warn('load_collada', e)
-try: import meshtool.filters.load_filters.load_obj
-except ImportError as e: warn('load_obj', e)
+declare('load_collada', 'load_filters.load_collada', 'Loading', 'Loads a collada file', load_args())
+declare('load_obj', 'load_filters.load_obj', 'Loading', 'Loads a Wavefront OBJ file', load_args())
 
 #Print filters
-try: import meshtool.filters.print_filters.print_textures
-except ImportError as e: warn('print_textures', e)
-try: import meshtool.filters.print_filters.print_json
-except ImportError as e: warn('print_json', e)
-try: import meshtool.filters.print_filters.print_info
-except ImportError as e: warn('print_info', e)
-try: import meshtool.filters.print_filters.print_instances
-except ImportError as e: warn('print_instances', e)
-try: import meshtool.filters.print_filters.print_scene
-except ImportError as e: warn('print_scene', e)
-try: import meshtool.filters.print_filters.print_render_info
-except ImportError as e: warn('print_render_info', e)
-try: import meshtool.filters.print_filters.print_bounds
-except ImportError as e: warn('print_bounds', e)
+declare('print_textures', 'print_filters.print_textures', 'Printing',
+        'Prints a list of the embedded images in the mesh')
+declare('print_json', 'print_filters.print_json', 'Printing',
+        'Prints a bunch of information about the mesh in a JSON format')
+declare('print_info', 'print_filters.print_info', 'Printing',
+        'Prints a bunch of information about the mesh to the console')
+declare('print_instances', 'print_filters.print_instances', 'Printing',
+        'Prints geometry instances from the default scene')
+declare('print_scene', 'print_filters.print_scene', 'Printing',
+        'Prints the default scene tree')
+declare('print_render_info', 'print_filters.print_render_info', 'Printing',
+        'Prints estimated number of batches, total number of triangles, and total texture memory')
+declare('print_bounds', 'print_filters.print_bounds', 'Printing',
+        'Prints bounds information about the mesh')
 if HAS_PANDA:
-    try: import meshtool.filters.print_filters.print_pm_perceptual_error
-    except ImportError as e: warn('print_pm_perceptual_error', e)
+    declare('print_pm_perceptual_error', 'print_filters.print_pm_perceptual_error', 'Printing',
+            'Prints perceptual error at different levels of a progressive mesh compared to full resolution',
+            [FileArgument("pm_file", "Path of the progressive mesh file. Specify NONE if no pm file."),
+             FileArgument("mipmap_tar_file", "Path of the tar file with mipmap levels in it")])
 
 #Viewer
 if HAS_PANDA:
-    try: import meshtool.filters.panda_filters.viewer
-    except ImportError as e: warn('viewer', e)
-    try: import meshtool.filters.panda_filters.collada_viewer
-    except ImportError as e: warn('collada_viewer', e)
-    try: import meshtool.filters.panda_filters.pm_viewer
-    except ImportError as e: warn('pm_viewer', e)
+    declare('viewer', 'panda_filters.viewer', 'Visualizations',
+            'Uses panda3d to bring up a viewer')
+    declare('collada_viewer', 'panda_filters.collada_viewer', 'Visualizations',
+            'Uses panda3d to bring up a viewer with lights and camera from the collada file')
+    declare('pm_viewer', 'panda_filters.pm_viewer', 'Visualizations',
+            'Uses panda3d to bring up a viewer of a base mesh and progressive stream',
+            [FileArgument("pm_file", "Path of the progressive mesh file, PDAE or BPDAE")])
 
 #Optimizations
-try: import meshtool.filters.optimize_filters.combine_effects
-except ImportError as e: warn('combine_effects', e)
-try: import meshtool.filters.optimize_filters.combine_materials
-except ImportError as e: warn('combine_materials', e)
-try: import meshtool.filters.optimize_filters.combine_primitives
-except ImportError as e: warn('combine_primitives', e)
-try: import meshtool.filters.optimize_filters.strip_lines
-except ImportError as e: warn('strip_lines', e)
-try: import meshtool.filters.optimize_filters.strip_empty_geometry
-except ImportError as e: warn('strip_empty_geometry', e)
-try: import meshtool.filters.optimize_filters.strip_unused_sources
-except ImportError as e: warn('strip_unused_sources', e)
-try: import meshtool.filters.optimize_filters.triangulate
-except ImportError as e: warn('triangulate', e)
-try: import meshtool.filters.optimize_filters.generate_normals
-except ImportError as e: warn('generate_normals', e)
-try: import meshtool.filters.optimize_filters.save_mipmaps
-except ImportError as e: warn('save_mipmaps', e)
-try: import meshtool.filters.optimize_filters.optimize_textures
-except ImportError as e: warn('optimize_textures', e)
-try: import meshtool.filters.optimize_filters.adjust_texcoords
-except ImportError as e: warn('adjust_texcoords', e)
-try: import meshtool.filters.optimize_filters.normalize_indices
-except ImportError as e: warn('normalize_indices', e)
-try: import meshtool.filters.optimize_filters.split_triangle_texcoords
-except ImportError as e: warn('split_triangle_texcoords', e)
-try: import meshtool.filters.optimize_filters.optimize_sources
-except ImportError as e: warn('optimize_sources', e)
+declare('combine_effects', 'optimize_filters.combine_effects', 'Optimizations',
+        'Combines identical effects')
+declare('combine_materials', 'optimize_filters.combine_materials', 'Optimizations',
+        'Combines identical materials')
+declare('combine_primitives', 'optimize_filters.combine_primitives', 'Optimizations',
+        'Combines primitives within a geometry if they have the same sources and scene material mapping (triangle sets only)')
+declare('strip_lines', 'optimize_filters.strip_lines', 'Optimizations',
+        'Strips any lines from the document')
+declare('strip_empty_geometry', 'optimize_filters.strip_empty_geometry', 'Optimizations',
+        'Strips any empty geometry from the document and removes them from any scenes')
+declare('strip_unused_sources', 'optimize_filters.strip_unused_sources', 'Optimizations',
+        "Strips any source arrays from geometries if they aren't referenced by any primitives")
+declare('triangulate', 'optimize_filters.triangulate', 'Optimizations',
+        'Replaces any polylist or polygons with triangles')
+declare('generate_normals', 'optimize_filters.generate_normals', 'Optimizations',
+        "Generates normals for any triangle sets that don't have any")
+declare('save_mipmaps', 'optimize_filters.save_mipmaps', 'Optimizations',
+        'Saves mipmaps to disk in tar format in the same location as textures but with an added .tar. The archive will contain PNG or JPG images.')
+declare('optimize_textures', 'optimize_filters.optimize_textures', 'Optimizations',
+        'Converts all textures with alpha channel to PNG and ones without to JPEG')
+declare('adjust_texcoords', 'optimize_filters.adjust_texcoords', 'Optimizations',
+        'Adjusts texture coordinates of triangles so that they are as close to the 0-1 range as possible')
+declare('normalize_indices', 'optimize_filters.normalize_indices', 'Optimizations',
+        'Goes through all triangle sets, changing all index values to go from 1 to N, replacing sources to be size N')
+declare('split_triangle_texcoords', 'optimize_filters.split_triangle_texcoords', 'Optimizations',
+        'Splits triangles that span multiple texcoords into multiple triangles to better help texture atlasing')
+declare('optimize_sources', 'optimize_filters.optimize_sources', 'Optimizations',
+        'Compresses sources to unique values, updating triangleset indices')
 
 #Atlasing
-try: import meshtool.filters.atlas_filters.make_atlases
-except ImportError as e: warn('make_atlases', e)
+declare('make_atlases', 'atlas_filters.make_atlases', 'Optimizations',
+        'Makes a texture atlas with the textures referenced in the given file. Extremely conservative: ' +
+        'will only make an atlas from texture coordinates inside the range (0,1). Atlas can be saved with --save_collada_zip.')
+declare('fill_gutters', 'atlas_filters.fill_gutters', 'Optimizations',
+        'Fills the unused space in textures, such as the gaps between images in an atlas made by ' +
+        'make_atlases, with colors blended out from the texels that triangles use, so that it ' +
+        "doesn't bleed into them when mipmapping")
 
 #Simplification
-try: import meshtool.filters.simplify_filters.sander_simplify
-except ImportError as e: warn('sander_simplify', e)
-try: import meshtool.filters.simplify_filters.add_back_pm
-except ImportError as e: warn('add_back_pm', e)
+declare('sander_simplify', 'simplify_filters.sander_simplify', 'Simplification',
+        'Simplifies the mesh based on sandler, et al. method.',
+        [FileArgument('pm_file', 'Where to save the progressive mesh stream, as binary BPDAE if its name ends in .bpdae')])
+declare('sander_simplify_lods', 'simplify_filters.sander_simplify_lods', 'Simplification',
+        'Simplifies the mesh based on sandler, et al. method into several levels of detail in one pass, ' +
+        'all sharing one texture atlas. Each level is saved as its own geometry and scene, with the first ' +
+        'as the default scene. Targets are comma separated triangle counts, or error levels between ' +
+        '0 and 1 with a decimal point, e.g. 20000,5000,0.95',
+        [FilterArgument('targets', 'Comma separated triangle counts, or error levels ' +
+                        'between 0 and 1 with a decimal point, of each level of detail, ' +
+                        'e.g. 20000,5000,0.95')])
+declare('sander_simplify_snapshots', 'simplify_filters.sander_simplify_snapshots', 'Simplification',
+        'Simplifies the mesh based on sandler, et al. method, saving a BPDAE progressive stream ' +
+        'with snapshots of the full mesh at the given levels, so a level can be loaded from the ' +
+        'nearest snapshot below it. Levels are comma separated numbers of refinements, or ' +
+        'fractions of the stream between 0 and 1 with a decimal point, e.g. 0.25,0.5,0.75',
+        [FileArgument('pm_file', 'Where to save the progressive mesh stream, which ' +
+                      'must be named .bpdae'),
+         FilterArgument('levels', 'Comma separated numbers of refinements, or ' +
+                        'fractions of the stream between 0 and 1 with a decimal ' +
+                        'point, to save snapshots at, e.g. 0.25,0.5,0.75')])
+declare('add_back_pm', 'simplify_filters.add_back_pm', 'Simplification',
+        'Adds back mesh data from a progressive PDAE file',
+        [FileArgument('pm_file', 'PDAE or BPDAE file to load from'),
+         FilterArgument('percent', 'Percent of progressive file to add back')])
 
 #Meta filters
-try: import meshtool.filters.meta_filters.medium_optimizations
-except ImportError as e: warn('medium_optimizations', e)
-try: import meshtool.filters.meta_filters.full_optimizations
-except ImportError as e: warn('full_optimizations', e)
+declare('medium_optimizations', 'meta_filters.medium_optimizations', 'Meta',
+        'A meta filter that runs a safe, medium-level of optimizations. Performs these filters in this order: ' +
+        'triangulate, generate_normals, combine_effects, combine_materials, combine_primitives, optimize_sources, ' +
+        'strip_unused_sources, optimize_textures')
+declare('full_optimizations', 'meta_filters.full_optimizations', 'Meta',
+        'A meta filter that runs all optimizations. Performs these filters in this order: ' +
+        'triangulate, generate_normals, combine_effects, combine_materials, combine_primitives, ' +
+        'adjust_texcoords, optimize_textures, split_triangle_texcoords, normalize_indices, ' +
+        'make_atlases, combine_effects, combine_materials, combine_primitives, optimize_sources' +
+        'strip_unused_sources, optimize_textures')
 
 #Save filters last
 if HAS_PANDA:
-    try: import meshtool.filters.panda_filters.save_screenshot
-    except ImportError as e: warn('save_screenshot', e)
-    try: import meshtool.filters.panda_filters.save_rotate_screenshots
-    except ImportError as e: warn('save_rotate_screenshots', e)
-try: import meshtool.filters.save_filters.save_collada
-except ImportError as e: warn('save_collada', e)
-try: import meshtool.filters.save_filters.save_collada_zip
-except ImportError as e: warn('save_collada_zip', e)
-try: import meshtool.filters.save_filters.save_badgerfish
-except ImportError as e: warn('save_badgerfish', e)
-try: import meshtool.filters.save_filters.save_ply
-except ImportError as e: warn('save_ply', e)
-try: import meshtool.filters.save_filters.save_obj
-except ImportError as e: warn('save_obj', e)
-try: import meshtool.filters.save_filters.save_obj_zip
-except ImportError as e: warn('save_obj_zip', e)
+    declare('save_screenshot', 'panda_filters.save_screenshot', 'Saving',
+            'Saves a screenshot of the rendered collada file', save_args())
+    declare('save_rotate_screenshots', 'panda_filters.save_rotate_screenshots', 'Saving',
+            'Saves N screenshots of size WxH, rotating evenly spaced around the object ' +
+            'between shots. Each screenshot file will be file.n.png',
+            save_args(FilterArgument("N", "Number of screenshots to save"),
+                      FilterArgument("W", "Width of thumbnail"),
+                      FilterArgument("H", "Height of screenshot to save")))
+declare('save_collada', 'save_filters.save_collada', 'Saving', 'Saves a collada file', save_args())
+declare('save_collada_zip', 'save_filters.save_collada_zip', 'Saving',
+        'Saves a collada file and textures in a zip file. Normalizes texture paths.', save_args())
+declare('save_badgerfish', 'save_filters.save_badgerfish', 'Saving',
+        'Saves a collada file as JSON badgerfish', save_args())
+declare('save_ply', 'save_filters.save_ply', 'Saving', 'Saves a collada model in PLY format', save_args())
+declare('save_obj', 'save_filters.save_obj', 'Saving', 'Saves a mesh as an OBJ file', save_args())
+declare('save_obj_zip', 'save_filters.save_obj_zip', 'Saving',
+        'Saves an OBJ file and textures in a zip file. Normalizes texture paths.', save_args())
 if HAS_PANDA:
-    try: import meshtool.filters.save_filters.save_bam
-    except ImportError as e: warn('save_bam', e)
-try: import meshtool.filters.save_filters.save_threejs_scene
-except ImportError as e: warn('save_threejs_scene', e)
+    declare('save_bam', 'save_filters.save_bam', 'Saving', 'Saves to Panda3D BAM file format', save_args())
+declare('save_threejs_scene', 'save_filters.save_threejs_scene', 'Saving',
+        'Saves a collada model in three.js 4.3 scene format', save_args())
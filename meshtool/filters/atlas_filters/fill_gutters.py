@@ -0,0 +1,160 @@
+from meshtool.filters.base_filters import OptimizationFilter
+from meshtool.filters.atlas_filters.make_atlases import getTexcoordToImgMapping
+from meshtool.filters.simplify_filters.rasterize import rasterize_triangles
+from meshtool.util import Image
+import collada
+import numpy
+from io import BytesIO
+
+def pullPushFill(pixels, covered):
+    """Fills the pixels of an image that aren't covered with a smooth
+    blend of the nearest covered pixels, using a pull-push pyramid.
+
+    Pulling averages the covered pixels into successively smaller levels,
+    each pixel weighted by how much of it is covered, until a single pixel
+    is left. Pushing then goes back up, filling the uncovered parts of each
+    level from the level below it. Covered pixels are left unchanged, and
+    the time and memory taken are linear in the number of pixels.
+
+    :param pixels: (H,W,C) or (H,W) array of the image
+    :param covered: (H,W) bool array of the pixels to keep
+    :returns: a new array of the same shape and dtype as pixels
+    """
+    pixels = numpy.asarray(pixels)
+    covered = numpy.asarray(covered, dtype=bool)
+    if not numpy.any(covered) or numpy.all(covered):
+        return pixels.copy()
+
+    colors = pixels.reshape(pixels.shape[:2] + (-1,)).astype(numpy.float64)
+    weights = covered.astype(numpy.float64)
+
+    #pull: colors are averages of the covered parts of each pixel, with
+    # weights being how covered it is, clamped to 1
+    levels = [(colors, weights)]
+    while weights.shape[0] > 1 or weights.shape[1] > 1:
+        height, width = weights.shape
+        #odd sizes are padded with an uncovered row or column
+        padded_colors = numpy.zeros((height + height % 2, width + width % 2, colors.shape[2]))
+        padded_weights = numpy.zeros(padded_colors.shape[:2])
+        padded_colors[:height,:width] = colors * weights[:,:,None]
+        padded_weights[:height,:width] = weights
+
+        summed_colors = padded_colors[0::2,0::2] + padded_colors[1::2,0::2] + \
+                        padded_colors[0::2,1::2] + padded_colors[1::2,1::2]
+        summed_weights = padded_weights[0::2,0::2] + padded_weights[1::2,0::2] + \
+                         padded_weights[0::2,1::2] + padded_weights[1::2,1::2]
+        colors = summed_colors / numpy.where(summed_weights > 0, summed_weights, 1)[:,:,None]
+        weights = numpy.minimum(summed_weights, 1)
+        levels.append((colors, weights))
+
+    #push: blend each level's colors with the filled level below it
+    filled = levels[-1][0]
+    for colors, weights in reversed(levels[:-1]):
+        height, width = weights.shape
+        below = numpy.repeat(numpy.repeat(filled, 2, axis=0), 2, axis=1)[:height,:width]
+        filled = colors * weights[:,:,None] + below * (1 - weights[:,:,None])
+
+    if numpy.issubdtype(pixels.dtype, numpy.integer):
+        limits = numpy.iinfo(pixels.dtype)
+        filled = numpy.clip(numpy.round(filled), limits.min, limits.max)
+    return filled.astype(pixels.dtype).reshape(pixels.shape)
+
+def getImageCoverage(mesh):
+    """Finds the texels of each image that the mesh's texture coordinates map to
+
+    :returns: a dict mapping image paths to (H,W) bool arrays of the
+              covered texels. Images with texture coordinates outside
+              of the range (0,1), which tile, are left out.
+    """
+    path2image = dict((cimg.path, cimg) for cimg in mesh.images)
+    coverage = {}
+    tiled = set()
+
+    for texset, imgpaths in getTexcoordToImgMapping(mesh).items():
+        prim = mesh.geometries[texset.geom_id].primitives[texset.prim_index]
+        if isinstance(prim, collada.lineset.LineSet):
+            continue
+        if not isinstance(prim, collada.triangleset.TriangleSet):
+            prim = prim.triangleset()
+        if len(prim) == 0:
+            continue
+        texcoords = prim.texcoordset[texset.texcoordset_index][prim.texcoord_indexset[texset.texcoordset_index]]
+        inside = numpy.all((texcoords >= 0.0) & (texcoords <= 1.0))
+
+        for path in imgpaths:
+            if path in tiled:
+                continue
+            if not inside:
+                tiled.add(path)
+                coverage.pop(path, None)
+                continue
+            pilimg = path2image[path].pilimage if path in path2image else None
+            if pilimg is None:
+                continue
+
+            width, height = pilimg.size
+            tris = numpy.empty(texcoords.shape, dtype=numpy.float64)
+            tris[:,:,0] = texcoords[:,:,0] * width
+            tris[:,:,1] = (1.0 - texcoords[:,:,1]) * height
+            pixels, tri_ids, bary = rasterize_triangles(tris, width, height)
+
+            if path not in coverage:
+                coverage[path] = numpy.zeros(height * width, dtype=bool)
+            coverage[path][pixels] = True
+
+    return dict((path, covered.reshape(path2image[path].pilimage.size[::-1]))
+                for path, covered in coverage.items())
+
+def fillGutters(mesh):
+    previous_images = [cimg.path for cimg in mesh.images]
+    coverage = getImageCoverage(mesh)
+
+    for cimg in mesh.images:
+        if cimg.path not in coverage:
+            continue
+        covered = coverage[cimg.path]
+        if numpy.all(covered) or not numpy.any(covered):
+            continue
+
+        pilimg = cimg.pilimage
+        original_format = pilimg.format
+        if pilimg.mode not in ('L', 'LA', 'RGB', 'RGBA'):
+            pilimg = pilimg.convert('RGBA' if 'A' in pilimg.getbands() else 'RGB')
+        filled = pullPushFill(numpy.asarray(pilimg), covered)
+        pilimg = Image.fromarray(filled)
+
+        #keep JPEGs as JPEG, everything else gets saved as a PNG
+        if original_format == 'JPEG' and pilimg.mode in ('L', 'RGB'):
+            output_format = 'JPEG'
+            output_extension = '.jpg'
+            output_options = {'quality':95, 'optimize':True}
+        else:
+            output_format = 'PNG'
+            output_extension = '.png'
+            output_options = {'optimize':True}
+
+        if original_format != output_format and cimg.path.lower()[-len(output_extension):] != output_extension:
+            dot = cimg.path.rfind('.')
+            before_ext = cimg.path[0:dot] if dot != -1 else cimg.path
+            while before_ext + output_extension in previous_images:
+                before_ext = before_ext + '-x'
+            cimg.path = before_ext + output_extension
+            previous_images.append(cimg.path)
+
+        outbuf = BytesIO()
+        pilimg.save(outbuf, output_format, **output_options)
+        cimg.data = outbuf.getvalue()
+
+def FilterGenerator():
+    class FillGuttersFilter(OptimizationFilter):
+        def __init__(self):
+            super(FillGuttersFilter, self).__init__('fill_gutters',
+                    'Fills the unused space in textures, such as the gaps between images in an atlas made by ' +
+                    'make_atlases, with colors blended out from the texels that triangles use, so that it ' +
+                    'doesn\'t bleed into them when mipmapping')
+        def apply(self, mesh):
+            fillGutters(mesh)
+            return mesh
+    return FillGuttersFilter()
+from meshtool.filters import factory
+factory.register(FilterGenerator().name, FilterGenerator)
@@ -1,4 +1,5 @@
 import bisect
+import functools
 
 class CouldNotPack:
     pass
@@ -11,8 +12,8 @@ class TreeNode:
         self.key = key
         self.area = rect[2]*rect[3]
 
-    def __cmp__(self, other):
-        return cmp(self.area, other.area)
+    def __lt__(self, other):
+        return self.area < other.area
 
     def __iter__(self):
         if self.left is not None:
@@ -32,8 +33,8 @@ class TreeNode:
 class DummyAreaSorter(object):
     def __init__(self, area):
         self.area = area
-    def __cmp__(self, other):
-        return cmp(self.area, other.area)
+    def __lt__(self, other):
+        return self.area < other.area
 
 # Sort by longer side then shorter side, descending
 def rectcmp(rect1, rect2):
@@ -61,7 +62,7 @@ class RectPack:
         
         rects = [(key, self.rectangles[key][0], self.rectangles[key][1])
                  for key in self.rectangles]
-        rects.sort(rectcmp)
+        rects.sort(key=functools.cmp_to_key(rectcmp))
         
         #initial smallest pack could be two 1x1 rects, although not likely
         width = 2
@@ -118,6 +119,13 @@ class RectPack:
     def getPlacement(self, key):
         return self.placements[key]
     
+    def __getstate__(self):
+        #the tree of free locations is only needed while packing, and is
+        # too deeply nested to pickle
+        state = dict(self.__dict__)
+        state.pop('free_locations', None)
+        return state
+    
     def insert(self, rect):
         width_to_insert = rect[1]*rect[2]
         area_loc = bisect.bisect_left(self.free_locations, DummyAreaSorter(width_to_insert))
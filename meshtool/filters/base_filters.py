@@ -1,3 +1,5 @@
+import importlib
+import sys
 from meshtool.args import FileArgument
 
 class FilterException(Exception):
@@ -65,16 +67,65 @@ class SaveFilter(OpFilter):
         
     CATEGORY = 'Saving'
 
+class FilterManifestEntry(object):
+    """Static description of a filter that is available without importing
+    the module that implements it"""
+    def __init__(self, name, module, category, description, arguments=None):
+        self.name = name
+        self.module = module
+        self.category = category
+        self.description = description
+        self.arguments = arguments if arguments is not None else []
+    def __str__(self):
+        return "<FilterManifestEntry (name=%s, module=%s)>" % (self.name, self.module)
+
 class FilterFactory(object):
-    """Factor for registering and retrieving filters"""
+    """Factor for registering and retrieving filters
+    
+    Filters can either be registered directly with :meth:`register` or
+    declared with a :class:`FilterManifestEntry`, in which case the module
+    implementing the filter is only imported the first time an instance
+    of it is requested."""
     def __init__(self):
         self.registrar = {}
+        self.manifest = {}
+        self.importErrors = {}
         #keeping a list of names to preserve ordering
         self.nameList = []
     def register(self, name, filter_generator):
         self.registrar[name] = filter_generator
-        self.nameList.append(name)
+        if name not in self.manifest:
+            self.nameList.append(name)
+    def declare(self, entry):
+        self.manifest[entry.name] = entry
+        self.nameList.append(entry.name)
+    def getManifestEntry(self, name):
+        return self.manifest.get(name)
+    def getCategory(self, name):
+        if name in self.manifest:
+            return self.manifest[name].category
+        inst = self.getInstance(name)
+        return inst.CATEGORY if inst is not None else None
+    def getDescription(self, name):
+        if name in self.manifest:
+            return self.manifest[name].description
+        inst = self.getInstance(name)
+        return inst.description if inst is not None else None
+    def getArguments(self, name):
+        if name in self.manifest:
+            return self.manifest[name].arguments
+        inst = self.getInstance(name)
+        return inst.arguments if inst is not None else []
     def getInstance(self, name):
+        if name not in self.registrar and name in self.manifest:
+            if name in self.importErrors:
+                return None
+            try:
+                importlib.import_module(self.manifest[name].module)
+            except ImportError as e:
+                self.importErrors[name] = e
+                sys.stderr.write("Warning: filter '%s' disabled because of ImportError: %s\n" % (name, str(e)))
+                return None
         if name in self.registrar:
             return self.registrar[name]()
         else:
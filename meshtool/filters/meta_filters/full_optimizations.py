@@ -1,5 +1,6 @@
 from meshtool.filters.base_filters import MetaFilter
 from meshtool.filters import factory
+from meshtool.profiling import profile_filter
 
 def fullOptimizations(mesh):
     optimize_filters = [
@@ -23,7 +24,7 @@ def fullOptimizations(mesh):
     
     for f in optimize_filters:
         inst = factory.getInstance(f)
-        mesh = inst.apply(mesh)
+        mesh = profile_filter(f, inst, mesh)
         
     return mesh
 
@@ -1,5 +1,6 @@
 from meshtool.filters.base_filters import MetaFilter
 from meshtool.filters import factory
+from meshtool.profiling import profile_filter
 
 def mediumOptimizations(mesh):
     optimize_filters = [
@@ -15,7 +16,7 @@ def mediumOptimizations(mesh):
     
     for f in optimize_filters:
         inst = factory.getInstance(f)
-        mesh = inst.apply(mesh)
+        mesh = profile_filter(f, inst, mesh)
         
     return mesh
 
@@ -1,12 +1,6 @@
 from meshtool.filters.base_filters import OptimizationFilter
 import collada
 import numpy
-import inspect
-
-#after numpy 1.3, unique1d was renamed to unique
-args, varargs, keywords, defaults = inspect.getargspec(numpy.unique)    
-if 'return_inverse' not in args:
-    numpy.unique = numpy.unique1d
 
 def optimizeSources(mesh):
     
@@ -44,6 +38,7 @@ def optimizeSources(mesh):
             #makes the array unique and returns index locations for previous data
             unique_data, index_locs = numpy.unique( new_data.view([('',new_data.dtype)]*new_data.shape[1]), return_inverse=True)
             unique_data = unique_data.view(new_data.dtype).reshape(-1,new_data.shape[1])
+            index_locs = index_locs.reshape(-1)
             
             base_source_name = srcid + '-unique'
             source_name = base_source_name
@@ -5,7 +5,6 @@ import struct
 from math import pi, sin, cos
 from meshtool.util import Image, ImageOps
 from io import StringIO
-import inspect
 import math
 
 from direct.task import Task
@@ -26,11 +25,6 @@ from panda3d.core import PTAFloat, CPTAFloat, AnimBundleNode, DepthOffsetAttrib
 from direct.actor.Actor import Actor
 from panda3d.core import loadPrcFileData
 
-#after numpy 1.3, unique1d was renamed to unique
-args, varargs, keywords, defaults = inspect.getargspec(numpy.unique)    
-if 'return_inverse' not in args:
-    numpy.unique = numpy.unique1d
-
 def getNodeFromController(controller, controlled_prim):
     if type(controlled_prim) is collada.controller.BoundSkinPrimitive:
         ch = Character('simplechar')
@@ -179,11 +173,11 @@ def getVertexData(vertex, vertex_index, normal=None, normal_index=None,
     unique_stacked_indices = unique_stacked_indices.view(stacked_indices.dtype).reshape(-1,stacked_indices.shape[1])
     
     #unique returns as int64, so cast back
-    index_map = numpy.cast['uint32'](index_map)
-    inverse_map = numpy.cast['uint32'](inverse_map)
+    index_map = index_map.astype(numpy.uint32)
+    inverse_map = inverse_map.astype(numpy.uint32).reshape(-1)
     
     #sort the index map to get a list of the index of the first time each value was encountered
-    sorted_map = numpy.cast['uint32'](numpy.argsort(index_map))
+    sorted_map = numpy.argsort(index_map).astype(numpy.uint32)
     
     #since we're sorting the unique values, we have to map the inverse_map to the new index locations
     backwards_map = numpy.zeros_like(sorted_map)
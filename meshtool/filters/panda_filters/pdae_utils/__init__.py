@@ -2,7 +2,9 @@ try:
     from pdae_cython import *
 except ImportError:
     from .pdae_python import *
-    
+from .pdae_binary import *
+from .pdae_arrays import *
+
 import unittest
 import time
 import os
@@ -68,5 +70,26 @@ class PDAETest(unittest.TestCase):
                 print('Took', after - start, 'seconds to load')
                 self.assertEqual(all_pm_refinements, blessed_refinements)
     
+    def testParser(self):
+        to_test = ['test.pdae', 'planterfeeder.dae.pdae', 'terrain_test_2.dae.pdae']
+        
+        for test_file in to_test:
+            f = open(os.path.join(CURDIR, test_file))
+            blessed_refinements = readPDAE(f)
+            
+            for block_size in [100, 1024, 50 * 1024, 1024 * 1024]:
+                start = time.time()
+                f = open(os.path.join(CURDIR, test_file), 'rb')
+                parser = PDAEParser()
+                all_pm_refinements = []
+                data = f.read(block_size)
+                while len(data) > 0:
+                    all_pm_refinements.extend(parser.feed(data))
+                    data = f.read(block_size)
+                after = time.time()
+                print('Took', after - start, 'seconds to parse in blocks of', block_size)
+                self.assertTrue(parser.done)
+                self.assertEqual([refinementOps(r) for r in all_pm_refinements], blessed_refinements)
+    
 if __name__ == '__main__':
     unittest.main()
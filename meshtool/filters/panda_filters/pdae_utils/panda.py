@@ -1,7 +1,7 @@
 import panda3d.core as p3d
-from meshtool.filters.panda_filters import pdae_utils as pdae
 
 def add_refinements(geomPath, refinements):
+    """Applies a list of pdae_utils.Refinement to the first geom of geomPath"""
     geom = geomPath.node().modifyGeom(0)
     vertdata = geom.modifyVertexData()
     prim = geom.modifyPrimitive(0)
@@ -20,23 +20,21 @@ def add_refinements(geomPath, refinements):
     uvwriter.setRow(numverts)
     
     for refinement in refinements:
-        for vals in refinement:
-            op = vals[0]
-            if op == pdae.PM_OP.TRIANGLE_ADDITION:
-                indexrewriter.setRow(nextTriangleIndex)
-                nextTriangleIndex += 3
-                indexrewriter.addData1i(vals[1])
-                indexrewriter.addData1i(vals[2])
-                indexrewriter.addData1i(vals[3])
-            
-            elif op == pdae.PM_OP.INDEX_UPDATE:
-                indexrewriter.setRow(vals[1])
-                indexrewriter.setData1i(vals[2])
-                
-            elif op == pdae.PM_OP.VERTEX_ADDITION:
-                numverts += 1
-                vertwriter.addData3f(vals[1], vals[2], vals[3])
-                normalwriter.addData3f(vals[4], vals[5], vals[6])
-                uvwriter.addData2f(vals[7], vals[8])
+        for vals in refinement.vertices.tolist():
+            numverts += 1
+            vertwriter.addData3f(vals[0], vals[1], vals[2])
+            normalwriter.addData3f(vals[3], vals[4], vals[5])
+            uvwriter.addData2f(vals[6], vals[7])
+        
+        for vals in refinement.triangles.tolist():
+            indexrewriter.setRow(nextTriangleIndex)
+            nextTriangleIndex += 3
+            indexrewriter.addData1i(vals[0])
+            indexrewriter.addData1i(vals[1])
+            indexrewriter.addData1i(vals[2])
+        
+        for vals in refinement.updates.tolist():
+            indexrewriter.setRow(vals[0])
+            indexrewriter.setData1i(vals[1])
 
     indexdata.setNumRows(nextTriangleIndex)
@@ -0,0 +1,194 @@
+"""Reads the refinements of a progressive stream in either format as
+NumPy arrays, reading no further into the file than the last refinement
+asked for.
+
+Refinements read together can be joined into a single Refinement, which
+applies the same way as applying them one after another: its vertices
+and triangles are appended in order, then its index updates made in
+order. That holds as long as each index update refers to a triangle
+added before it, which is the case for every stream sander_simplify
+writes.
+
+Text streams are parsed with :class:`PDAEParser`, a push parser that's
+fed bytes as they arrive. The compiled one from pdae_cython is used
+when it's been built.
+"""
+
+import numpy
+from .pdae_binary import Refinement, BPDAEReader, isBPDAE, joinRefinements, INDEX_DTYPE
+
+__all__ = ['PDAEParser', 'PDAEReader', 'openPDAE']
+
+#bytes read from a text stream at a time
+READ_CHUNK_SIZE = 256 * 1024
+
+#number of values after the letter on each kind of operation line
+OPERATION_WIDTHS = {b'v': 8, b't': 3, b'u': 2}
+
+def _split(array, counts):
+    bounds = numpy.cumsum([0] + list(counts)).tolist()
+    return [array[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+def parseRefinements(block, num_ops):
+    """Parses the text of consecutive complete refinements into a list of
+    Refinements. block is the bytes of their lines, each refinement a
+    line with its number of operations followed by that many operation
+    lines, and num_ops the number of operations of each. Vertices are
+    kept as the float64 values parsed from the text."""
+    data = numpy.frombuffer(block, dtype=numpy.uint8)
+    line_starts = numpy.concatenate(([0], numpy.flatnonzero(data == ord('\n')) + 1))
+    is_count = numpy.zeros(len(line_starts), dtype=bool)
+    is_count[numpy.cumsum([0] + [count + 1 for count in num_ops[:-1]]).astype(numpy.int64)] = True
+    kinds = data[line_starts[~is_count]] if len(data) > 0 else numpy.zeros(0, dtype=numpy.uint8)
+    
+    #with the letters taken out, every value of the block is converted at
+    # once and found by its position among all the values
+    values = numpy.fromstring(block.translate(None, b'vtu'), dtype=numpy.float64, sep=' ')
+    values_per_line = numpy.ones(len(line_starts), dtype=numpy.int64)
+    op_values = numpy.zeros(len(kinds), dtype=numpy.int64)
+    for kind, width in OPERATION_WIDTHS.items():
+        op_values[kinds == ord(kind)] = width
+    if numpy.any(op_values == 0):
+        raise ValueError('invalid PDAE operation')
+    values_per_line[~is_count] = op_values
+    if values_per_line.sum() != len(values):
+        raise ValueError('invalid PDAE operation')
+    op_starts = (numpy.cumsum(values_per_line) - values_per_line)[~is_count]
+    
+    refinement_of_op = numpy.repeat(numpy.arange(len(num_ops)), num_ops)
+    sections = []
+    for kind, dtype in ((b'v', numpy.float64), (b't', INDEX_DTYPE), (b'u', INDEX_DTYPE)):
+        width = OPERATION_WIDTHS[kind]
+        selected = kinds == ord(kind)
+        positions = op_starts[selected][:,numpy.newaxis] + numpy.arange(width)
+        section = values[positions.reshape(-1)].astype(dtype).reshape(-1, width)
+        sections.append(_split(section, numpy.bincount(refinement_of_op[selected], minlength=len(num_ops))))
+    return [Refinement(*parts) for parts in zip(*sections)]
+
+class PDAEParser(object):
+    """Push parser for text PDAE streams
+
+    Data is passed to :meth:`feed` in chunks of any size, and each call
+    returns the refinements it completed. Only the data after the last
+    complete refinement is kept, together with the positions of the line
+    ends already found in it, so each byte is scanned once and leftover
+    data is never copied into a new string.
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+        #positions in buffer of the line ends found so far
+        self.line_ends = numpy.zeros(0, dtype=numpy.int64)
+        self.num_refinements = None
+        self.refinements_read = 0
+
+    @property
+    def done(self):
+        """Whether every refinement in the stream has been parsed"""
+        return self.num_refinements is not None and self.refinements_read >= self.num_refinements
+
+    def _line_start(self, line):
+        return 0 if line == 0 else int(self.line_ends[line-1]) + 1
+
+    def feed(self, data):
+        """Adds bytes to the stream, returning a list of the Refinements
+        completed by them. Data after the last refinement is ignored."""
+        if self.done:
+            return []
+        found = numpy.flatnonzero(numpy.frombuffer(data, dtype=numpy.uint8) == ord('\n'))
+        self.line_ends = numpy.concatenate((self.line_ends, found + len(self.buffer)))
+        self.buffer += data
+
+        line = 0
+        if self.num_refinements is None:
+            if len(self.line_ends) < 2:
+                return []
+            if bytes(self.buffer[:self.line_ends[0]]).strip() != b'PDAE':
+                raise ValueError('not a PDAE file')
+            self.num_refinements = int(self.buffer[self.line_ends[0]+1:self.line_ends[1]])
+            line = 2
+
+        #find the complete refinements, each a line with its number of
+        # operations followed by that many lines
+        first_line = line
+        num_ops = []
+        while self.refinements_read + len(num_ops) < self.num_refinements and line < len(self.line_ends):
+            count = int(self.buffer[self._line_start(line):self.line_ends[line]])
+            if line + count >= len(self.line_ends):
+                break
+            num_ops.append(count)
+            line += count + 1
+
+        refinements = []
+        if len(num_ops) > 0:
+            block = bytes(self.buffer[self._line_start(first_line):self.line_ends[line-1]])
+            refinements = parseRefinements(block, num_ops)
+            self.refinements_read += len(num_ops)
+
+        consumed = self._line_start(line)
+        del self.buffer[:consumed]
+        self.line_ends = self.line_ends[line:] - consumed
+        return refinements
+
+class PDAEReader(object):
+    """Reads the refinements of a text PDAE file in order"""
+    def __init__(self, pm_filebuf, chunk_size=READ_CHUNK_SIZE):
+        """:param pm_filebuf: file opened in binary mode, positioned at the
+                              start of the stream"""
+        self.filebuf = pm_filebuf
+        self.chunk_size = chunk_size
+        self.parser = PDAEParser()
+        #refinements parsed but not read yet
+        self.pending = []
+        self.position = 0
+        while self.parser.num_refinements is None:
+            if not self._feed():
+                raise ValueError('not a PDAE file')
+
+    def _feed(self):
+        data = self.filebuf.read(self.chunk_size)
+        if len(data) == 0:
+            return False
+        self.pending.extend(self.parser.feed(data))
+        return True
+
+    def __len__(self):
+        return self.parser.num_refinements
+
+    def snapshot(self, level):
+        """Text streams have no snapshots, so this is always None"""
+        return None
+
+    def read(self, start=0, end=None, join=False):
+        """Returns refinements [start, end) as a list of Refinements, or as
+        one Refinement if join is set. Since a text stream has no index,
+        start has to be where the previous read ended."""
+        if end is None or end > len(self):
+            end = len(self)
+        if start != self.position:
+            raise ValueError('text PDAE refinements can only be read in order')
+        end = max(start, end)
+
+        while len(self.pending) < end - start:
+            if not self._feed():
+                raise ValueError('truncated PDAE file')
+        refinements = self.pending[:end-start]
+        del self.pending[:end-start]
+        self.position = end
+        return joinRefinements(refinements) if join else refinements
+
+def openPDAE(pm_filebuf):
+    """Returns a reader with the same interface as PDAEReader for a
+    progressive stream in either format, from a seekable file opened in
+    binary mode. A binary stream can also be read out of order."""
+    if isBPDAE(pm_filebuf):
+        return BPDAEReader(pm_filebuf)
+    return PDAEReader(pm_filebuf)
+
+#still available under its own name when the compiled parser replaces it
+PythonPDAEParser = PDAEParser
+
+try:
+    #the compiled parser has the same interface
+    from .pdae_cython import PDAEParser
+except ImportError:
+    pass
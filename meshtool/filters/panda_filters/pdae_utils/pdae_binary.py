@@ -0,0 +1,311 @@
+"""Binary progressive mesh streams
+
+A BPDAE file holds the same refinements as a text PDAE file, packed
+little-endian so they decode straight into NumPy arrays:
+
+ - the 6-byte magic number, the string BPDAE followed by a null character
+ - uint16 format version and uint32 number of refinements
+ - an index of uint64 byte offsets from the start of the file, one for
+   each refinement and one for the end of the last, so any range of
+   refinements can be read with one seek and one read
+ - each refinement: uint32 counts of its vertex additions, triangle
+   additions and index updates, followed by its new vertices as 8
+   float32s each (x y z, normal x y z, s t), its new triangles as 3
+   uint32 vertex indices each and its index updates as uint32
+   (index location, vertex index) pairs
+
+Within a refinement the operations are grouped by kind and applied in
+that order: vertices are added, then triangles, then the index updates
+in the order they're given. That's also the order sander_simplify
+writes them in a text PDAE.
+
+The refinements can be followed by snapshots, the full vertex and index
+buffers of the mesh after some number of refinements, so a level can be
+loaded from the nearest snapshot below it by applying only the
+refinements in between. Readers that don't know about them never read
+past the end of the last refinement. The snapshot section is:
+
+ - the 6-byte magic number, the string BSNAP followed by a null character
+ - uint32 number of snapshots
+ - a table with, for each snapshot in increasing order of level, uint32
+   number of refinements applied, number of vertices and number of
+   indices, and the uint64 byte offset of its data from the start of the
+   file
+ - each snapshot's vertices as 8 float32s each, followed by its indices
+   as uint32s, three for each triangle
+"""
+
+import io
+import sys
+import collections
+import numpy
+from .pdae_python import PM_OP
+
+__all__ = ['BPDAE_MAGIC', 'BPDAE_VERSION', 'Refinement', 'Snapshot', 'refinementFromOps', 'refinementOps',
+           'joinRefinements', 'applyRefinement', 'writeBPDAE', 'decodeRefinements', 'decodeJoinedRefinements', 'isBPDAE',
+           'BPDAEReader', 'readBPDAE', 'readLevel', 'loadPDAE', 'convertPDAE']
+
+BPDAE_MAGIC = b'BPDAE\x00'
+BPDAE_VERSION = 1
+SNAPSHOT_MAGIC = b'BSNAP\x00'
+
+VERTEX_DTYPE = numpy.dtype('<f4')
+INDEX_DTYPE = numpy.dtype('<u4')
+
+HEADER_SIZE = len(BPDAE_MAGIC) + 2 + 4
+COUNTS_SIZE = 3 * 4
+VERTEX_SIZE = 8 * 4
+TRIANGLE_SIZE = 3 * 4
+UPDATE_SIZE = 2 * 4
+SNAPSHOT_HEADER_SIZE = len(SNAPSHOT_MAGIC) + 4
+
+SNAPSHOT_ENTRY = numpy.dtype([('level', '<u4'), ('vertices', '<u4'), ('indices', '<u4'), ('offset', '<u8')])
+
+#vertices is an (N,8) float32 array, triangles an (N,3) and updates an (N,2) uint32 array
+Refinement = collections.namedtuple('Refinement', ['vertices', 'triangles', 'updates'])
+
+#the mesh after level refinements: vertices is an (N,8) float array and
+# indices a flat uint32 array, three for each triangle
+Snapshot = collections.namedtuple('Snapshot', ['level', 'vertices', 'indices'])
+
+def refinementFromOps(refinement_ops):
+    """Groups a list of operation tuples, as returned by readPDAE, into a Refinement"""
+    vertices = [op[1:] for op in refinement_ops if op[0] == PM_OP.VERTEX_ADDITION]
+    triangles = [op[1:] for op in refinement_ops if op[0] == PM_OP.TRIANGLE_ADDITION]
+    updates = [op[1:] for op in refinement_ops if op[0] == PM_OP.INDEX_UPDATE]
+    return Refinement(numpy.array(vertices, dtype=numpy.float32).reshape(-1, 8),
+                      numpy.array(triangles, dtype=numpy.uint32).reshape(-1, 3),
+                      numpy.array(updates, dtype=numpy.uint32).reshape(-1, 2))
+
+def refinementOps(refinement):
+    """The operation tuples of a Refinement, in the same form as readPDAE returns"""
+    ops = [(PM_OP.VERTEX_ADDITION,) + tuple(v) for v in refinement.vertices.tolist()]
+    ops.extend((PM_OP.TRIANGLE_ADDITION,) + tuple(t) for t in refinement.triangles.tolist())
+    ops.extend((PM_OP.INDEX_UPDATE,) + tuple(u) for u in refinement.updates.tolist())
+    return ops
+
+def writeBPDAE(pm_refinements, bpdae_outbuf, snapshots=()):
+    """Writes a list of Refinements, or of lists of operation tuples, to a
+    file opened in binary mode, followed by a list of Snapshots if any are
+    given. Returns the number of bytes written."""
+    pm_refinements = [r if isinstance(r, Refinement) else refinementFromOps(r) for r in pm_refinements]
+
+    sizes = [COUNTS_SIZE + VERTEX_SIZE * len(r.vertices) + TRIANGLE_SIZE * len(r.triangles) +
+             UPDATE_SIZE * len(r.updates) for r in pm_refinements]
+    index = numpy.zeros(len(pm_refinements) + 1, dtype='<u8')
+    index[0] = HEADER_SIZE + index.nbytes
+    numpy.cumsum(sizes, out=index[1:])
+    index[1:] += index[0]
+
+    bpdae_outbuf.write(BPDAE_MAGIC)
+    bpdae_outbuf.write(numpy.array([BPDAE_VERSION], dtype='<u2').tobytes())
+    bpdae_outbuf.write(numpy.array([len(pm_refinements)], dtype='<u4').tobytes())
+    bpdae_outbuf.write(index.tobytes())
+    for r in pm_refinements:
+        counts = numpy.array([len(r.vertices), len(r.triangles), len(r.updates)], dtype=INDEX_DTYPE)
+        bpdae_outbuf.write(counts.tobytes() +
+                           numpy.ascontiguousarray(r.vertices, dtype=VERTEX_DTYPE).tobytes() +
+                           numpy.ascontiguousarray(r.triangles, dtype=INDEX_DTYPE).tobytes() +
+                           numpy.ascontiguousarray(r.updates, dtype=INDEX_DTYPE).tobytes())
+    if len(snapshots) == 0:
+        return int(index[-1])
+    
+    snapshots = sorted(snapshots, key=lambda snapshot: snapshot.level)
+    table = numpy.zeros(len(snapshots), dtype=SNAPSHOT_ENTRY)
+    table['level'] = [snapshot.level for snapshot in snapshots]
+    table['vertices'] = [len(snapshot.vertices) for snapshot in snapshots]
+    table['indices'] = [len(snapshot.indices) for snapshot in snapshots]
+    sizes = VERTEX_SIZE * table['vertices'].astype(numpy.int64) + 4 * table['indices'].astype(numpy.int64)
+    table['offset'] = int(index[-1]) + SNAPSHOT_HEADER_SIZE + table.nbytes + numpy.cumsum(sizes) - sizes
+    
+    bpdae_outbuf.write(SNAPSHOT_MAGIC)
+    bpdae_outbuf.write(numpy.array([len(snapshots)], dtype='<u4').tobytes())
+    bpdae_outbuf.write(table.tobytes())
+    for snapshot in snapshots:
+        bpdae_outbuf.write(numpy.ascontiguousarray(snapshot.vertices, dtype=VERTEX_DTYPE).tobytes() +
+                           numpy.ascontiguousarray(snapshot.indices, dtype=INDEX_DTYPE).tobytes())
+    return int(table['offset'][-1] + sizes[-1])
+
+def joinRefinements(refinements):
+    """Concatenates a list of Refinements into one"""
+    if len(refinements) == 0:
+        return Refinement(numpy.zeros((0, 8), dtype=VERTEX_DTYPE),
+                          numpy.zeros((0, 3), dtype=INDEX_DTYPE),
+                          numpy.zeros((0, 2), dtype=INDEX_DTYPE))
+    return Refinement(*[numpy.concatenate(parts) for parts in zip(*refinements)])
+
+def applyRefinement(vertices, indices, refinement):
+    """Returns the vertex and index buffers after applying a Refinement,
+    such as several joined together, to an (N,8) vertex array and a flat
+    index array. Where an index is updated more than once its last update
+    is the one that's kept."""
+    vertices = numpy.concatenate((vertices, refinement.vertices))
+    indices = numpy.concatenate((indices, refinement.triangles.reshape(-1)))
+    locations, last = numpy.unique(refinement.updates[::-1,0], return_index=True)
+    indices[locations] = refinement.updates[::-1,1][last]
+    return vertices, indices
+
+def _ranges(starts, lengths):
+    """Concatenation of arange(start, start+length) for each pair"""
+    total = int(lengths.sum())
+    return numpy.repeat(starts - (numpy.cumsum(lengths) - lengths), lengths) + numpy.arange(total)
+
+def decodeJoinedRefinements(data, offsets):
+    """Decodes the refinements starting at each of an array of byte
+    offsets into a bytes-like object, joined into one Refinement"""
+    words = numpy.frombuffer(data, INDEX_DTYPE)
+    starts = numpy.asarray(offsets, dtype=numpy.int64) // 4
+    counts = words[starts[:,numpy.newaxis] + numpy.arange(3)].astype(numpy.int64)
+    vertex_starts = starts + 3
+    triangle_starts = vertex_starts + 8 * counts[:,0]
+    update_starts = triangle_starts + 3 * counts[:,1]
+    return Refinement(words[_ranges(vertex_starts, 8 * counts[:,0])].view(VERTEX_DTYPE).reshape(-1, 8),
+                      words[_ranges(triangle_starts, 3 * counts[:,1])].reshape(-1, 3),
+                      words[_ranges(update_starts, 2 * counts[:,2])].reshape(-1, 2))
+
+def decodeRefinements(data, num_refinements):
+    """Decodes num_refinements consecutive refinements from the start of a
+    bytes-like object. The arrays returned share its memory."""
+    refinements = []
+    offset = 0
+    for i in range(num_refinements):
+        nverts, ntris, nupdates = numpy.frombuffer(data, INDEX_DTYPE, 3, offset).tolist()
+        offset += COUNTS_SIZE
+        vertices = numpy.frombuffer(data, VERTEX_DTYPE, nverts * 8, offset).reshape(-1, 8)
+        offset += VERTEX_SIZE * nverts
+        triangles = numpy.frombuffer(data, INDEX_DTYPE, ntris * 3, offset).reshape(-1, 3)
+        offset += TRIANGLE_SIZE * ntris
+        updates = numpy.frombuffer(data, INDEX_DTYPE, nupdates * 2, offset).reshape(-1, 2)
+        offset += UPDATE_SIZE * nupdates
+        refinements.append(Refinement(vertices, triangles, updates))
+    return refinements
+
+def isBPDAE(pm_filebuf):
+    """Whether a seekable file opened in binary mode starts with a BPDAE
+    header. The file position is left where it was."""
+    position = pm_filebuf.tell()
+    magic = pm_filebuf.read(len(BPDAE_MAGIC))
+    pm_filebuf.seek(position)
+    return magic == BPDAE_MAGIC
+
+class BPDAEReader(object):
+    """Random access to the refinements of a BPDAE file. Only the header
+    and index are read up front."""
+    def __init__(self, pm_filebuf):
+        """:param pm_filebuf: seekable file opened in binary mode, positioned
+                              at the start of the stream"""
+        self.filebuf = pm_filebuf
+        self.start = pm_filebuf.tell()
+        header = pm_filebuf.read(HEADER_SIZE)
+        if header[:len(BPDAE_MAGIC)] != BPDAE_MAGIC:
+            raise ValueError('not a BPDAE file')
+        version = int(numpy.frombuffer(header, '<u2', 1, len(BPDAE_MAGIC))[0])
+        if version != BPDAE_VERSION:
+            raise ValueError('unsupported BPDAE version %d' % version)
+        num_refinements = int(numpy.frombuffer(header, '<u4', 1, len(BPDAE_MAGIC) + 2)[0])
+        self.index = numpy.frombuffer(pm_filebuf.read(8 * (num_refinements + 1)), '<u8').astype(numpy.int64)
+        if len(self.index) != num_refinements + 1:
+            raise ValueError('truncated BPDAE index')
+        
+        #the snapshot table, if the refinements are followed by one
+        self.snapshots = numpy.zeros(0, dtype=SNAPSHOT_ENTRY)
+        pm_filebuf.seek(self.start + self.index[-1])
+        header = pm_filebuf.read(SNAPSHOT_HEADER_SIZE)
+        if header[:len(SNAPSHOT_MAGIC)] == SNAPSHOT_MAGIC:
+            num_snapshots = int(numpy.frombuffer(header, '<u4', 1, len(SNAPSHOT_MAGIC))[0])
+            table = numpy.frombuffer(pm_filebuf.read(SNAPSHOT_ENTRY.itemsize * num_snapshots), SNAPSHOT_ENTRY)
+            if len(table) != num_snapshots:
+                raise ValueError('truncated BPDAE snapshot table')
+            self.snapshots = table
+
+    def __len__(self):
+        return len(self.index) - 1
+
+    def read(self, start=0, end=None, join=False):
+        """Returns refinements [start, end) as a list of Refinements, or as
+        one Refinement if join is set"""
+        if end is None or end > len(self):
+            end = len(self)
+        if start >= end:
+            return joinRefinements([]) if join else []
+        self.filebuf.seek(self.start + self.index[start])
+        size = int(self.index[end] - self.index[start])
+        data = self.filebuf.read(size)
+        if len(data) != size:
+            raise ValueError('truncated BPDAE file')
+        if join:
+            return decodeJoinedRefinements(data, self.index[start:end] - self.index[start])
+        return decodeRefinements(data, end - start)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('refinement index out of range')
+        return self.read(i, i + 1)[0]
+
+    def snapshot(self, level):
+        """Returns the Snapshot with the most refinements applied that
+        doesn't go past level, or None if there isn't one"""
+        i = int(numpy.searchsorted(self.snapshots['level'], level, side='right')) - 1
+        if i < 0:
+            return None
+        entry = self.snapshots[i]
+        num_vertices = int(entry['vertices'])
+        num_indices = int(entry['indices'])
+        self.filebuf.seek(self.start + int(entry['offset']))
+        size = VERTEX_SIZE * num_vertices + 4 * num_indices
+        data = self.filebuf.read(size)
+        if len(data) != size:
+            raise ValueError('truncated BPDAE file')
+        return Snapshot(int(entry['level']),
+                        numpy.frombuffer(data, VERTEX_DTYPE, num_vertices * 8).reshape(-1, 8),
+                        numpy.frombuffer(data, INDEX_DTYPE, num_indices, VERTEX_SIZE * num_vertices))
+
+def readBPDAE(pm_filebuf):
+    """Reads all the refinements of a BPDAE file, or returns None if it isn't one"""
+    if not isBPDAE(pm_filebuf):
+        return None
+    return BPDAEReader(pm_filebuf).read()
+
+def readLevel(reader, level, base=None):
+    """Returns the vertex and index buffers of the mesh after level
+    refinements, loaded from the nearest snapshot below it, if the reader
+    has one, with only the refinements in between applied to it.
+
+    :param reader: a reader as returned by openPDAE
+    :param base: (vertices, indices) of the base mesh, in the same form
+                 as a Snapshot's, used when there's no snapshot to start from
+    """
+    if level > len(reader):
+        level = len(reader)
+    snapshot = reader.snapshot(level)
+    if snapshot is None:
+        if base is None:
+            raise ValueError('no snapshot at or below level %d and no base mesh given' % level)
+        snapshot = Snapshot(0, base[0], base[1])
+    return applyRefinement(snapshot.vertices, snapshot.indices, reader.read(snapshot.level, level, join=True))
+
+def loadPDAE(pm_filebuf):
+    """Reads a progressive stream in either format from a seekable file
+    opened in binary mode, returning lists of operation tuples like readPDAE"""
+    if isBPDAE(pm_filebuf):
+        return [refinementOps(r) for r in BPDAEReader(pm_filebuf).read()]
+    from meshtool.filters.panda_filters.pdae_utils import readPDAE
+    return readPDAE(io.TextIOWrapper(pm_filebuf))
+
+def convertPDAE(pdae_filebuf, bpdae_outbuf):
+    """Converts a text PDAE file to BPDAE, returning the number of refinements"""
+    from meshtool.filters.panda_filters.pdae_utils import readPDAE
+    pm_refinements = readPDAE(pdae_filebuf)
+    if pm_refinements is None:
+        raise ValueError('not a PDAE file')
+    writeBPDAE(pm_refinements, bpdae_outbuf)
+    return len(pm_refinements)
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.stderr.write('usage: python -m meshtool.filters.panda_filters.pdae_utils.pdae_binary input.pdae output.bpdae\n')
+        sys.exit(1)
+    with open(sys.argv[1], 'r') as pdae_filebuf, open(sys.argv[2], 'wb') as bpdae_outbuf:
+        print('Converted', convertPDAE(pdae_filebuf, bpdae_outbuf), 'refinements')
@@ -1,10 +1,16 @@
 from libc.stdlib cimport strtod, strtol
 from libc.stdio cimport fgets
+from libc.string cimport memchr
+import numpy
+from meshtool.filters.panda_filters.pdae_utils.pdae_binary import Refinement
 
 try:
     from cStringIO import StringIO
 except ImportError:
-    from StringIO import StringIO
+    try:
+        from StringIO import StringIO
+    except ImportError:
+        from io import BytesIO as StringIO
 
 cdef enum PM_OP:
     INDEX_UPDATE = 1
@@ -61,7 +67,7 @@ cdef list readPDAErefinement(pm_filebuf, int num_operations):
             f8 = strtod(ptr, ptrptr)
             refinement_ops.append((VERTEX_ADDITION, f1, f2, f3, f4, f5, f6, f7, f8))
         else:
-            print op
+            print(op)
             assert(False)
             
     return refinement_ops
@@ -113,3 +119,155 @@ def readPDAEPartial(data, int refinements_read, num_refinements):
         data_left = "%d\n" % num_operations + data_left
     
     return (refinements_read, num_refinements, pm_refinements, data_left)
+
+
+cdef Py_ssize_t nextLine(char* buf, Py_ssize_t pos, Py_ssize_t end):
+    cdef char* found = <char*>memchr(buf + pos, b'\n', end - pos)
+    if found == NULL:
+        return -1
+    return found - buf + 1
+
+cdef class PDAEParser:
+    """Push parser for text PDAE streams, with the same interface as the
+    one in pdae_arrays. Lines are found with memchr as data arrives, and
+    complete refinements parsed in two passes, one counting the operations
+    of each kind and one filling arrays of that size."""
+    cdef bytearray buffer
+    #offset in buffer of the first line not looked at yet
+    cdef Py_ssize_t scanned
+    #operation lines still to come in the refinement being scanned, or -1
+    # if the next line is a count
+    cdef Py_ssize_t ops_left
+    #end in buffer of the last complete refinement
+    cdef Py_ssize_t complete_end
+    cdef list num_ops
+    cdef public object num_refinements
+    cdef public int refinements_read
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.scanned = 0
+        self.ops_left = -1
+        self.complete_end = 0
+        self.num_ops = []
+        self.num_refinements = None
+        self.refinements_read = 0
+
+    property done:
+        def __get__(self):
+            return self.num_refinements is not None and self.refinements_read >= self.num_refinements
+
+    def feed(self, data):
+        if self.done:
+            return []
+        self.buffer += data
+        cdef char* buf = self.buffer
+        cdef Py_ssize_t end = len(self.buffer)
+        cdef Py_ssize_t line_end
+
+        if self.num_refinements is None:
+            line_end = nextLine(buf, 0, end)
+            if line_end < 0 or nextLine(buf, line_end, end) < 0:
+                return []
+            if bytes(self.buffer[:line_end]).strip() != b'PDAE':
+                raise ValueError('not a PDAE file')
+            self.num_refinements = strtol(buf + line_end, NULL, 10)
+            del self.buffer[:nextLine(buf, line_end, end)]
+            buf = self.buffer
+            end = len(self.buffer)
+
+        cdef Py_ssize_t wanted = self.num_refinements - self.refinements_read
+        while self.ops_left >= 0 or len(self.num_ops) < wanted:
+            if self.ops_left < 0:
+                line_end = nextLine(buf, self.scanned, end)
+                if line_end < 0:
+                    break
+                self.ops_left = strtol(buf + self.scanned, NULL, 10)
+                self.num_ops.append(self.ops_left)
+                self.scanned = line_end
+            while self.ops_left > 0:
+                line_end = nextLine(buf, self.scanned, end)
+                if line_end < 0:
+                    break
+                self.ops_left -= 1
+                self.scanned = line_end
+            if self.ops_left > 0:
+                break
+            self.ops_left = -1
+            self.complete_end = self.scanned
+
+        cdef Py_ssize_t num_complete = len(self.num_ops) - (1 if self.ops_left >= 0 else 0)
+        cdef list refinements = []
+        if num_complete > 0:
+            refinements = self._parse(self.num_ops[:num_complete])
+            del self.num_ops[:num_complete]
+            self.refinements_read += num_complete
+        del self.buffer[:self.complete_end]
+        self.scanned -= self.complete_end
+        self.complete_end = 0
+        return refinements
+
+    cdef list _parse(self, list num_ops):
+        cdef char* buf = self.buffer
+        cdef char* ptr
+        cdef char** ptrptr = &ptr
+        cdef Py_ssize_t pos = 0
+        cdef Py_ssize_t r, i, j, nv = 0, nt = 0, nu = 0
+        cdef Py_ssize_t num_refinements = len(num_ops)
+        cdef Py_ssize_t[:, ::1] counts = numpy.zeros((num_refinements, 3), dtype=numpy.intp)
+        cdef char op
+
+        #first pass counts the operations of each kind in each refinement
+        for r in range(num_refinements):
+            pos = nextLine(buf, pos, self.complete_end)
+            for i in range(<Py_ssize_t>num_ops[r]):
+                op = buf[pos]
+                if op == b'v':
+                    counts[r, 0] += 1
+                elif op == b't':
+                    counts[r, 1] += 1
+                elif op == b'u':
+                    counts[r, 2] += 1
+                else:
+                    raise ValueError('invalid PDAE operation')
+                pos = nextLine(buf, pos, self.complete_end)
+
+        totals = numpy.asarray(counts).sum(axis=0)
+        vertices = numpy.empty((totals[0], 8), dtype=numpy.float64)
+        triangles = numpy.empty((totals[1], 3), dtype=numpy.uint32)
+        updates = numpy.empty((totals[2], 2), dtype=numpy.uint32)
+        cdef double[:, ::1] v = vertices
+        cdef unsigned int[:, ::1] t = triangles
+        cdef unsigned int[:, ::1] u = updates
+
+        #second pass fills them in
+        pos = 0
+        for r in range(num_refinements):
+            pos = nextLine(buf, pos, self.complete_end)
+            for i in range(<Py_ssize_t>num_ops[r]):
+                op = buf[pos]
+                ptr = buf + pos + 1
+                if op == b'v':
+                    for j in range(8):
+                        v[nv, j] = strtod(ptr, ptrptr)
+                    nv += 1
+                elif op == b't':
+                    for j in range(3):
+                        t[nt, j] = strtol(ptr, ptrptr, 10)
+                    nt += 1
+                else:
+                    for j in range(2):
+                        u[nu, j] = strtol(ptr, ptrptr, 10)
+                    nu += 1
+                pos = nextLine(buf, pos, self.complete_end)
+
+        cdef list refinements = []
+        nv = nt = nu = 0
+        for r in range(num_refinements):
+            refinements.append(Refinement(vertices[nv:nv+counts[r, 0]],
+                                          triangles[nt:nt+counts[r, 1]],
+                                          updates[nu:nu+counts[r, 2]]))
+            nv += counts[r, 0]
+            nt += counts[r, 1]
+            nu += counts[r, 2]
+        return refinements
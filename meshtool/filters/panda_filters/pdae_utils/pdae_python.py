@@ -1,4 +1,3 @@
-import struct
 try:
     from io import StringIO
 except ImportError:
@@ -80,30 +79,3 @@ def readPDAEPartial(data, refinements_read, num_refinements):
         data_left = "%d\n" % num_operations + data_left
     
     return (refinements_read, num_refinements, pm_refinements, data_left)
-
-def writeBPDAE(pm_refinements, bpdae_outbuf):
-    #6-byte magic number header - the string BPDAE followed by a null character
-    bpdae_outbuf.write(struct.pack('!6s', 'BPDAE'))
-    
-    #the number of refinements in the file
-    bpdae_outbuf.write(struct.pack('!L', len(pm_refinements)))
-    
-    for refinement in pm_refinements:
-        #number of objects in this refinement
-        bpdae_outbuf.write(struct.pack('!H', len(refinement)))
-        
-        for operation in refinement:
-            vals = list(operation)
-            op = vals.pop(0)
-            
-            if op == PM_OP.TRIANGLE_ADDITION:
-                v1, v2, v3 = vals
-                bpdae_outbuf.write(struct.pack('!cIII', 't', v1, v2, v3))
-            elif op == PM_OP.INDEX_UPDATE:
-                tindex, vindex = vals
-                bpdae_outbuf.write(struct.pack('!cII', 'u', tindex, vindex))
-            elif op == PM_OP.VERTEX_ADDITION:
-                vx, vy, vz, nx, ny, nz, s, t = vals
-                bpdae_outbuf.write(struct.pack('!cffffffff', 'v', vx, vy, vz, nx, ny, nz, s, t))
-    
-    bpdae_outbuf.close()
@@ -11,7 +11,7 @@ from panda3d.core import Mat4
 import sys
 import numpy
 import collada
-from .pdae_utils import PM_OP, readPDAE
+from .pdae_utils import PM_OP, loadPDAE
 
 uiArgs = { 'rolloverSound':None,
            'clickSound':None
@@ -63,7 +63,7 @@ class PandaPmViewer:
         
         print('Loading pm into memory... ', end=' ')
         sys.stdout.flush()
-        self.pm_refinements = readPDAE(pm_filebuf)
+        self.pm_refinements = loadPDAE(pm_filebuf)
         self.pm_index = 0
         print('Done')
 
@@ -168,10 +168,10 @@ def FilterGenerator():
     class PmViewer(VisualizationFilter):
         def __init__(self):
             super(PmViewer, self).__init__('pm_viewer', 'Uses panda3d to bring up a viewer of a base mesh and progressive stream')
-            self.arguments.append(FileArgument("pm_file", "Path of the progressive mesh file"))
+            self.arguments.append(FileArgument("pm_file", "Path of the progressive mesh file, PDAE or BPDAE"))
         def apply(self, mesh, pm_filename):
             try:
-                pm_filebuf = open(pm_filename, 'r')
+                pm_filebuf = open(pm_filename, 'rb')
             except IOError as ex:
                 print("Error opening pm file:", str(ex))
                 sys.exit(1)
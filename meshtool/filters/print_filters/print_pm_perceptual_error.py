@@ -39,13 +39,11 @@ def getPmPerceptualError(mesh, pm_filebuf, mipmap_tarfilebuf):
     pm_chunks = []
     
     if pm_filebuf is not None:
+        parser = pdae_utils.PDAEParser()
         data = pm_filebuf.read(PM_CHUNK_SIZE)
-        refinements_read = 0
-        num_refinements = None
         while len(data) > 0:
-            (refinements_read, num_refinements, pm_refinements, data_left) = pdae_utils.readPDAEPartial(data, refinements_read, num_refinements)
-            pm_chunks.append(pm_refinements)
-            data = data_left + pm_filebuf.read(PM_CHUNK_SIZE)
+            pm_chunks.append(parser.feed(data))
+            data = pm_filebuf.read(PM_CHUNK_SIZE)
     
     tar = tarfile.TarFile(fileobj=mipmap_tarfilebuf)
     texsizes = []
@@ -199,7 +197,7 @@ def FilterGenerator():
             
         def apply(self, mesh, pm_filename, mipmap_tarfilename):
             try:
-                pm_filebuf = open(pm_filename, 'r') if pm_filename != 'NONE' else None
+                pm_filebuf = open(pm_filename, 'rb') if pm_filename != 'NONE' else None
             except IOError as ex:
                 raise FilterException("Error opening pm file: %s" % str(ex))
             
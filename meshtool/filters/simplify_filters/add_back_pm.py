@@ -5,10 +5,14 @@ from meshtool.args import FileArgument, FilterArgument
 from meshtool.filters.base_filters import SimplifyFilter, FilterException
 
 def add_back_pm(mesh, pm_file, percent):
-    refinements = pdae_utils.readPDAE(pm_file)
+    #only the refinements being added back are read from the file
+    try:
+        reader = pdae_utils.openPDAE(pm_file)
+    except ValueError as ex:
+        raise FilterException("Invalid pm file: %s" % str(ex))
     
-    num_to_load = len(refinements) * (percent / 100.0)
-    num_to_load = min(num_to_load, len(refinements))
+    num_to_load = len(reader) * (percent / 100.0)
+    num_to_load = min(num_to_load, len(reader))
     num_to_load = int(round(num_to_load))
     if num_to_load <= 0:
         return mesh
@@ -30,11 +34,11 @@ def add_back_pm(mesh, pm_file, percent):
     unique_stacked_indices = unique_stacked_indices.view(stacked_indices.dtype).reshape(-1,stacked_indices.shape[1])
     
     #unique returns as int64, so cast back
-    index_map = numpy.cast['uint32'](index_map)
-    inverse_map = numpy.cast['uint32'](inverse_map)
+    index_map = index_map.astype(numpy.uint32)
+    inverse_map = inverse_map.astype(numpy.uint32).reshape(-1)
     
     #sort the index map to get a list of the index of the first time each value was encountered
-    sorted_map = numpy.cast['uint32'](numpy.argsort(index_map))
+    sorted_map = numpy.argsort(index_map).astype(numpy.uint32)
     
     #since we're sorting the unique values, we have to map the inverse_map to the new index locations
     backwards_map = numpy.zeros_like(sorted_map)
@@ -48,43 +52,16 @@ def add_back_pm(mesh, pm_file, percent):
     data2stack = []
     for idx, data in enumerate(alldata):
         data2stack.append(data[unique_stacked_indices[:,idx]])
-    unique_stacked_data = numpy.hstack(data2stack).flatten()
+    unique_stacked_data = numpy.hstack(data2stack)
 
-    num_added_verts = 0
-    num_added_tris = 0
-    for refinement_index in range(num_to_load):
-        for op in refinements[refinement_index]:
-            if op[0] == pdae_utils.PM_OP.VERTEX_ADDITION:
-                num_added_verts += 1
-            elif op[0] == pdae_utils.PM_OP.TRIANGLE_ADDITION:
-                num_added_tris += 1
-    
-    cur_vertex = len(unique_stacked_data)
-    cur_triangle = len(inverse_map)
-    
-    unique_stacked_data = numpy.append(unique_stacked_data, numpy.zeros(num_added_verts * 8, dtype=numpy.float32))
-    inverse_map = numpy.append(inverse_map, numpy.zeros(num_added_tris * 3, dtype=numpy.uint32))
-    
-    for refinement_index in range(num_to_load):
-        for operation in refinements[refinement_index]:
-            vals = list(operation)
-            op = vals.pop(0)
-            if op == pdae_utils.PM_OP.VERTEX_ADDITION:
-                vx, vy, vz, nx, ny, nz, s, t = list(map(float, vals))
-                unique_stacked_data[cur_vertex:cur_vertex+8] = vx, vy, vz, nx, ny, nz, s, t
-                cur_vertex += 8
-            elif op == pdae_utils.PM_OP.TRIANGLE_ADDITION:
-                v1, v2, v3 = list(map(int, vals))
-                inverse_map[cur_triangle:cur_triangle+3] = v1, v2, v3
-                cur_triangle += 3
-            elif op == pdae_utils.PM_OP.INDEX_UPDATE:
-                tindex, vindex = list(map(int, vals))
-                inverse_map[tindex] = vindex
+    #starting from the nearest snapshot in the stream, if it has one, the
+    # refinements are applied all at once: new vertices and triangles are
+    # appended, then the index updates made in order
+    unique_stacked_data, inverse_map = pdae_utils.readLevel(reader, num_to_load, (unique_stacked_data, inverse_map))
     
     oldgeom = geom
     mesh.geometries.pop(0)
     
-    unique_stacked_data.shape = (-1, 8)
     vertex = numpy.copy(unique_stacked_data[:,0:3])
     normal = numpy.copy(unique_stacked_data[:,3:6])
     uvs = numpy.copy(unique_stacked_data[:,6:8])
@@ -121,11 +98,11 @@ def FilterGenerator():
     class AddBackPm(SimplifyFilter):
         def __init__(self):
             super(AddBackPm, self).__init__('add_back_pm', 'Adds back mesh data from a progressive PDAE file')
-            self.arguments.append(FileArgument('pm_file', 'PDAE file to load from'))
+            self.arguments.append(FileArgument('pm_file', 'PDAE or BPDAE file to load from'))
             self.arguments.append(FilterArgument('percent', 'Percent of progressive file to add back'))
         def apply(self, mesh, pm_file, percent):
             try:
-                pmin = open(pm_file, 'r')
+                pmin = open(pm_file, 'rb')
             except IOError:
                 raise FilterException("Invalid pm file")
             
@@ -0,0 +1,104 @@
+"""Runs per-chart work in a pool of worker processes
+
+The arrays a task needs are copied once into shared memory blocks that
+every worker maps, so only the small per-chart task arguments and their
+results are pickled. Results are returned in task order, so they can be
+merged back in the same order no matter how many workers ran them.
+
+The number of workers defaults to $MESHTOOL_WORKERS, which is what
+``meshtool --workers N`` sets.
+"""
+
+import os
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy
+
+def default_workers():
+    try:
+        return max(1, int(os.environ.get('MESHTOOL_WORKERS', 1)))
+    except ValueError:
+        return 1
+
+class SharedArrays(object):
+    """Named numpy arrays available as attributes, along with a cache
+    dict for objects a process derives from them"""
+    def __init__(self, arrays):
+        self.__dict__.update(arrays)
+        self.names = list(arrays.keys())
+        self.cache = {}
+        self.blocks = []
+
+    def share(self):
+        """Copies the arrays to new shared memory blocks, returning a
+        picklable spec that :meth:`attach` maps them from"""
+        spec = []
+        for name in self.names:
+            arr = numpy.ascontiguousarray(getattr(self, name))
+            block = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            self.blocks.append(block)
+            numpy.ndarray(arr.shape, dtype=arr.dtype, buffer=block.buf)[...] = arr
+            spec.append((name, block.name, arr.shape, arr.dtype.str))
+        return spec
+
+    @classmethod
+    def attach(cls, spec):
+        blocks = []
+        arrays = {}
+        for name, block_name, shape, dtype in spec:
+            block = shared_memory.SharedMemory(name=block_name)
+            blocks.append(block)
+            arrays[name] = numpy.ndarray(shape, dtype=numpy.dtype(dtype), buffer=block.buf)
+        shared = cls(arrays)
+        shared.blocks = blocks
+        return shared
+
+    def release(self):
+        """Unlinks the blocks created by :meth:`share`"""
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+_worker_shared = None
+
+def _init_worker(spec):
+    global _worker_shared
+    _worker_shared = SharedArrays.attach(spec)
+
+def _run_in_worker(args):
+    function, task = args
+    return function(_worker_shared, task)
+
+def map_charts(function, arrays, tasks, workers=None):
+    """Calls function(shared, task) for every task, where shared is a
+    :class:`SharedArrays` of arrays, and returns the results in order.
+
+    Runs in the current process if there is only one worker, or if this
+    is already a daemonic worker process (e.g. of --batch), which can't
+    start a pool of its own.
+    """
+    if workers is None:
+        workers = default_workers()
+    tasks = list(tasks)
+    shared = SharedArrays(arrays)
+
+    if workers <= 1 or len(tasks) <= 1 or multiprocessing.current_process().daemon:
+        return [function(shared, task) for task in tasks]
+
+    spec = shared.share()
+    try:
+        pool = multiprocessing.Pool(processes=min(workers, len(tasks)),
+                                    initializer=_init_worker, initargs=(spec,))
+        try:
+            chunksize = max(1, len(tasks) // (workers * 4))
+            results = pool.map(_run_in_worker, [(function, task) for task in tasks], chunksize)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+    finally:
+        shared.release()
+    return results
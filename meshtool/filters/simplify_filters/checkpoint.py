@@ -0,0 +1,104 @@
+"""Saves the state of a long running filter after each of its stages
+
+A checkpoint is a single file named by a fingerprint of the filter's input
+and settings, so a run on a different input or with different settings
+never picks up another run's state. It starts with a JSON header line
+giving the checkpoint format version, the meshtool version and the stage
+it was saved after, followed by the gzipped pickle of the state. A
+checkpoint whose header doesn't match, or that can't be read, is stale and
+gets ignored.
+
+Checkpoints are only saved and resumed from when $MESHTOOL_RESUME is set
+to the directory to keep them in, which is what ``meshtool --resume``
+does. A filter removes its checkpoint once it finishes.
+"""
+
+import os
+import sys
+import json
+import gzip
+import pickle
+import hashlib
+import tempfile
+import meshtool
+
+#bump whenever the state saved by a filter changes
+CHECKPOINT_VERSION = 2
+
+MAGIC = b'MESHTOOL-CHECKPOINT\n'
+
+#favors speed, since state is saved after every stage
+COMPRESS_LEVEL = 1
+
+def checkpoint_dir():
+    """Directory checkpoints are kept in, or None if they're disabled"""
+    return os.environ.get('MESHTOOL_RESUME') or None
+
+def fingerprint(arrays, settings):
+    """Hashes a list of numpy arrays and a list of settings with repr()s
+    that identify them"""
+    digest = hashlib.sha256()
+    digest.update(repr((CHECKPOINT_VERSION, meshtool.__version__, settings)).encode('utf8'))
+    for array in arrays:
+        digest.update(repr((array.dtype.str, array.shape)).encode('utf8'))
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+class Checkpoint(object):
+    def __init__(self, directory, name, key):
+        """:param directory: directory to keep the checkpoint in
+        :param name: name of the filter saving it
+        :param key: fingerprint of its input and settings"""
+        self.directory = directory
+        self.key = key
+        self.path = os.path.join(directory, '%s-%s.checkpoint' % (name, key))
+
+    def header(self, stage):
+        return {'version': CHECKPOINT_VERSION,
+                'meshtool_version': meshtool.__version__,
+                'key': self.key,
+                'stage': stage}
+
+    def save(self, stage, state):
+        """Replaces the checkpoint with state saved after stage"""
+        os.makedirs(self.directory, exist_ok=True)
+        # written next to the checkpoint and renamed over it, so a crash
+        # while saving leaves the previous one intact
+        fd, tmppath = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(MAGIC)
+                f.write(json.dumps(self.header(stage)).encode('utf8') + b'\n')
+                with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=COMPRESS_LEVEL) as z:
+                    pickle.dump(state, z, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmppath, self.path)
+        except:
+            os.remove(tmppath)
+            raise
+
+    def load(self, stages):
+        """Returns (stage, state) of the checkpoint, or None if there isn't
+        one. A stale checkpoint, or one saved after a stage not in stages,
+        is removed with a warning and None returned."""
+        if not os.path.isfile(self.path):
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise ValueError('not a checkpoint')
+                header = json.loads(f.readline().decode('utf8'))
+                expected = self.header(header.get('stage'))
+                if header != expected or header['stage'] not in stages:
+                    raise ValueError('saved by version %s (format %s)' %
+                                     (header.get('meshtool_version'), header.get('version')))
+                with gzip.GzipFile(fileobj=f, mode='rb') as z:
+                    state = pickle.load(z)
+        except Exception as e:
+            sys.stderr.write("meshtool: warning: ignoring stale checkpoint '%s': %s\n" % (self.path, str(e)))
+            self.remove()
+            return None
+        return header['stage'], state
+
+    def remove(self):
+        if os.path.isfile(self.path):
+            os.remove(self.path)
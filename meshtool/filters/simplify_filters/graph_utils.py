@@ -1,161 +1,160 @@
 from heapq import heappush, heappop
-from networkx import NetworkXError
 import networkx as nx
 import builtins
-
-def astar_path(G, source, target, heuristic=None, weight='weight', exclude=None, subset=None):
-    """Return a list of nodes in a shortest path between source and target 
-    using the A* ("A-star") algorithm.
-
-    There may be more than one shortest path.  This returns only one.
-    
-    Parameters
-    ----------
-    G : NetworkX graph
-
-    source : node
-       Starting node for path
-
-    target : node
-       Ending node for path 
-
-    heuristic : function
-       A function to evaluate the estimate of the distance
-       from the a node to the target.  The function takes
-       two nodes arguments and must return a number.
-
-    weight: string, optional (default='weight')
-       Edge data key corresponding to the edge weight.
-
-    exclude: set, optional
-       An optional set of nodes that will be excluded from
-       the traversal
-       
-    subset: set, optional
-       An optional set of nodes that the path has to be in
-
-    Raises
-    ------
-    NetworkXNoPath
-        If no path exists between source and target.
-
-    Examples
-    --------
-    >>> G=nx.path_graph(5)
-    >>> print(nx.astar_path(G,0,4))
-    [0, 1, 2, 3, 4]
-    >>> G=nx.grid_graph(dim=[3,3])  # nodes are two-tuples (x,y)
-    >>> def dist(a, b):
-    ...    (x1, y1) = a
-    ...    (x2, y2) = b
-    ...    return ((x1 - x2) ** 2 + (y1 - y2) ** 2) ** 0.5
-    >>> print(nx.astar_path(G,(0,0),(2,2),dist))
-    [(0, 0), (0, 1), (1, 1), (1, 2), (2, 2)]
-
-
-    See Also
-    --------
-    shortest_path, dijkstra_path
-
+import numpy
+
+def csr_positions(offsets, rows):
+    """Positions in the flat array of a CSR structure of every item of the
+    given rows, concatenated in row order"""
+    rows = numpy.asarray(rows, dtype=numpy.int64)
+    starts = offsets[rows]
+    counts = offsets[rows + 1] - starts
+    total = int(counts.sum())
+    row_starts = numpy.cumsum(counts) - counts
+    return numpy.repeat(starts - row_starts, counts) + numpy.arange(total)
+
+class VertexSubgraph(object):
+    """The part of a mesh's vertex adjacency between a set of vertices
+
+    Vertices are numbered locally by their position in the sorted array
+    of global vertex numbers the subgraph was made from, so local order
+    follows global order. Neighbors and edge lengths are gathered from
+    the MeshAdjacency CSR arrays once, and queries are restricted with
+    boolean masks over the local vertices instead of sets.
     """
-    if G.is_multigraph():
-        raise NetworkXError("astar_path() not implemented for Multi(Di)Graphs")
-    
-    if heuristic is None:
-        # The default heuristic is h=0 - same as Dijkstra's algorithm
-        def heuristic(u,v):
-            return 0
-    # The queue stores priority, node, cost to reach, and parent.
-    # Uses Python heapq to keep in priority order.
-    # Add each node's hash to the queue to prevent the underlying heap from
-    # attempting to compare the nodes themselves. The hash breaks ties in the
-    # priority and is guarenteed unique for all nodes in the graph.
-    queue = [(0, hash(source), source, 0, None)]
-
-    # Maps enqueued nodes to distance of discovered paths and the
-    # computed heuristics to target. We avoid computing the heuristics
-    # more than once and inserting the node into the queue too many times.
-    enqueued = {}
-    # Maps explored nodes to parent closest to the source.
-    explored = {}
-    
-    while queue:
-        # Pop the smallest item from queue.
-        _, __, curnode, dist, parent = heappop(queue)
-
-        if curnode == target:
-            path = [curnode]
-            node = parent
-            while node is not None:
-                path.append(node)
-                node = explored[node]
-            path.reverse()
-            return path
-
-        if curnode in explored:
-            continue
-
-        explored[curnode] = parent
-
-        for neighbor, w in list(G[curnode].items()):
-            if neighbor in explored or \
-                    (exclude and neighbor != target and neighbor in exclude) or \
-                    (subset and neighbor not in subset):
+    def __init__(self, G, vertices):
+        """:param G: MeshAdjacency with its edge lengths computed
+        :param vertices: sorted array of unique vertex numbers"""
+        self.vertices = numpy.asarray(vertices, dtype=numpy.int64)
+        n = len(self.vertices)
+        positions = csr_positions(G.vertex_neighbor_offsets, self.vertices)
+        rows = numpy.repeat(numpy.arange(n), numpy.diff(G.vertex_neighbor_offsets)[self.vertices])
+        neighbors = self.local(G.vertex_neighbors_flat[positions])
+        inside = neighbors >= 0
+        self.offsets = numpy.zeros(n + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(rows[inside], minlength=n), out=self.offsets[1:])
+        self.neighbors = neighbors[inside]
+        self.lengths = G.edge_lengths[G.vertex_neighbor_edges[positions[inside]]]
+
+    def __len__(self):
+        return len(self.vertices)
+
+    def local(self, vertices):
+        """Local numbers of an array of global vertex numbers, -1 for
+        vertices not in the subgraph"""
+        vertices = numpy.asarray(vertices, dtype=numpy.int64)
+        if len(self.vertices) == 0:
+            return numpy.full(vertices.shape, -1, dtype=numpy.int64)
+        locs = numpy.minimum(numpy.searchsorted(self.vertices, vertices), len(self.vertices) - 1)
+        return numpy.where(self.vertices[locs] == vertices, locs, -1)
+
+    def mask(self, vertices):
+        """Boolean array over the local vertices, set for the given global
+        vertices, which must be in the subgraph"""
+        mask = numpy.zeros(len(self.vertices), dtype=bool)
+        mask[self.local(numpy.fromiter(vertices, dtype=numpy.int64))] = True
+        return mask
+
+    def distances(self, positions, target):
+        """Straight line distance from each local vertex to local vertex
+        target, computed the same way as sander_simplify.v3dist"""
+        d = positions[self.vertices] - positions[self.vertices[target]]
+        return numpy.sqrt((d[:,0]*d[:,0] + d[:,1]*d[:,1] + d[:,2]*d[:,2]).astype(numpy.float64))
+
+    def shortest_path(self, source, target, allowed, heuristic=None):
+        """Returns the list of local vertices on a shortest path between
+        local vertices source and target, or None if there isn't one.
+
+        An A* search, with ties between vertices of the same estimated
+        cost broken by the lower local number. Only vertices where the boolean array allowed is set are entered,
+        except for target. heuristic is an optional array of estimated
+        distances from each local vertex to target."""
+        offsets = self.offsets.tolist()
+        neighbors = self.neighbors.tolist()
+        lengths = self.lengths.tolist()
+        allowed = allowed.tolist()
+        allowed[target] = True
+        if heuristic is None:
+            heuristic = [0] * len(offsets)
+        else:
+            heuristic = heuristic.tolist()
+
+        queue = [(0, source, 0, -1)]
+        # parent of each explored vertex, None while unexplored, and cost
+        # of the cheapest path to each enqueued vertex
+        explored = [None] * len(self.vertices)
+        enqueued = [None] * len(self.vertices)
+
+        while queue:
+            _, curnode, dist, parent = heappop(queue)
+
+            if curnode == target:
+                path = [curnode]
+                node = parent
+                while node != -1:
+                    path.append(node)
+                    node = explored[node]
+                path.reverse()
+                return path
+
+            if explored[curnode] is not None:
                 continue
-            ncost = dist + w.get(weight,1)
-            if neighbor in enqueued:
-                qcost, h = enqueued[neighbor]
-                # if qcost < ncost, a longer path to neighbor remains
-                # enqueued. Removing it would need to filter the whole
-                # queue, it's better just to leave it there and ignore
-                # it when we visit the node a second time.
-                if qcost <= ncost:
-                    continue
-            else:
-                h = heuristic(neighbor, target)
-            enqueued[neighbor] = ncost, h
-            heappush(queue, (ncost + h, hash(neighbor), neighbor, 
-                             ncost, curnode))
+            explored[curnode] = parent
 
-    raise nx.exception.NetworkXError("Node %s not reachable from %s"%(source,target))
-
-
-def dfs_interior_nodes(G, starting, boundary, subset):
-    """Produce nodes on the interior of a boundary of nodes
+            for i in range(offsets[curnode], offsets[curnode+1]):
+                neighbor = neighbors[i]
+                if explored[neighbor] is not None or not allowed[neighbor]:
+                    continue
+                ncost = dist + lengths[i]
+                qcost = enqueued[neighbor]
+                if qcost is not None and qcost <= ncost:
+                    continue
+                enqueued[neighbor] = ncost
+                heappush(queue, (ncost + heuristic[neighbor], neighbor, ncost, curnode))
+
+        return None
+
+    def flood_fill(self, seeds, allowed):
+        """Boolean array of the local vertices reachable from the seeds,
+        a boolean array, through vertices where allowed is set. Seeds are
+        included and expanded whether or not they are allowed."""
+        reached = seeds.copy()
+        frontier = numpy.nonzero(seeds)[0]
+        while len(frontier) > 0:
+            step = self.neighbors[csr_positions(self.offsets, frontier)]
+            step = step[allowed[step] & ~reached[step]]
+            reached[step] = True
+            frontier = numpy.unique(step)
+        return reached
+
+def edge_topology(edges, nodes=()):
+    """Returns (number of connected components, number of independent
+    cycles) of the graph made from a small collection of edges and any
+    extra isolated nodes. The number of independent cycles is the size
+    of a cycle basis, E - V + C."""
+    parent = {}
+    def find(n):
+        root = n
+        while parent[root] != root:
+            root = parent[root]
+        while parent[n] != root:
+            parent[n], n = root, parent[n]
+        return root
     
-    Parameters
-    ----------
-    G : NetworkX graph
-
-    starting : set
-       Starting nodes to find interior nodes from
-       
-    boundary : set
-       Boundary of nodes not to go outside of
-       
-    subset : set
-       List of nodes to consider. Any nodes not in this set
-       will not be traversed.
+    for n in nodes:
+        parent.setdefault(n, n)
+    num_edges = 0
+    for (a, b) in edges:
+        parent.setdefault(a, a)
+        parent.setdefault(b, b)
+        num_edges += 1
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_a] = root_b
     
-    """
-    nodes=list(starting)
-    visited=set()
-    for start in nodes:
-        if start in visited:
-            continue
-        visited.add(start)
-        stack = [iter(G[start])]
-        while stack:
-            children = stack[-1]
-            try:
-                child = next(children)
-                if child not in visited and child not in boundary and child in subset:
-                    yield child
-                    visited.add(child)
-                    stack.append(iter(G[child]))
-            except StopIteration:
-                stack.pop()
-                
+    components = sum(1 for n in parent if parent[n] == n)
+    return components, num_edges - len(parent) + components
+
 def super_cycle(G):
     """Yields the nodes of the longest cycle available in G"""
     
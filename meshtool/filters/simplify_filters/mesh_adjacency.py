@@ -0,0 +1,311 @@
+"""Array based adjacency information for triangle meshes
+
+All of the adjacency is computed with vectorized sorts of integer edge
+keys and stored in compressed sparse row (CSR) form: for each vertex,
+edge or face there is a range ``offsets[i]:offsets[i+1]`` into a flat
+array of the adjacent items. This takes a small fraction of the memory
+of a graph with a dict per node and is built in a few numpy calls.
+"""
+
+import numpy
+
+def _csr(keys, values, num_keys):
+    """Groups values by keys, which must already be sorted, returning
+    (offsets, values) where the values for key i are
+    values[offsets[i]:offsets[i+1]]"""
+    counts = numpy.bincount(keys, minlength=num_keys)
+    offsets = numpy.zeros(num_keys + 1, dtype=numpy.int64)
+    numpy.cumsum(counts, out=offsets[1:])
+    return offsets, values
+
+def _sorted_unique(keys):
+    """numpy.unique for integer keys, sorting in place"""
+    keys.sort()
+    if len(keys) == 0:
+        return keys
+    keep = numpy.ones(len(keys), dtype=bool)
+    keep[1:] = keys[1:] != keys[:-1]
+    return keys[keep]
+
+def _group_unique(keys, values, num_keys):
+    """Sorts (key, value) pairs, drops duplicates and returns them in CSR form"""
+    order = numpy.lexsort((values, keys))
+    keys = keys[order]
+    values = values[order]
+    if len(keys) > 0:
+        keep = numpy.ones(len(keys), dtype=bool)
+        keep[1:] = (keys[1:] != keys[:-1]) | (values[1:] != values[:-1])
+        keys = keys[keep]
+        values = values[keep]
+    return _csr(keys, values, num_keys)
+
+def _group_pairs(flat, starts, counts):
+    """Enumerates every combination of two items within groups of a flat
+    array, where group i is flat[starts[i]:starts[i]+counts[i]]. Returns
+    (group, first, second) arrays ordered by group, and within a group in
+    the same order as itertools.combinations."""
+    starts = numpy.asarray(starts, dtype=numpy.int64)
+    counts = numpy.asarray(counts, dtype=numpy.int64)
+    groups = [numpy.zeros(0, dtype=numpy.int64)]
+    firsts = [numpy.zeros(0, dtype=numpy.int64)]
+    seconds = [numpy.zeros(0, dtype=numpy.int64)]
+    for count in numpy.unique(counts[counts >= 2]):
+        sel = numpy.nonzero(counts == count)[0]
+        i, j = numpy.triu_indices(count, 1)
+        groups.append(numpy.repeat(sel, len(i)))
+        firsts.append((starts[sel][:,numpy.newaxis] + i).reshape(-1))
+        seconds.append((starts[sel][:,numpy.newaxis] + j).reshape(-1))
+    groups = numpy.concatenate(groups)
+    order = numpy.argsort(groups, kind='stable')
+    return groups[order], flat[numpy.concatenate(firsts)[order]], flat[numpy.concatenate(seconds)[order]]
+
+def connected_faces(tris, f1, f2):
+    """Vectorized check of whether each pair of faces (f1[i], f2[i]) should
+    be considered connected: they must not be the same triangle up to
+    winding order, and no edge of f1 may be traversed in the same direction
+    by f2, which would mean they face opposite directions."""
+    t1 = tris[f1]
+    t2 = tris[f2]
+    connected = numpy.any(numpy.sort(t1, axis=1) != numpy.sort(t2, axis=1), axis=1)
+    rows = numpy.arange(len(t2))
+    for i in range(3):
+        a = t1[:,i]
+        b = t1[:,(i+1) % 3]
+        a_matches = t2 == a[:,numpy.newaxis]
+        #position after the first occurrence of a in f2
+        next_loc = (numpy.argmax(a_matches, axis=1) + 1) % 3
+        same_direction = numpy.any(a_matches, axis=1) & (t2[rows, next_loc] == b)
+        connected &= ~same_direction
+    return connected
+
+def shared_vertex_counts(tris, f1, f2, num_vertices):
+    """Returns, for every vertex, how many of the face pairs (f1[i], f2[i])
+    both use it"""
+    t1 = tris[f1]
+    t2 = tris[f2]
+    shared = []
+    for i in range(3):
+        v = t1[:,i]
+        #only count a vertex used twice by a degenerate triangle once
+        first_use = numpy.all(t1[:,:i] != v[:,numpy.newaxis], axis=1)
+        shared.append(v[first_use & numpy.any(t2 == v[:,numpy.newaxis], axis=1)])
+    return numpy.bincount(numpy.concatenate(shared), minlength=num_vertices)
+
+def vertex_corners(tris, num_vertices):
+    """Returns (offsets, corners) where the corners that use vertex v are
+    corners[offsets[v]:offsets[v+1]], in increasing order. Corner
+    ``3*f + i`` is position i of triangle f."""
+    flat = numpy.asarray(tris).reshape(-1)
+    corners = numpy.argsort(flat, kind='stable')
+    return _csr(flat[corners], corners, num_vertices)
+
+class MeshAdjacency(object):
+    """Vertex, edge and face adjacency of a triangle mesh
+
+    Triangle ``f`` has the three half-edges ``3*f + i`` for i in 0-2, going
+    from ``tris[f][i]`` to ``tris[f][(i+1) % 3]``. Edges are the unique
+    unordered vertex pairs of the half-edges, stored with the smaller
+    vertex first. Half-edges of degenerate triangles that start and end
+    at the same vertex don't belong to any edge and have edge id -1.
+
+    :param tris: (N,3) array of vertex indices for each triangle
+    :param num_vertices: number of vertices the triangles index into
+    """
+
+    def __init__(self, tris, num_vertices):
+        tris = numpy.asarray(tris).reshape(-1, 3)
+        self.num_vertices = num_vertices
+        self.num_faces = len(tris)
+        self.tris = tris
+
+        face_ids = numpy.arange(self.num_faces, dtype=numpy.int64)
+
+        #half-edges, in order (0,1), (1,2), (2,0) for each triangle
+        self.half_origin = tris.reshape(-1).astype(numpy.int64)
+        self.half_dest = tris[:, (1, 2, 0)].reshape(-1).astype(numpy.int64)
+        half_lo = numpy.minimum(self.half_origin, self.half_dest)
+        half_hi = numpy.maximum(self.half_origin, self.half_dest)
+
+        #faces that use the same vertex more than once
+        self.degenerate = (tris[:,0] == tris[:,1]) | (tris[:,1] == tris[:,2]) | (tris[:,0] == tris[:,2])
+
+        #unique edges from sorting the integer keys of the non-loop half-edges
+        valid_halves = numpy.nonzero(half_lo != half_hi)[0]
+        keys = half_lo[valid_halves] * num_vertices + half_hi[valid_halves]
+        order = numpy.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        is_first = numpy.ones(len(sorted_keys), dtype=bool)
+        is_first[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        self.edge_keys = sorted_keys[is_first]
+        self.num_edges = len(self.edge_keys)
+        self.edges = numpy.empty((self.num_edges, 2), dtype=numpy.int64)
+        self.edges[:,0] = self.edge_keys // num_vertices
+        self.edges[:,1] = self.edge_keys % num_vertices
+
+        #edge id of each half-edge
+        sorted_edge_ids = numpy.cumsum(is_first) - 1
+        self.half_edge = numpy.full(3 * self.num_faces, -1, dtype=numpy.int64)
+        self.half_edge[valid_halves[order]] = sorted_edge_ids
+
+        #edge -> half-edges, sorted by half-edge id within each edge
+        sorted_halves = valid_halves[order]
+        self.edge_half_offsets, self.edge_halves = _csr(sorted_edge_ids, sorted_halves, self.num_edges)
+
+        #edge -> faces, without the duplicates from degenerate triangles
+        self.edge_face_offsets, self.edge_faces_flat = _group_unique(sorted_edge_ids, sorted_halves // 3, self.num_edges)
+        self.edge_face_counts = numpy.diff(self.edge_face_offsets)
+
+        #vertex -> faces
+        self.vertex_face_offsets, self.vertex_faces_flat = _group_unique(
+            tris.reshape(-1).astype(numpy.int64), numpy.repeat(face_ids, 3), num_vertices)
+
+        #vertex -> neighboring vertices, with the edge that connects them
+        both_ends = numpy.concatenate((self.edges[:,0], self.edges[:,1]))
+        other_ends = numpy.concatenate((self.edges[:,1], self.edges[:,0]))
+        edge_ids = numpy.concatenate((numpy.arange(self.num_edges), numpy.arange(self.num_edges)))
+        order = numpy.lexsort((other_ends, both_ends))
+        self.vertex_neighbor_offsets, self.vertex_neighbors_flat = _csr(both_ends[order], other_ends[order], num_vertices)
+        self.vertex_neighbor_edges = edge_ids[order]
+
+        #face -> faces sharing an edge with it
+        pairs = self.face_pairs()
+        both_faces = numpy.concatenate((pairs[:,0], pairs[:,1]))
+        other_faces = numpy.concatenate((pairs[:,1], pairs[:,0]))
+        self.face_neighbor_offsets, self.face_neighbors_flat = _group_unique(both_faces, other_faces, self.num_faces)
+
+        self.edge_lengths = None
+
+    def face_pairs(self):
+        """Returns a (P,2) array of every pair of distinct faces that share
+        an edge, with the smaller face first, sorted and without duplicates"""
+        _, f1, f2 = _group_pairs(self.edge_faces_flat, self.edge_face_offsets[:-1], self.edge_face_counts)
+        keys = _sorted_unique(f1 * self.num_faces + f2)
+        return numpy.column_stack((keys // self.num_faces, keys % self.num_faces))
+
+    def face_graph(self):
+        """Finds which of the faces sharing an edge are connected. Two faces
+        are connected unless they are the same triangle up to winding order,
+        or they traverse an edge they share in the same direction, meaning
+        they face opposite ways. A triangle that uses a vertex twice has a
+        zero length edge at that vertex, shared by every face around it.
+
+        Returns (offsets, neighbors, invalid_edges), where the faces connected
+        to face f are neighbors[offsets[f]:offsets[f+1]] in the order they
+        were connected, visiting the edges in order followed by the zero
+        length edges. invalid_edges is a (K,2) array of the edges, with (v,v)
+        for a zero length edge, along which more than two pairs of faces are
+        connected."""
+        shared = numpy.nonzero(self.edge_face_counts >= 2)[0]
+        loop_verts = numpy.unique(self.half_origin[self.half_origin == self.half_dest])
+
+        edge_groups, e1, e2 = _group_pairs(self.edge_faces_flat, self.edge_face_offsets[shared],
+                                           self.edge_face_counts[shared])
+        loop_groups, l1, l2 = _group_pairs(self.vertex_faces_flat, self.vertex_face_offsets[loop_verts],
+                                           numpy.diff(self.vertex_face_offsets)[loop_verts])
+        groups = numpy.concatenate((edge_groups, loop_groups + len(shared)))
+        f1 = numpy.concatenate((e1, l1))
+        f2 = numpy.concatenate((e2, l2))
+
+        connected = connected_faces(self.tris, f1, f2)
+
+        numadded = numpy.bincount(groups[connected], minlength=len(shared) + len(loop_verts))
+        invalid = numpy.nonzero(numadded > 2)[0]
+        invalid_edges = self.edges[shared[invalid[invalid < len(shared)]]]
+        invalid_loops = loop_verts[invalid[invalid >= len(shared)] - len(shared)]
+        invalid_edges = numpy.concatenate((invalid_edges, numpy.column_stack((invalid_loops, invalid_loops))))
+
+        #each connected pair adds f2 to the neighbors of f1 then f1 to the
+        # neighbors of f2. keep the first time each one was added.
+        c1 = f1[connected]
+        c2 = f2[connected]
+        src = numpy.column_stack((c1, c2)).reshape(-1)
+        dst = numpy.column_stack((c2, c1)).reshape(-1)
+        keys = src * self.num_faces + dst
+        order = numpy.argsort(keys, kind='stable')
+        first = numpy.ones(len(order), dtype=bool)
+        first[1:] = keys[order][1:] != keys[order][:-1]
+        order = numpy.sort(order[first])
+        order = order[numpy.argsort(src[order], kind='stable')]
+        offsets, neighbors = _csr(src[order], dst[order], self.num_faces)
+
+        return offsets, neighbors, invalid_edges
+
+    def edge_id(self, v1, v2):
+        """Returns the id of the edge between two vertices, or -1"""
+        lo, hi = min(v1, v2), max(v1, v2)
+        return int(self.edge_ids(numpy.array([[lo, hi]]))[0])
+
+    def edge_ids(self, pairs):
+        """Vectorized :meth:`edge_id` for an (N,2) array of vertex pairs"""
+        pairs = numpy.asarray(pairs, dtype=numpy.int64).reshape(-1, 2)
+        keys = numpy.minimum(pairs[:,0], pairs[:,1]) * self.num_vertices + numpy.maximum(pairs[:,0], pairs[:,1])
+        if self.num_edges == 0:
+            return numpy.full(len(keys), -1, dtype=numpy.int64)
+        locs = numpy.minimum(numpy.searchsorted(self.edge_keys, keys), self.num_edges - 1)
+        return numpy.where(self.edge_keys[locs] == keys, locs, -1)
+
+    def vertex_faces(self, v):
+        return self.vertex_faces_flat[self.vertex_face_offsets[v]:self.vertex_face_offsets[v+1]]
+
+    def vertex_neighbors(self, v):
+        return self.vertex_neighbors_flat[self.vertex_neighbor_offsets[v]:self.vertex_neighbor_offsets[v+1]]
+
+    def vertex_neighbor_lengths(self, v):
+        """Lengths of the edges to each of :meth:`vertex_neighbors`.
+        Requires :meth:`compute_edge_lengths` to have been called."""
+        return self.edge_lengths[self.vertex_neighbor_edges[self.vertex_neighbor_offsets[v]:self.vertex_neighbor_offsets[v+1]]]
+
+    def edge_faces(self, e):
+        return self.edge_faces_flat[self.edge_face_offsets[e]:self.edge_face_offsets[e+1]]
+
+    def edge_half_edges(self, e):
+        return self.edge_halves[self.edge_half_offsets[e]:self.edge_half_offsets[e+1]]
+
+    def face_neighbors(self, f):
+        return self.face_neighbors_flat[self.face_neighbor_offsets[f]:self.face_neighbor_offsets[f+1]]
+
+    def boundary_edges(self):
+        """Ids of the edges that belong to a single face"""
+        return numpy.nonzero(self.edge_face_counts == 1)[0]
+
+    def boundary_vertices(self):
+        """Boolean array of the vertices on a boundary edge"""
+        boundary = numpy.zeros(self.num_vertices, dtype=bool)
+        boundary[self.edges[self.boundary_edges()].reshape(-1)] = True
+        return boundary
+
+    def compute_edge_lengths(self, vertices):
+        """Computes and stores the 3d length of every edge"""
+        diff = vertices[self.edges[:,0]] - vertices[self.edges[:,1]]
+        self.edge_lengths = numpy.sqrt(numpy.sum(diff * diff, axis=1))
+        return self.edge_lengths
+
+    def vertex_components(self):
+        """Number of connected components of the vertex graph, counting
+        vertices that aren't used by any triangle as their own component"""
+        return count_components(self.num_vertices, self.edges)
+
+    def face_components(self):
+        """Number of connected components of the face adjacency graph"""
+        return count_components(self.num_faces, self.face_pairs())
+
+def count_components(num_nodes, edges):
+    """Counts the connected components of a graph with nodes 0 to
+    num_nodes-1 and the given (E,2) array of edges, by repeatedly
+    propagating the minimum label along the edges"""
+    edges = numpy.asarray(edges, dtype=numpy.int64).reshape(-1, 2)
+    labels = numpy.arange(num_nodes, dtype=numpy.int64)
+    while True:
+        prev = labels.copy()
+        numpy.minimum.at(labels, edges[:,0], labels[edges[:,1]])
+        numpy.minimum.at(labels, edges[:,1], labels[edges[:,0]])
+        #pointer jumping so long chains collapse quickly
+        while True:
+            jumped = labels[labels]
+            if numpy.array_equal(jumped, labels):
+                break
+            labels = jumped
+        if numpy.array_equal(prev, labels):
+            break
+    #every label is now the root of its component
+    return int(numpy.count_nonzero(labels == numpy.arange(num_nodes)))
@@ -0,0 +1,126 @@
+"""A compact log of the changes simplifying a mesh makes to its triangles
+
+Each change is a fixed width record in a growable NumPy structured array.
+Undoing the changes in reverse order rebuilds the full mesh, which is how
+the progressive stream is written:
+
+ - ``TRIANGLE_ADDITION`` records a triangle that was removed, with the
+   vertex, normal and uv indices of its three corners
+ - ``INDEX_UPDATE`` records that one corner of a triangle was moved, with
+   the vertex, normal and uv index it had before in the first element of
+   each
+
+Changes are grouped into operations, such as a single edge collapse, and
+the record offset each operation starts at is kept in a second array.
+"""
+
+import numpy
+
+TRIANGLE_ADDITION = 1
+INDEX_UPDATE = 2
+
+RECORD = numpy.dtype([('kind', numpy.int8),
+                      ('corner', numpy.int8),
+                      ('tri', numpy.int32),
+                      ('vert', numpy.int32, 3),
+                      ('normal', numpy.int32, 3),
+                      ('uv', numpy.int32, 3)])
+
+#records the log starts with room for, doubled whenever it fills up
+INITIAL_CAPACITY = 1024
+
+def _grow(array, size):
+    """Returns array, or a copy with more room, with room for size elements"""
+    if size <= len(array):
+        return array
+    grown = numpy.empty(max(2 * len(array), size), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+class OperationLog(object):
+    def __init__(self):
+        self._records = numpy.empty(INITIAL_CAPACITY, dtype=RECORD)
+        self._boundaries = numpy.empty(INITIAL_CAPACITY, dtype=numpy.int64)
+        self.size = 0
+        self.num_operations = 0
+
+    def __getstate__(self):
+        #leave out the room that hasn't been used yet
+        state = dict(self.__dict__)
+        state['_records'] = self.records.copy()
+        state['_boundaries'] = self.boundaries.copy()
+        return state
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def records(self):
+        return self._records[:self.size]
+
+    @property
+    def boundaries(self):
+        """Record offset each operation starts at"""
+        return self._boundaries[:self.num_operations]
+
+    def begin_operation(self):
+        self._boundaries = _grow(self._boundaries, self.num_operations + 1)
+        self._boundaries[self.num_operations] = self.size
+        self.num_operations += 1
+
+    def _append(self, record):
+        self._records = _grow(self._records, self.size + 1)
+        self._records[self.size] = record
+        self.size += 1
+
+    def add_triangle(self, tri, verts, normals, uvs):
+        """Records that triangle tri with the given corners was removed"""
+        self._append((TRIANGLE_ADDITION, 0, tri, verts, normals, uvs))
+
+    def add_triangles(self, tris, verts, normals, uvs):
+        """Records that each of an array of triangles was removed"""
+        self._records = _grow(self._records, self.size + len(tris))
+        added = self._records[self.size:self.size+len(tris)]
+        added['kind'] = TRIANGLE_ADDITION
+        added['corner'] = 0
+        added['tri'] = tris
+        added['vert'] = verts
+        added['normal'] = normals
+        added['uv'] = uvs
+        self.size += len(tris)
+
+    def update_index(self, tri, corner, vert, normal, uv):
+        """Records that a corner of tri, which had the given indices, moved"""
+        self._append((INDEX_UPDATE, corner, tri, (vert, 0, 0), (normal, 0, 0), (uv, 0, 0)))
+
+    def groups(self, start=0, end=None):
+        """Returns the group each record in [start, end) belongs to. Records
+        before the first operation are group 0 and the rest are numbered
+        by operation, so records logged after the last operation began
+        belong to it."""
+        if end is None:
+            end = self.size
+        return numpy.searchsorted(self.boundaries, numpy.arange(start, end), side='right')
+
+    def undo_updates(self, vert_indices, normal_indices, uv_indices, start=0, end=None):
+        """Undoes the index updates in records [start, end) in place. Each
+        corner gets the value from its earliest update in the range, which
+        is what undoing them one by one in reverse order leaves."""
+        if end is None:
+            end = self.size
+        records = self._records[start:end]
+        updates = records[records['kind'] == INDEX_UPDATE]
+        keys = updates['tri'].astype(numpy.int64) * 3 + updates['corner']
+        keys, first = numpy.unique(keys, return_index=True)
+        tris = keys // 3
+        corners = keys % 3
+        vert_indices[tris, corners] = updates['vert'][first, 0]
+        normal_indices[tris, corners] = updates['normal'][first, 0]
+        uv_indices[tris, corners] = updates['uv'][first, 0]
+
+    def removed_triangles(self, start=0, end=None):
+        """Triangles removed by records [start, end)"""
+        if end is None:
+            end = self.size
+        records = self._records[start:end]
+        return records['tri'][records['kind'] == TRIANGLE_ADDITION]
@@ -0,0 +1,151 @@
+"""Tutte/Floater parameterization of a chart into the unit disc
+
+Each interior vertex of a chart is placed at the average of its
+neighbors, weighted by the lengths of the edges to them, with the
+boundary vertices fixed. This is a sparse symmetric positive definite
+system ``L x = b`` with one row per interior vertex, where L is the
+weighted graph Laplacian restricted to the interior. It is solved for
+the U and V coordinates at once.
+
+SciPy's sparse LU factorization is used if it's available. Otherwise
+small systems are solved densely and larger ones with conjugate
+gradients, so memory stays proportional to the number of edges.
+"""
+
+import numpy
+
+try:
+    import scipy.sparse
+    import scipy.sparse.linalg
+except ImportError:
+    scipy = None
+
+#largest system, in interior vertices, solved with a dense matrix when SciPy isn't available
+DENSE_MAXIMUM = 1500
+#relative residual the conjugate gradient solver stops at
+CG_TOLERANCE = 1e-10
+
+def _gather(offsets, items):
+    """Positions of the CSR rows of each item concatenated, and the index
+    into items each position came from"""
+    starts = offsets[items]
+    counts = offsets[items + 1] - starts
+    total = int(numpy.sum(counts))
+    rows = numpy.repeat(numpy.arange(len(items)), counts)
+    row_starts = numpy.cumsum(counts) - counts
+    positions = numpy.arange(total) - numpy.repeat(row_starts, counts) + numpy.repeat(starts, counts)
+    return rows, positions
+
+def tutte_system(adjacency, interior, boundary, boundary_uvs):
+    """Builds the linear system for the interior vertices of a chart
+
+    :param adjacency: :class:`MeshAdjacency` with its edge lengths computed
+    :param interior: array of the chart's interior vertex ids
+    :param boundary: array of the chart's boundary vertex ids
+    :param boundary_uvs: (B,2) array of the fixed uvs of the boundary vertices
+    :returns: (rows, cols, weights, diagonal, rhs) where the off diagonal
+              entries of L are -weights at (rows, cols)
+    """
+    interior = numpy.asarray(interior, dtype=numpy.int64)
+    boundary = numpy.asarray(boundary, dtype=numpy.int64)
+    n = len(interior)
+
+    #chart vertices are numbered interior first, then boundary; neighbors
+    # outside the chart are dropped
+    chart_verts = numpy.concatenate((interior, boundary))
+    order = numpy.argsort(chart_verts)
+    sorted_verts = chart_verts[order]
+
+    rows, positions = _gather(adjacency.vertex_neighbor_offsets, interior)
+    neighbors = adjacency.vertex_neighbors_flat[positions]
+    weights = adjacency.edge_lengths[adjacency.vertex_neighbor_edges[positions]].astype(numpy.float64)
+
+    locs = numpy.minimum(numpy.searchsorted(sorted_verts, neighbors), len(sorted_verts) - 1)
+    in_chart = sorted_verts[locs] == neighbors
+    rows = rows[in_chart]
+    weights = weights[in_chart]
+    local = order[locs[in_chart]]
+
+    diagonal = numpy.bincount(rows, weights=weights, minlength=n)
+
+    to_boundary = local >= n
+    rhs = numpy.zeros((n, 2))
+    boundary_uvs = numpy.asarray(boundary_uvs, dtype=numpy.float64).reshape(-1, 2)
+    for i in range(2):
+        rhs[:,i] = numpy.bincount(rows[to_boundary], minlength=n,
+                                  weights=weights[to_boundary] * boundary_uvs[local[to_boundary] - n, i])
+
+    to_interior = ~to_boundary
+    return rows[to_interior], local[to_interior], weights[to_interior], diagonal, rhs
+
+def _solve_sparse(n, rows, cols, weights, diagonal, rhs):
+    indices = numpy.arange(n)
+    A = scipy.sparse.csc_matrix((numpy.concatenate((-weights, diagonal)),
+                                 (numpy.concatenate((rows, indices)), numpy.concatenate((cols, indices)))),
+                                shape=(n, n))
+    lu = scipy.sparse.linalg.splu(A)
+    solution = lu.solve(rhs)
+    nbytes = (lu.L.nnz + lu.U.nnz) * 12 + A.nnz * 12 + rhs.nbytes * 2
+    return solution, nbytes
+
+def _solve_dense(n, rows, cols, weights, diagonal, rhs):
+    A = numpy.zeros((n, n))
+    A[rows, cols] = -weights
+    A[numpy.arange(n), numpy.arange(n)] = diagonal
+    solution = numpy.linalg.solve(A, rhs)
+    return solution, A.nbytes + rhs.nbytes * 2
+
+def _solve_cg(n, rows, cols, weights, diagonal, rhs):
+    """Jacobi preconditioned conjugate gradients on both columns at once"""
+    def multiply(x):
+        result = diagonal[:,None] * x
+        for i in range(x.shape[1]):
+            result[:,i] -= numpy.bincount(rows, weights=weights * x[cols, i], minlength=n)
+        return result
+
+    x = rhs / diagonal[:,None]
+    r = rhs - multiply(x)
+    z = r / diagonal[:,None]
+    p = z.copy()
+    rz = numpy.sum(r * z, axis=0)
+    target = CG_TOLERANCE * numpy.maximum(numpy.sqrt(numpy.sum(rhs * rhs, axis=0)), 1e-300)
+    for _ in range(max(100, 2 * n)):
+        if numpy.all(numpy.sqrt(numpy.sum(r * r, axis=0)) <= target):
+            break
+        Ap = multiply(p)
+        pAp = numpy.sum(p * Ap, axis=0)
+        alpha = numpy.where(pAp > 0, rz / numpy.where(pAp > 0, pAp, 1), 0)
+        x += alpha * p
+        r -= alpha * Ap
+        z = r / diagonal[:,None]
+        rz_next = numpy.sum(r * z, axis=0)
+        beta = numpy.where(rz > 0, rz_next / numpy.where(rz > 0, rz, 1), 0)
+        p = z + beta * p
+        rz = rz_next
+    nbytes = rows.nbytes + cols.nbytes + weights.nbytes * 2 + rhs.nbytes * 6
+    return x, nbytes
+
+def solve_tutte(rows, cols, weights, diagonal, rhs, solver=None):
+    """Solves a system from :func:`tutte_system`
+
+    :param solver: 'sparse', 'dense' or 'cg', or None to pick the best available
+    :returns: ((n,2) array of interior uvs, solver name, estimated bytes used)
+    """
+    n = len(diagonal)
+    if solver is None:
+        if scipy is not None:
+            solver = 'sparse'
+        elif n <= DENSE_MAXIMUM:
+            solver = 'dense'
+        else:
+            solver = 'cg'
+
+    if n == 0:
+        return numpy.zeros((0, 2)), solver, 0
+    if solver == 'sparse':
+        solution, nbytes = _solve_sparse(n, rows, cols, weights, diagonal, rhs)
+    elif solver == 'dense':
+        solution, nbytes = _solve_dense(n, rows, cols, weights, diagonal, rhs)
+    else:
+        solution, nbytes = _solve_cg(n, rows, cols, weights, diagonal, rhs)
+    return solution, solver, nbytes
@@ -0,0 +1,61 @@
+"""A min priority queue where each key is queued at most once
+
+Pushing a key that is already queued replaces its priority, and keys can
+be discarded. Replaced and discarded entries are marked as removed rather
+than searched for in the heap, and the heap is rebuilt without them once
+they outnumber the live entries, so its size stays proportional to the
+number of keys queued.
+"""
+
+import heapq
+
+#the heap is compacted when it has more than this many entries per live key
+COMPACT_RATIO = 2
+#and at least this many removed entries
+COMPACT_MINIMUM = 1024
+
+class PriorityQueue(object):
+    def __init__(self, items=()):
+        """:param items: iterable of (priority, key) pairs"""
+        self.entries = {}
+        for priority, key in items:
+            self.entries[key] = [priority, key, True]
+        self.heap = list(self.entries.values())
+        heapq.heapify(self.heap)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def priority(self, key):
+        return self.entries[key][0]
+
+    def push(self, priority, key):
+        """Queues key, replacing its priority if it's already queued"""
+        self.discard(key)
+        entry = [priority, key, True]
+        self.entries[key] = entry
+        heapq.heappush(self.heap, entry)
+
+    def discard(self, key):
+        """Removes key if it's queued, returning whether it was"""
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+        entry[2] = False
+        if len(self.heap) > COMPACT_RATIO * len(self.entries) + COMPACT_MINIMUM:
+            self.heap = [e for e in self.heap if e[2]]
+            heapq.heapify(self.heap)
+        return True
+
+    def pop(self):
+        """Removes and returns the (priority, key) with the lowest
+        priority, breaking ties by key. Raises IndexError if empty."""
+        while self.heap:
+            priority, key, live = heapq.heappop(self.heap)
+            if live:
+                del self.entries[key]
+                return priority, key
+        raise IndexError('pop from an empty priority queue')
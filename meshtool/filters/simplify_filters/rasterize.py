@@ -0,0 +1,143 @@
+"""Batched triangle rasterization and texture resampling with NumPy
+
+Coordinates are in pixels with the origin at the top left corner of the
+image, so the center of pixel (x, y) is at (x + 0.5, y + 0.5). This is
+the same convention PIL's Image.transform uses.
+"""
+
+import numpy
+
+#maximum number of candidate pixels tested at once while rasterizing
+RASTER_CHUNK_SIZE = 1 << 22
+
+def rasterize_triangles(tris, width, height):
+    """Finds the pixels of a width x height image covered by triangles
+
+    A pixel is covered by a triangle if any part of the pixel's square
+    touches it, so triangles sharing an edge leave no gaps and the
+    outline of a set of triangles is fully covered. Where several
+    triangles cover a pixel, it goes to the one its center is furthest
+    inside. Degenerate triangles cover nothing.
+
+    :param tris: (T,3,2) array of triangle corners in pixel coordinates
+    :returns: (pixels, tri_ids, bary) giving, for each covered pixel, its
+              index into the flattened image, the triangle it belongs to
+              and (K,3) barycentric coordinates of its center, clamped
+              to the triangle
+    """
+    tris = numpy.asarray(tris, dtype=numpy.float64)
+    p0, p1, p2 = tris[:,0], tris[:,1], tris[:,2]
+    area2 = (p1[:,0] - p0[:,0]) * (p2[:,1] - p0[:,1]) - (p1[:,1] - p0[:,1]) * (p2[:,0] - p0[:,0])
+    valid = numpy.abs(area2) > 1e-12
+
+    #inclusive pixel ranges of each triangle's bounding box
+    xmin = numpy.clip(numpy.floor(numpy.min(tris[:,:,0], axis=1)), 0, width - 1).astype(numpy.int64)
+    xmax = numpy.clip(numpy.floor(numpy.max(tris[:,:,0], axis=1)), 0, width - 1).astype(numpy.int64)
+    ymin = numpy.clip(numpy.floor(numpy.min(tris[:,:,1], axis=1)), 0, height - 1).astype(numpy.int64)
+    ymax = numpy.clip(numpy.floor(numpy.max(tris[:,:,1], axis=1)), 0, height - 1).astype(numpy.int64)
+    box_widths = xmax - xmin + 1
+    counts = numpy.where(valid, box_widths * (ymax - ymin + 1), 0)
+
+    #barycentric i is the edge function of the edge opposite corner i,
+    # a*x + b*y + c, divided by area2
+    edge_starts = tris[:,(1,2,0)]
+    edge_vecs = tris[:,(2,0,1)] - edge_starts
+    safe_area2 = numpy.where(valid, area2, 1.0)[:,None]
+    coef_a = (-edge_vecs[:,:,1] / safe_area2).T.copy()
+    coef_b = (edge_vecs[:,:,0] / safe_area2).T.copy()
+    coef_c = ((edge_vecs[:,:,1] * edge_starts[:,:,0] - edge_vecs[:,:,0] * edge_starts[:,:,1]) / safe_area2).T.copy()
+    #how far below 0 a barycentric can be at a pixel's center if the pixel's square touches the triangle
+    tolerance = -0.5 * (numpy.abs(coef_a) + numpy.abs(coef_b))
+
+    all_pixels, all_tris, all_bary = [], [], []
+    cumulative = numpy.cumsum(counts)
+    start = 0
+    while start < len(tris):
+        #a run of triangles with about RASTER_CHUNK_SIZE candidate pixels, at least one triangle
+        offset = cumulative[start - 1] if start > 0 else 0
+        end = max(int(numpy.searchsorted(cumulative, offset + RASTER_CHUNK_SIZE, side='right')), start + 1)
+        chunk_counts = counts[start:end]
+        tri_ids = numpy.repeat(numpy.arange(start, end), chunk_counts)
+        local = numpy.arange(len(tri_ids)) - numpy.repeat(numpy.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+        xs = xmin[tri_ids] + local % box_widths[tri_ids]
+        ys = ymin[tri_ids] + local // box_widths[tri_ids]
+        start = end
+        if len(tri_ids) == 0:
+            continue
+
+        cx = xs + 0.5
+        cy = ys + 0.5
+        bary = numpy.empty((3, len(tri_ids)))
+        covered = numpy.ones(len(tri_ids), dtype=bool)
+        for i in range(3):
+            bary[i] = coef_a[i][tri_ids] * cx + coef_b[i][tri_ids] * cy + coef_c[i][tri_ids]
+            covered &= bary[i] >= tolerance[i][tri_ids]
+
+        all_pixels.append(ys[covered] * width + xs[covered])
+        all_tris.append(tri_ids[covered])
+        all_bary.append(bary[:,covered].T)
+
+    if len(all_pixels) == 0:
+        return numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64), numpy.zeros((0, 3))
+    pixels = numpy.concatenate(all_pixels)
+    tri_ids = numpy.concatenate(all_tris)
+    bary = numpy.concatenate(all_bary)
+
+    #keep the candidate furthest inside its triangle for each pixel
+    scores = numpy.minimum(numpy.minimum(bary[:,0], bary[:,1]), bary[:,2])
+    best = numpy.full(width * height, -numpy.inf)
+    numpy.maximum.at(best, pixels, scores)
+    winners = numpy.nonzero(scores == best[pixels])[0]
+    owner = numpy.full(width * height, -1, dtype=numpy.int64)
+    owner[pixels[winners]] = winners
+    chosen = owner[owner >= 0]
+    pixels = pixels[chosen]
+    tri_ids = tri_ids[chosen]
+    bary = numpy.maximum(bary[chosen], 0)
+    bary /= (bary[:,0] + bary[:,1] + bary[:,2])[:,None]
+    return pixels, tri_ids, bary
+
+def sample_bilinear(image, xs, ys):
+    """Samples an (H,W,C) image at pixel coordinates with bilinear
+    filtering, wrapping around its edges like repeating texture
+    coordinates. Returns a (K,C) float array."""
+    height, width = image.shape[:2]
+    fx = numpy.asarray(xs, dtype=numpy.float64) - 0.5
+    fy = numpy.asarray(ys, dtype=numpy.float64) - 0.5
+    x0 = numpy.floor(fx)
+    y0 = numpy.floor(fy)
+    ax = (fx - x0)[:,None]
+    ay = (fy - y0)[:,None]
+    x0 = x0.astype(numpy.int64) % width
+    y0 = y0.astype(numpy.int64) % height
+    x1 = (x0 + 1) % width
+    y1 = (y0 + 1) % height
+    top = image[y0, x0] * (1 - ax) + image[y0, x1] * ax
+    bottom = image[y1, x0] * (1 - ax) + image[y1, x1] * ax
+    return top * (1 - ay) + bottom * ay
+
+def resample_triangles(dst_tris, src_tris, tri_sources, sources, width, height):
+    """Copies triangles from source images into a new image
+
+    :param dst_tris: (T,3,2) pixel coordinates of the triangles in the new image
+    :param src_tris: (T,3,2) pixel coordinates of the triangles in their source images
+    :param tri_sources: (T,) index into sources of each triangle's image
+    :param sources: list of (H,W,3) uint8 source image arrays
+    :returns: ((height,width,3) uint8 image that is black where no
+              triangle was drawn, (height,width) bool array of the covered pixels)
+    """
+    pixels, tri_ids, bary = rasterize_triangles(dst_tris, width, height)
+    src_tris = numpy.asarray(src_tris, dtype=numpy.float64)[tri_ids]
+    src_xs = numpy.sum(bary * src_tris[:,:,0], axis=1)
+    src_ys = numpy.sum(bary * src_tris[:,:,1], axis=1)
+
+    image = numpy.zeros((height * width, 3), dtype=numpy.uint8)
+    pixel_sources = numpy.asarray(tri_sources)[tri_ids]
+    for source in numpy.unique(pixel_sources):
+        selected = pixel_sources == source
+        colors = sample_bilinear(sources[source], src_xs[selected], src_ys[selected])
+        image[pixels[selected]] = numpy.clip(numpy.round(colors), 0, 255).astype(numpy.uint8)
+
+    covered = numpy.zeros(height * width, dtype=bool)
+    covered[pixels] = True
+    return image.reshape(height, width, 3), covered.reshape(height, width)
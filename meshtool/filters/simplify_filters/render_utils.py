@@ -59,7 +59,7 @@ def gen_color():
         RGB_tuple = colorsys.hsv_to_rgb(*HSV_tuple)
         yield [int(x * 256) for x in RGB_tuple]
 
-def renderCharts(facegraph, verts, vert_indices, lineset=None):
+def renderCharts(charts, verts, vert_indices, lineset=None):
     
     from meshtool.filters.panda_filters.pandacore import getVertexData, attachLights, ensureCameraAt
     from meshtool.filters.panda_filters.pandacontrols import KeyboardMovement, MouseDrag, MouseScaleZoom, ButtonUtils
@@ -72,9 +72,9 @@ def renderCharts(facegraph, verts, vert_indices, lineset=None):
     vertex=GeomVertexWriter(vdata, 'vertex')
     color=GeomVertexWriter(vdata, 'color')
     
-    colors = gen_color3(len(facegraph))
+    colors = gen_color3(len(charts))
     numtris = 0
-    for chart, data in facegraph.nodes_iter(data=True):
+    for chart, data in charts.items():
         curcolor = next(colors)
         for tri in data['tris']:
             triv = verts[vert_indices[tri]]
@@ -1,18 +1,29 @@
 from meshtool.args import FileArgument
 from meshtool.filters.base_filters import SimplifyFilter
-import inspect
 import numpy
 import networkx as nx
-from itertools import chain, combinations
-import datetime
+from itertools import chain
 import math
 import builtins
 import heapq
 from .render_utils import renderVerts, renderCharts
-from .graph_utils import astar_path, dfs_interior_nodes, super_cycle
+from .graph_utils import VertexSubgraph, super_cycle, edge_topology
+from .mesh_adjacency import MeshAdjacency, count_components, shared_vertex_counts, vertex_corners
+from .parameterize import tutte_system, solve_tutte
+from .chart_pool import map_charts, default_workers
+from .priority_queue import PriorityQueue
+from .operation_log import OperationLog, TRIANGLE_ADDITION
+from .time_budget import TimeBudget, default_time_budget
+from .telemetry import PhaseTelemetry, telemetry_enabled, sidecar_path
+from .checkpoint import Checkpoint, checkpoint_dir, fingerprint
+from .rasterize import resample_triangles
+from meshtool.filters.panda_filters import pdae_utils
 import gc
-import sys
+import io
+import os
+import hashlib
 import random
+import time
 import collada
 try:
     from ipdb import launch_ipdb_on_exception
@@ -22,26 +33,9 @@ except ImportError:
 
 from meshtool.util import Image, ImageDraw
 from meshtool.filters.atlas_filters.rectpack import RectPack
-from io import StringIO
+from meshtool.filters.atlas_filters.fill_gutters import pullPushFill
+from io import BytesIO
 import meshtool.filters
-import bisect
-
-#after numpy 1.3, unique1d was renamed to unique
-args, varargs, keywords, defaults = inspect.getargspec(numpy.unique)    
-if 'return_inverse' not in args:
-    numpy.unique = numpy.unique1d
-
-# Import both cv (opencv's official python bindings)
-# and pyopencv, a python binding to cv that makes it
-# much easier to use. Mostly using pyopencv below, but
-# in some cases the inpaint function fails using pyopencv
-# so it gets used via the regular cv 
-try: import pyopencv as pcv
-except ImportError:
-    pcv = None
-try: import cv
-except ImportError:
-    cv = None
 
 #Error threshold values, range 0-1
 MERGE_ERROR_THRESHOLD = 0.91
@@ -55,22 +49,28 @@ TRIANGLE_MAXIMUM = 40000
 # the total mesh, don't make a progressive stream
 STREAM_THRESHOLD = 0.2
 
-def timer():
-    begintime = datetime.datetime.now()
-    while True:
-        curtime = datetime.datetime.now()
-        yield (curtime-begintime)
-        begintime = curtime
+# attributes that aren't saved in checkpoints, because they're settings,
+# refer to the input mesh and output file, or describe the current run
+CHECKPOINT_EXCLUDE = ['mesh', 'pmbuf', 'binary_stream', 'tri2material', 'material2color', 'workers', 'lod_targets',
+                      'snapshot_levels', 'time_budget', 'telemetry']
+
+# fraction of the time budget, if there is one, each phase that can stop early gets,
+# leaving the rest for parameterizing, baking, packing and saving
+PHASE_BUDGET = [('merge_charts', 0.25),
+                ('straighten_chart_boundaries', 0.1),
+                ('optimize_chart_parameterizations', 0.3),
+                ('simplify_mesh', 0.25)]
 
 def seg_intersect(a1,a2, b1,b2):
     """line segment intersection using vectors
     see Computer Graphics by F.S. Hill
     
-    line segment a given by endpoints a1, a2
-    line segment b given by endpoints b1, b2
+    line segments a given by (N,2) arrays of endpoints a1, a2
+    line segments b given by (N,2) arrays of endpoints b1, b2
     
-    returns point (c1,d1) where the two line
-    segments intersect or None if lines don't intersect
+    returns (N,2) array of the points (c1,d1) where the lines through
+    each pair of segments intersect, and a mask of the ones that lie
+    within segment a's bounds. Parallel lines don't intersect.
     
     Original code from http://www.cs.mun.ca/~rod/2500/notes/numpy-arrays/numpy-arrays.html
     """
@@ -78,32 +78,64 @@ def seg_intersect(a1,a2, b1,b2):
     db = b2-b1
     dp = a1-b1
     
-    dap = numpy.copy(da)
-    dap[0] = -da[1]
-    dap[1] = da[0]
-    
-    denom = numpy.dot(dap, db)
-    num = numpy.dot(dap, dp)
-    intersect = (num / denom)*db + b1
-    if intersect[0] > max(a1[0], a2[0]) or intersect[0] < min(a1[0], a2[0]) or \
-        intersect[1] > max(a1[1], a2[1]) or intersect[1] < min(a1[1], a2[1]):
-        return None
-    return intersect
+    denom = -da[:,1]*db[:,0] + da[:,0]*db[:,1]
+    num = -da[:,1]*dp[:,0] + da[:,0]*dp[:,1]
+    valid = denom != 0
+    intersect = (num / numpy.where(valid, denom, 1))[:,numpy.newaxis]*db + b1
+    valid &= (intersect[:,0] <= numpy.maximum(a1[:,0], a2[:,0])) & (intersect[:,0] >= numpy.minimum(a1[:,0], a2[:,0])) & \
+             (intersect[:,1] <= numpy.maximum(a1[:,1], a2[:,1])) & (intersect[:,1] >= numpy.minimum(a1[:,1], a2[:,1]))
+    return intersect, valid
          
-def calcPerimeter(pts):
-    """Calculates the perimeter of an area by 
-    summing the distance between the points in
-    a set of edges"""
-    dx = pts[:,0,0]-pts[:,1,0]
-    dy = pts[:,0,1]-pts[:,1,1]
-    dz = pts[:,0,2]-pts[:,1,2]
-    return numpy.sum(numpy.sqrt(dx*dx + dy*dy + dz*dz))
+#layout of the boundary moments kept for each chart: number of points,
+# sum of the points, upper triangle of the sum of their outer products
+# and the perimeter
+MOMENT_SIZE = 11
+MOMENT_UPPER = ([0, 0, 0, 1, 1, 2], [0, 1, 2, 1, 2, 2])
+
+#number of chart pairs to compute initial merge errors for at once
+MERGE_BATCH_SIZE = 65536
+
+def calcEdgeMoments(pts):
+    """Calculates the moments of each edge in an (E,2,3) array of edge
+    endpoints. Summing the rows gives the moments of a boundary made of
+    those edges, which are all that's needed to compute its merge error."""
+    pts = numpy.asarray(pts, dtype=numpy.float64)
+    moments = numpy.empty((len(pts), MOMENT_SIZE))
+    moments[:,0] = 2
+    moments[:,1:4] = pts[:,0] + pts[:,1]
+    outer = pts[:,0,:,None] * pts[:,0,None,:] + pts[:,1,:,None] * pts[:,1,None,:]
+    moments[:,4:10] = outer[:, MOMENT_UPPER[0], MOMENT_UPPER[1]]
+    d = pts[:,0] - pts[:,1]
+    moments[:,10] = numpy.sqrt(numpy.sum(d * d, axis=1))
+    return moments
+
+def calcMergeError(moments):
+    """
+    Calculates the error of each chart boundary in an (N,MOMENT_SIZE)
+    array of moments, which is the perimeter squared plus E_fit from
+    
+     - Hierarchical Face Clustering on Polygonal Surfaces
+     - Michael Garland, et al.
+     - See section 3.2
+    
+    E_fit is the mean squared distance of the boundary points to
+    their best fit plane, which is the smallest eigenvalue of
+    Z = A - (b * b^T) / c divided by c, where c is the number
+    of points, b their sum and A = sum{v_i * v_i^T}"""
+    count = moments[:,0]
+    b = moments[:,1:4]
+    Z = numpy.empty((len(moments), 3, 3))
+    Z[:, MOMENT_UPPER[0], MOMENT_UPPER[1]] = moments[:,4:10]
+    Z[:, MOMENT_UPPER[1], MOMENT_UPPER[0]] = moments[:,4:10]
+    Z -= b[:,:,None] * b[:,None,:] / count[:,None,None]
+    Efit = numpy.maximum(numpy.linalg.eigvalsh(Z)[:,0], 0) / count
+    return moments[:,10] ** 2 + Efit
 
 def v2dist(pt1, pt2):
     """Calculates the distance between two 2d points element-wise
     along an array"""
     d = pt1 - pt2
-    return math.sqrt(d[0]*d[0] + d[1]*d[1])
+    return numpy.sqrt(d[...,0]*d[...,0] + d[...,1]*d[...,1])
 def v3dist(pt1, pt2):
     """Calculates the distance between two 3d points element-wise
     along an array"""
@@ -111,48 +143,10 @@ def v3dist(pt1, pt2):
     return math.sqrt(d[0]*d[0] + d[1]*d[1] + d[2]*d[2])
 
 def array_mult(arr1, arr2):
-    return arr1[:,0]*arr2[:,0] + arr1[:,1]*arr2[:,1] + arr2[:,2]*arr1[:,2]
+    return arr1[...,0]*arr2[...,0] + arr1[...,1]*arr2[...,1] + arr2[...,2]*arr1[...,2]
 def array_dot(arr1, arr2):
     return numpy.sqrt( array_mult(arr1, arr2) )
 
-def calcFitError(pts):
-    """
-    Calculates E_fit, which is an error value from
-    
-     - Hierarchical Face Clustering on Polygonal Surfaces
-     - Michael Garland, et al.
-     - See section 3.2
-    
-    Computes the best fit plane through a set of points
-    and then calculates the squared mean distance between
-    the points and the plane as the error value"""
-    
-    # this computes the outer product of each vector
-    # in the array, element-wise, then sums up the 3x3
-    # matrices
-    #  A = sum{v_i * v_i^T} 
-    A = numpy.sum(pts[...,None] * pts[:,None,:], 0)
-    
-    # b = mean(v_i)
-    b = numpy.mean(pts, 0)
-
-    # Z = A - (b * b^T) / c
-    Z = A - numpy.outer(b,b) / len(pts)
-    
-    # n (normal of best fit plane) is the eigenvector
-    # corresponding to the minimum eigenvalue
-    eigvals, eigvecs = numpy.linalg.eigh(Z)
-    n = eigvecs[numpy.argmin(eigvals)]
-    
-    # d (scalar offset of best fit plane) = -n^T * b / c
-    d = numpy.inner(-n, b)
-    
-    # final error is the square of the mean distance of each point to the plane
-    mean_dist = numpy.mean(numpy.abs(numpy.dot(pts, n) + d))
-    Efit = mean_dist * mean_dist
-    
-    return Efit
-
 def tri_areas_3d(arr):
     crosses = numpy.cross(arr[:,0] - arr[:,1], arr[:,0] - arr[:,2])
     return array_dot(crosses, crosses) / 2.0
@@ -169,23 +163,27 @@ def stretch_metric(t3d, t2d, return_A2d=False, flippedCheck=None, normalize=Fals
      - Texture Mapping Progressive Meshes
      - Pedro V. Sander, et al.
      - See section 3
+    
+    t2d can have extra leading dimensions to evaluate several
+    parameterizations of the same triangles at once, in which case a
+    normalized metric is returned for each of them.
     """
      
     q1 = t3d[:,0]
     q2 = t3d[:,1]
     q3 = t3d[:,2]
-    s1 = t2d[:,0,0]
-    s2 = t2d[:,1,0]
-    s3 = t2d[:,2,0]
-    t1 = t2d[:,0,1]
-    t2 = t2d[:,1,1]
-    t3 = t2d[:,2,1]
+    s1 = t2d[...,0,0]
+    s2 = t2d[...,1,0]
+    s3 = t2d[...,2,0]
+    t1 = t2d[...,0,1]
+    t2 = t2d[...,1,1]
+    t3 = t2d[...,2,1]
     A2d = ((s2-s1)*(t3-t1) - (s3-s1)*(t2-t1)) / 2.0
     A2d[A2d == 0] = numpy.inf
     assert(not(numpy.any(A2d==0) and return_A2d))
     
-    S_s = (q1*(t2-t3)[:,None] + q2*(t3-t1)[:,None] + q3*(t1-t2)[:,None]) / (2.0 * A2d)[:,None]
-    S_t = (q1*(s3-s2)[:,None] + q2*(s1-s3)[:,None] + q3*(s2-s1)[:,None]) / (2.0 * A2d)[:,None]
+    S_s = (q1*(t2-t3)[...,None] + q2*(t3-t1)[...,None] + q3*(t1-t2)[...,None]) / (2.0 * A2d)[...,None]
+    S_t = (q1*(s3-s2)[...,None] + q2*(s1-s3)[...,None] + q3*(s2-s1)[...,None]) / (2.0 * A2d)[...,None]
     
     L2 = numpy.sqrt((array_mult(S_s,S_s) + array_mult(S_t,S_t)) / 2.0)
     if flippedCheck is not None:
@@ -198,8 +196,8 @@ def stretch_metric(t3d, t2d, return_A2d=False, flippedCheck=None, normalize=Fals
         if flippedCheck is None and sumA3d == 0:
             L2 = 0
         else:
-            A3d[L2 == numpy.inf] = numpy.inf
-            L2 = numpy.sqrt(numpy.sum(L2*L2*A3d) / sumA3d) * numpy.sqrt(numpy.sum(numpy.abs(A2d)) / sumA3d)
+            A3d = numpy.where(L2 == numpy.inf, numpy.inf, A3d)
+            L2 = numpy.sqrt(numpy.sum(L2*L2*A3d, axis=-1) / sumA3d) * numpy.sqrt(numpy.sum(numpy.abs(A2d), axis=-1) / sumA3d)
         
     if return_A2d:
         return L2, A2d
@@ -227,93 +225,11 @@ def drawChart(chart_tris, border_verts, new_uvs, newvert2idx):
     del draw
     im.show()
 
-def transformblit(src_tri, dst_tri, src_img, dst_img, alpha=255):
-    """Pastes a triangular region from one image
-    into a triangular region in another image by
-    using an affine transformation"""
-    ((x11,x12), (x21,x22), (x31,x32)) = src_tri
-    ((y11,y12), (y21,y22), (y31,y32)) = dst_tri
-
-    minx = int(math.floor(min(y11, y21, y31)))
-    miny = int(math.floor(min(y12, y22, y32)))
-    y11 -= minx
-    y21 -= minx
-    y31 -= minx
-    y12 -= miny
-    y22 -= miny
-    y32 -= miny
-    sizex = int(math.ceil(max(y11, y21, y31)))
-    sizey = int(math.ceil(max(y12, y22, y32)))
-    
-    M = numpy.array([
-                     [y11, y12, 1, 0, 0, 0],
-                     [y21, y22, 1, 0, 0, 0],
-                     [y31, y32, 1, 0, 0, 0],
-                     [0, 0, 0, y11, y12, 1],
-                     [0, 0, 0, y21, y22, 1],
-                     [0, 0, 0, y31, y32, 1]
-                ])
-    
-    y = numpy.array([x11, x21, x31, x12, x22, x32])
-
-    try:
-        A = numpy.linalg.solve(M, y)
-    except numpy.linalg.LinAlgError:
-        #can happen if the new triangle is a single point, so no need to paint it
-        return
-
-    transformed = src_img.transform((sizex, sizey), Image.AFFINE, A, Image.BICUBIC)
-    
-    mask = Image.new('1' if alpha == 255 else 'L', (sizex, sizey))
-    maskdraw = ImageDraw.Draw(mask)
-    maskdraw.polygon(((y11,y12), (y21,y22), (y31,y32)), outline=alpha, fill=alpha)
-
-    dst_img.paste(transformed, (minx, miny), mask=mask)
-
-def opencvblit(src_tri, dst_tri, src_cv_img, dst_pil_img):
-    """Pastes a triangular region from one image
-    into a triangular region in another image by
-    using an affine transformation. Uses pyopencv
-    for the source image and PIL for the destination
-    image."""
-    
-    ((x11,x12), (x21,x22), (x31,x32)) = src_tri
-    ((y11,y12), (y21,y22), (y31,y32)) = dst_tri
-
-    minx = int(math.floor(min(y11, y21, y31)))
-    miny = int(math.floor(min(y12, y22, y32)))
-    y11 -= minx
-    y21 -= minx
-    y31 -= minx
-    y12 -= miny
-    y22 -= miny
-    y32 -= miny
-    sizex = int(math.ceil(max(y11, y21, y31)))
-    sizey = int(math.ceil(max(y12, y22, y32)))
-    
-    #if the destination size is 0, no point in performing the transformation
-    # and opencv throws an exception that we can't catch anyway
-    if sizex < 1 or sizey < 1:
-        return
-    
-    src_vec = pcv.vector_Point2f([pcv.Point2f(float(x),float(y)) for (x,y) in src_tri])
-    dst_vec = pcv.vector_Point2f([pcv.Point2f(float(x),float(y)) for (x,y) in [(y11,y12), (y21,y22), (y31,y32)]])
-    
-    A = pcv.getAffineTransform(src_vec, dst_vec)
-    
-    transformed_im = pcv.Mat()
-    pcv.warpAffine(src_cv_img, transformed_im, A, pcv.Size(sizex, sizey), pcv.INTER_CUBIC, pcv.BORDER_WRAP)
-    
-    transformed_im = transformed_im.to_pil_image()
-    mask = Image.new('1', (sizex, sizey))
-    maskdraw = ImageDraw.Draw(mask)
-    maskdraw.polygon(((y11,y12), (y21,y22), (y31,y32)), outline=255, fill=255)
-
-    dst_pil_img.paste(transformed_im, (minx, miny), mask=mask)
-
 def evalQuadric(A, b, c, pt):
-    """Evaluates a quadric Q = (A,b,c) at the point pt"""
-    return numpy.dot(pt,numpy.inner(A,pt)) + 2*numpy.dot(b,pt) + c
+    """Evaluates quadrics Q = (A,b,c) at the points pt, where A is an
+    (N,3,3) array, b and pt are (N,3) and c is (N,)"""
+    Apt = A[:,:,0]*pt[:,0,numpy.newaxis] + A[:,:,1]*pt[:,1,numpy.newaxis] + A[:,:,2]*pt[:,2,numpy.newaxis]
+    return array_mult(pt, Apt) + 2*array_mult(b, pt) + c
 
 def quadricsForTriangles(tris):
     """Computes the quadric error matrix Q = (A,b,c)
@@ -348,21 +264,235 @@ def quadricsForTriangles(tris):
 
 def uniqify_multidim_indexes(sourcedata, indices, return_map=False):
     unique_data, index_map = numpy.unique(sourcedata.view([('',sourcedata.dtype)]*sourcedata.shape[1]), return_inverse=True)
-    index_map = numpy.cast['int32'](index_map)
+    index_map = index_map.astype(numpy.int32).reshape(-1)
     if return_map:
         return unique_data.view(sourcedata.dtype).reshape(-1,sourcedata.shape[1]), index_map[indices], index_map
     return unique_data.view(sourcedata.dtype).reshape(-1,sourcedata.shape[1]), index_map[indices]
 
-class STREAM_OP:
-    OPERATION_BOUNDARY = 0
-    INDEX_UPDATE = 1
-    TRIANGLE_ADDITION = 2
+def index_rows_by_first_use(rows):
+    """Numbers the distinct rows of a 2d array in the order each first
+    appears. Returns the number of each row, and whether each row is the
+    first appearance of its value."""
+    #lexsort is stable, so each run of equal rows starts with the first one
+    order = numpy.lexsort(rows.T[::-1])
+    sorted_rows = rows[order]
+    run_starts = numpy.ones(len(rows), dtype=bool)
+    run_starts[1:] = numpy.any(sorted_rows[1:] != sorted_rows[:-1], axis=1)
+    run_ids = numpy.cumsum(run_starts) - 1
+    first_positions = order[run_starts]
+    run_numbers = numpy.empty(len(first_positions), dtype=numpy.int32)
+    run_numbers[numpy.argsort(first_positions)] = numpy.arange(len(first_positions), dtype=numpy.int32)
+    
+    numbers = numpy.empty(len(rows), dtype=numpy.int32)
+    numbers[order] = run_numbers[run_ids]
+    first_use = numpy.zeros(len(rows), dtype=bool)
+    first_use[first_positions] = True
+    return numbers, first_use
+
+def parameterizeChart(shared, task):
+    """Maps the boundary of a chart to a circle, spaced by arc length, and
+    solves for the uvs of its interior vertices. Returns (verts, uvs, stats)
+    with the boundary vertices first, where stats is (interior vertices,
+    solver, estimated bytes) of the solve."""
+    tris, border_edges = task
+    all_vertices = shared.all_vertices
+    chart_tris = shared.all_vert_indices[tris]
+
+    unique_verts = set(chain.from_iterable(chart_tris))
+    border_verts = set(chain.from_iterable(border_edges))
+    interior_verts = list(unique_verts.difference(border_verts))
+            
+    bordergraph = nx.from_edgelist(border_edges)
+    bigcycle = list(super_cycle(bordergraph))
+    boundary_path = []
+    for i in range(len(bigcycle)-1):
+        boundary_path.append((bigcycle[i], bigcycle[i+1]))
+    boundary_path.append((bigcycle[len(bigcycle)-1], bigcycle[0]))
+    assert(len(boundary_path) == len(border_edges))
+
+    total_dist = 0
+    for (v1, v2) in boundary_path:
+        total_dist += v3dist(all_vertices[v1], all_vertices[v2])
+    
+    vert2uv = {}
+    curangle = 0
+    for edge in boundary_path:
+        angle = v3dist(all_vertices[edge[0]], all_vertices[edge[1]]) / total_dist
+        curangle += angle * 2 * math.pi
+        x, y = (math.sin(curangle) + 1) / 2.0, (math.cos(curangle) + 1.0) / 2.0
+        vert2uv[edge[0]] = (x,y)
+    
+    solver, nbytes = None, 0
+    if len(interior_verts) > 0:
+        boundary_verts = list(vert2uv.keys())
+        #the shared arrays include the vertex adjacency tutte_system needs
+        system = tutte_system(shared, interior_verts, boundary_verts, list(vert2uv.values()))
+        interior_uvs, solver, nbytes = solve_tutte(*system)
+        for v, uv in zip(interior_verts, interior_uvs.tolist()):
+            vert2uv[v] = tuple(uv)
+    
+    return list(vert2uv.keys()), list(vert2uv.values()), (len(interior_verts), solver, nbytes)
+
+def optimizeChart(shared, task):
+    """Reduces the texture stretch of a chart's parameterization by moving
+    each interior vertex along random lines, for 4 iterations with
+    shrinking ranges. The random lines are seeded by the chart id. Stops
+    moving vertices once time.time() passes the deadline, if there is one.
+    Returns (uv_locs, uvs, L2, truncated) with the final uvs at uv_locs in
+    new_uvs, and whether it stopped early."""
+    face, tris, border_verts, deadline = task
+    rng = random.Random(face)
+    chart_tris = shared.all_vert_indices[tris]
+    tri_3d = shared.all_vertices[chart_tris]
+    tri_2d = shared.new_uvs[shared.new_uv_indices[tris]]
+    
+    unique_verts, index_map = numpy.unique(chart_tris, return_inverse=True)
+    index_map.shape = chart_tris.shape
+    corner_offsets, corners = vertex_corners(index_map, len(unique_verts))
+    uv_locs = numpy.empty(len(unique_verts), dtype=numpy.int64)
+    uv_locs[index_map] = shared.new_uv_indices[tris]
+    uvs = shared.new_uvs[uv_locs]
+    
+    truncated = False
+    for iteration in range(1, 5):
+        if truncated:
+            break
+    
+        L2 = stretch_metric(tri_3d, tri_2d)
+        neighborhood_stretch = numpy.zeros(unique_verts.shape, dtype=numpy.float32)
+        neighborhood_stretch[index_map[:,0]] += L2
+        neighborhood_stretch[index_map[:,1]] += L2
+        neighborhood_stretch[index_map[:,2]] += L2
+        vert_stretch_heap = list(zip(-1 * neighborhood_stretch, list(range(len(unique_verts)))))
+        heapq.heapify(vert_stretch_heap)
+    
+        while len(vert_stretch_heap) > 0:
+            stretch, local_vert = heapq.heappop(vert_stretch_heap)
+            vert = unique_verts[local_vert]
+            if vert in border_verts:
+                continue
+            
+            if deadline is not None and time.time() > deadline:
+                truncated = True
+                break
+            
+            ucoord, vcoord = uvs[local_vert]
+            
+            #corners of the vertex, and the triangles they're in without repeats
+            vert_corners = corners[corner_offsets[local_vert]:corner_offsets[local_vert+1]]
+            corner_tris = vert_corners // 3
+            corner_positions = vert_corners % 3
+            new_tri = numpy.ones(len(corner_tris), dtype=bool)
+            new_tri[1:] = corner_tris[1:] != corner_tris[:-1]
+            neighborhood_tris = corner_tris[new_tri]
+            corner_neighborhood = numpy.cumsum(new_tri) - 1
+            
+            neighborhood_tri3d = tri_3d[neighborhood_tris]
+            neighborhood_tri_2d = tri_2d[neighborhood_tris]
+            neighborhood_L2, origA2d = stretch_metric(neighborhood_tri3d, neighborhood_tri_2d, return_A2d=True, normalize=True)
+            
+            randangle = rng.uniform(0, 2 * math.pi)
+            randslope = math.tan(randangle)
+
+            # y - y1 = m(x - x1)
+            def yfromx(x):
+                return randslope * (x - ucoord) + vcoord
+            def xfromy(y):
+                return ((y - vcoord) / randslope) + ucoord
+            
+            xintercept0 = yfromx(0)
+            minx = 0.0 if 0 <= xintercept0 <= 1 else min(xfromy(0), xfromy(1))
+            xintercept1 = yfromx(1)
+            maxx = 1.0 if 0 <= xintercept1 <= 1 else max(xfromy(0), xfromy(1))
+            minx, maxx = tuple(sorted([minx, maxx]))
+            
+            assert 0 <= minx <= maxx <= 1, (minx, maxx, xfromy(0), xfromy(1), yfromx(0), yfromx(1))
+            
+            rangesize = (maxx-minx) / iteration
+            rangemin = ucoord - rangesize / 2.0
+            rangemax = ucoord + rangesize / 2.0
+            if rangemax > maxx:
+                rangemin -= (maxx-rangemax)
+                rangemax -= (maxx-rangemax)
+            if rangemin < minx:
+                rangemax += (minx-rangemin)
+                rangemin += (minx-rangemin)
+            if rangemax > maxx: rangemax = maxx
+            if rangemin < minx: rangemin = minx
+            if rangemax < rangemin:
+                rangemin, rangemax = rangemax, rangemin
+                
+            assert(0 <= rangemin <= rangemax <= 1)
+            
+            samples = 10.0
+            step = (rangemax - rangemin) / samples
+            bestu, bestv = ucoord, vcoord
+            if step > 0:
+                #score every sample along the line at once
+                xvals = numpy.arange(rangemin, rangemax, step)
+                yvals = yfromx(xvals)
+                sample_tri_2d = numpy.repeat(neighborhood_tri_2d[numpy.newaxis], len(xvals), axis=0)
+                sample_tri_2d[:,corner_neighborhood,corner_positions,0] = xvals[:,numpy.newaxis]
+                sample_tri_2d[:,corner_neighborhood,corner_positions,1] = yvals[:,numpy.newaxis]
+                sample_L2 = stretch_metric(neighborhood_tri3d, sample_tri_2d, flippedCheck=origA2d, normalize=True)
+                best = numpy.argmin(sample_L2)
+                if sample_L2[best] < neighborhood_L2:
+                    bestu, bestv = xvals[best], yvals[best]
+
+            tri_2d[corner_tris,corner_positions,0] = bestu
+            tri_2d[corner_tris,corner_positions,1] = bestv
+            uvs[local_vert] = (bestu, bestv)
+    
+    chart_L2 = stretch_metric(tri_3d, tri_2d, normalize=True)
+    return uv_locs, uvs, chart_L2, truncated
+
+def bakeChart(shared, task):
+    """Draws the texture of a chart into a new image of its packed size by
+    resampling each triangle from its original texture. Returns the chart
+    image and a mask that is 0 where triangles were drawn."""
+    tris, chart_width, chart_height = task
+    tris = numpy.asarray(tris)
+    
+    newuvs = shared.new_uvs[shared.new_uv_indices[tris]]
+    newtris = numpy.empty(newuvs.shape)
+    newtris[:,:,0] = newuvs[:,:,0] * (chart_width-0.5)
+    newtris[:,:,1] = (1.0-newuvs[:,:,1]) * (chart_height-0.5)
+    
+    textures = shared.tri_textures[tris]
+    texture_sizes = shared.texture_sizes[textures]
+    prevuvs = shared.all_orig_uvs[shared.all_orig_uv_indices[tris]]
+    prevtris = numpy.empty(prevuvs.shape)
+    prevtris[:,:,0] = prevuvs[:,:,0] * texture_sizes[:,0,None]
+    prevtris[:,:,1] = (1.0-prevuvs[:,:,1]) * texture_sizes[:,1,None]
+    
+    sources = [getattr(shared, 'texture%d' % texture) for texture in range(len(shared.texture_sizes))]
+    chartim, covered = resample_triangles(newtris, prevtris, textures, sources, chart_width, chart_height)
+    chartmask = numpy.where(covered, 0, 255).astype(numpy.uint8)
+    return Image.fromarray(chartim, 'RGB'), Image.fromarray(chartmask, 'L')
 
 class SanderSimplify(object):
 
-    def __init__(self, mesh, pmbuf):
+    def __init__(self, mesh, pmbuf, workers=None, lod_targets=None, time_budget=None, snapshot_levels=None):
         self.mesh = mesh
         self.pmbuf = pmbuf
+        #the progressive stream is written as BPDAE to a file opened in binary mode
+        self.binary_stream = pmbuf is not None and not isinstance(pmbuf, io.TextIOBase)
+        
+        #seconds the phases that can stop early are allowed to take, or None for no limit
+        self.time_budget = TimeBudget(default_time_budget() if time_budget is None else time_budget, PHASE_BUDGET)
+        
+        #number of processes per-chart work is spread over
+        self.workers = default_workers() if workers is None else workers
+        
+        #('triangles', count) or ('error', level) targets to save a level of detail at,
+        # instead of a base mesh and progressive stream
+        self.lod_targets = lod_targets
+        self.lods = None
+        
+        #('refinements', count) or ('fraction', fraction) levels of the progressive
+        # stream to save the full mesh at, so loading a level only needs the
+        # refinements after the nearest one. Only BPDAE streams can hold them.
+        self.snapshot_levels = snapshot_levels
         
         self.all_vertices = []
         self.all_normals = []
@@ -379,9 +509,10 @@ class SanderSimplify(object):
         
         self.tri2material = []
         
-        self.timer = timer()
+        #wall time, cpu time, memory and counters of each phase
+        self.telemetry = PhaseTelemetry()
         
-        self.begin_operation('Building aggregated vertex and triangle list...')
+        self.begin_operation('aggregate_primitives', 'Building aggregated vertex and triangle list...')
         for boundgeom in chain(mesh.scene.objects('geometry'), mesh.scene.objects('controller')):
             if isinstance(boundgeom, collada.controller.BoundController):
                 boundgeom = boundgeom.geometry
@@ -456,23 +587,21 @@ class SanderSimplify(object):
             
         self.end_operation()
 
-    def begin_operation(self, message):
-        print(message, end=' ')
-        sys.stdout.flush()
+    def begin_operation(self, phase, message):
+        self.telemetry.begin(phase, message)
         gc.disable()
     def end_operation(self):
-        seconds = next(self.timer).seconds
-        hours = seconds // 3600
-        seconds -= (hours * 3600)
-        minutes = seconds // 60
-        seconds -= (minutes * 60)
-        if hours > 0: print("%dh" % hours, end=' ')
-        if hours > 0 or minutes > 0: print("%dm" % minutes, end=' ')
-        print("%ds" % seconds)
+        self.telemetry.end()
         gc.enable()
+    def save_telemetry(self, filename):
+        self.telemetry.save(filename,
+                            time_budget=self.time_budget.seconds,
+                            truncated_phases=self.time_budget.truncated,
+                            lod_targets=self.lod_targets,
+                            workers=self.workers)
 
     def uniqify_list(self):
-        self.begin_operation('Uniqifying the list...')
+        self.begin_operation('uniqify_list', 'Uniqifying the list...')
         
         self.all_vertices, self.all_vert_indices = uniqify_multidim_indexes(self.all_vertices, self.all_vert_indices)
         self.all_normals, self.all_normal_indices = uniqify_multidim_indexes(self.all_normals, self.all_normal_indices)
@@ -486,80 +615,44 @@ class SanderSimplify(object):
         self.end_operation()
 
     def build_vertex_graph(self):
-        self.begin_operation('Building vertex graph...')
-        vertexgraph = nx.Graph()
-        vertexgraph.add_nodes_from(range(len(self.all_vertices)))
-
-        vertexgraph.add_edges_from(self.all_vert_indices[:,(0,1)])
-        vertexgraph.add_edges_from(self.all_vert_indices[:,(0,2)])
-        vertexgraph.add_edges_from(self.all_vert_indices[:,(1,2)])
-        
-        vertexgraph.add_nodes_from(( (edge[0], {facenum: True})
-                                     for facenum, edge in
-                                     enumerate(self.all_vert_indices[:,(0,1)]) ))
-        vertexgraph.add_nodes_from(( (edge[0], {facenum: True})
-                                     for facenum, edge in
-                                     enumerate(self.all_vert_indices[:,(0,2)]) ))
-        vertexgraph.add_nodes_from(( (edge[0], {facenum: True})
-                                     for facenum, edge in
-                                     enumerate(self.all_vert_indices[:,(1,2)]) ))
-        vertexgraph.add_nodes_from(( (edge[1], {facenum: True})
-                                     for facenum, edge in
-                                     enumerate(self.all_vert_indices[:,(0,1)]) ))
-        vertexgraph.add_nodes_from(( (edge[1], {facenum: True})
-                                     for facenum, edge in
-                                     enumerate(self.all_vert_indices[:,(0,2)]) ))
-        vertexgraph.add_nodes_from(( (edge[1], {facenum: True})
-                                     for facenum, edge in
-                                     enumerate(self.all_vert_indices[:,(1,2)]) ))
-        
-        self.vertexgraph = vertexgraph
+        self.begin_operation('build_vertex_graph', 'Building vertex graph...')
+        self.adjacency = MeshAdjacency(self.all_vert_indices, len(self.all_vertices))
+        
+        #the charts each vertex is on the boundary of, which starts out as
+        # the triangles it belongs to
+        offsets = self.adjacency.vertex_face_offsets.tolist()
+        vertex_faces = self.adjacency.vertex_faces_flat.tolist()
+        self.vert2charts = [set(vertex_faces[offsets[v]:offsets[v+1]]) for v in range(len(self.all_vertices))]
+        
         self.end_operation()
 
     def build_face_graph(self):
-        self.begin_operation('Building face graph...')
-        facegraph = nx.Graph()
-        facegraph.add_nodes_from(( (i, {'tris': [i],
-                                        'edges':set([tuple(sorted([tri[0], tri[1]])),
-                                                     tuple(sorted([tri[1], tri[2]])),
-                                                     tuple(sorted([tri[0], tri[2]]))])})
-                                   for i, tri in
-                                   enumerate(self.all_vert_indices) ))
-
-        self.invalid_edges = set()
-        for (v1, v2) in self.vertexgraph.edges_iter():
-            adj_v1 = set(self.vertexgraph.node[v1].keys())
-            adj_v2 = set(self.vertexgraph.node[v2].keys())
-            adj_both = adj_v1.intersection(adj_v2)
-            if len(adj_both) < 2:
-                continue
-            numadded = 0
-            for (f1, f2) in combinations(adj_both, 2):
-                f1tri = self.all_vert_indices[f1]
-                f2tri = self.all_vert_indices[f2]
-
-                #if faces are the same up to winding order, they shouldnt be considered connected
-                if sorted(f1tri) == sorted(f2tri):
-                    continue
-                edges = [(f1tri[0], f1tri[1]), (f1tri[1], f1tri[2]), (f1tri[2], f1tri[0])]
-
-                #check to see if the adjacent triangles traverse a shared edge in the same order
-                # if they do, then they are facing opposite directions and so should not be merged
-                reallyConnected = True
-                for (f1v1, f1v2) in edges:
-                    if not f1v1 in f2tri or not f1v2 in f2tri:
-                        continue
-                    wheref2v1 = numpy.where(f2tri == f1v1)[0][0]
-                    nextlocf2 = wheref2v1 + 1 if wheref2v1 < 2 else 0
-                    if f2tri[nextlocf2] == f1v2:
-                        reallyConnected = False
-                
-                if reallyConnected:
-                    numadded += 1
-                    facegraph.add_edge(f1, f2)
-            if numadded > 2:
-                #edge is adjacent to more than two faces, so don't merge it
-                self.invalid_edges.add(tuple(sorted([v1, v2])))
+        self.begin_operation('build_face_graph', 'Building face graph...')
+        
+        #every triangle starts out as its own chart. chart_neighbors maps each
+        # chart to the charts adjacent to it, in a dict used as an ordered set
+        offsets, neighbors, invalid_edges = self.adjacency.face_graph()
+        self.charts = {}
+        self.chart_neighbors = {}
+        
+        #number of pairs of adjacent charts around each vertex, which makes
+        # a vertex a corner when it's 3 or more
+        num_neighbors = numpy.diff(offsets)
+        f1 = numpy.repeat(numpy.arange(len(num_neighbors)), num_neighbors)
+        pairs = f1 < neighbors
+        self.vert_chart_adjacency = shared_vertex_counts(self.all_vert_indices, f1[pairs], neighbors[pairs],
+                                                         len(self.all_vertices)).tolist()
+        
+        offsets = offsets.tolist()
+        neighbors = neighbors.tolist()
+        sorted_tris = numpy.sort(self.all_vert_indices, axis=1).tolist()
+        for i, (v1, v2, v3) in enumerate(sorted_tris):
+            self.charts[i] = {'tris': [i],
+                              'edges': set([(v1, v2), (v2, v3), (v1, v3)])}
+            self.chart_neighbors[i] = dict.fromkeys(neighbors[offsets[i]:offsets[i+1]], True)
+
+        #edges adjacent to more than two faces, which shouldn't be merged
+        self.invalid_edges = set(tuple(edge) for edge in invalid_edges.tolist())
         
         #store diffuse color of each face, or None for textures
         # this will be used to constrain the chart merging so that color-only
@@ -577,63 +670,179 @@ class SanderSimplify(object):
             else:
                 diffuse = None
             for i in range(tri_index, end_range):
-                facegraph.node[i]['diffuse'] = diffuse
-                
-        self.facegraph = facegraph
+                self.charts[i]['diffuse'] = diffuse
         
         self.end_operation()
 
+    def chart_adjacency(self):
+        """Yields each pair of adjacent charts once"""
+        seen = set()
+        for chart, neighbors in self.chart_neighbors.items():
+            for neighbor in neighbors:
+                if neighbor not in seen:
+                    yield (chart, neighbor)
+            seen.add(chart)
+
+    def chart_vertices(self, chart):
+        return set(chain.from_iterable(self.charts[chart]['edges']))
+
+    def add_vertex_chart(self, v, chart):
+        """Adds chart to the charts around vertex v, updating its count of adjacent charts"""
+        charts = self.vert2charts[v]
+        neighbors = self.chart_neighbors[chart]
+        self.vert_chart_adjacency[v] += sum(1 for c in charts if c in neighbors)
+        charts.add(chart)
+
+    def remove_vertex_chart(self, v, chart):
+        charts = self.vert2charts[v]
+        neighbors = self.chart_neighbors[chart]
+        charts.remove(chart)
+        self.vert_chart_adjacency[v] -= sum(1 for c in charts if c in neighbors)
+
+    def link_charts(self, chart1, chart2):
+        self.chart_neighbors[chart1][chart2] = True
+        self.chart_neighbors[chart2][chart1] = True
+        for v in self.chart_vertices(chart1):
+            if chart2 in self.vert2charts[v]:
+                self.vert_chart_adjacency[v] += 1
+
+    def add_chart(self, chart, tris, edges, diffuse):
+        self.charts[chart] = {'tris': tris, 'edges': edges, 'diffuse': diffuse}
+        self.chart_neighbors[chart] = {}
+        for v in self.chart_vertices(chart):
+            self.vert2charts[v].add(chart)
+
+    def remove_chart(self, chart):
+        for v in self.chart_vertices(chart):
+            self.remove_vertex_chart(v, chart)
+        for neighbor in self.chart_neighbors.pop(chart):
+            del self.chart_neighbors[neighbor][chart]
+        del self.charts[chart]
+
+    def chart_components(self):
+        chart_index = dict((chart, i) for i, chart in enumerate(self.chart_neighbors))
+        pairs = [(chart_index[c1], chart_index[c2]) for (c1, c2) in self.chart_adjacency()]
+        return count_components(len(chart_index), pairs)
+
+    def shared_edge_moments(self, shared_edges):
+        if len(shared_edges) == 0:
+            return numpy.zeros(MOMENT_SIZE)
+        return numpy.sum(calcEdgeMoments(self.all_vertices[list(shared_edges)]), axis=0)
+
+    def merge_errors(self, chart, edges, others):
+        """Returns (error, other) for merging chart, whose boundary is edges,
+        with each of the other charts, skipping merges that would leave no
+        boundary at all"""
+        shared = []
+        owners = []
+        for i, other in enumerate(others):
+            other_shared = edges.intersection(self.charts[other]['edges'])
+            shared.extend(other_shared)
+            owners.extend([i] * len(other_shared))
+        
+        merged = self.chart_moments[chart] + self.chart_moments[others]
+        if len(shared) > 0:
+            shared_moments = numpy.zeros((len(others), MOMENT_SIZE))
+            numpy.add.at(shared_moments, owners, calcEdgeMoments(self.all_vertices[shared]))
+            merged -= 2 * shared_moments
+        
+        nonempty = numpy.nonzero(merged[:,0] > 0)[0]
+        errors = calcMergeError(merged[nonempty])
+        return [(error, others[i]) for (error, i) in zip(errors.tolist(), nonempty.tolist())]
+
     def initialize_chart_merge_errors(self):
         self.merge_priorities = []
         self.maxerror = 0
         
-        self.begin_operation('(Step 1 of 7) Creating priority queue for initial merges...')
-        for v1, v2 in self.facegraph.edges_iter():
-            if self.facegraph.node[v1]['diffuse'] != self.facegraph.node[v2]['diffuse']:
-                continue
-            edges1 = self.facegraph.node[v1]['edges']
-            edges2 = self.facegraph.node[v2]['edges']
-            merged = numpy.array(list(edges1.symmetric_difference(edges2)))
-            if len(merged) > 0:
-                error = calcPerimeter(self.all_vertices[merged])**2
-                error += calcFitError(self.all_vertices[merged.flatten()])
-                if error > self.maxerror: self.maxerror = error
-                self.merge_priorities.append((error, (v1, v2)))
+        self.begin_operation('initialize_chart_merge_errors', '(Step 1 of 7) Creating priority queue for initial merges...')
+        
+        #each chart is still a single triangle here. moments of merged
+        # charts are stored by their id as they're created
+        tris = self.all_vert_indices
+        num_tris = len(tris)
+        tri_edges = numpy.sort(tris[:,((0,1),(1,2),(0,2))], axis=2)
+        edge_keys = tri_edges[:,:,0].astype(numpy.int64) * len(self.all_vertices) + tri_edges[:,:,1]
+        #a degenerate triangle has one of its edges twice
+        unique_edge = numpy.ones((num_tris, 3), dtype=bool)
+        unique_edge[:,1] = edge_keys[:,1] != edge_keys[:,0]
+        unique_edge[:,2] = (edge_keys[:,2] != edge_keys[:,0]) & (edge_keys[:,2] != edge_keys[:,1])
+        edge_moments = calcEdgeMoments(self.all_vertices[tri_edges.reshape(-1, 2)]).reshape(num_tris, 3, MOMENT_SIZE)
+        edge_moments *= unique_edge[:,:,None]
+        self.chart_moments = numpy.zeros((2 * num_tris, MOMENT_SIZE))
+        self.chart_moments[:num_tris] = numpy.sum(edge_moments, axis=1)
+        
+        diffuse_ids = {}
+        tri_diffuse = numpy.array([diffuse_ids.setdefault(self.charts[i]['diffuse'], len(diffuse_ids))
+                                   for i in range(num_tris)], dtype=numpy.int64)
+        pairs = numpy.array(list(self.chart_adjacency()), dtype=numpy.int64).reshape(-1, 2)
+        pairs = pairs[tri_diffuse[pairs[:,0]] == tri_diffuse[pairs[:,1]]]
+        
+        #the boundary of the merged chart is the symmetric difference of the
+        # two boundaries, so the shared edges get subtracted from both.
+        # done in batches to bound the size of the temporary arrays
+        for start in range(0, len(pairs), MERGE_BATCH_SIZE):
+            batch = pairs[start:start+MERGE_BATCH_SIZE]
+            keys1 = edge_keys[batch[:,0]]
+            keys2 = edge_keys[batch[:,1]]
+            shared = numpy.any(keys1[:,:,None] == keys2[:,None,:], axis=2)
+            shared_moments = numpy.sum(edge_moments[batch[:,0]] * shared[:,:,None], axis=1)
+            merged = self.chart_moments[batch[:,0]] + self.chart_moments[batch[:,1]] - 2 * shared_moments
+            
+            nonempty = merged[:,0] > 0
+            errors = calcMergeError(merged[nonempty])
+            if len(errors) > 0:
+                self.maxerror = max(self.maxerror, float(numpy.max(errors)))
+            self.merge_priorities.extend(zip(errors.tolist(), map(tuple, batch[nonempty].tolist())))
 
         heapq.heapify(self.merge_priorities)
+        self.telemetry.set('candidate_merges', len(self.merge_priorities))
         
         self.end_operation()
 
     def merge_charts(self):
-        self.begin_operation('(Step 1 of 7) Merging charts...')
+        self.begin_operation('merge_charts', '(Step 1 of 7) Merging charts...')
         node_count = len(self.all_vert_indices)
+        telemetry = self.telemetry
+        for counter in ('heap_pops', 'heap_pushes', 'merges'):
+            telemetry.set(counter, 0)
+        telemetry.set('rejected_merges', {})
+        stop_reason = 'queue_empty'
         while len(self.merge_priorities) > 0:
+            if self.time_budget.expired('merge_charts'):
+                stop_reason = 'time_budget'
+                break
             (error, (face1, face2)) = heapq.heappop(self.merge_priorities)
+            telemetry.count('heap_pops')
             
             #this can happen if we have already merged one of these
-            if face1 not in self.facegraph or face2 not in self.facegraph:
+            if face1 not in self.charts or face2 not in self.charts:
+                telemetry.count('rejected_merges', reason='stale')
                 continue
             
-            edges1 = self.facegraph.node[face1]['edges']
-            edges2 = self.facegraph.node[face2]['edges']
+            edges1 = self.charts[face1]['edges']
+            edges2 = self.charts[face2]['edges']
             combined_edges = edges1.symmetric_difference(edges2)
             shared_edges = edges1.intersection(edges2)
             
             #if the length of the xor of the edges of the two faces is less than either of the original
             # then it's creating some kind of collapse, so disallow
             if len(combined_edges) < len(edges1) or len(combined_edges) < len(edges2):
+                telemetry.count('rejected_merges', reason='boundary_collapse')
                 continue
     
             if len(self.invalid_edges) > 0 and len(shared_edges.intersection(self.invalid_edges)) > 0:
+                telemetry.count('rejected_merges', reason='invalid_edge')
                 continue
     
             #check if boundary is more than one connected component
-            connected_components_graph = nx.from_edgelist(combined_edges)
-            if nx.number_connected_components(connected_components_graph) > 1:
+            num_components, num_cycles = edge_topology(combined_edges)
+            if num_components > 1:
+                telemetry.count('rejected_merges', reason='disconnected_boundary')
                 continue
             #check if boundary has more than one cycle, which can happen when one chart is
             # connected to another by an interior edge
-            if len(nx.cycle_basis(connected_components_graph)) != 1:
+            if num_cycles != 1:
+                telemetry.count('rejected_merges', reason='boundary_cycles')
                 continue
     
             # if the number of corners of the merged face is less than 3, disqualify it
@@ -642,26 +851,22 @@ class SanderSimplify(object):
             corners1 = set()
             vertices1 = set(chain.from_iterable(edges1))
             for v in vertices1:
-                adj_v = set(self.vertexgraph.node[v].keys())
-                numadj = self.facegraph.subgraph(adj_v).number_of_edges()
-                if numadj >= 3:
+                if self.vert_chart_adjacency[v] >= 3:
                     corners1.add(v)
             
             corners2 = set()
             vertices2 = set(chain.from_iterable(edges2))
             for v in vertices2:
-                adj_v = set(self.vertexgraph.node[v].keys())
-                numadj = self.facegraph.subgraph(adj_v).number_of_edges()
-                if numadj >= 3:
+                if self.vert_chart_adjacency[v] >= 3:
                     corners2.add(v)
             
             combined_vertices = set(chain.from_iterable(combined_edges))
             newcorners = set()
             faces_sharing_vert = set()
             for v in combined_vertices:
-                adj_v = set(self.vertexgraph.node[v].keys())
+                adj_v = self.vert2charts[v]
                 faces_sharing_vert.update(adj_v)
-                numadj = self.facegraph.subgraph(adj_v).number_of_edges()
+                numadj = self.vert_chart_adjacency[v]
                 if face1 in adj_v and face2 in adj_v:
                     numadj -= 1
                 if numadj >= 3:
@@ -670,13 +875,15 @@ class SanderSimplify(object):
             faces_sharing_vert.discard(face2)
             
             if len(newcorners) < 3 and (len(newcorners) < len(corners1) or len(newcorners) < len(corners2)):
+                telemetry.count('rejected_merges', reason='too_few_corners')
                 continue
             
             #cutoff value was chosen which seems to work well for most models
             logrel = math.log(1 + error) / math.log(1 + self.maxerror)
             if logrel > MERGE_ERROR_THRESHOLD:
+                stop_reason = 'error_threshold'
                 break
-            #print 'error', error, 'maxerror', self.maxerror, 'logrel', logrel, 'merged left', len(self.merge_priorities), 'numfaces', len(self.facegraph)
+            #print 'error', error, 'maxerror', self.maxerror, 'logrel', logrel, 'merged left', len(self.merge_priorities), 'numfaces', len(self.charts)
             
             newface = node_count
             node_count += 1
@@ -685,19 +892,16 @@ class SanderSimplify(object):
             
             invalidmerge = False
             for otherface in faces_sharing_vert:
-                if otherface not in self.facegraph:
+                if otherface not in self.charts:
                     continue
-                otheredges = self.facegraph.node[otherface]['edges']
+                otheredges = self.charts[otherface]['edges']
                 otherverts = set(chain.from_iterable(otheredges))
                 commonverts = combined_vertices.intersection(otherverts)
                 commonedges = combined_edges.intersection(otheredges)
-                
-                connected_components_graph = nx.from_edgelist(commonedges)
-                connected_components_graph.add_nodes_from(commonverts)
     
                 #invalid merge if border between merged face and neighbor is more than one connected component
-                if nx.number_connected_components(connected_components_graph) != 1:
-                    invalidmerge = True
+                if edge_topology(commonedges, commonverts)[0] != 1:
+                    invalidmerge = 'neighbor_border'
                     break
                 
                 #if there are no common edges, it just means single vertices are shared, so don't need to check rest
@@ -708,8 +912,8 @@ class SanderSimplify(object):
                 othernewcorners = set()
                 otherprevcorners = set()
                 for v in vertices:
-                    adj_v = set(self.vertexgraph.node[v].keys())
-                    numadj = self.facegraph.subgraph(adj_v).number_of_edges()
+                    adj_v = self.vert2charts[v]
+                    numadj = self.vert_chart_adjacency[v]
                     if numadj >= 3:
                         otherprevcorners.add(v)
                     if face1 in adj_v and face2 in adj_v:
@@ -719,70 +923,69 @@ class SanderSimplify(object):
                 
                 #invalid merge if neighbor would have less than 3 corners
                 if len(othernewcorners) < 3 and len(othernewcorners) < len(otherprevcorners):
-                    invalidmerge = True
+                    invalidmerge = 'neighbor_corners'
                     break
                 
                 edges_to_add.append((newface, otherface))
     
             if invalidmerge:
+                telemetry.count('rejected_merges', reason=invalidmerge)
                 continue
             
             #only add edges to neighbors that are already neighbors
-            valid_neighbors = set(self.facegraph.neighbors(face1))
-            valid_neighbors.update(set(self.facegraph.neighbors(face2)))
+            valid_neighbors = set(self.chart_neighbors[face1])
+            valid_neighbors.update(set(self.chart_neighbors[face2]))
             edges_to_add = [e for e in edges_to_add if (e[1] in valid_neighbors)]
             
-            combined_tris = self.facegraph.node[face1]['tris'] + self.facegraph.node[face2]['tris']
-            diffuse = self.facegraph.node[face1]['diffuse']
-            self.facegraph.add_node(newface, tris=combined_tris, edges=combined_edges, diffuse=diffuse)        
-            self.facegraph.add_edges_from(edges_to_add)
+            combined_tris = self.charts[face1]['tris'] + self.charts[face2]['tris']
+            diffuse = self.charts[face1]['diffuse']
+            if newface >= len(self.chart_moments):
+                self.chart_moments = numpy.concatenate((self.chart_moments, numpy.zeros_like(self.chart_moments)))
+            self.chart_moments[newface] = self.chart_moments[face1] + self.chart_moments[face2] - \
+                                            2 * self.shared_edge_moments(shared_edges)
             
-            adj_faces = set(self.facegraph.neighbors(face1))
-            adj_faces = adj_faces.union(set(self.facegraph.neighbors(face2)))
+            adj_faces = set(self.chart_neighbors[face1])
+            adj_faces = adj_faces.union(set(self.chart_neighbors[face2]))
             adj_faces.remove(face1)
             adj_faces.remove(face2)
-            for otherface in adj_faces:
-                if self.facegraph.node[otherface]['diffuse'] != diffuse: continue
-                otheredges = self.facegraph.node[otherface]['edges']
-                merged = numpy.array(list(combined_edges.symmetric_difference(otheredges)))
-                if len(merged) > 0:
-                    error = calcPerimeter(self.all_vertices[merged])**2
-                    error += calcFitError(self.all_vertices[merged.flatten()])
-                    if error > self.maxerror: self.maxerror = error
-                    heapq.heappush(self.merge_priorities, (error, (newface, otherface)))
-    
-            for v in combined_vertices:
-                if face1 in self.vertexgraph.node[v]:
-                    del self.vertexgraph.node[v][face1]
-                if face2 in self.vertexgraph.node[v]:
-                    del self.vertexgraph.node[v][face2]
-                self.vertexgraph.node[v][newface] = True
+            adj_faces = [otherface for otherface in adj_faces if self.charts[otherface]['diffuse'] == diffuse]
+            for (error, otherface) in self.merge_errors(newface, combined_edges, adj_faces):
+                if error > self.maxerror: self.maxerror = error
+                heapq.heappush(self.merge_priorities, (error, (newface, otherface)))
+                telemetry.count('heap_pushes')
     
-            self.facegraph.remove_node(face1)
-            self.facegraph.remove_node(face2)
+            telemetry.count('merges')
+            self.remove_chart(face1)
+            self.remove_chart(face2)
+            self.add_chart(newface, combined_tris, combined_edges, diffuse)
+            for (newface, otherface) in edges_to_add:
+                self.link_charts(newface, otherface)
     
+        del self.chart_moments
+        telemetry.set('stop_reason', stop_reason)
+        telemetry.set('charts', len(self.charts))
         self.end_operation()
 
     def update_corners(self, enforce=False):
-        self.begin_operation('Updating corners...')
-        for face, facedata in self.facegraph.nodes_iter(data=True):
+        self.begin_operation('update_corners', 'Updating corners...')
+        for face, facedata in self.charts.items():
             edges = facedata['edges']
             vertices = set(chain.from_iterable(edges))
-            corners = set((v for v in vertices if self.facegraph.subgraph(list(self.vertexgraph.node[v].keys())).number_of_edges() >= 3))
-            self.facegraph.node[face]['corners'] = corners
+            corners = set((v for v in vertices if self.vert_chart_adjacency[v] >= 3))
+            facedata['corners'] = corners
             
         if enforce:
-            for (face1, face2) in self.facegraph.edges_iter():
-                edges1 = self.facegraph.node[face1]['edges']
-                edges2 = self.facegraph.node[face2]['edges']
+            for (face1, face2) in self.chart_adjacency():
+                edges1 = self.charts[face1]['edges']
+                edges2 = self.charts[face2]['edges']
                 shared_edges = edges1.intersection(edges2)
                 
                 if len(self.invalid_edges) > 0 and len(shared_edges.intersection(self.invalid_edges)) > 0:
                     continue
                 
                 shared_vertices = set(chain.from_iterable(shared_edges))
-                corners1 = self.facegraph.node[face1]['corners']
-                corners2 = self.facegraph.node[face2]['corners']
+                corners1 = self.charts[face1]['corners']
+                corners2 = self.charts[face2]['corners']
                 combined_corners = corners1.intersection(corners2).intersection(shared_vertices)
                 
                 giveup = False
@@ -821,33 +1024,37 @@ class SanderSimplify(object):
                     
                     end_path = shared_path[-1][1]
                     
-                    self.facegraph.node[face1]['corners'].add(end_path)
-                    self.facegraph.node[face2]['corners'].add(end_path)
+                    self.charts[face1]['corners'].add(end_path)
+                    self.charts[face2]['corners'].add(end_path)
             
         self.end_operation()
 
     def calc_edge_length(self):
-        self.begin_operation('Computing distance between points')
-        for v1, v2 in self.vertexgraph.edges_iter():
-            self.vertexgraph.add_edge(v1, v2, distance=v3dist(self.all_vertices[v1],self.all_vertices[v2]))
+        self.begin_operation('calc_edge_length', 'Computing distance between points')
+        self.adjacency.compute_edge_lengths(self.all_vertices)
         self.end_operation()
 
     def straighten_chart_boundaries(self):
-        self.begin_operation('(Step 1 of 7) Straightening chart boundaries...')
-        for (face1, face2) in self.facegraph.edges_iter():
+        self.begin_operation('straighten_chart_boundaries', '(Step 1 of 7) Straightening chart boundaries...')
+        self.telemetry.set('boundaries', 0)
+        self.telemetry.set('straightened', 0)
+        for (face1, face2) in self.chart_adjacency():
+            if self.time_budget.expired('straighten_chart_boundaries'):
+                break
+            self.telemetry.count('boundaries')
             
             #can't straigten if differing diffuse source (color vs texture)
-            if self.facegraph.node[face1]['diffuse'] != self.facegraph.node[face2]['diffuse']:
+            if self.charts[face1]['diffuse'] != self.charts[face2]['diffuse']:
                 continue
             
             #can't straighten the border of a single triangle
-            tris1 = self.facegraph.node[face1]['tris']
-            tris2 = self.facegraph.node[face2]['tris']
+            tris1 = self.charts[face1]['tris']
+            tris2 = self.charts[face2]['tris']
             if len(tris1) <= 1 or len(tris2) <= 1:
                 continue
             
-            edges1 = self.facegraph.node[face1]['edges']
-            edges2 = self.facegraph.node[face2]['edges']
+            edges1 = self.charts[face1]['edges']
+            edges2 = self.charts[face2]['edges']
             shared_edges = edges1.intersection(edges2)
             
             if len(self.invalid_edges) > 0 and len(shared_edges.intersection(self.invalid_edges)) > 0:
@@ -858,8 +1065,8 @@ class SanderSimplify(object):
                 continue
             
             shared_vertices = set(chain.from_iterable(shared_edges))
-            corners1 = self.facegraph.node[face1]['corners']
-            corners2 = self.facegraph.node[face2]['corners']
+            corners1 = self.charts[face1]['corners']
+            corners2 = self.charts[face2]['corners']
             combined_corners = corners1.intersection(corners2).intersection(shared_vertices)
             
             if len(combined_corners) < 1 or len(combined_corners) > 2:
@@ -904,18 +1111,21 @@ class SanderSimplify(object):
             
             edges1 = edges1.symmetric_difference(shared_edges)
             edges2 = edges2.symmetric_difference(shared_edges)
-            all_verts1 = set(chain.from_iterable(self.all_vert_indices[tris1]))
-            all_verts2 = set(chain.from_iterable(self.all_vert_indices[tris2]))
-            stop_nodes = all_verts1.intersection(all_verts2).difference(shared_vertices)
-            stop_nodes = stop_nodes.union(set(chain.from_iterable(edges1))).union(set(chain.from_iterable(edges2)))
-            constrained_set = all_verts1.union(all_verts2)
-            
-            try:
-                straightened_path = astar_path(self.vertexgraph, start_path, end_path,
-                                               heuristic=lambda x,y: v3dist(self.all_vertices[x], self.all_vertices[y]),
-                                               weight='distance', subset=constrained_set, exclude=stop_nodes)
-            except nx.exception.NetworkXError:
+            all_verts1 = numpy.unique(self.all_vert_indices[tris1])
+            all_verts2 = numpy.unique(self.all_vert_indices[tris2])
+            graph = VertexSubgraph(self.adjacency, numpy.union1d(all_verts1, all_verts2))
+            stop_nodes = graph.mask(numpy.intersect1d(all_verts1, all_verts2, assume_unique=True))
+            stop_nodes[graph.mask(shared_vertices)] = False
+            stop_nodes |= graph.mask(chain(chain.from_iterable(edges1), chain.from_iterable(edges2)))
+            
+            target = graph.local(end_path)
+            straightened_path = graph.shortest_path(graph.local(start_path), target, ~stop_nodes,
+                                                    heuristic=graph.distances(self.all_vertices, target))
+            if straightened_path is None:
                 continue
+            on_path = numpy.zeros(len(graph), dtype=bool)
+            on_path[straightened_path] = True
+            straightened_path = graph.vertices[straightened_path].tolist()
             
             # if we already have the shortest path, nothing to do
             if set(shared_vertices) == set(straightened_path):
@@ -936,39 +1146,20 @@ class SanderSimplify(object):
             if len(new_edges1) == 0 or len(new_edges2) == 0:
                 continue
             
-            boundary1 = set(chain.from_iterable(new_edges1))
-            boundary2 = set(chain.from_iterable(new_edges2))
-            boundary = boundary1.union(boundary2).union(straightened_path)
-            
-            vertexset1 = boundary1.difference(straightened_path)
-            vertexset2 = boundary2.difference(straightened_path)
-            
-            allin1 = list(dfs_interior_nodes(self.vertexgraph,
-                                             starting=vertexset1,
-                                             boundary=boundary,
-                                             subset=constrained_set.difference(boundary2)))
-            allin2 = list(dfs_interior_nodes(self.vertexgraph,
-                                             starting=vertexset2,
-                                             boundary=boundary,
-                                             subset=constrained_set.difference(boundary1)))
-            
-            vertexset1 = set(allin1).union(vertexset1).union(straightened_path)
-            vertexset2 = set(allin2).union(vertexset2).union(straightened_path)
-            combined_tris = tris1 + tris2
-            tris1 = []
-            tris2 = []
-            trisneither = []
-            for tri in combined_tris:
-                trivals = self.all_vert_indices[tri]
-                if trivals[0] in vertexset1 and trivals[1] in vertexset1 and trivals[2] in vertexset1:
-                    tris1.append(tri)
-                elif trivals[0] in vertexset2 and trivals[1] in vertexset2 and trivals[2] in vertexset2:
-                    tris2.append(tri)
-                else:
-                    trisneither.append(tri)
+            boundary1 = graph.mask(chain.from_iterable(new_edges1))
+            boundary2 = graph.mask(chain.from_iterable(new_edges2))
+            interior = ~(boundary1 | boundary2 | on_path)
+            
+            #flood each side from its boundary, without crossing the path
+            vertexset1 = graph.flood_fill(boundary1 & ~on_path, interior) | on_path
+            vertexset2 = graph.flood_fill(boundary2 & ~on_path, interior) | on_path
+            combined_tris = numpy.array(tris1 + tris2, dtype=numpy.int64)
+            local_tris = graph.local(self.all_vert_indices[combined_tris])
+            in1 = vertexset1[local_tris].all(axis=1)
+            in2 = ~in1 & vertexset2[local_tris].all(axis=1)
             
             #this can happen if the straightened path cuts off another face's edges
-            if len(trisneither) != 0:
+            if not (in1 | in2).all():
                 continue
             
             # This can happen if the shortest path actually encompasses
@@ -976,307 +1167,157 @@ class SanderSimplify(object):
             # two faces. If we didn't merge these two in the previous step,
             # it was because the cost was too high or it would violate one of
             # the constraints, so just ignore this 
-            if len(tris1) == 0 or len(tris2) == 0:
-                continue
-            
-            #this can happen if the straightened path cuts off another face's edges
-            if len(tris1) + len(tris2) != len(combined_tris):
+            if not in1.any() or not in2.any():
                 continue
+            tris1 = combined_tris[in1].tolist()
+            tris2 = combined_tris[in2].tolist()
     
             new_edges1 = new_edges1.union(new_combined_edges)
             new_edges2 = new_edges2.union(new_combined_edges)
     
-            bordergraph1 = nx.from_edgelist(new_edges1)
-            supcycle1 = super_cycle(bordergraph1)
-            if supcycle1 is None or len(list(supcycle1)) < 1:
-                continue
-            bordergraph2 = nx.from_edgelist(new_edges2)
-            supcycle2 = super_cycle(bordergraph2)
-            if supcycle2 is None or len(list(supcycle2)) < 1:
+            #each new border has to enclose its chart
+            topology1 = edge_topology(new_edges1)
+            topology2 = edge_topology(new_edges2)
+            if topology1[1] < 1 or topology2[1] < 1:
                 continue
     
             #if we stole edges from one face to the other, fix it
             edges_to_add = []
             edges_to_remove = []
-            for otherface in self.facegraph.neighbors_iter(face1):
+            for otherface in self.chart_neighbors[face1]:
                 if otherface == face2:
                     continue
-                otheredges = self.facegraph.node[otherface]['edges']
+                otheredges = self.charts[otherface]['edges']
                 face1otheredges = otheredges.intersection(new_edges1)
                 if len(face1otheredges) == 0:
                     edges_to_remove.append((otherface, face1))
                     edges_to_add.append((otherface, face2))
-            for otherface in self.facegraph.neighbors_iter(face2):
+            for otherface in self.chart_neighbors[face2]:
                 if otherface == face1:
                     continue
-                otheredges = self.facegraph.node[otherface]['edges']
+                otheredges = self.charts[otherface]['edges']
                 face2otheredges = otheredges.intersection(new_edges2)
                 if len(face2otheredges) == 0:
                     edges_to_remove.append((otherface, face2))
                     edges_to_add.append((otherface, face1))
                 
             #check if boundary is more than one connected component
-            connected_components_graph = nx.from_edgelist(new_combined_edges)
-            if nx.number_connected_components(connected_components_graph) > 1:
+            num_components, num_cycles = edge_topology(new_combined_edges)
+            if num_components > 1:
                 continue
-            if len(nx.cycle_basis(connected_components_graph)) > 1:
+            if num_cycles > 1:
                 continue
             
             # check if either new set of edges would be more than one connected component
-            graph1 = nx.from_edgelist(new_edges1)
-            if nx.number_connected_components(graph1) > 1:
-                continue
-            graph2 = nx.from_edgelist(new_edges2)
-            if nx.number_connected_components(graph2) > 1:
+            if topology1[0] > 1 or topology2[0] > 1:
                 continue
                 
             #ideally we would swap these edges, but this would require revisiting these faces
             # in the loop above, and so we can't do that easily. instead, just disallow
             # a straigtening that would cause the two faces to have to swap neighbors
-            #self.facegraph.remove_edges_from(edges_to_remove)
-            #self.facegraph.add_edges_from(edges_to_add)
+            #for (otherface, face) in edges_to_remove: ...
+            #for (otherface, face) in edges_to_add: ...
             if len(edges_to_remove) > 0 or len(edges_to_add) > 0:
                 continue
                 
             #update adjaceny in vertex graph for swapped
-            orig_verts1 = set(chain.from_iterable(self.facegraph.node[face1]['edges']))
-            orig_verts2 = set(chain.from_iterable(self.facegraph.node[face2]['edges']))
+            orig_verts1 = set(chain.from_iterable(self.charts[face1]['edges']))
+            orig_verts2 = set(chain.from_iterable(self.charts[face2]['edges']))
             new_verts1 = set(chain.from_iterable(new_edges1))
             new_verts2 = set(chain.from_iterable(new_edges2))
             
             for v1lost in orig_verts1.difference(new_verts1):
-                del self.vertexgraph.node[v1lost][face1]
+                self.remove_vertex_chart(v1lost, face1)
             for v2lost in orig_verts2.difference(new_verts2):
-                del self.vertexgraph.node[v2lost][face2]
+                self.remove_vertex_chart(v2lost, face2)
             for v1added in new_verts1.difference(orig_verts1):
-                self.vertexgraph.node[v1added][face1] = True
+                self.add_vertex_chart(v1added, face1)
             for v2added in new_verts2.difference(orig_verts2):
-                self.vertexgraph.node[v2added][face2] = True
+                self.add_vertex_chart(v2added, face2)
                 
-            self.facegraph.add_node(face1, tris=tris1, edges=new_edges1)
-            self.facegraph.add_node(face2, tris=tris2, edges=new_edges2)
+            self.charts[face1].update(tris=tris1, edges=new_edges1)
+            self.charts[face2].update(tris=tris2, edges=new_edges2)
+            self.telemetry.count('straightened')
             
         self.end_operation()
 
     def create_initial_parameterizations(self):
-        self.begin_operation('(Step 2 of 7) Forming initial chart parameterizations...')
+        self.begin_operation('create_initial_parameterizations', '(Step 2 of 7) Forming initial chart parameterizations...')
         new_uv_indices = numpy.zeros(shape=(len(self.all_vert_indices), 3), dtype=numpy.int32)
         new_uvs = []
         new_uvs_offset = 0
-        
-        for (face, facedata) in self.facegraph.nodes_iter(data=True):
-            border_edges = facedata['edges']
-            chart_tris = self.all_vert_indices[facedata['tris']]
-    
-            unique_verts = set(chain.from_iterable(chart_tris))
-            border_verts = set(chain.from_iterable(border_edges))
-            interior_verts = list(unique_verts.difference(border_verts))
-                    
-            bordergraph = nx.from_edgelist(border_edges)
-            bigcycle = list(super_cycle(bordergraph))
-            boundary_path = []
-            for i in range(len(bigcycle)-1):
-                boundary_path.append((bigcycle[i], bigcycle[i+1]))
-            boundary_path.append((bigcycle[len(bigcycle)-1], bigcycle[0]))
-            assert(len(boundary_path) == len(border_edges))
-    
-            total_dist = 0
-            for (v1, v2) in boundary_path:
-                total_dist += v3dist(self.all_vertices[v1], self.all_vertices[v2])
-            
-            vert2uv = {}
-            curangle = 0
-            for edge in boundary_path:
-                angle = v3dist(self.all_vertices[edge[0]], self.all_vertices[edge[1]]) / total_dist
-                curangle += angle * 2 * math.pi
-                x, y = (math.sin(curangle) + 1) / 2.0, (math.cos(curangle) + 1.0) / 2.0
-                vert2uv[edge[0]] = (x,y)
-            
-            if len(interior_verts) > 0:
-            
-                vert2idx = {}
-                for i, v in enumerate(interior_verts):
-                    vert2idx[v] = i
-                
-                A = numpy.zeros(shape=(len(interior_verts), len(interior_verts)), dtype=numpy.float32)
-                Bu = numpy.zeros(len(interior_verts), dtype=numpy.float32)
-                Bv = numpy.zeros(len(interior_verts), dtype=numpy.float32)
-                sumu = numpy.zeros(len(interior_verts), dtype=numpy.float32)
-                
-                for edge in self.vertexgraph.subgraph(unique_verts).edges_iter():
-                    v1, v2 = edge
-                    if v1 in border_verts and v2 in border_verts:
-                        continue
+        #(interior vertices, solver, estimated bytes) of the chart whose solve used the most memory
+        self.parameterization_peak = (0, None, 0)
+        
+        arrays = {'all_vertices': self.all_vertices,
+                  'all_vert_indices': self.all_vert_indices,
+                  'vertex_neighbor_offsets': self.adjacency.vertex_neighbor_offsets,
+                  'vertex_neighbors_flat': self.adjacency.vertex_neighbors_flat,
+                  'vertex_neighbor_edges': self.adjacency.vertex_neighbor_edges,
+                  'edge_lengths': self.adjacency.edge_lengths}
+        tasks = [(numpy.asarray(facedata['tris']), list(facedata['edges'])) for facedata in self.charts.values()]
+        results = map_charts(parameterizeChart, arrays, tasks, self.workers)
+        
+        for (face, facedata), (verts, uvs, stats) in zip(self.charts.items(), results):
+            if stats[2] > self.parameterization_peak[2]:
+                self.parameterization_peak = stats
                     
-                    edgelen = v3dist(self.all_vertices[v1], self.all_vertices[v2])
-                    if v1 in border_verts:
-                        Bu[vert2idx[v2]] += edgelen * vert2uv[v1][0]
-                        Bv[vert2idx[v2]] += edgelen * vert2uv[v1][1]
-                        sumu[vert2idx[v2]] += edgelen
-                    elif v2 in border_verts:
-                        Bu[vert2idx[v1]] += edgelen * vert2uv[v2][0]
-                        Bv[vert2idx[v1]] += edgelen * vert2uv[v2][1]
-                        sumu[vert2idx[v1]] += edgelen
-                    else:
-                        A[vert2idx[v1]][vert2idx[v2]] = -1 * edgelen
-                        A[vert2idx[v2]][vert2idx[v1]] = -1 * edgelen
-                        sumu[vert2idx[v1]] += edgelen
-                        sumu[vert2idx[v2]] += edgelen
-                
-                Bu.shape = (len(Bu), 1)
-                Bv.shape = (len(Bv), 1)
-                sumu.shape = (len(sumu), 1)
-                
-                A /= sumu
-                Bu /= sumu
-                Bv /= sumu
-                try: numpy.fill_diagonal(A, 1)
-                except AttributeError:
-                    for i in range(len(A)):
-                        A[i][i] = 1
-                
-                interior_us = numpy.linalg.solve(A, Bu)
-                interior_vs = numpy.linalg.solve(A, Bv)
-                for (i, (u, v)) in enumerate(zip(interior_us, interior_vs)):
-                    vert2uv[interior_verts[i]] = (u[0], v[0])
-                    
-            new_uvs.append(list(vert2uv.values()))
-            newvert2idx = dict(list(zip(list(vert2uv.keys()), list(range(new_uvs_offset, new_uvs_offset + len(vert2uv))))))
+            new_uvs.append(uvs)
+            newvert2idx = dict(list(zip(verts, list(range(new_uvs_offset, new_uvs_offset + len(verts))))))
             for tri in facedata['tris']:
                 for i, v in enumerate(self.all_vert_indices[tri]):
                     new_uv_indices[tri][i] = newvert2idx[v]
-            new_uvs_offset += len(vert2uv)
-            self.facegraph.node[face]['vert2uvidx'] = newvert2idx
+            new_uvs_offset += len(verts)
+            self.charts[face]['vert2uvidx'] = newvert2idx
             
         self.new_uvs = numpy.concatenate(new_uvs)
         self.new_uv_indices = new_uv_indices
         
+        self.telemetry.set('charts', len(tasks))
+        self.telemetry.set('largest_chart_interior_vertices', self.parameterization_peak[0],
+                           'interior vertices of largest chart parameterization')
+        self.telemetry.set('largest_chart_solver', self.parameterization_peak[1], 'solver of largest chart parameterization')
+        self.telemetry.set('largest_chart_bytes', self.parameterization_peak[2], 'bytes used by largest chart parameterization')
+        
         self.end_operation()
 
     def optimize_chart_parameterizations(self):
 
-        self.begin_operation('(Step 2 of 7) Optimizing chart parameterizations...')
+        self.begin_operation('optimize_chart_parameterizations', '(Step 2 of 7) Optimizing chart parameterizations...')
         total_L2 = 0
-        for (face, facedata) in self.facegraph.nodes_iter(data=True):
+        
+        arrays = {'all_vertices': self.all_vertices,
+                  'all_vert_indices': self.all_vert_indices,
+                  'new_uvs': self.new_uvs,
+                  'new_uv_indices': self.new_uv_indices}
+        deadline = self.time_budget.deadline('optimize_chart_parameterizations')
+        tasks = [(face, numpy.asarray(facedata['tris']), set(chain.from_iterable(facedata['edges'])), deadline)
+                 for face, facedata in self.charts.items() if facedata['diffuse'] is None]
+        results = iter(map_charts(optimizeChart, arrays, tasks, self.workers))
+        
+        for (face, facedata) in self.charts.items():
             
             if facedata['diffuse'] is not None:
-                self.facegraph.node[face]['L2'] = 0
+                self.charts[face]['L2'] = 0
                 self.new_uvs[self.new_uv_indices[facedata['tris']]] = 0.5
                 continue
             
-            border_edges = facedata['edges']
-            newvert2idx = self.facegraph.node[face]['vert2uvidx']
-            chart_tris = self.all_vert_indices[facedata['tris']]
-            tri_3d = self.all_vertices[chart_tris]
-            tri_2d = self.new_uvs[self.new_uv_indices[facedata['tris']]]
-            
-            unique_verts, index_map = numpy.unique(chart_tris, return_inverse=True)
-            index_map.shape = chart_tris.shape
-            border_verts = set(chain.from_iterable(border_edges))
-            
-            for iteration in range(1, 5):
-            
-                L2 = stretch_metric(tri_3d, tri_2d)
-                neighborhood_stretch = numpy.zeros(unique_verts.shape, dtype=numpy.float32)
-                neighborhood_stretch[index_map[:,0]] += L2
-                neighborhood_stretch[index_map[:,1]] += L2
-                neighborhood_stretch[index_map[:,2]] += L2
-                vert_stretch_heap = list(zip(-1 * neighborhood_stretch, unique_verts))
-                heapq.heapify(vert_stretch_heap)
-            
-                while len(vert_stretch_heap) > 0:
-                    stretch, vert = heapq.heappop(vert_stretch_heap)
-                    if vert in border_verts:
-                        continue
-                    
-                    ucoord, vcoord = self.new_uvs[newvert2idx[vert]]
-                    
-                    vert_tri1 = chart_tris[:,0] == vert
-                    vert_tri2 = chart_tris[:,1] == vert
-                    vert_tri3 = chart_tris[:,2] == vert
-                    neighborhood_selector = numpy.logical_or(numpy.logical_or(vert_tri1, vert_tri2), vert_tri3)
-                    
-                    neighborhood_tri3d = tri_3d[neighborhood_selector]
-                    neighborhood_tri_2d = tri_2d[neighborhood_selector]
-                    neighborhood_L2, origA2d = stretch_metric(neighborhood_tri3d, neighborhood_tri_2d, return_A2d=True, normalize=True)
-                    
-                    randangle = random.uniform(0, 2 * math.pi)
-                    randslope = math.tan(randangle)
-        
-                    # y - y1 = m(x - x1)
-                    def yfromx(x):
-                        return randslope * (x - ucoord) + vcoord
-                    def xfromy(y):
-                        return ((y - vcoord) / randslope) + ucoord
-                    
-                    xintercept0 = yfromx(0)
-                    minx = 0.0 if 0 <= xintercept0 <= 1 else min(xfromy(0), xfromy(1))
-                    xintercept1 = yfromx(1)
-                    maxx = 1.0 if 0 <= xintercept1 <= 1 else max(xfromy(0), xfromy(1))
-                    minx, maxx = tuple(sorted([minx, maxx]))
-                    
-                    if not(0 <= minx <= maxx <= 1):
-                        print(minx, maxx, xfromy(0), xfromy(1), yfromx(0), yfromx(1))
-                    assert(0 <= minx <= maxx <= 1)
-                    
-                    rangesize = (maxx-minx) / iteration
-                    rangemin = ucoord - rangesize / 2.0
-                    rangemax = ucoord + rangesize / 2.0
-                    if rangemax > maxx:
-                        rangemin -= (maxx-rangemax)
-                        rangemax -= (maxx-rangemax)
-                    if rangemin < minx:
-                        rangemax += (minx-rangemin)
-                        rangemin += (minx-rangemin)
-                    if rangemax > maxx: rangemax = maxx
-                    if rangemin < minx: rangemin = minx
-                    if rangemax < rangemin:
-                        rangemin, rangemax = rangemax, rangemin
-                        
-                    assert(0 <= rangemin <= rangemax <= 1)
-                    
-                    samples = 10.0
-                    step = (rangemax - rangemin) / samples
-                    bestu, bestv = ucoord, vcoord
-                    bestL2 = neighborhood_L2
-                    for xval in numpy.arange(rangemin, rangemax, step):
-                        yval = yfromx(xval)
-        
-                        tri_2d[vert_tri1,0,0] = xval
-                        tri_2d[vert_tri2,1,0] = xval
-                        tri_2d[vert_tri3,2,0] = xval
-                        tri_2d[vert_tri1,0,1] = yval
-                        tri_2d[vert_tri2,1,1] = yval
-                        tri_2d[vert_tri3,2,1] = yval
-                        
-                        neighborhood_tri_2d = tri_2d[neighborhood_selector]
-                        neighborhood_L2 = stretch_metric(neighborhood_tri3d, neighborhood_tri_2d, flippedCheck=origA2d, normalize=True)
-                        if neighborhood_L2 < bestL2:
-                            bestL2 = neighborhood_L2
-                            bestu, bestv = xval, yval
-        
-                    tri_2d[vert_tri1,0,0] = bestu
-                    tri_2d[vert_tri2,1,0] = bestu
-                    tri_2d[vert_tri3,2,0] = bestu
-                    tri_2d[vert_tri1,0,1] = bestv
-                    tri_2d[vert_tri2,1,1] = bestv
-                    tri_2d[vert_tri3,2,1] = bestv
-                    
-                    ucoord, vcoord = bestu, bestv
-        
-                    self.new_uvs[newvert2idx[vert],0] = ucoord
-                    self.new_uvs[newvert2idx[vert],1] = vcoord
-            
-            chart_L2 = stretch_metric(tri_3d, tri_2d, normalize=True)
+            uv_locs, uvs, chart_L2, truncated = next(results)
+            if truncated:
+                self.time_budget.truncate('optimize_chart_parameterizations')
+                self.telemetry.count('truncated_charts')
+            self.new_uvs[uv_locs] = uvs
             total_L2 += chart_L2
-            self.facegraph.node[face]['L2'] = chart_L2
+            self.charts[face]['L2'] = chart_L2
             
         self.total_L2 = total_L2
+        self.telemetry.set('charts', len(tasks))
+        self.telemetry.set('total_L2', float(total_L2))
             
         self.end_operation()
 
     def resize_charts(self):
-        self.begin_operation('(Step 3 of 7) Creating and resizing charts...')
+        self.begin_operation('resize_charts', '(Step 3 of 7) Creating and resizing charts...')
 
         self.material2color = {}
         tri_areas = []
@@ -1308,7 +1349,7 @@ class SanderSimplify(object):
         total_texture_area = numpy.sum(tri_areas)
 
         total_3d_area = 0
-        for face, facedata in self.facegraph.nodes_iter(data=True):
+        for face, facedata in self.charts.items():
             chart_3d_area = numpy.sum(tri_areas_3d(self.all_vertices[self.all_vert_indices[facedata['tris']]]))
             facedata['chart_3d_area'] = chart_3d_area
             total_3d_area += chart_3d_area
@@ -1317,7 +1358,7 @@ class SanderSimplify(object):
         TEXTURE_SIZE = TEXTURE_DIMENSION * TEXTURE_DIMENSION
 
         new_total_L2 = self.total_L2
-        for face, facedata in self.facegraph.nodes_iter(data=True):
+        for face, facedata in self.charts.items():
             if facedata['diffuse'] is not None:
                 continue
             
@@ -1334,11 +1375,8 @@ class SanderSimplify(object):
 
         self.total_L2 = new_total_L2
         
-        rp = RectPack()
-        self.chart_ims = {}
-        self.chart_masks = {}
-        self.pil_to_cv = {}
-        for face, facedata in self.facegraph.nodes_iter(data=True):
+        bake_faces = []
+        for face, facedata in self.charts.items():
             
             if facedata['diffuse'] is not None:
                 continue
@@ -1382,47 +1420,50 @@ class SanderSimplify(object):
             chart_width = int(math.pow(2, round(math.log(chart_width, 2)))) - 2
             chart_height = int(math.pow(2, round(math.log(chart_height, 2)))) - 2
             
-            self.facegraph.node[face]['chart_size'] = (chart_width, chart_height)
+            self.charts[face]['chart_size'] = (chart_width, chart_height)
 
-            chartim = Image.new('RGB', (chart_width, chart_height))
-            chartmask = Image.new('L', (chart_width, chart_height), 255)
-            maskdraw = ImageDraw.Draw(chartmask)
-                
-            for tri in facedata['tris']:
-                
-                newuvs = self.new_uvs[self.new_uv_indices[tri]]
-                newu = (newuvs[:,0] * (chart_width-0.5))
-                newv = ((1.0-newuvs[:,1]) * (chart_height-0.5))
-                newtri = [(newu[0], newv[0]), (newu[1], newv[1]), (newu[2], newv[2])]
-                maskdraw.polygon(newtri, fill=0, outline=0)
-                
-                bisect_loc = bisect.bisect(self.tri2material, (tri,0))
-                if bisect_loc >= len(self.tri2material) or tri != self.tri2material[bisect_loc][0]:
-                    bisect_loc -= 1
-                diffuse_source = self.material2color[self.tri2material[bisect_loc][1]]
-                if pcv is not None:
-                    cv_diffuse_source = self.pil_to_cv.get(diffuse_source)
-                    if cv_diffuse_source is None:
-                        cv_diffuse_source = pcv.Mat.from_pil_image(diffuse_source)
-                        self.pil_to_cv[diffuse_source] = cv_diffuse_source
-                
-                prevuvs = self.all_orig_uvs[self.all_orig_uv_indices[tri]]
-                prevu = prevuvs[:,0] * diffuse_source.size[0]
-                prevv = (1.0-prevuvs[:,1]) * diffuse_source.size[1]
-                prevtri = [(prevu[0], prevv[0]), (prevu[1], prevv[1]), (prevu[2], prevv[2])]
-                
-                if pcv is None:
-                    transformblit(prevtri, newtri, diffuse_source, chartim)
-                else:
-                    #we prefer opencv because it allows us to wrap the texcoords
-                    opencvblit(prevtri, newtri, cv_diffuse_source, chartim)
-                    
+            bake_faces.append(face)
+        
+        #textures are shared with the workers as arrays, indexed per triangle
+        textures = []
+        texture_index = {}
+        tri_textures = numpy.zeros(len(self.all_vert_indices), dtype=numpy.int32)
+        for matnum, (i, mat) in enumerate(self.tri2material):
+            if matnum < len(self.tri2material) - 1:
+                end_range = self.tri2material[matnum+1][0]
+            else:
+                end_range = len(self.all_vert_indices)
+            diffuse_source = self.material2color[mat]
+            if isinstance(diffuse_source, tuple):
+                continue
+            if id(diffuse_source) not in texture_index:
+                texture_index[id(diffuse_source)] = len(textures)
+                if diffuse_source.mode != 'RGB':
+                    diffuse_source = diffuse_source.convert('RGB')
+                textures.append(numpy.asarray(diffuse_source))
+            tri_textures[i:end_range] = texture_index[id(self.material2color[mat])]
+        
+        arrays = {'new_uvs': self.new_uvs,
+                  'new_uv_indices': self.new_uv_indices,
+                  'all_orig_uvs': self.all_orig_uvs,
+                  'all_orig_uv_indices': self.all_orig_uv_indices,
+                  'tri_textures': tri_textures}
+        arrays['texture_sizes'] = numpy.array([(t.shape[1], t.shape[0]) for t in textures], dtype=numpy.float64).reshape(-1, 2)
+        for texture, texture_array in enumerate(textures):
+            arrays['texture%d' % texture] = texture_array
+        tasks = [(self.charts[face]['tris'],) + self.charts[face]['chart_size'] for face in bake_faces]
+        results = map_charts(bakeChart, arrays, tasks, self.workers)
+        
+        rp = RectPack()
+        self.chart_ims = {}
+        self.chart_masks = {}
+        for face, (chartim, chartmask) in zip(bake_faces, results):
+            (chart_width, chart_height) = self.charts[face]['chart_size']
             self.chart_ims[face] = chartim
             self.chart_masks[face] = chartmask
 
             rp.addRectangle(face, chart_width+2, chart_height+2)
         
-        del self.pil_to_cv
         assert(rp.pack())
         
         #find size for color charts so that they are still visible at 128x128 mipmap
@@ -1433,7 +1474,7 @@ class SanderSimplify(object):
         
         self.color2chart = {}
         self.color2faces = {}
-        for face, facedata in self.facegraph.nodes_iter(data=True):
+        for face, facedata in self.charts.items():
             if facedata['diffuse'] is None: continue
             
             if facedata['diffuse'] not in self.color2chart:
@@ -1454,161 +1495,164 @@ class SanderSimplify(object):
         self.chart_packing = rp
         
         #now resize the uvs according to chart size
-        for face, facedata in self.facegraph.nodes_iter(data=True):
+        for face, facedata in self.charts.items():
             chart_uvs = numpy.unique(self.new_uv_indices[facedata['tris']])
-            self.facegraph.node[face]['chart_uvs'] = chart_uvs
+            self.charts[face]['chart_uvs'] = chart_uvs
             
             if facedata['diffuse'] is not None: continue
             
-            (chart_width, chart_height) = self.facegraph.node[face]['chart_size']
+            (chart_width, chart_height) = self.charts[face]['chart_size']
             self.new_uvs[chart_uvs, 0] *= chart_width-0.5
             self.new_uvs[chart_uvs, 1] *= chart_height-0.5
         
+        self.telemetry.set('atlas_width', rp.width, 'texture width')
+        self.telemetry.set('atlas_height', rp.height, 'texture height')
         self.end_operation()
 
     def normalize_uvs(self):
-        self.begin_operation('Normalizing texture coordinates...')
+        self.begin_operation('normalize_uvs', 'Normalizing texture coordinates...')
 
-        for face, facedata in self.facegraph.nodes_iter(data=True):
+        for face, facedata in self.charts.items():
             if facedata['diffuse'] is not None: continue
             
-            (chart_width, chart_height) = self.facegraph.node[face]['chart_size']
+            (chart_width, chart_height) = self.charts[face]['chart_size']
             
-            chart_uvs = self.facegraph.node[face]['chart_uvs']
+            chart_uvs = self.charts[face]['chart_uvs']
 
             self.new_uvs[chart_uvs, 0] /= chart_width-0.5
             self.new_uvs[chart_uvs, 1] /= chart_height-0.5
         
         self.end_operation()
 
-    def evaluate_edge_collapse(self, v1, v2):
-        #considering (v1,v2) -> v1
-        
-        #can't remove corners
-        if v2 in self.all_corners:
-            return
-        
-        #need to preserve boundary straightness
-        if v2 in self.all_edge_verts and v1 not in self.all_edge_verts:
-            return
-
-        v2tris = list(self.vertexgraph.node[v2]['tris'])
-        v2tri_idx = self.all_vert_indices[v2tris]
-        
-        moved = set()
-        degenerate = set()
-        degenerate_segments = []
-        for t2, t2_idx in zip(v2tris, v2tri_idx):
-            if v1 in t2_idx:
-                degenerate.add(t2)
-                facefrom = self.tri2face[t2]
-                
-                #texture stretch for color-only face is 0
-                if self.facegraph.node[facefrom]['diffuse'] is not None:
-                    continue
-                
-                face_vert2uvidx = self.facegraph.node[facefrom]['vert2uvidx']
-                other_vert = [v for v in t2_idx if v != v1 and v != v2][0]
-                degen_3d = (self.all_vertices[other_vert], self.all_vertices[v2])
-                degen_uv = (self.new_uvs[face_vert2uvidx[other_vert]], self.new_uvs[face_vert2uvidx[v2]])
-                degenerate_segments.append((degen_3d, degen_uv))
-            else:
-                moved.add(t2)
-
-        texture_stretches = []
-        for moved_tri_idx in moved:
-            facefrom = self.tri2face[moved_tri_idx]
-            
-            #texture stretch for color-only face is 0
-            if self.facegraph.node[facefrom]['diffuse'] is not None:
-                continue
-            
-            face_vert2uvidx = self.facegraph.node[facefrom]['vert2uvidx']
-            
-            #don't want to cross chart boundaries
-            if v1 not in face_vert2uvidx:
-                return
-            
-            moved_vert_idx = self.all_vert_indices[moved_tri_idx]
-            other_pts = [ m for m in moved_vert_idx if m != v2 ]
-            other_uv_pts = [ self.new_uvs[face_vert2uvidx[m]] for m in other_pts ]
-            
-            v2_pt = self.new_uvs[face_vert2uvidx[v2]]
-            v1_pt = self.new_uvs[face_vert2uvidx[v1]]
-            
-            #this checks if the triangle has flipped
-            # see: http://stackoverflow.com/questions/7365531/detecting-if-a-triangle-flips-when-changing-a-point
-            vec1 = numpy.array([other_uv_pts[1][0] - other_uv_pts[0][0], other_uv_pts[1][1] - other_uv_pts[0][1], 0], dtype=numpy.float32)
-            vec2_v1 = numpy.array([v1_pt[0] - other_uv_pts[0][0], v1_pt[1] - other_uv_pts[0][1], 0], dtype=numpy.float32)
-            vec2_v2 = numpy.array([v2_pt[0] - other_uv_pts[0][0], v2_pt[1] - other_uv_pts[0][1], 0], dtype=numpy.float32)
-            v1_direction = numpy.cross(vec1, vec2_v1)[2]
-            v2_direction = numpy.cross(vec1, vec2_v2)[2]
-            
-            #don't want to flip the triangle in the parametric domain
-            if v2_direction > 0 and not(v1_direction > 0) or \
-                v2_direction < 0 and not(v1_direction < 0):
-                return
-
-            other_v3_pts = [self.all_vertices[m] for m in other_pts]
-            v1_3d = self.all_vertices[v1]
-            
-            #the maximum texture deviation could lie at the edge,edge intersection
-            # between the moving edge and a degenerate edge
-            for moving_3d, moving_uv in zip(other_v3_pts, other_uv_pts):
-                for (degen_3d, degen_uv) in degenerate_segments:
-                    #find where the uv coords intersect
-                    intersect_uv = seg_intersect(moving_uv, v1_pt, degen_uv[0], degen_uv[1])
-                    if intersect_uv is None: continue
-
-                    #convert the u,v intersection to 3d for the degenerate edge
-                    degen_uv_dist = v2dist(degen_uv[0], degen_uv[1])
-                    if degen_uv_dist <= 0: continue
-                    degen_intersect_relative = v2dist(degen_uv[0], intersect_uv) / degen_uv_dist
-                    degen_v3_diff = degen_3d[1] - degen_3d[0]
-                    degen_v3_intersect = degen_3d[0] + degen_v3_diff * degen_intersect_relative
-                    
-                    #and then to 3d for the moving edge
-                    moving_uv_dist = v2dist(moving_uv, v1_pt)
-                    if moving_uv_dist <= 0: continue
-                    moving_intersect_relative = v2dist(moving_uv, intersect_uv) / moving_uv_dist
-                    moving_v3_diff = v1_3d - moving_3d
-                    moving_v3_intersect = moving_3d + moving_v3_diff * moving_intersect_relative
-
-                    v3_texture_stretch = v3dist(degen_v3_intersect, moving_v3_intersect)
-                    texture_stretches.append(v3_texture_stretch)
-        
-        dist3d_v1_v2 = v3dist(self.all_vertices[v1], self.all_vertices[v2])
-        texture_stretches.append(dist3d_v1_v2)
-        texture_diff = max(texture_stretches)
-        
-        combined_A = self.vert_quadric_A[v1] + self.vert_quadric_A[v2]
-        combined_b = self.vert_quadric_b[v1] + self.vert_quadric_b[v2]
-        combined_c = self.vert_quadric_c[v1] + self.vert_quadric_c[v2]
-        quadric_error = evalQuadric(combined_A, combined_b, combined_c, self.all_vertices[v1])
+    def evaluate_edge_collapses(self, v1s, v2s):
+        """Evaluates contracting each edge (v1s[i], v2s[i]) into v1s[i] at
+        once, returning an array of the texture deviation plus quadric
+        error of each, which is NaN for contractions that aren't allowed"""
+        v1s = numpy.asarray(v1s, dtype=numpy.int64)
+        v2s = numpy.asarray(v2s, dtype=numpy.int64)
+        
+        #can't remove corners, and need to preserve boundary straightness
+        allowed = ~self.vert_is_corner[v2s] & ~(self.vert_is_edge[v2s] & ~self.vert_is_edge[v1s])
+        
+        #the triangles around each v2, as (candidate, triangle) pairs
+        candidates = numpy.nonzero(allowed)[0]
+        candidate_v2s = v2s[candidates].tolist()
+        pair_cands = numpy.repeat(candidates, [len(self.vert_tris[v]) for v in candidate_v2s])
+        pair_tris = numpy.fromiter(chain.from_iterable(self.vert_tris[v] for v in candidate_v2s),
+                                   dtype=numpy.int64, count=len(pair_cands))
+        pair_v1s = v1s[pair_cands]
+        tri_idx = self.all_vert_indices[pair_tris]
+        tri_uvidx = self.new_uv_indices[pair_tris]
+        is_v1 = tri_idx == pair_v1s[:,numpy.newaxis]
+        is_v2 = tri_idx == v2s[pair_cands][:,numpy.newaxis]
+        where_v2 = numpy.argmax(is_v2, axis=1)
+        degenerate = numpy.any(is_v1, axis=1)
+        #texture stretch for color-only face is 0
+        textured = self.tri_textured[pair_tris]
+        
+        #segments from the other vertex of each degenerate triangle to v2
+        degen = numpy.nonzero(degenerate & textured)[0]
+        other_vert = numpy.argmax(~is_v1[degen] & ~is_v2[degen], axis=1)
+        degen_3d = (self.all_vertices[tri_idx[degen, other_vert]], self.all_vertices[tri_idx[degen, where_v2[degen]]])
+        degen_uv = (self.new_uvs[tri_uvidx[degen, other_vert]], self.new_uvs[tri_uvidx[degen, where_v2[degen]]])
+        degen_counts = numpy.bincount(pair_cands[degen], minlength=len(v1s))
+        degen_starts = numpy.cumsum(degen_counts) - degen_counts
+        
+        moved = numpy.nonzero(~degenerate & textured)[0]
+        moved_cands = pair_cands[moved]
+        
+        #don't want to cross chart boundaries
+        keys = self.tri_faces[pair_tris[moved]] * len(self.all_vertices) + pair_v1s[moved]
+        locs = numpy.minimum(numpy.searchsorted(self.face_vert_keys, keys), len(self.face_vert_keys) - 1)
+        in_chart = self.face_vert_keys[locs] == keys
+        allowed[moved_cands[~in_chart]] = False
+        
+        #the two other corners of each moved triangle, in order
+        other_pts = numpy.argsort(is_v2[moved], axis=1, kind='stable')[:,:2]
+        other_uv_pts = self.new_uvs[tri_uvidx[moved[:,numpy.newaxis], other_pts]]
+        v2_pt = self.new_uvs[tri_uvidx[moved, where_v2[moved]]]
+        v1_pt = self.new_uvs[self.face_vert_uvs[locs]]
+        
+        #this checks if the triangle has flipped
+        # see: http://stackoverflow.com/questions/7365531/detecting-if-a-triangle-flips-when-changing-a-point
+        vec1 = (other_uv_pts[:,1] - other_uv_pts[:,0]).astype(numpy.float32)
+        vec2_v1 = (v1_pt - other_uv_pts[:,0]).astype(numpy.float32)
+        vec2_v2 = (v2_pt - other_uv_pts[:,0]).astype(numpy.float32)
+        v1_direction = vec1[:,0]*vec2_v1[:,1] - vec1[:,1]*vec2_v1[:,0]
+        v2_direction = vec1[:,0]*vec2_v2[:,1] - vec1[:,1]*vec2_v2[:,0]
+        
+        #don't want to flip the triangle in the parametric domain
+        flipped = (v2_direction > 0) & ~(v1_direction > 0) | (v2_direction < 0) & ~(v1_direction < 0)
+        allowed[moved_cands[flipped]] = False
+        
+        #the maximum texture deviation could lie at the edge,edge intersection
+        # between each moving edge and each degenerate edge of the same contraction
+        moving_cands = numpy.repeat(moved_cands, 2)
+        moving_counts = degen_counts[moving_cands]
+        moving = numpy.repeat(numpy.arange(len(moving_cands)), moving_counts)
+        crossing = degen_starts[moving_cands][moving] + numpy.arange(len(moving)) - \
+                   numpy.repeat(numpy.cumsum(moving_counts) - moving_counts, moving_counts)
+        moving_uv = other_uv_pts.reshape(-1, 2)[moving]
+        moving_3d = self.all_vertices[tri_idx[moved[:,numpy.newaxis], other_pts].ravel()][moving]
+        moving_v1_uv = v1_pt[moving // 2]
+        degen_uv0, degen_uv1 = degen_uv[0][crossing], degen_uv[1][crossing]
+        degen_3d0, degen_3d1 = degen_3d[0][crossing], degen_3d[1][crossing]
+        
+        #find where the uv coords intersect
+        intersect_uv, intersects = seg_intersect(moving_uv, moving_v1_uv, degen_uv0, degen_uv1)
+        
+        #convert the u,v intersection to 3d for the degenerate edge
+        degen_uv_dist = v2dist(degen_uv0, degen_uv1)
+        intersects &= degen_uv_dist > 0
+        degen_intersect_relative = v2dist(degen_uv0, intersect_uv) / numpy.where(intersects, degen_uv_dist, 1)
+        degen_v3_intersect = degen_3d0 + (degen_3d1 - degen_3d0) * degen_intersect_relative.astype(numpy.float32)[:,numpy.newaxis]
+        
+        #and then to 3d for the moving edge
+        moving_uv_dist = v2dist(moving_uv, moving_v1_uv)
+        intersects &= moving_uv_dist > 0
+        moving_intersect_relative = v2dist(moving_uv, intersect_uv) / numpy.where(intersects, moving_uv_dist, 1)
+        v1_3d = self.all_vertices[v1s[moving_cands][moving]]
+        moving_v3_intersect = moving_3d + (v1_3d - moving_3d) * moving_intersect_relative.astype(numpy.float32)[:,numpy.newaxis]
+        
+        v3_texture_stretch = array_dot(degen_v3_intersect - moving_v3_intersect, degen_v3_intersect - moving_v3_intersect)
+        v1_v2_3d = self.all_vertices[v1s] - self.all_vertices[v2s]
+        texture_diff = array_dot(v1_v2_3d, v1_v2_3d)
+        numpy.maximum.at(texture_diff, moving_cands[moving][intersects], v3_texture_stretch[intersects])
+        
+        combined_A = self.vert_quadric_A[v1s] + self.vert_quadric_A[v2s]
+        combined_b = self.vert_quadric_b[v1s] + self.vert_quadric_b[v2s]
+        combined_c = self.vert_quadric_c[v1s] + self.vert_quadric_c[v2s]
+        quadric_error = evalQuadric(combined_A, combined_b, combined_c, self.all_vertices[v1s])
         combined_error = texture_diff + quadric_error
+        combined_error[~allowed] = numpy.nan
         return combined_error
 
     def initialize_simplification_errors(self):
-        self.begin_operation('Calculationg priority queue for initial edge contractions...')
+        self.begin_operation('initialize_simplification_errors', 'Calculationg priority queue for initial edge contractions...')
         
-        self.all_corners = set()
-        self.all_edge_verts = set()
+        self.vert_is_corner = numpy.zeros(len(self.all_vertices), dtype=bool)
+        self.vert_is_edge = numpy.zeros(len(self.all_vertices), dtype=bool)
+        self.tri_faces = numpy.zeros(len(self.all_vert_indices), dtype=numpy.int64)
+        self.tri_textured = numpy.zeros(len(self.all_vert_indices), dtype=bool)
         self.tri2face = {}
-        for face, facedata in self.facegraph.nodes_iter(data=True):
-            self.all_corners = self.all_corners.union(facedata['corners'])
-            self.all_edge_verts = self.all_edge_verts.union(set(chain.from_iterable(facedata['edges'])))
-            facev2uv = self.facegraph.node[face]['vert2uvidx']
+        for face, facedata in self.charts.items():
+            self.vert_is_corner[list(facedata['corners'])] = True
+            self.vert_is_edge[list(chain.from_iterable(facedata['edges']))] = True
+            self.tri_faces[facedata['tris']] = face
+            self.tri_textured[facedata['tris']] = facedata['diffuse'] is None
             for tri in facedata['tris']:
                 self.tri2face[tri] = face
-            self.facegraph.node[face]['orig_tris'] = facedata['tris']
-
-        self.vertexgraph.add_nodes_from(( (i, {'tris':set()}) for i in range(len(self.all_vertices))))
-        for i, (v1,v2,v3) in enumerate(self.all_vert_indices):
-            self.vertexgraph.node[v1]['tris'].add(i)
-            self.vertexgraph.node[v2]['tris'].add(i)
-            self.vertexgraph.node[v3]['tris'].add(i)
+            self.charts[face]['orig_tris'] = facedata['tris']
+        
+        #sorted face * num vertices + vertex keys of every vertex in each face, and its uv index there
+        face_vert_keys = (self.tri_faces[:,numpy.newaxis] * len(self.all_vertices) + self.all_vert_indices).ravel()
+        self.face_vert_keys, first = numpy.unique(face_vert_keys, return_index=True)
+        self.face_vert_uvs = self.new_uv_indices.ravel()[first]
 
-        self.contraction_priorities = []
+        #the triangles using each vertex, which is set to None once the vertex is contracted away
+        offsets = self.adjacency.vertex_face_offsets.tolist()
+        vertex_faces = self.adjacency.vertex_faces_flat.tolist()
+        self.vert_tris = [set(vertex_faces[offsets[v]:offsets[v+1]]) for v in range(len(self.all_vertices))]
 
         (A, b, c, area, normal) = quadricsForTriangles(self.all_vertices[self.all_vert_indices])
         
@@ -1630,87 +1674,107 @@ class SanderSimplify(object):
 
         #to preserve borders, we inflate the quadric error for edges that
         # only have one incident triangle
-        for v1,v2 in self.vertexgraph.edges_iter():
-            tris1 = self.vertexgraph.node[v1]['tris']
-            tris2 = self.vertexgraph.node[v2]['tris']
-            tris_both = tris1.intersection(tris2)
-            if len(tris_both) > 1: continue
-            t = list(tris_both)[0]
-            
-            v = self.all_vertices[v1] - self.all_vertices[v2]
-            normal2 = numpy.cross(v, normal[t])
-            normal2 = normal2 / numpy.linalg.norm(normal2)
-            d = -numpy.dot(normal[t], self.all_vertices[v1])
-            A3 = area[t] * numpy.outer(normal2, normal2)
-            b3 = area[t] * d * normal2
-            c3 = area[t] * d * d
-
-            self.vert_quadric_A[v1] += A3
-            self.vert_quadric_b[v1] += b3
-            self.vert_quadric_c[v1] += c3
-
-        self.maxerror = 0
-        
-        for (vv1, vv2) in self.vertexgraph.edges_iter():
-            for (v1, v2) in ((vv1,vv2),(vv2,vv1)):
-                combined_error = self.evaluate_edge_collapse(v1,v2)
-                if combined_error is None:
-                    continue
-                if combined_error > self.maxerror:
-                    self.maxerror = combined_error
-                
-                self.contraction_priorities.append((combined_error, (v1, v2)))
-                
-        heapq.heapify(self.contraction_priorities)
+        border = self.adjacency.boundary_edges()
+        v1 = self.adjacency.edges[border,0]
+        v2 = self.adjacency.edges[border,1]
+        t = self.adjacency.edge_faces_flat[self.adjacency.edge_face_offsets[border]]
+        
+        v = self.all_vertices[v1] - self.all_vertices[v2]
+        normal2 = numpy.cross(v, normal[t])
+        normal2 = normal2 / numpy.sqrt(numpy.sum(normal2 * normal2, axis=1))[:,numpy.newaxis]
+        d = -numpy.sum(normal[t] * self.all_vertices[v1], axis=1)
+        A3 = area[t][:,numpy.newaxis,numpy.newaxis] * normal2[:,:,numpy.newaxis] * normal2[:,numpy.newaxis,:]
+        b3 = (area[t] * d)[:,numpy.newaxis] * normal2
+        c3 = area[t] * d * d
+
+        numpy.add.at(self.vert_quadric_A, v1, A3)
+        numpy.add.at(self.vert_quadric_b, v1, b3)
+        numpy.add.at(self.vert_quadric_c, v1, c3)
+
+        #both directions of every edge
+        v1s = self.adjacency.edges.ravel()
+        v2s = self.adjacency.edges[:,::-1].ravel()
+        errors = self.evaluate_edge_collapses(v1s, v2s)
+        valid = ~numpy.isnan(errors)
+        self.maxerror = max(0, float(numpy.max(errors[valid]))) if numpy.any(valid) else 0
+        
+        self.contraction_priorities = PriorityQueue(zip(errors[valid].tolist(),
+                                                        zip(v1s[valid].tolist(), v2s[valid].tolist())))
+        self.telemetry.set('candidate_collapses', len(self.contraction_priorities))
+        self.telemetry.set('disallowed_collapses', int(numpy.sum(~valid)))
 
         self.end_operation()
 
     def simplify_mesh(self):
-        self.begin_operation('(Step 4 of 7) Simplifying...')
+        self.begin_operation('simplify_mesh', '(Step 4 of 7) Simplifying...')
         
         self.tris_left = set(range(len(self.all_vert_indices)))
-        self.simplify_operations = []
-        
+        self.simplify_operations = OperationLog()
+        #length of simplify_operations when each level of detail target was reached
+        self.lod_marks = [None] * len(self.lod_targets) if self.lod_targets is not None else None
+        
+        telemetry = self.telemetry
+        for counter in ('heap_pops', 'heap_pushes', 'heap_discards', 'collapses'):
+            telemetry.set(counter, 0)
+        telemetry.set('rejected_collapses', {})
+        stop_reason = 'queue_empty'
         while len(self.contraction_priorities) > 0:
-            (error, (v1, v2)) = heapq.heappop(self.contraction_priorities)
+            if self.time_budget.expired('simplify_mesh'):
+                stop_reason = 'time_budget'
+                break
+            (error, (v1, v2)) = self.contraction_priorities.pop()
+            telemetry.count('heap_pops')
             
             #considering (v1,v2) -> v1
             
             #check of one of these vertices was already contracted
-            if v1 not in self.vertexgraph or v2 not in self.vertexgraph:
+            if self.vert_tris[v1] is None or self.vert_tris[v2] is None:
+                telemetry.count('rejected_collapses', reason='stale')
                 continue
 
             #cutoff value was chosen which seems to work well for most models
             if error > 0:
                 logrel = math.log(1 + error) / math.log(1 + self.maxerror)
-                #print 'error', error, 'maxerror', self.maxerror, 'logrel', logrel, 'v1', v1, 'v2', v2, 'numverts', len(self.vertexgraph), 'numfaces', len(self.tris_left), 'contractions left', len(self.contraction_priorities)
+                #print 'error', error, 'maxerror', self.maxerror, 'logrel', logrel, 'v1', v1, 'v2', v2, 'numverts', len(self.all_vertices), 'numfaces', len(self.tris_left), 'contractions left', len(self.contraction_priorities)
             else: logrel = 0
-            if logrel > SIMPLIFICATION_ERROR_THRESHOLD and len(self.tris_left) < TRIANGLE_MAXIMUM:
+            if self.lod_targets is not None:
+                #snapshot the targets reached before this contraction, stopping once all are
+                for i, (kind, target) in enumerate(self.lod_targets):
+                    if self.lod_marks[i] is None and (kind == 'error' and logrel > target or
+                                                      kind == 'triangles' and len(self.tris_left) <= target):
+                        self.lod_marks[i] = len(self.simplify_operations)
+                if None not in self.lod_marks:
+                    stop_reason = 'lod_targets'
+                    break
+            elif logrel > SIMPLIFICATION_ERROR_THRESHOLD and len(self.tris_left) < TRIANGLE_MAXIMUM:
+                stop_reason = 'error_threshold'
                 break
             
-            v2tris = list(self.vertexgraph.node[v2]['tris'])
-            v1tris = self.vertexgraph.node[v1]['tris']
+            v2tris = list(self.vert_tris[v2])
+            v1tris = self.vert_tris[v1]
             v2tri_idx = self.all_vert_indices[v2tris]
             
             invalid_contraction = False
             for t2 in v2tris:
                 facefrom = self.tri2face[t2]
-                if v1 not in self.facegraph.node[facefrom]['vert2uvidx']:
+                if v1 not in self.charts[facefrom]['vert2uvidx']:
                     #this can happen if this triangle was created by a different
                     # merge and so we didn't check this constraint when considering the edge before
                     invalid_contraction = True
                     break
             if invalid_contraction:
+                telemetry.count('rejected_collapses', reason='uv_missing')
                 continue
             
-            self.simplify_operations.append(STREAM_OP.OPERATION_BOUNDARY)
+            telemetry.count('collapses')
+            self.simplify_operations.begin_operation()
             
             #do degenerate first so we can record values for progressive stream
             degenerate = set()
             for t2, t2_idx in zip(v2tris, v2tri_idx):
                 if v1 in t2_idx:
                     degenerate.add(t2)
-                    self.simplify_operations.append((STREAM_OP.TRIANGLE_ADDITION, t2, t2_idx, self.all_normal_indices[t2], self.new_uv_indices[t2]))
+                    self.simplify_operations.add_triangle(t2, t2_idx, self.all_normal_indices[t2], self.new_uv_indices[t2])
             
             new_contractions = set()
             for t2, t2_idx in zip(v2tris, v2tri_idx):
@@ -1723,20 +1787,20 @@ class SanderSimplify(object):
                     
                     #update vert and uv index values from v2 to v1
                     facefrom = self.tri2face[t2]
-                    face_vert2uvidx = self.facegraph.node[facefrom]['vert2uvidx']
+                    face_vert2uvidx = self.charts[facefrom]['vert2uvidx']
                     prev_vertex_value = self.all_vert_indices[t2][where_v2]
                     self.all_vert_indices[t2][where_v2] = v1
                     prev_uv_value = self.new_uv_indices[t2][where_v2]
                     self.new_uv_indices[t2][where_v2] = face_vert2uvidx[v1]
                     
                     #add tri to v1's list now that we moved it
-                    self.vertexgraph.node[v1]['tris'].add(t2)
+                    self.vert_tris[v1].add(t2)
                     
                     #try to find a triangle in the same chart as v2 that contains v1
                     # so we can copy its normal value
                     copy_tri_v1 = None
                     where_v1 = None
-                    for facetri in self.facegraph.node[facefrom]['tris']:
+                    for facetri in self.charts[facefrom]['tris']:
                         if facetri in v1tris:
                             facetri_idx = self.all_vert_indices[facetri]
                             where_v1 = numpy.where(facetri_idx == v1)[0][0]
@@ -1746,7 +1810,7 @@ class SanderSimplify(object):
                     prev_normal_value = self.all_normal_indices[t2][where_v2]
                     self.all_normal_indices[t2][where_v2] = self.all_normal_indices[copy_tri_v1][where_v1]
                     
-                    self.simplify_operations.append((STREAM_OP.INDEX_UPDATE, t2, where_v2, prev_vertex_value, prev_normal_value, prev_uv_value))
+                    self.simplify_operations.update_index(t2, where_v2, prev_vertex_value, prev_normal_value, prev_uv_value)
                     
                     #add new candidate merges
                     new_contractions.add((t2_idx[other1], v1))
@@ -1757,61 +1821,71 @@ class SanderSimplify(object):
             #remove the degenerate triangle from the triangle list of other vertices in the triangle
             for tri in degenerate:
                 for v in self.all_vert_indices[tri]:
-                    self.vertexgraph.node[v]['tris'].discard(tri)
+                    self.vert_tris[v].discard(tri)
             
             #discard the degenerate triangles from the total list of tris
             self.tris_left.difference_update(degenerate)
             
-            #remove vertex from graph
-            self.vertexgraph.remove_node(v2)
+            #remove vertex from graph, along with its queued contractions
+            self.vert_tris[v2] = None
+            discarded = 0
+            for v in set(v2tri_idx.ravel().tolist()):
+                discarded += self.contraction_priorities.discard((v, v2))
+                discarded += self.contraction_priorities.discard((v2, v))
+            telemetry.count('heap_discards', discarded)
             
             #update quadric
             self.vert_quadric_A[v1] += self.vert_quadric_A[v2]
             self.vert_quadric_b[v1] += self.vert_quadric_b[v2]
             self.vert_quadric_c[v1] += self.vert_quadric_c[v2]       
             
-            #now update priority list with new valid contractions
-            for (v1, v2) in new_contractions:
-                combined_error = self.evaluate_edge_collapse(v1,v2)
-                if combined_error is None:
+            #now update priority list with new valid contractions, replacing
+            # their previous errors and dropping ones that are no longer valid
+            new_contractions = list(new_contractions)
+            errors = self.evaluate_edge_collapses([v for v, _ in new_contractions], [v for _, v in new_contractions])
+            for contraction, combined_error in zip(new_contractions, errors.tolist()):
+                if combined_error != combined_error:
+                    telemetry.count('heap_discards', self.contraction_priorities.discard(contraction))
                     continue
                 if combined_error > self.maxerror:
                     self.maxerror = combined_error
                 
-                heapq.heappush(self.contraction_priorities, (combined_error, (v1, v2)))
+                self.contraction_priorities.push(combined_error, contraction)
+                telemetry.count('heap_pushes')
+        
+        telemetry.set('stop_reason', stop_reason)
+        telemetry.set('triangles', len(self.tris_left))
+        if self.lod_marks is not None:
+            #targets that were never reached get the most simplified mesh
+            self.lod_marks = [len(self.simplify_operations) if mark is None else mark for mark in self.lod_marks]
             
         self.end_operation()
 
     def enforce_simplification(self):
         if len(self.tris_left) < TRIANGLE_MAXIMUM:
             return
-        self.begin_operation('Enforcing simplification...')
+        self.begin_operation('enforce_simplification', 'Enforcing simplification...')
         
-        list_tris_left = numpy.array(list(self.tris_left), dtype=numpy.int32)
+        list_tris_left = numpy.array(sorted(self.tris_left), dtype=numpy.int32)
         areas3d = tri_areas_3d(self.all_vertices[self.all_vert_indices[list_tris_left]])
         sorted_indices = numpy.argsort(areas3d)
         list_tris_left = list_tris_left[sorted_indices]
         
-        i = 0
-        while len(self.tris_left) > TRIANGLE_MAXIMUM:
-            tri = list_tris_left[i]
-            i += 1
-            tri_idx = self.all_vert_indices[tri]
-            self.simplify_operations.append((STREAM_OP.TRIANGLE_ADDITION,
-                                             tri,
-                                             tri_idx,
-                                             self.all_normal_indices[tri],
-                                             self.new_uv_indices[tri]))
-            
+        #remove the smallest triangles, logged as part of the last operation
+        removed = list_tris_left[:len(self.tris_left) - TRIANGLE_MAXIMUM]
+        self.simplify_operations.add_triangles(removed, self.all_vert_indices[removed],
+                                               self.all_normal_indices[removed], self.new_uv_indices[removed])
+        
+        for tri, tri_idx in zip(removed.tolist(), self.all_vert_indices[removed].tolist()):
             for v in tri_idx:
-                self.vertexgraph.node[v]['tris'].discard(tri)
-                
-            self.tris_left.remove(tri)
+                self.vert_tris[v].discard(tri)
+        self.tris_left.difference_update(removed.tolist())
         
+        self.telemetry.set('removed_triangles', len(removed))
         self.end_operation()
 
     def pack_charts(self):
-        self.begin_operation('(Step 6 of 7) Creating and packing charts into atlas...')
+        self.begin_operation('pack_charts', '(Step 6 of 7) Creating and packing charts into atlas...')
         self.atlasimg = Image.new('RGB', (self.chart_packing.width, self.chart_packing.height))
         atlasmask = Image.new('L', (self.chart_packing.width, self.chart_packing.height), 255)
         
@@ -1837,182 +1911,188 @@ class SanderSimplify(object):
             chart_tris = []
             chart_uvs = []
             for face in faces_to_get:
-                chart_tris.extend(f for f in self.facegraph.node[face]['orig_tris'] if f in self.tris_left)
-                chart_uvs.extend(self.facegraph.node[face]['chart_uvs'])
+                chart_tris.extend(f for f in self.charts[face]['orig_tris'] if f in self.tris_left)
+                chart_uvs.extend(self.charts[face]['chart_uvs'])
             chart_uvs = numpy.unique(chart_uvs)
     
             #this rescales the texcoords to map to the new atlas location
             self.new_uvs[chart_uvs,0] = (self.new_uvs[chart_uvs,0] * (w-0.5) + x) / width
             self.new_uvs[chart_uvs,1] = 1.0 - (( (1.0-self.new_uvs[chart_uvs,1]) * (h-0.5) + y ) / height)
 
-        if cv is not None:
-            #convert image and mask to opencv format
-            cv_im = cv.CreateImageHeader(self.atlasimg.size, cv.IPL_DEPTH_8U, 3)
-            cv.SetData(cv_im, self.atlasimg.tostring())
-            cv_mask = cv.CreateImageHeader(atlasmask.size, cv.IPL_DEPTH_8U, 1)
-            cv.SetData(cv_mask, atlasmask.tostring())
+        #fill the space between charts so it doesn't bleed into them when mipmapping
+        covered = numpy.asarray(atlasmask) == 0
+        self.atlasimg = Image.fromarray(pullPushFill(numpy.asarray(self.atlasimg), covered))
 
-            #do the inpainting
-            cv_painted_im = cv.CloneImage(cv_im)
-            cv.Inpaint(cv_im, cv_mask, cv_painted_im, 3, cv.CV_INPAINT_TELEA)
-            
-            #convert back to PIL
-            self.atlasimg = Image.fromstring("RGB", cv.GetSize(cv_painted_im), cv_painted_im.tostring())
-
-            # -- using pyopencv which has strange bugs
-            #cv_im = cv.Mat.from_pil_image(self.atlasimg)
-            #cv_mask = cv.Mat.from_pil_image(atlasmask)
-            #cv_mask = cv_mask.reshape(1, cv_im.rows)
-            #cv_painted_im = cv_im.clone()
-            #cv.inpaint(cv_im, cv_mask, cv_painted_im, 3, cv.INPAINT_TELEA)
-            #self.atlasimg = cv_painted_im.to_pil_image()
+        self.telemetry.set('charts', len(self.chart_ims))
+        self.telemetry.set('atlas_width', self.chart_packing.width)
+        self.telemetry.set('atlas_height', self.chart_packing.height)
+        self.telemetry.set('atlas_coverage', float(numpy.mean(covered)))
 
         self.end_operation()
 
     def split_base_and_pm(self):
         
-        self.begin_operation('Creating progressive stream...')
+        self.begin_operation('split_base_and_pm', 'Creating progressive stream...')
         
         #first uniqify the uvs
         self.new_uvs, self.new_uv_indices, self.old2newuvmap = uniqify_multidim_indexes(self.new_uvs, self.new_uv_indices, return_map=True)
         
-        base_tris = numpy.array(list(self.tris_left), dtype=numpy.int32)
+        #the stream undoes the logged operations starting from the last one,
+        # undoing the changes within each in reverse order too
+        records = self.simplify_operations.records[::-1]
+        groups = self.simplify_operations.groups()[::-1]
+        added = records['kind'] == TRIANGLE_ADDITION
+        num_added = int(numpy.sum(added))
+        
+        #triangles added back are numbered after the base triangles, in the order they're added
+        base_tris = numpy.array(sorted(self.tris_left), dtype=numpy.int32)
         tri_mapping = numpy.zeros(shape=(len(self.all_vert_indices),), dtype=numpy.int32)
-        tri_mapping[base_tris] = numpy.arange(len(self.tris_left), dtype=numpy.int32)
+        tri_mapping[base_tris] = numpy.arange(len(base_tris), dtype=numpy.int32)
+        tri_mapping[records['tri'][added]] = numpy.arange(len(base_tris), len(base_tris) + num_added, dtype=numpy.int32)
         
         #strip out unused indices
         self.all_vert_indices = self.all_vert_indices[base_tris]
         self.all_normal_indices = self.all_normal_indices[base_tris]
         self.new_uv_indices = self.new_uv_indices[base_tris]
 
-        #have to flatten and reshape like this so that it's contiguous
-        stacked_indices = numpy.hstack((self.all_vert_indices.reshape(-1, 1),
-                                        self.all_normal_indices.reshape(-1, 1),
-                                        self.new_uv_indices.reshape(-1, 1))).flatten().reshape((-1, 3))
-        
-        #index_map - maps each unique value back to a location in the original array it came from
-        #   eg. stacked_indices[index_map] == unique_stacked_indices
-        #new_tris - maps original array locations to their location in the unique array
-        #   e.g. unique_stacked_indices[new_tris] == stacked_indices
-        unique_stacked_indices, index_map, new_tris = numpy.unique(stacked_indices.view([('',stacked_indices.dtype)]*stacked_indices.shape[1]), return_index=True, return_inverse=True)
-        unique_stacked_indices = unique_stacked_indices.view(stacked_indices.dtype).reshape(-1,stacked_indices.shape[1])
-        
-        #unique returns as int64, so cast back
-        index_map = numpy.cast['int32'](index_map)
-        new_tris = numpy.cast['int32'](new_tris)
-        
-        #sort the index map to get a list of the index of the first time each value was encountered
-        sorted_map = numpy.cast['int32'](numpy.argsort(index_map))
-        
-        #since we're sorting the unique values, we have to map the new_tris to the new index locations
-        backwards_map = numpy.zeros_like(sorted_map)
-        backwards_map[sorted_map] = numpy.arange(len(sorted_map), dtype=numpy.int32)
-        
-        #now this is the new unique values and their indices
-        unique_stacked_indices = unique_stacked_indices[sorted_map]
-        new_tris = backwards_map[new_tris]
-        new_tris.shape = (-1, 3)
-        
-        oldindex2newindex = {}
-        for i, oldset in enumerate(unique_stacked_indices):
-            oldindex2newindex[tuple(oldset)] = i 
-        
-        print('num unique vert data locs in base mesh', len(unique_stacked_indices))
-        print('num triangles in base mesh', len(self.tris_left))
-        cur_triangle = len(self.tris_left)
-        
-        vertex_buffer = []
-        update_buffer = []
-        triangle_buffer = []
-        operations_buffer = []
-        
-        for operation in reversed(self.simplify_operations):
-            if operation == STREAM_OP.OPERATION_BOUNDARY:
-                num_ops = len(vertex_buffer) + len(update_buffer) + len(triangle_buffer)
-                if num_ops > 0:
-                    entire_op = "%d\n" % num_ops
-                    for s in chain(vertex_buffer, triangle_buffer, update_buffer):
-                        entire_op += s
-                    operations_buffer.append(entire_op)
-                    vertex_buffer = []
-                    update_buffer = []
-                    triangle_buffer = []
-            
-            elif operation[0] == STREAM_OP.INDEX_UPDATE:
-                op, tri_index, vert_index, changed_vert, changed_normal, changed_uv = operation
-                changed_uv = self.old2newuvmap[changed_uv]
-                #print 'index update', tri_index, vert_index, changed_vert, changed_normal, changed_uv
-                
-                new_tri_index = tri_mapping[tri_index]
-                unique_old_index = (changed_vert, changed_normal, changed_uv)
-                if unique_old_index not in oldindex2newindex:
-                    v = self.all_vertices[changed_vert]
-                    n = self.all_normals[changed_normal]
-                    u = self.new_uvs[changed_uv]
-                    vertex_buffer.append("v %.7g %.7g %.7g %.7g %.7g %.7g %.7g %.7g\n" % (v[0], v[1], v[2], n[0], n[1], n[2], u[0], u[1]))
-                    oldindex2newindex[unique_old_index] = len(oldindex2newindex)
-                update_buffer.append("u %d %d\n" % (new_tri_index*3 + vert_index, oldindex2newindex[unique_old_index]))
-                
-            elif operation[0] == STREAM_OP.TRIANGLE_ADDITION:
-                op, oldtri, vert_idx, norm_idx, uv_idx = operation
-                uv_idx = [self.old2newuvmap[uv_idx[0]], self.old2newuvmap[uv_idx[1]], self.old2newuvmap[uv_idx[2]]]
-                #print 'newtri', oldtri, vert_idx, norm_idx, uv_idx
-                
-                newtri = []
-                for pt in ((vert_idx[0], norm_idx[0], uv_idx[0]),
-                           (vert_idx[1], norm_idx[1], uv_idx[1]),
-                           (vert_idx[2], norm_idx[2], uv_idx[2])):
-                    if pt in oldindex2newindex:
-                        newtri.append(oldindex2newindex[pt])
-                    else:
-                        v = self.all_vertices[pt[0]]
-                        n = self.all_normals[pt[1]]
-                        u = self.new_uvs[pt[2]]
-                        vertex_buffer.append("v %.7g %.7g %.7g %.7g %.7g %.7g %.7g %.7g\n" % (v[0], v[1], v[2], n[0], n[1], n[2], u[0], u[1]))
-                        newtri.append(len(oldindex2newindex))
-                        oldindex2newindex[pt] = len(oldindex2newindex)
-                triangle_buffer.append("t %d %d %d\n" % (newtri[0], newtri[1], newtri[2]))
-                tri_mapping[oldtri] = cur_triangle
-                cur_triangle += 1
-            else:
-                assert(False)
-        
-        #check for last operation
-        num_ops = len(vertex_buffer) + len(update_buffer) + len(triangle_buffer)
-        if num_ops > 0:
-            entire_op = "%d\n" % num_ops
-            for s in chain(vertex_buffer, triangle_buffer, update_buffer):
-                entire_op += s
-            operations_buffer.append(entire_op)
-        
-        self.pmbuf.write("PDAE\n")
-        self.pmbuf.write("%d\n" % len(operations_buffer))
-        for op in operations_buffer:
-            self.pmbuf.write(op)
-        operations_buffer = None
+        base_corners = numpy.dstack((self.all_vert_indices, self.all_normal_indices, self.new_uv_indices)).reshape(-1, 3)
+        
+        #(vertex, normal, uv) of each corner the stream refers to, in the order it does:
+        # the three corners of a triangle added back, or the previous corner of an update
+        corner_counts = numpy.where(added, 3, 1)
+        corner_record = numpy.repeat(numpy.arange(len(records)), corner_counts)
+        corner_number = numpy.arange(len(corner_record)) - numpy.repeat(numpy.cumsum(corner_counts) - corner_counts, corner_counts)
+        stream_corners = numpy.empty(shape=(len(corner_record), 3), dtype=numpy.int32)
+        stream_corners[:,0] = records['vert'][corner_record, corner_number]
+        stream_corners[:,1] = records['normal'][corner_record, corner_number]
+        stream_corners[:,2] = self.old2newuvmap[records['uv'][corner_record, corner_number]]
+        
+        #each distinct corner becomes a vertex of the stream, numbered in the order
+        # it's first used, with the ones in the base mesh first
+        all_corners = numpy.concatenate((base_corners, stream_corners))
+        corner_index, first_use = index_rows_by_first_use(all_corners)
+        num_base_verts = int(numpy.sum(first_use[:len(base_corners)]))
+        stream_index = corner_index[len(base_corners):]
+        new_verts = numpy.nonzero(first_use[len(base_corners):])[0]
+        
+        self.telemetry.set('base_vertices', num_base_verts, 'num unique vert data locs in base mesh')
+        self.telemetry.set('base_triangles', len(self.tris_left), 'num triangles in base mesh')
+        
+        #each operation adds its new vertices, then its triangles, then makes its updates
+        added_corners = numpy.nonzero(added[corner_record])[0]
+        updates = numpy.nonzero(~added)[0]
+        update_corners = numpy.nonzero(~added[corner_record])[0]
+        update_locations = tri_mapping[records['tri'][updates]] * 3 + records['corner'][updates]
+        
+        line_records = numpy.concatenate((corner_record[new_verts], numpy.nonzero(added)[0], updates))
+        line_sections = numpy.repeat([0, 1, 2], [len(new_verts), num_added, len(updates)])
+        order = numpy.lexsort((line_records, line_sections, -groups[line_records]))
+        line_groups = groups[line_records][order]
+        group_starts = numpy.nonzero(numpy.diff(line_groups, prepend=-1))[0]
+        
+        if self.binary_stream:
+            #the same order, split into one array per section and refinement
+            refinement_number = numpy.cumsum(numpy.diff(line_groups, prepend=-1) != 0) - 1
+            section_offsets = [0, len(new_verts), len(new_verts) + num_added]
+            section_data = [numpy.hstack((self.all_vertices[stream_corners[new_verts,0]],
+                                          self.all_normals[stream_corners[new_verts,1]],
+                                          self.new_uvs[stream_corners[new_verts,2]])),
+                            stream_index[added_corners].reshape(-1, 3),
+                            numpy.column_stack((update_locations, stream_index[update_corners]))]
+            sections = []
+            for section, data in enumerate(section_data):
+                in_section = line_sections[order] == section
+                data = data[order[in_section] - section_offsets[section]]
+                counts = numpy.bincount(refinement_number[in_section], minlength=len(group_starts))
+                sections.append(numpy.split(data, numpy.cumsum(counts)[:-1]))
+            refinements = [pdae_utils.Refinement(*parts) for parts in zip(*sections)]
+            
+            snapshots = []
+            if self.snapshot_levels is not None:
+                #the base mesh's vertices are numbered in the order they're first used too
+                base_vertex_corners = base_corners[first_use[:len(base_corners)]]
+                vertices = numpy.hstack((self.all_vertices[base_vertex_corners[:,0]],
+                                         self.all_normals[base_vertex_corners[:,1]],
+                                         self.new_uvs[base_vertex_corners[:,2]]))
+                indices = corner_index[:len(base_corners)].astype(numpy.uint32)
+                level = 0
+                for target in self.snapshot_refinement_counts(len(refinements)):
+                    joined = pdae_utils.joinRefinements(refinements[level:target])
+                    vertices, indices = pdae_utils.applyRefinement(vertices, indices, joined)
+                    level = target
+                    snapshots.append(pdae_utils.Snapshot(level, vertices, indices))
+                self.telemetry.set('snapshot_levels', [snapshot.level for snapshot in snapshots])
+            stream_bytes = pdae_utils.writeBPDAE(refinements, self.pmbuf, snapshots)
+        else:
+            lines = []
+            verts = self.all_vertices[stream_corners[new_verts,0]].tolist()
+            normals = self.all_normals[stream_corners[new_verts,1]].tolist()
+            uvs = self.new_uvs[stream_corners[new_verts,2]].tolist()
+            for (v, n, u) in zip(verts, normals, uvs):
+                lines.append("v %.7g %.7g %.7g %.7g %.7g %.7g %.7g %.7g\n" % (v[0], v[1], v[2], n[0], n[1], n[2], u[0], u[1]))
+            for tri in stream_index[added_corners].reshape(-1, 3).tolist():
+                lines.append("t %d %d %d\n" % (tri[0], tri[1], tri[2]))
+            for (location, index) in zip(update_locations.tolist(), stream_index[update_corners].tolist()):
+                lines.append("u %d %d\n" % (location, index))
+            
+            operations_buffer = []
+            order = order.tolist()
+            group_starts = group_starts.tolist() + [len(order)]
+            for start, end in zip(group_starts[:-1], group_starts[1:]):
+                operations_buffer.append("%d\n" % (end - start) + ''.join(lines[i] for i in order[start:end]))
+            
+            self.pmbuf.write("PDAE\n")
+            self.pmbuf.write("%d\n" % len(operations_buffer))
+            for op in operations_buffer:
+                self.pmbuf.write(op)
+            refinements = operations_buffer
+            stream_bytes = sum(len(op) for op in operations_buffer)
+            operations_buffer = None
+        self.telemetry.set('stream_operations', len(refinements))
+        self.telemetry.set('stream_bytes', stream_bytes)
         
         self.end_operation()
 
+    def snapshot_refinement_counts(self, num_refinements):
+        """The distinct numbers of refinements to save snapshots after, in
+        increasing order, for a stream of num_refinements"""
+        counts = set()
+        for kind, level in self.snapshot_levels:
+            if kind == 'fraction':
+                level = int(round(level * num_refinements))
+            counts.add(min(level, num_refinements))
+        return sorted(counts)
+
     def add_back_pm(self):
-        self.begin_operation('Reconstructing full mesh because progressive stream is too small...')
+        self.begin_operation('add_back_pm', 'Reconstructing full mesh because progressive stream is too small...')
         
-        for operation in reversed(self.simplify_operations):
-            if operation == STREAM_OP.OPERATION_BOUNDARY:
-                pass
-            
-            elif operation[0] == STREAM_OP.INDEX_UPDATE:
-                op, tri_index, vert_index, changed_vert, changed_normal, changed_uv = operation
-                self.all_vert_indices[tri_index][vert_index] = changed_vert
-                self.all_normal_indices[tri_index][vert_index] = changed_normal
-                self.new_uv_indices[tri_index][vert_index] = changed_uv
-                
-            elif operation[0] == STREAM_OP.TRIANGLE_ADDITION:
-                pass
+        self.simplify_operations.undo_updates(self.all_vert_indices, self.all_normal_indices, self.new_uv_indices)
         
         self.end_operation()
 
+    def extract_lods(self):
+        self.begin_operation('extract_lods', 'Extracting levels of detail...')
+        
+        #undo operations from the most simplified level of detail back towards
+        # the full mesh, taking the triangles left at each level's mark
+        self.lods = [None] * len(self.lod_marks)
+        position = len(self.simplify_operations)
+        for lod in sorted(range(len(self.lod_marks)), key=lambda lod: -self.lod_marks[lod]):
+            mark = min(position, self.lod_marks[lod])
+            self.simplify_operations.undo_updates(self.all_vert_indices, self.all_normal_indices, self.new_uv_indices,
+                                                  mark, position)
+            self.tris_left.update(self.simplify_operations.removed_triangles(mark, position).tolist())
+            position = mark
+            
+            lod_tris = numpy.array(sorted(self.tris_left), dtype=numpy.int32)
+            self.lods[lod] = (self.all_vert_indices[lod_tris], self.all_normal_indices[lod_tris], self.new_uv_indices[lod_tris])
+        
+        self.telemetry.set('lod_triangles', [len(vert_idx) for (vert_idx, normal_idx, uv_idx) in self.lods],
+                           'number of faces in each level of detail')
+        self.end_operation()
+
     def save_mesh(self):
-        self.begin_operation('(Step 7 of 7) Saving mesh...')
+        self.begin_operation('save_mesh', '(Step 7 of 7) Saving mesh...')
         newmesh = collada.Collada()
         newmesh.assetInfo.title = self.mesh.assetInfo.title
         newmesh.assetInfo.subject = self.mesh.assetInfo.subject
@@ -2020,12 +2100,14 @@ class SanderSimplify(object):
         newmesh.assetInfo.keywords = self.mesh.assetInfo.keywords
         newmesh.assetInfo.upaxis = self.mesh.assetInfo.upaxis
         
-        sander_contributor = collada.asset.Contributor(authoring_tool='meshtool',
-                                                       comments='Retextured and simplified base mesh using Texture Mapping Progressive Meshes, Sander et al.')
+        comments = 'Retextured and simplified base mesh using Texture Mapping Progressive Meshes, Sander et al.'
+        if len(self.time_budget.truncated) > 0:
+            comments += ' Phases stopped early to fit a %g second time budget: %s.' % (self.time_budget.seconds, ', '.join(self.time_budget.truncated))
+        sander_contributor = collada.asset.Contributor(authoring_tool='meshtool', comments=comments)
         newmesh.assetInfo.contributors.append(sander_contributor)
         
         cimg = collada.material.CImage("sander-simplify-packed-atlas", "./atlas.jpg")
-        imgout = StringIO()
+        imgout = BytesIO()
         self.atlasimg.save(imgout, format="JPEG", quality=95, optimize=True)
         cimg.setData(imgout.getvalue())
         newmesh.images.append(cimg)
@@ -2038,49 +2120,69 @@ class SanderSimplify(object):
         material = collada.material.Material("sander-simplify-material0", "sander-simplify-material", effect)
         newmesh.materials.append(material)
         
-        vert_src = collada.source.FloatSource("sander-verts-array", self.all_vertices, ('X', 'Y', 'Z'))
-        normal_src = collada.source.FloatSource("sander-normals-array", self.all_normals, ('X', 'Y', 'Z'))
-        uv_src = collada.source.FloatSource("sander-uv-array", self.new_uvs, ('S', 'T'))
-        geom = collada.geometry.Geometry(newmesh, "sander-geometry-0", "sander-mesh", [vert_src, normal_src, uv_src])
-        
-        input_list = collada.source.InputList()
-        input_list.addInput(0, 'VERTEX', '#sander-verts-array')
-        input_list.addInput(1, 'NORMAL', '#sander-normals-array')
-        input_list.addInput(2, 'TEXCOORD', '#sander-uv-array')
-        
-        new_index = numpy.dstack((self.all_vert_indices, self.all_normal_indices, self.new_uv_indices)).flatten()
-        triset = geom.createTriangleSet(new_index, input_list, "materialref")
-        geom.primitives.append(triset)
-        newmesh.geometries.append(geom)
-        
-        matnode = collada.scene.MaterialNode("materialref", material, inputs=[('TEX0', 'TEXCOORD', '0')])
-        geomnode = collada.scene.GeometryNode(geom, [matnode])
-        node = collada.scene.Node("node0", children=[geomnode])
-        
-        myscene = collada.scene.Scene("myscene", [node])
-        newmesh.scenes.append(myscene)
-        newmesh.scene = myscene
+        if self.lods is None:
+            levels = [(self.all_vertices, self.all_normals, self.new_uvs,
+                       self.all_vert_indices, self.all_normal_indices, self.new_uv_indices)]
+        else:
+            #each level of detail only gets the vertex data it uses
+            levels = []
+            for lod_indices in self.lods:
+                level_data = []
+                level_indices = []
+                for data, indices in zip((self.all_vertices, self.all_normals, self.new_uvs), lod_indices):
+                    used, remapped = numpy.unique(indices, return_inverse=True)
+                    level_data.append(data[used])
+                    level_indices.append(remapped.astype(numpy.int32).reshape(-1, 3))
+                levels.append(tuple(level_data) + tuple(level_indices))
+        
+        for lod, (vertices, normals, uvs, vert_indices, normal_indices, uv_indices) in enumerate(levels):
+            prefix = 'sander' if lod == 0 else 'sander-lod%d' % lod
+            vert_src = collada.source.FloatSource(prefix + "-verts-array", vertices, ('X', 'Y', 'Z'))
+            normal_src = collada.source.FloatSource(prefix + "-normals-array", normals, ('X', 'Y', 'Z'))
+            uv_src = collada.source.FloatSource(prefix + "-uv-array", uvs, ('S', 'T'))
+            geom = collada.geometry.Geometry(newmesh, "sander-geometry-%d" % lod,
+                                             "sander-mesh" if lod == 0 else "sander-mesh-lod%d" % lod,
+                                             [vert_src, normal_src, uv_src])
+            
+            input_list = collada.source.InputList()
+            input_list.addInput(0, 'VERTEX', '#' + prefix + '-verts-array')
+            input_list.addInput(1, 'NORMAL', '#' + prefix + '-normals-array')
+            input_list.addInput(2, 'TEXCOORD', '#' + prefix + '-uv-array')
+            
+            new_index = numpy.dstack((vert_indices, normal_indices, uv_indices)).flatten()
+            triset = geom.createTriangleSet(new_index, input_list, "materialref")
+            geom.primitives.append(triset)
+            newmesh.geometries.append(geom)
+            
+            #each level of detail is in its own scene, with the first as the default
+            matnode = collada.scene.MaterialNode("materialref", material, inputs=[('TEX0', 'TEXCOORD', '0')])
+            geomnode = collada.scene.GeometryNode(geom, [matnode])
+            node = collada.scene.Node("node%d" % lod, children=[geomnode])
+            
+            myscene = collada.scene.Scene("myscene" if lod == 0 else "myscene-lod%d" % lod, [node])
+            newmesh.scenes.append(myscene)
+        newmesh.scene = newmesh.scenes[0]
         self.end_operation()
         return newmesh
 
-    def simplify(self):
+    def create_charts(self):
         self.uniqify_list()
         self.build_vertex_graph()
         self.build_face_graph()
         
-        #renderCharts(self.facegraph, self.all_vertices, self.all_vert_indices)
-        print('number of vertices =', len(self.vertexgraph))
-        print('number of faces =', len(self.facegraph))
-        print('connected vertex components =', nx.number_connected_components(self.vertexgraph))
-        print('connected face components =', nx.number_connected_components(self.facegraph))
+        #renderCharts(self.charts, self.all_vertices, self.all_vert_indices)
+        self.telemetry.set('vertices', len(self.all_vertices), 'number of vertices')
+        self.telemetry.set('faces', len(self.charts), 'number of faces')
+        self.telemetry.set('vertex_components', self.adjacency.vertex_components(), 'connected vertex components')
+        self.telemetry.set('face_components', self.chart_components(), 'connected face components')
         
         self.initialize_chart_merge_errors()
         self.merge_charts()
         
-        print('number of charts =', len(self.facegraph))
-        print('connected face components =', nx.number_connected_components(self.facegraph))
+        self.telemetry.set('charts', len(self.charts), 'number of charts')
+        self.telemetry.set('chart_components', self.chart_components(), 'connected face components')
         
-        #renderCharts(self.facegraph, self.all_vertices, self.all_vert_indices)
+        #renderCharts(self.charts, self.all_vertices, self.all_vert_indices)
         
         self.update_corners()
         
@@ -2088,21 +2190,99 @@ class SanderSimplify(object):
         self.straighten_chart_boundaries()
         self.update_corners(enforce=True)
         
-        #renderCharts(self.facegraph, self.all_vertices, self.all_vert_indices)
+        #renderCharts(self.charts, self.all_vertices, self.all_vert_indices)
         
+    def parameterize_charts(self):
         self.create_initial_parameterizations()
         self.optimize_chart_parameterizations()
+        
+    def bake_charts(self):
         self.resize_charts()
-        print('texture size = (%dx%d)' % (self.chart_packing.width, self.chart_packing.height))
         
+    def simplify_base_mesh(self):
         self.initialize_simplification_errors()
         self.simplify_mesh()
-        print('number of faces in base mesh after simplification =', len(self.tris_left))
-        self.enforce_simplification()
-        print('number of faces in base mesh after enforced simplification =', len(self.tris_left))
+        self.telemetry.set('triangles', len(self.tris_left), 'number of faces in base mesh after simplification')
+        if self.lod_targets is None:
+            self.enforce_simplification()
+            self.telemetry.set('base_triangles', len(self.tris_left), 'number of faces in base mesh after enforced simplification')
         
+    def create_atlas(self):
         self.normalize_uvs()
         self.pack_charts()
+    
+    def input_fingerprint(self):
+        """Identifies the aggregated input mesh and the settings the
+        result depends on, to match checkpoints to"""
+        materials = []
+        for (i, mat) in self.tri2material:
+            if mat is None or mat.effect is None or mat.effect.diffuse is None:
+                materials.append((i, None))
+            elif isinstance(mat.effect.diffuse, tuple):
+                materials.append((i, mat.effect.diffuse))
+            else:
+                data = mat.effect.diffuse.sampler.surface.image.data
+                materials.append((i, hashlib.sha256(data).hexdigest()))
+        return fingerprint([self.all_vertices, self.all_normals, self.all_orig_uvs, self.all_vert_indices,
+                            self.all_normal_indices, self.all_orig_uv_indices],
+                           [materials, self.lod_targets, self.time_budget.seconds, MERGE_ERROR_THRESHOLD,
+                            SIMPLIFICATION_ERROR_THRESHOLD, TRIANGLE_MAXIMUM])
+    
+    def save_checkpoint(self, checkpoint, stage):
+        self.begin_operation('save_checkpoint', 'Saving checkpoint...')
+        state = dict((k, v) for (k, v) in self.__dict__.items() if k not in CHECKPOINT_EXCLUDE)
+        state['truncated_phases'] = self.time_budget.truncated
+        checkpoint.save(stage, state)
+        self.telemetry.set('stage', stage)
+        self.telemetry.set('bytes', os.path.getsize(checkpoint.path))
+        self.end_operation()
+    
+    def load_checkpoint(self, checkpoint):
+        """Restores the state of the last stage saved to checkpoint.
+        Returns the number of stages it covers."""
+        self.begin_operation('load_checkpoint', 'Looking for checkpoint...')
+        saved = checkpoint.load([stage for (stage, function) in self.stages()])
+        if saved is None:
+            self.end_operation()
+            return 0
+        stage, state = saved
+        for phase in state.pop('truncated_phases'):
+            self.time_budget.truncate(phase)
+        self.__dict__.update(state)
+        self.telemetry.set('stage', stage, 'resuming after stage')
+        self.end_operation()
+        return [name for (name, function) in self.stages()].index(stage) + 1
+    
+    def stages(self):
+        """The stages of simplify() a checkpoint can be saved after"""
+        return [('charts', self.create_charts),
+                ('parameterizations', self.parameterize_charts),
+                ('chart_images', self.bake_charts),
+                ('simplification', self.simplify_base_mesh),
+                ('atlas', self.create_atlas)]
+    
+    def simplify(self):
+        checkpoint = None
+        done = 0
+        if checkpoint_dir() is not None:
+            checkpoint = Checkpoint(checkpoint_dir(), 'sander_simplify', self.input_fingerprint())
+            done = self.load_checkpoint(checkpoint)
+        
+        for stage, function in self.stages()[done:]:
+            function()
+            if checkpoint is not None:
+                self.save_checkpoint(checkpoint, stage)
+        
+        if len(self.time_budget.truncated) > 0:
+            self.telemetry.set('truncated_phases', ', '.join(self.time_budget.truncated),
+                               'phases stopped early to fit the time budget')
+        
+        if self.lod_targets is not None:
+            self.extract_lods()
+            mesh = self.save_mesh()
+            if checkpoint is not None:
+                checkpoint.remove()
+            return mesh
         
         self.orig_tri_count = len(self.all_vert_indices)
         self.base_tri_count = len(self.tris_left)
@@ -2116,25 +2296,33 @@ class SanderSimplify(object):
         else:
             self.split_base_and_pm()
         
-        return self.save_mesh()
+        mesh = self.save_mesh()
+        if checkpoint is not None:
+            checkpoint.remove()
+        return mesh
 
 def FilterGenerator():
     class SandlerSimplificationFilter(SimplifyFilter):
         def __init__(self):
             super(SandlerSimplificationFilter, self).__init__('sander_simplify', 'Simplifies the mesh based on sandler, et al. method.')
-            self.arguments.append(FileArgument('pm_file', 'Where to save the progressive mesh stream'))
-        def apply(self, mesh, pm_file):
-            try:
-                pmout = open(pm_file, 'w')
-            except TypeError:
-                pmout = pm_file
-            
+            self.arguments.append(FileArgument('pm_file', 'Where to save the progressive mesh stream, as binary BPDAE if its name ends in .bpdae'))
+        def simplify(self, mesh, pmout):
             s = SanderSimplify(mesh, pmout)
             if USE_IPDB:
                 with launch_ipdb_on_exception():
-                    mesh = s.simplify()
-            else:
-                mesh = s.simplify()
+                    return s, s.simplify()
+            return s, s.simplify()
+        def apply(self, mesh, pm_file):
+            if not isinstance(pm_file, str):
+                #a file object given by the caller is written to and left open
+                s, mesh = self.simplify(mesh, pm_file)
+                return mesh
+            
+            with open(pm_file, 'wb' if pm_file.endswith('.bpdae') else 'w') as pmout:
+                s, mesh = self.simplify(mesh, pmout)
+            
+            if telemetry_enabled():
+                s.save_telemetry(sidecar_path(pm_file))
             return mesh
     return SandlerSimplificationFilter()
 from meshtool.filters import factory
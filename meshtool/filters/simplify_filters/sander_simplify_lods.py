@@ -0,0 +1,53 @@
+from meshtool.args import FilterArgument
+from meshtool.filters.base_filters import SimplifyFilter, FilterException
+from meshtool.filters.simplify_filters.sander_simplify import SanderSimplify, USE_IPDB
+
+if USE_IPDB:
+    from ipdb import launch_ipdb_on_exception
+
+def parse_lod_targets(targets):
+    """Parses a comma separated list of level of detail targets. Whole
+    numbers are triangle counts, and numbers with a decimal point are
+    error levels between 0 and 1, the same scale as
+    SIMPLIFICATION_ERROR_THRESHOLD. Returns a list of ('triangles', count)
+    and ('error', level) tuples in the given order."""
+    parsed = []
+    for target in str(targets).split(','):
+        target = target.strip()
+        try:
+            if '.' in target:
+                level = float(target)
+                if not 0 <= level <= 1:
+                    raise ValueError()
+                parsed.append(('error', level))
+            else:
+                count = int(target)
+                if count < 0:
+                    raise ValueError()
+                parsed.append(('triangles', count))
+        except ValueError:
+            raise FilterException("invalid level of detail target '%s'" % target)
+    return parsed
+
+def FilterGenerator():
+    class SandlerSimplificationLODFilter(SimplifyFilter):
+        def __init__(self):
+            super(SandlerSimplificationLODFilter, self).__init__('sander_simplify_lods',
+                    'Simplifies the mesh based on sandler, et al. method into several levels of detail in one pass, ' +
+                    'all sharing one texture atlas. Each level is saved as its own geometry and scene, with the first ' +
+                    'as the default scene. Targets are comma separated triangle counts, or error levels between ' +
+                    '0 and 1 with a decimal point, e.g. 20000,5000,0.95')
+            self.arguments.append(FilterArgument('targets', 'Comma separated triangle counts, or error levels ' +
+                                                 'between 0 and 1 with a decimal point, of each level of detail, ' +
+                                                 'e.g. 20000,5000,0.95'))
+        def apply(self, mesh, targets):
+            s = SanderSimplify(mesh, None, lod_targets=parse_lod_targets(targets))
+            if USE_IPDB:
+                with launch_ipdb_on_exception():
+                    mesh = s.simplify()
+            else:
+                mesh = s.simplify()
+            return mesh
+    return SandlerSimplificationLODFilter()
+from meshtool.filters import factory
+factory.register(FilterGenerator().name, FilterGenerator)
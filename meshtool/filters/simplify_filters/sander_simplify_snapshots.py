@@ -0,0 +1,68 @@
+from meshtool.args import FileArgument, FilterArgument
+from meshtool.filters.base_filters import SimplifyFilter, FilterException
+from meshtool.filters.simplify_filters.sander_simplify import SanderSimplify, USE_IPDB
+from meshtool.filters.simplify_filters.telemetry import telemetry_enabled, sidecar_path
+
+if USE_IPDB:
+    from ipdb import launch_ipdb_on_exception
+
+def parse_snapshot_levels(levels):
+    """Parses a comma separated list of progressive stream levels. Whole
+    numbers are numbers of refinements, and numbers with a decimal point
+    are fractions of the stream between 0 and 1. Returns a list of
+    ('refinements', count) and ('fraction', fraction) tuples in the given
+    order."""
+    parsed = []
+    for level in str(levels).split(','):
+        level = level.strip()
+        try:
+            if '.' in level:
+                fraction = float(level)
+                if not 0 <= fraction <= 1:
+                    raise ValueError()
+                parsed.append(('fraction', fraction))
+            else:
+                count = int(level)
+                if count < 0:
+                    raise ValueError()
+                parsed.append(('refinements', count))
+        except ValueError:
+            raise FilterException("invalid snapshot level '%s'" % level)
+    return parsed
+
+def FilterGenerator():
+    class SandlerSimplificationSnapshotFilter(SimplifyFilter):
+        def __init__(self):
+            super(SandlerSimplificationSnapshotFilter, self).__init__('sander_simplify_snapshots',
+                    'Simplifies the mesh based on sandler, et al. method, saving a BPDAE progressive stream ' +
+                    'with snapshots of the full mesh at the given levels, so a level can be loaded from the ' +
+                    'nearest snapshot below it. Levels are comma separated numbers of refinements, or ' +
+                    'fractions of the stream between 0 and 1 with a decimal point, e.g. 0.25,0.5,0.75')
+            self.arguments.append(FileArgument('pm_file', 'Where to save the progressive mesh stream, which ' +
+                                               'must be named .bpdae'))
+            self.arguments.append(FilterArgument('levels', 'Comma separated numbers of refinements, or ' +
+                                                 'fractions of the stream between 0 and 1 with a decimal ' +
+                                                 'point, to save snapshots at, e.g. 0.25,0.5,0.75'))
+        def apply(self, mesh, pm_file, levels):
+            snapshot_levels = parse_snapshot_levels(levels)
+            if not str(pm_file).endswith('.bpdae'):
+                raise FilterException("snapshots can only be saved to a .bpdae stream")
+            try:
+                pmout = open(pm_file, 'wb')
+            except IOError as ex:
+                raise FilterException("Error opening pm file: %s" % str(ex))
+
+            with pmout:
+                s = SanderSimplify(mesh, pmout, snapshot_levels=snapshot_levels)
+                if USE_IPDB:
+                    with launch_ipdb_on_exception():
+                        mesh = s.simplify()
+                else:
+                    mesh = s.simplify()
+
+            if telemetry_enabled():
+                s.save_telemetry(sidecar_path(pm_file))
+            return mesh
+    return SandlerSimplificationSnapshotFilter()
+from meshtool.filters import factory
+factory.register(FilterGenerator().name, FilterGenerator)
@@ -0,0 +1,136 @@
+"""Per-phase measurements of a filter that runs in several phases
+
+Each phase records its wall time, CPU time of this process and of any
+worker processes that finished during it, the peak resident set size at
+its end and how much it grew, and counters specific to the phase such as
+heap operations or rejected merges by reason.
+
+Filters that record telemetry write it as a JSON sidecar next to their
+output when $MESHTOOL_TELEMETRY is set, which is what
+``meshtool --telemetry`` does.
+"""
+
+import os
+import sys
+import time
+import json
+import meshtool
+from meshtool.profiling import peak_rss, resource
+
+def telemetry_enabled():
+    return os.environ.get('MESHTOOL_TELEMETRY', '') not in ('', '0')
+
+def sidecar_path(output_path):
+    """Path of the telemetry sidecar for a filter's output file"""
+    return os.path.splitext(output_path)[0] + '.telemetry.json'
+
+def child_cpu_time():
+    """CPU seconds used by child processes that have been waited for"""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def format_seconds(seconds):
+    seconds = int(seconds)
+    hours = seconds // 3600
+    minutes = (seconds % 3600) // 60
+    parts = []
+    if hours > 0: parts.append("%dh" % hours)
+    if hours > 0 or minutes > 0: parts.append("%dm" % minutes)
+    parts.append("%ds" % (seconds % 60))
+    return ' '.join(parts)
+
+class PhaseTelemetry(object):
+    """Records a list of phases in the order they ran. If verbose, progress
+    messages, the time each phase took and any counters set with a label
+    are printed to stdout."""
+    def __init__(self, verbose=True):
+        self.verbose = verbose
+        self.phases = []
+        self.current = None
+        self.start = time.time()
+
+    def begin(self, phase, message=None):
+        if message is not None and self.verbose:
+            sys.stdout.write(message + ' ')
+            sys.stdout.flush()
+        rss = peak_rss()
+        self.current = {'phase': phase,
+                        'counters': {},
+                        '_wall': time.time(),
+                        '_cpu': time.process_time(),
+                        '_child_cpu': child_cpu_time(),
+                        '_rss': rss,
+                        '_reported': []}
+
+    def end(self):
+        entry = self.current
+        self.current = None
+        wall = time.time() - entry.pop('_wall')
+        rss_before = entry.pop('_rss')
+        rss_after = peak_rss()
+        entry['wall_seconds'] = wall
+        entry['cpu_seconds'] = time.process_time() - entry.pop('_cpu')
+        entry['child_cpu_seconds'] = child_cpu_time() - entry.pop('_child_cpu')
+        entry['peak_rss'] = rss_after
+        entry['peak_rss_delta'] = rss_after - rss_before if rss_before is not None else None
+        reported = entry.pop('_reported')
+        self.phases.append(entry)
+        if self.verbose:
+            sys.stdout.write(format_seconds(wall) + "\n")
+            for line in reported:
+                sys.stdout.write(line)
+        return entry
+
+    def _counters(self):
+        """Counters of the running phase, or of the last one to finish"""
+        if self.current is not None:
+            return self.current['counters']
+        if len(self.phases) == 0:
+            raise ValueError('no phase has been recorded')
+        return self.phases[-1]['counters']
+
+    def count(self, name, n=1, reason=None):
+        """Adds n to a counter. With a reason, the counter is a dict
+        counting each reason separately."""
+        counters = self._counters()
+        if reason is None:
+            counters[name] = counters.get(name, 0) + n
+        else:
+            by_reason = counters.setdefault(name, {})
+            by_reason[reason] = by_reason.get(reason, 0) + n
+
+    def set(self, name, value, label=None):
+        """Sets a counter. With a label it's also reported, as a line of
+        'label = value' that a running phase holds back until its time
+        has been printed."""
+        self._counters()[name] = value
+        if label is not None and self.verbose:
+            line = '%s = %s\n' % (label, value)
+            if self.current is not None:
+                self.current['_reported'].append(line)
+            else:
+                sys.stdout.write(line)
+
+    def get(self, phase, name, default=None):
+        """Value of a counter in the last run of a phase"""
+        for entry in reversed(self.phases):
+            if entry['phase'] == phase:
+                return entry['counters'].get(name, default)
+        return default
+
+    def report(self):
+        return {'meshtool_version': meshtool.__version__,
+                'total_wall_seconds': time.time() - self.start,
+                'total_cpu_seconds': sum(entry['cpu_seconds'] for entry in self.phases),
+                'total_child_cpu_seconds': sum(entry['child_cpu_seconds'] for entry in self.phases),
+                'peak_rss': peak_rss(),
+                'phases': self.phases}
+
+    def save(self, filename, **extra):
+        """Writes the report as JSON, with any extra top level keys"""
+        report = self.report()
+        report.update(extra)
+        with open(filename, 'w') as f:
+            json.dump(report, f, indent=2)
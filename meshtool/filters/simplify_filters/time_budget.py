@@ -0,0 +1,51 @@
+"""Splits a wall clock time budget between the phases of a filter
+
+Each phase gets a deadline at the start of the budget plus its share
+and the shares of every phase before it, so time one phase doesn't use
+carries over to the ones after it. A phase that can stop early checks
+:meth:`TimeBudget.expired` as it goes and finishes with the best valid
+state it has reached, and is then reported as truncated.
+
+The budget defaults to $MESHTOOL_TIME_BUDGET seconds, which is what
+``meshtool --time_budget seconds`` sets. Without one nothing expires.
+"""
+
+import os
+import time
+
+def default_time_budget():
+    try:
+        seconds = float(os.environ.get('MESHTOOL_TIME_BUDGET', 0))
+    except ValueError:
+        return None
+    return seconds if seconds > 0 else None
+
+class TimeBudget(object):
+    def __init__(self, seconds, phases):
+        """:param seconds: total number of seconds, or None for no limit
+        :param phases: list of (phase name, fraction of the budget) in
+                       the order the phases run"""
+        self.seconds = seconds
+        self.start = time.time()
+        self.deadlines = {}
+        elapsed_fraction = 0
+        for phase, fraction in phases:
+            elapsed_fraction += fraction
+            self.deadlines[phase] = None if seconds is None else self.start + seconds * elapsed_fraction
+        self.truncated = []
+
+    def deadline(self, phase):
+        """Time, as from time.time(), that phase should finish by, or None"""
+        return self.deadlines[phase]
+
+    def expired(self, phase):
+        """Whether phase is past its deadline, marking it as truncated if so"""
+        deadline = self.deadlines[phase]
+        if deadline is None or time.time() <= deadline:
+            return False
+        self.truncate(phase)
+        return True
+
+    def truncate(self, phase):
+        if phase not in self.truncated:
+            self.truncated.append(phase)
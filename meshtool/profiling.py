@@ -0,0 +1,127 @@
+"""Per-filter profiling of a filter chain
+
+Records wall time, CPU time, growth of the peak resident set size, and
+mesh statistics before and after each filter. Meta filters that run
+other filters through :func:`profile_filter` get their sub-filters
+recorded as children."""
+
+import sys
+import time
+import json
+import platform
+import datetime
+import meshtool
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# the profiler currently recording a chain, if any
+_active = None
+
+def peak_rss():
+    """Returns the peak resident set size of this process in bytes,
+    or None if it can't be determined on this platform"""
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #ru_maxrss is in bytes on mac but kilobytes everywhere else
+    if sys.platform == 'darwin':
+        return maxrss
+    return maxrss * 1024
+
+def mesh_counts(mesh):
+    """Returns a dict of statistics about a mesh used for comparing
+    before and after a filter runs"""
+    import collada
+    if not isinstance(mesh, collada.Collada):
+        return None
+    from meshtool.filters.print_filters.print_render_info import getRenderInfo
+    render_info = getRenderInfo(mesh)
+    return {'triangles': render_info['num_triangles'],
+            'vertices': render_info['num_vertices'],
+            'primitives': render_info['num_draw_raw'],
+            'images': len(mesh.images),
+            'texture_bytes': render_info['texture_ram']}
+
+class FilterProfiler(object):
+    """Collects a tree of per-filter measurements"""
+    def __init__(self):
+        self.results = []
+        self._stack = []
+        #time spent computing mesh_counts, which is excluded from filter timings
+        self._overhead_wall = 0.0
+        self._overhead_cpu = 0.0
+
+    def _counts(self, mesh):
+        wall_start = time.time()
+        cpu_start = time.process_time()
+        counts = mesh_counts(mesh)
+        self._overhead_wall += time.time() - wall_start
+        self._overhead_cpu += time.process_time() - cpu_start
+        return counts
+
+    def run(self, name, arguments, mesh, func):
+        """Calls func() which runs the filter called name on mesh, recording
+        it. Returns whatever func returns."""
+        global _active
+
+        entry = {'filter': name,
+                 'arguments': list(arguments),
+                 'before': self._counts(mesh),
+                 'children': []}
+        if len(self._stack) > 0:
+            self._stack[-1]['children'].append(entry)
+        else:
+            self.results.append(entry)
+
+        self._stack.append(entry)
+        prev_active = _active
+        _active = self
+        overhead_wall = self._overhead_wall
+        overhead_cpu = self._overhead_cpu
+        rss_before = peak_rss()
+        wall_start = time.time()
+        cpu_start = time.process_time()
+        result = None
+        try:
+            result = func()
+        except Exception as e:
+            entry['error'] = str(e)
+            raise
+        finally:
+            wall = time.time() - wall_start
+            cpu = time.process_time() - cpu_start
+            rss_after = peak_rss()
+            _active = prev_active
+            self._stack.pop()
+
+            entry['wall_seconds'] = wall - (self._overhead_wall - overhead_wall)
+            entry['cpu_seconds'] = cpu - (self._overhead_cpu - overhead_cpu)
+            entry['peak_rss_delta'] = rss_after - rss_before if rss_before is not None else None
+            entry['after'] = self._counts(result) if 'error' not in entry else None
+        return result
+
+    def report(self):
+        def total(key):
+            return sum(entry[key] for entry in self.results if key in entry)
+        return {'meshtool_version': meshtool.__version__,
+                'python_version': platform.python_version(),
+                'platform': platform.platform(),
+                'timestamp': datetime.datetime.now().isoformat(),
+                'total_wall_seconds': total('wall_seconds'),
+                'total_cpu_seconds': total('cpu_seconds'),
+                'peak_rss': peak_rss(),
+                'filters': self.results}
+
+    def save(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+def profile_filter(name, inst, mesh, *arguments):
+    """Applies an operation filter to a mesh. If a chain is currently being
+    profiled, the filter is recorded as a child of the filter calling it."""
+    if _active is None:
+        return inst.apply(mesh, *arguments)
+    return _active.run(name, arguments, mesh, lambda: inst.apply(mesh, *arguments))
@@ -0,0 +1,346 @@
+"""Long running job server that keeps a pool of warm worker processes
+
+Jobs are sent as HTTP requests, either over a Unix domain socket or a
+localhost TCP port. Each job is an input file and a filter chain whose
+arguments are templates, the same as with --batch::
+
+    POST /jobs
+    {"input": "models/duck.dae",
+     "chain": [["load_collada", "{input}"],
+               ["medium_optimizations"],
+               ["save_collada", "out/{name}.dae"]],
+     "timeout": 60}
+
+The response is the same result record --batch writes for each file.
+If the job queue is full, the server answers 503 right away so clients
+can back off and retry. ``GET /health`` reports queue depth, job counts
+and per-filter latency.
+
+:class:`ServeClient` is a small client for scripts and tests.
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import threading
+import multiprocessing
+import http.client
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Queue, Full
+
+from meshtool.chain import ChainException, resolve_chain
+from meshtool.batch import WorkerProcess, JobTimeout
+
+DEFAULT_QUEUE_SIZE = 32
+
+def parse_address(address):
+    """Returns (family, address) for a server address string, which is
+    either a path to a Unix domain socket (optionally prefixed with
+    ``unix:``), or ``host:port`` or just ``port`` for localhost HTTP"""
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    if os.sep in address or address.endswith('.sock'):
+        return socket.AF_UNIX, address
+    host, sep, port = address.rpartition(':')
+    if not sep:
+        host = '127.0.0.1'
+    try:
+        return socket.AF_INET, (host, int(port))
+    except ValueError:
+        raise ValueError("invalid server address '%s'" % address)
+
+def parse_chain(chain):
+    """Converts a job's chain, a list of [filter_name, arg, ...] lists,
+    to the (filter_name, arguments) tuples used by resolve_chain"""
+    if not isinstance(chain, list) or len(chain) == 0:
+        raise ChainException("chain must be a non-empty list", usage=True)
+    ordered_args = []
+    for item in chain:
+        if isinstance(item, str):
+            item = [item]
+        if not isinstance(item, list) or len(item) == 0 or not all(isinstance(a, str) for a in item):
+            raise ChainException("each filter in the chain must be a list of strings", usage=True)
+        ordered_args.append((item[0], item[1:]))
+    return ordered_args
+
+class Job(object):
+    def __init__(self, index, ordered_args, input_path, timeout):
+        self.index = index
+        self.ordered_args = ordered_args
+        self.input_path = input_path
+        self.timeout = timeout
+        self.queued = time.time()
+        self.record = None
+        self.done = threading.Event()
+
+class FilterStats(object):
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def to_dict(self):
+        return {'count': self.count,
+                'total_seconds': self.total_seconds,
+                'mean_seconds': self.total_seconds / self.count if self.count > 0 else 0.0,
+                'max_seconds': self.max_seconds}
+
+class JobServer(object):
+    """Queues submitted jobs and runs them on a pool of worker processes
+
+    :param workers: number of worker processes, defaults to the number of CPUs
+    :param queue_size: maximum number of jobs waiting for a worker. Jobs
+                       submitted when the queue is full are rejected.
+    :param timeout: default number of seconds a job may run before its
+                    worker is killed, or None for no limit
+    :param cache: optional :class:`meshtool.cache.ResultCache`
+    """
+    def __init__(self, workers=None, queue_size=DEFAULT_QUEUE_SIZE, timeout=None, cache=None):
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        self.num_workers = workers
+        self.timeout = timeout
+        self.cache = cache
+        self.queue = Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.next_index = 0
+        self.running = 0
+        self.counts = {'completed': 0, 'failed': 0, 'timeouts': 0, 'rejected': 0}
+        self.filter_stats = {}
+        self.queue_wait = FilterStats()
+        self.workers = []
+        self.threads = []
+
+    def start(self):
+        for i in range(self.num_workers):
+            worker = WorkerProcess(self.cache)
+            thread = threading.Thread(target=self._dispatch, args=(worker,))
+            thread.daemon = True
+            thread.start()
+            self.workers.append(worker)
+            self.threads.append(thread)
+
+    def stop(self):
+        for thread in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        for worker in self.workers:
+            worker.stop()
+        self.workers = []
+        self.threads = []
+
+    def submit(self, ordered_args, input_path, timeout=None):
+        """Queues a job, returning it. Raises ChainException if the chain
+        is invalid, or queue.Full if there's no room for it."""
+        resolve_chain(ordered_args)
+        with self.lock:
+            index = self.next_index
+            self.next_index += 1
+        job = Job(index, ordered_args, input_path, timeout if timeout is not None else self.timeout)
+        try:
+            self.queue.put_nowait(job)
+        except Full:
+            with self.lock:
+                self.counts['rejected'] += 1
+            raise
+        return job
+
+    def _dispatch(self, worker):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            with self.lock:
+                self.running += 1
+                self.queue_wait.add(time.time() - job.queued)
+            # whatever happens, the job is finished so its request returns
+            job.record = {'index': job.index, 'input': job.input_path, 'status': 'error',
+                          'error': 'worker process exited unexpectedly',
+                          'filter': None, 'cached': False, 'timings': [], 'seconds': 0.0}
+            try:
+                job.record = worker.run((job.ordered_args, job.input_path, job.index), job.timeout)
+            except JobTimeout:
+                job.record = {'index': job.index, 'input': job.input_path, 'status': 'timeout',
+                              'error': 'job took longer than %g seconds' % job.timeout,
+                              'filter': None, 'cached': False, 'timings': [], 'seconds': job.timeout}
+            except EOFError:
+                pass
+            finally:
+                self._record(job.record)
+                job.done.set()
+
+    def _record(self, record):
+        with self.lock:
+            self.running -= 1
+            if record['status'] == 'ok':
+                self.counts['completed'] += 1
+            elif record['status'] == 'timeout':
+                self.counts['timeouts'] += 1
+            else:
+                self.counts['failed'] += 1
+            for timing in record['timings']:
+                self.filter_stats.setdefault(timing['filter'], FilterStats()).add(timing['seconds'])
+
+    def health(self):
+        with self.lock:
+            return {'status': 'ok',
+                    'uptime_seconds': time.time() - self.started,
+                    'workers': self.num_workers,
+                    'queue_depth': self.queue.qsize(),
+                    'queue_size': self.queue.maxsize,
+                    'running': self.running,
+                    'jobs': dict(self.counts),
+                    'queue_wait': self.queue_wait.to_dict(),
+                    'filters': dict((name, stats.to_dict()) for name, stats in self.filter_stats.items())}
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    def send_json(self, code, obj, headers=None):
+        body = json.dumps(obj).encode('utf8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path in ('/health', '/metrics'):
+            self.send_json(200, self.server.jobs.health())
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/jobs':
+            self.send_json(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length).decode('utf8'))
+            input_path = request['input']
+            ordered_args = parse_chain(request['chain'])
+            timeout = request.get('timeout')
+            if timeout is not None:
+                timeout = float(timeout)
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {'error': 'invalid job: %s' % str(e)})
+            return
+        except ChainException as e:
+            self.send_json(400, {'error': str(e)})
+            return
+
+        try:
+            job = self.server.jobs.submit(ordered_args, input_path, timeout)
+        except ChainException as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        except Full:
+            self.send_json(503, {'error': 'job queue is full'}, {'Retry-After': '1'})
+            return
+
+        job.done.wait()
+        code = {'ok': 200, 'timeout': 504}.get(job.record['status'], 500)
+        self.send_json(code, job.record)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            sys.stderr.write("meshtool serve: %s\n" % (format % args))
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def make_server(address, jobs, verbose=False):
+    """Creates an HTTP server listening on address (see
+    :func:`parse_address`) that submits jobs to the given JobServer"""
+    family, addr = parse_address(address)
+    if family == socket.AF_UNIX:
+        if os.path.exists(addr):
+            os.remove(addr)
+        server = UnixHTTPServer(addr, JobRequestHandler)
+    else:
+        server = ThreadingHTTPServer(addr, JobRequestHandler)
+        server.daemon_threads = True
+    server.jobs = jobs
+    server.verbose = verbose
+    return server
+
+def main_serve(address, workers=None, queue_size=DEFAULT_QUEUE_SIZE, timeout=None, cache=None):
+    """Entry point for --serve from the command line"""
+    jobs = JobServer(workers=workers, queue_size=queue_size, timeout=timeout, cache=cache)
+    server = make_server(address, jobs, verbose=True)
+    jobs.start()
+    sys.stderr.write("meshtool serve: listening on %s with %d workers\n" % (address, jobs.num_workers))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        jobs.stop()
+        if parse_address(address)[0] == socket.AF_UNIX and os.path.exists(server.server_address):
+            os.remove(server.server_address)
+    return 0
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super(UnixHTTPConnection, self).__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+class ServeClient(object):
+    """Client for a running job server
+
+    Example::
+
+        client = ServeClient('/tmp/meshtool.sock')
+        status, record = client.submit('duck.dae', [['load_collada', '{input}'],
+                                                   ['save_collada', 'out/{name}.dae']])
+    """
+    def __init__(self, address, timeout=None):
+        self.address = address
+        self.timeout = timeout
+
+    def _connection(self):
+        family, addr = parse_address(self.address)
+        if family == socket.AF_UNIX:
+            return UnixHTTPConnection(addr, timeout=self.timeout)
+        return http.client.HTTPConnection(addr[0], addr[1], timeout=self.timeout)
+
+    def request(self, method, path, body=None):
+        """Returns (http_status, decoded_json_response)"""
+        conn = self._connection()
+        try:
+            headers = {}
+            if body is not None:
+                body = json.dumps(body).encode('utf8')
+                headers['Content-Type'] = 'application/json'
+            conn.request(method, path, body, headers)
+            response = conn.getresponse()
+            return response.status, json.loads(response.read().decode('utf8'))
+        finally:
+            conn.close()
+
+    def submit(self, input_path, chain, timeout=None):
+        """Runs a job, waiting for it to finish. Returns (http_status, record)."""
+        job = {'input': input_path, 'chain': chain}
+        if timeout is not None:
+            job['timeout'] = timeout
+        return self.request('POST', '/jobs', job)
+
+    def health(self):
+        return self.request('GET', '/health')[1]
@@ -0,0 +1,71 @@
+"""Benchmarks reading text progressive streams in chunks, the way they
+arrive over a network, with readPDAEPartial and with PDAEParser. Not part
+of the test suite; run directly with the PDAE files to read, e.g.:
+
+    python meshtool/tests/bench_pdae.py model.dae.pdae
+
+Without any, the test.pdae fixtures next to pdae_utils are read if they're
+there, otherwise a generated stream.
+"""
+
+import os
+import sys
+import time
+import random
+from meshtool.filters.panda_filters import pdae_utils
+
+FIXTURES = ['test.pdae', 'planterfeeder.dae.pdae', 'terrain_test_2.dae.pdae']
+CHUNK_SIZES = [1024, 64 * 1024, 1024 * 1024]
+GENERATED_REFINEMENTS = 50000
+
+def generate_pdae(num_refinements):
+    rand = random.Random(0)
+    lines = ['PDAE', str(num_refinements)]
+    for i in range(num_refinements):
+        lines.append('6')
+        lines.append('v ' + ' '.join('%.6f' % rand.uniform(-1, 1) for j in range(8)))
+        lines.extend('t %d %d %d' % (i, i + 1, i + 2) for j in range(2))
+        lines.extend('u %d %d' % (3 * i + j, i) for j in range(3))
+    return ('\n'.join(lines) + '\n').encode('ascii')
+
+def read_partial(data, chunk_size):
+    text = data.decode('ascii')
+    refinements_read = 0
+    num_refinements = None
+    position = chunk_size
+    curdata = text[:chunk_size]
+    while len(curdata) > 0:
+        (refinements_read, num_refinements, pm_refinements, data_left) = \
+            pdae_utils.readPDAEPartial(curdata, refinements_read, num_refinements)
+        curdata = data_left + text[position:position+chunk_size]
+        position += chunk_size
+    return refinements_read
+
+def read_parser(data, chunk_size):
+    parser = pdae_utils.PDAEParser()
+    for start in range(0, len(data), chunk_size):
+        parser.feed(data[start:start+chunk_size])
+    return parser.refinements_read
+
+def throughput(func, data, chunk_size):
+    start = time.time()
+    func(data, chunk_size)
+    return len(data) / (time.time() - start) / (1024 * 1024)
+
+def main(paths):
+    if len(paths) == 0:
+        fixture_dir = os.path.dirname(pdae_utils.__file__)
+        paths = [os.path.join(fixture_dir, f) for f in FIXTURES if os.path.isfile(os.path.join(fixture_dir, f))]
+    streams = [(os.path.basename(p), open(p, 'rb').read()) for p in paths]
+    if len(streams) == 0:
+        streams = [('generated', generate_pdae(GENERATED_REFINEMENTS))]
+
+    print('%-24s %10s %10s %14s %14s' % ('stream', 'MB', 'chunk', 'partial MB/s', 'parser MB/s'))
+    for name, data in streams:
+        for chunk_size in CHUNK_SIZES:
+            print('%-24s %10.1f %10d %14.1f %14.1f' % (name, len(data) / (1024.0 * 1024), chunk_size,
+                                                       throughput(read_partial, data, chunk_size),
+                                                       throughput(read_parser, data, chunk_size)))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,36 @@
+"""Benchmarks of the array based mesh processing used by the simplifier
+on large generated grids. Not part of the test suite; run directly with
+the number of triangles to try, e.g.:
+
+    python meshtool/tests/bench_simplify.py 100000 500000 2000000
+"""
+
+import sys
+import time
+from meshtool.filters.simplify_filters.mesh_adjacency import MeshAdjacency
+from meshes import make_grid
+
+DEFAULT_SIZES = [100000, 500000, 2000000]
+
+def bench_adjacency(vertices, tris):
+    return MeshAdjacency(tris, len(vertices))
+
+def bench_face_graph(vertices, tris, adjacency):
+    return adjacency.face_graph()
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return result, time.time() - start
+
+def main(sizes):
+    print('%10s %12s %12s' % ('triangles', 'adjacency', 'face graph'))
+    for size in sizes:
+        side = int((size / 2) ** 0.5)
+        vertices, tris = make_grid(side, side, noise=1.0)
+        adjacency, adjacency_secs = timed(bench_adjacency, vertices, tris)
+        _, face_graph_secs = timed(bench_face_graph, vertices, tris, adjacency)
+        print('%10d %11.2fs %11.2fs' % (len(tris), adjacency_secs, face_graph_secs))
+
+if __name__ == '__main__':
+    main([int(s) for s in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,71 @@
+import io
+import numpy
+import collada
+from meshtool.util import Image
+
+def make_triangle_mesh(filename):
+    mesh = collada.Collada()
+    vert_src = collada.source.FloatSource("verts-array", numpy.array([0, 0, 0, 1, 0, 0, 0, 1, 0], dtype=numpy.float32), ('X', 'Y', 'Z'))
+    geom = collada.geometry.Geometry(mesh, "geometry0", "mytriangle", [vert_src])
+    input_list = collada.source.InputList()
+    input_list.addInput(0, 'VERTEX', "#verts-array")
+    triset = geom.createTriangleSet(numpy.array([0, 1, 2]), input_list, "materialref")
+    geom.primitives.append(triset)
+    mesh.geometries.append(geom)
+    geomnode = collada.scene.GeometryNode(geom, [])
+    node = collada.scene.Node("node0", children=[geomnode])
+    myscene = collada.scene.Scene("myscene", [node])
+    mesh.scenes.append(myscene)
+    mesh.scene = myscene
+    mesh.write(filename)
+
+def make_grid(rows, cols, noise=0.0, seed=0):
+    """Returns (vertices, triangles) arrays of a grid of rows x cols quads,
+    split into two triangles each, with optional random height noise"""
+    rng = numpy.random.RandomState(seed)
+    xs, ys = numpy.meshgrid(numpy.arange(cols + 1, dtype=numpy.float32), numpy.arange(rows + 1, dtype=numpy.float32))
+    vertices = numpy.column_stack((xs.ravel(), ys.ravel(), rng.rand(xs.size).astype(numpy.float32) * noise))
+    corner = (numpy.arange(rows)[:,numpy.newaxis] * (cols + 1) + numpy.arange(cols)).ravel()
+    quads = numpy.column_stack((corner, corner + 1, corner + cols + 2, corner + cols + 1))
+    tris = numpy.concatenate((quads[:,(0,1,2)], quads[:,(0,2,3)]), axis=1).reshape(-1, 3)
+    return vertices, tris.astype(numpy.int32)
+
+def make_grid_mesh(rows, cols, noise=0.0, seed=0, texture_size=64):
+    """Returns a collada mesh of make_grid's grid, with normals and texture
+    coordinates spanning a generated checkerboard texture"""
+    vertices, tris = make_grid(rows, cols, noise, seed)
+    uvs = vertices[:,:2] / numpy.array([cols, rows], dtype=numpy.float32)
+    checks = (numpy.arange(texture_size)[:,numpy.newaxis] // 8 + numpy.arange(texture_size) // 8) % 2
+    pixels = numpy.dstack((checks * 255, numpy.arange(texture_size)[:,numpy.newaxis].repeat(texture_size, 1) * 4, 255 - checks * 255))
+    imgout = io.BytesIO()
+    Image.fromarray(pixels.astype(numpy.uint8)).save(imgout, format="PNG")
+
+    mesh = collada.Collada()
+    cimg = collada.material.CImage("grid-image", "./grid.png")
+    cimg.setData(imgout.getvalue())
+    mesh.images.append(cimg)
+    surface = collada.material.Surface("grid-surface", cimg)
+    sampler = collada.material.Sampler2D("grid-sampler", surface)
+    effect = collada.material.Effect("grid-effect", [surface, sampler], "blinn", diffuse=collada.material.Map(sampler, "TEX0"))
+    mesh.effects.append(effect)
+    material = collada.material.Material("grid-material0", "grid-material", effect)
+    mesh.materials.append(material)
+
+    vert_src = collada.source.FloatSource("grid-verts-array", vertices.ravel(), ('X', 'Y', 'Z'))
+    normal_src = collada.source.FloatSource("grid-normals-array", numpy.array([0, 0, 1], dtype=numpy.float32), ('X', 'Y', 'Z'))
+    uv_src = collada.source.FloatSource("grid-uv-array", uvs.ravel(), ('S', 'T'))
+    geom = collada.geometry.Geometry(mesh, "geometry0", "grid", [vert_src, normal_src, uv_src])
+    input_list = collada.source.InputList()
+    input_list.addInput(0, 'VERTEX', "#grid-verts-array")
+    input_list.addInput(1, 'NORMAL', "#grid-normals-array")
+    input_list.addInput(2, 'TEXCOORD', "#grid-uv-array", set="0")
+    indices = numpy.dstack((tris, numpy.zeros_like(tris), tris)).ravel()
+    geom.primitives.append(geom.createTriangleSet(indices, input_list, "materialref"))
+    mesh.geometries.append(geom)
+
+    matnode = collada.scene.MaterialNode("materialref", material, inputs=[("TEX0", "TEXCOORD", "0")])
+    node = collada.scene.Node("node0", children=[collada.scene.GeometryNode(geom, [matnode])])
+    myscene = collada.scene.Scene("myscene", [node])
+    mesh.scenes.append(myscene)
+    mesh.scene = myscene
+    return mesh
@@ -0,0 +1,97 @@
+import unittest
+import os
+import shutil
+import signal
+import tempfile
+from meshtool.batch import expand_inputs, run_batch, WorkerProcess
+from meshtool.filters import factory
+from meshtool.filters.base_filters import OpFilter
+from meshes import make_triangle_mesh
+
+class CrashFilter(OpFilter):
+    """Kills the process it runs in when given the name of the file to crash on"""
+    def __init__(self):
+        super(CrashFilter, self).__init__('test_crash', 'Kills its process on one input')
+    def apply(self, mesh, name):
+        if name == 'tri1':
+            os.kill(os.getpid(), signal.SIGKILL)
+        return mesh
+
+class BatchTester(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp(prefix='meshtool-test-batch')
+        self.indir = os.path.join(self.tempdir, 'in')
+        self.outdir = os.path.join(self.tempdir, 'out')
+        os.mkdir(self.indir)
+        self.good = []
+        for i in range(3):
+            path = os.path.join(self.indir, 'tri%d.dae' % i)
+            make_triangle_mesh(path)
+            self.good.append(path)
+        self.bad = os.path.join(self.indir, 'broken.dae')
+        with open(self.bad, 'w') as f:
+            f.write('this is not a collada file')
+        self.chain = [('load_collada', ['{input}']),
+                      ('save_collada', [os.path.join(self.outdir, '{name}.dae')])]
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+
+    def test_expand_inputs(self):
+        self.assertEqual(expand_inputs(os.path.join(self.indir, 'tri*.dae')), self.good)
+
+        manifest = os.path.join(self.tempdir, 'manifest.txt')
+        with open(manifest, 'w') as f:
+            f.write("# comment\nin/tri2.dae\n\nin/tri0.dae\n")
+        self.assertEqual(expand_inputs(manifest), [self.good[2], self.good[0]])
+
+    def check_records(self, records):
+        inputs = self.good + [self.bad]
+        self.assertEqual([r['input'] for r in records], inputs)
+        for record in records[:3]:
+            self.assertEqual(record['status'], 'ok')
+            self.assertIsNone(record['error'])
+            self.assertEqual([t['filter'] for t in record['timings']], ['load_collada', 'save_collada'])
+        self.assertEqual(records[3]['status'], 'error')
+        self.assertEqual(records[3]['filter'], 'load_collada')
+        for i in range(3):
+            self.assertTrue(os.path.isfile(os.path.join(self.outdir, 'tri%d.dae' % i)))
+        self.assertFalse(os.path.exists(os.path.join(self.outdir, 'broken.dae')))
+
+    def test_serial(self):
+        records = run_batch(self.chain, self.good + [self.bad], workers=1)
+        self.check_records(records)
+
+    def test_pool(self):
+        records = run_batch(self.chain, self.good + [self.bad], workers=2)
+        self.check_records(records)
+
+    def test_worker_crash(self):
+        # workers are forked, so they see the filter registered here
+        factory.register('test_crash', CrashFilter)
+        try:
+            chain = [self.chain[0], ('test_crash', ['{name}']), self.chain[1]]
+            inputs = self.good + [os.path.join(self.indir, 'tri%d.dae' % i) for i in range(3, 5)]
+            for path in inputs[3:]:
+                make_triangle_mesh(path)
+            records = run_batch(chain, inputs, workers=2)
+        finally:
+            del factory.registrar['test_crash']
+            factory.nameList.remove('test_crash')
+
+        self.assertEqual([r['input'] for r in records], inputs)
+        self.assertEqual([r['status'] for r in records], ['ok', 'error', 'ok', 'ok', 'ok'], records)
+        self.assertEqual(records[1]['error'], 'worker process exited unexpectedly')
+        self.assertFalse(os.path.exists(os.path.join(self.outdir, 'tri1.dae')))
+
+    def test_idle_worker_died(self):
+        # the job goes to the replacement of a worker that died while idle
+        worker = WorkerProcess()
+        try:
+            os.kill(worker.process.pid, signal.SIGKILL)
+            worker.process.join()
+            record = worker.run((self.chain, self.good[0], 0))
+        finally:
+            worker.stop()
+        self.assertEqual(record['status'], 'ok', record)
+        self.assertTrue(os.path.exists(os.path.join(self.outdir, 'tri0.dae')))
@@ -0,0 +1,105 @@
+import unittest
+import os
+import shutil
+import tempfile
+from meshtool.chain import resolve_chain
+from meshtool.cache import ResultCache, chain_key, hash_input, run_cached
+from meshes import make_triangle_mesh
+
+CURDIR = os.path.dirname(os.path.abspath(__file__))
+
+class CacheTester(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp(prefix='meshtool-test-cache')
+        self.cache = ResultCache(os.path.join(self.tempdir, 'cache'))
+        self.dae = os.path.join(self.tempdir, 'triangle.dae')
+        self.out = os.path.join(self.tempdir, 'triangle-out.dae')
+        make_triangle_mesh(self.dae)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+
+    def chain(self, *ops):
+        return resolve_chain([('load_collada', [self.dae])] + list(ops) +
+                             [('save_collada', [self.out])])
+
+    def run_chain(self, steps):
+        timings = []
+        cached = run_cached(steps, self.cache, timings)
+        self.assertTrue(os.path.isfile(self.out))
+        with open(self.out, 'rb') as f:
+            data = f.read()
+        os.remove(self.out)
+        return cached, [name for name, _ in timings], data
+
+    def test_hit_and_miss(self):
+        cached, filters_run, data = self.run_chain(self.chain())
+        self.assertFalse(cached)
+        self.assertEqual(filters_run, ['load_collada', 'save_collada'])
+
+        # identical chain and input is copied from the cache without loading
+        cached, filters_run, cached_data = self.run_chain(self.chain())
+        self.assertTrue(cached)
+        self.assertEqual(filters_run, ['cache'])
+        self.assertEqual(cached_data, data)
+
+        # different filters
+        cached, _, _ = self.run_chain(self.chain(('triangulate', [])))
+        self.assertFalse(cached)
+
+        # changed input
+        with open(self.dae, 'a') as f:
+            f.write('\n')
+        cached, _, _ = self.run_chain(self.chain())
+        self.assertFalse(cached)
+
+    def test_existing_output(self):
+        steps = self.chain()
+        self.run_chain(steps)
+        # save filters still refuse to overwrite files on a hit
+        open(self.out, 'w').close()
+        timings = []
+        from meshtool.chain import ChainException
+        self.assertRaises(ChainException, run_cached, steps, self.cache, timings)
+
+    def test_uncacheable(self):
+        self.assertIsNone(chain_key(resolve_chain([('load_collada', [self.dae]),
+                                                   ('print_info', [])])))
+        self.assertIsNone(chain_key(resolve_chain([('load_collada', [self.dae]),
+                                                   ('save_mipmaps', []),
+                                                   ('save_collada', [self.out])])))
+
+    def test_eviction(self):
+        self.run_chain(self.chain())
+        self.run_chain(self.chain(('triangulate', [])))
+        entries = self.cache.entries()
+        self.assertEqual(len(entries), 2)
+        # mark the first entry as the most recently used one
+        _, size, newest = entries[0]
+        os.utime(os.path.join(newest, 'meta.json'), (0, 0))
+        os.utime(os.path.join(entries[1][2], 'meta.json'), (0, 0))
+        os.utime(os.path.join(newest, 'meta.json'), None)
+
+        self.cache.max_size = size
+        self.cache.evict()
+        self.assertEqual([e[2] for e in self.cache.entries()], [newest])
+
+    def test_unusable_cache_dir(self):
+        # a file where the cache directory should be
+        open(os.path.join(self.tempdir, 'notadir'), 'w').close()
+        self.cache = ResultCache(os.path.join(self.tempdir, 'notadir', 'cache'))
+        cached, filters_run, data = self.run_chain(self.chain())
+        self.assertFalse(cached)
+        self.assertEqual(filters_run, ['load_collada', 'save_collada'])
+        self.assertEqual(self.cache.entries(), [])
+
+    def test_obj_aux_files(self):
+        objdir = os.path.join(self.tempdir, 'obj')
+        shutil.copytree(os.path.join(CURDIR, 'data', 'obj'), objdir)
+        obj = os.path.join(objdir, 'spider.obj')
+        before = hash_input('load_obj', obj)
+        self.assertEqual(hash_input('load_obj', obj), before)
+
+        with open(os.path.join(objdir, 'SpiderTex.jpg'), 'ab') as f:
+            f.write(b'\0')
+        self.assertNotEqual(hash_input('load_obj', obj), before)
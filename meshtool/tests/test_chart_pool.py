@@ -0,0 +1,38 @@
+import os
+import unittest
+import numpy
+from meshtool.filters.simplify_filters.chart_pool import map_charts, default_workers
+
+def chart_sum(shared, task):
+    start, end = task
+    return os.getpid(), float(numpy.sum(shared.values[start:end] * shared.scale))
+
+class ChartPoolTester(unittest.TestCase):
+    def setUp(self):
+        self.arrays = {'values': numpy.arange(100, dtype=numpy.float32),
+                       'scale': numpy.array(2.0)}
+        self.tasks = [(i, i + 10) for i in range(0, 100, 5)]
+
+    def test_serial_and_parallel(self):
+        serial = map_charts(chart_sum, self.arrays, self.tasks, workers=1)
+        parallel = map_charts(chart_sum, self.arrays, self.tasks, workers=3)
+        self.assertEqual([r[1] for r in serial], [r[1] for r in parallel])
+        self.assertEqual(serial[0][1], 90.0)
+        self.assertEqual(set(r[0] for r in serial), set([os.getpid()]))
+        self.assertNotIn(os.getpid(), set(r[0] for r in parallel))
+
+    def test_default_workers(self):
+        previous = os.environ.get('MESHTOOL_WORKERS')
+        try:
+            os.environ['MESHTOOL_WORKERS'] = '4'
+            self.assertEqual(default_workers(), 4)
+            os.environ['MESHTOOL_WORKERS'] = 'many'
+            self.assertEqual(default_workers(), 1)
+        finally:
+            if previous is None:
+                del os.environ['MESHTOOL_WORKERS']
+            else:
+                os.environ['MESHTOOL_WORKERS'] = previous
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+from meshtool.filters.simplify_filters import checkpoint
+from meshtool.filters.simplify_filters.checkpoint import Checkpoint, fingerprint
+
+class CheckpointTester(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp(prefix='meshtool-test-checkpoint')
+        self.stages = ['first', 'second']
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+
+    def test_resume(self):
+        verts = numpy.arange(12, dtype=numpy.float32).reshape(4, 3)
+        key = fingerprint([verts], [0.9])
+        self.assertNotEqual(key, fingerprint([verts[::-1]], [0.9]))
+        self.assertNotEqual(key, fingerprint([verts], [0.8]))
+
+        saved = Checkpoint(self.tempdir, 'test', key)
+        self.assertIsNone(saved.load(self.stages))
+        saved.save('first', {'verts': verts})
+        saved.save('second', {'verts': verts * 2, 'charts': {1: set([2, 3])}})
+
+        stage, state = Checkpoint(self.tempdir, 'test', key).load(self.stages)
+        self.assertEqual(stage, 'second')
+        self.assertTrue(numpy.array_equal(state['verts'], verts * 2))
+        self.assertEqual(state['charts'], {1: set([2, 3])})
+
+        saved.remove()
+        self.assertEqual(os.listdir(self.tempdir), [])
+
+    def test_stale(self):
+        saved = Checkpoint(self.tempdir, 'test', 'abc')
+        saved.save('first', {})
+        version = checkpoint.CHECKPOINT_VERSION
+        try:
+            checkpoint.CHECKPOINT_VERSION = version + 1
+            self.assertIsNone(saved.load(self.stages))
+        finally:
+            checkpoint.CHECKPOINT_VERSION = version
+        self.assertFalse(os.path.exists(saved.path))
+
+        with open(saved.path, 'wb') as f:
+            f.write(checkpoint.MAGIC + b'{"truncated')
+        self.assertIsNone(saved.load(self.stages))
+
+        saved.save('removed stage', {})
+        self.assertIsNone(saved.load(self.stages))
+
+if __name__ == '__main__':
+    unittest.main()
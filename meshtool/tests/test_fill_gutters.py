@@ -0,0 +1,81 @@
+import unittest
+import numpy
+import collada
+from io import BytesIO
+from meshtool.util import Image
+from meshtool.filters.atlas_filters.fill_gutters import pullPushFill, fillGutters
+
+def make_textured_mesh(texcoords, pilimg):
+    """A mesh with one triangle mapping texcoords into pilimg"""
+    mesh = collada.Collada()
+    imgbuf = BytesIO()
+    pilimg.save(imgbuf, 'PNG')
+    cimg = collada.material.CImage("image0", "texture.png")
+    cimg.data = imgbuf.getvalue()
+    surface = collada.material.Surface("surface0", cimg)
+    sampler = collada.material.Sampler2D("sampler0", surface)
+    effect = collada.material.Effect("effect0", [surface, sampler], "lambert",
+                                     diffuse=collada.material.Map(sampler, "TEX0"))
+    mat = collada.material.Material("material0", "material0", effect)
+    mesh.images.append(cimg)
+    mesh.effects.append(effect)
+    mesh.materials.append(mat)
+
+    vert_src = collada.source.FloatSource("verts-array", numpy.array([0, 0, 0, 1, 0, 0, 0, 1, 0], dtype=numpy.float32), ('X', 'Y', 'Z'))
+    uv_src = collada.source.FloatSource("uvs-array", numpy.array(texcoords, dtype=numpy.float32).ravel(), ('S', 'T'))
+    geom = collada.geometry.Geometry(mesh, "geometry0", "mytriangle", [vert_src, uv_src])
+    input_list = collada.source.InputList()
+    input_list.addInput(0, 'VERTEX', "#verts-array")
+    input_list.addInput(0, 'TEXCOORD', "#uvs-array", '0')
+    geom.primitives.append(geom.createTriangleSet(numpy.array([0, 1, 2]), input_list, "materialref"))
+    mesh.geometries.append(geom)
+
+    matnode = collada.scene.MaterialNode("materialref", mat, inputs=[("TEX0", "TEXCOORD", "0")])
+    geomnode = collada.scene.GeometryNode(geom, [matnode])
+    myscene = collada.scene.Scene("myscene", [collada.scene.Node("node0", children=[geomnode])])
+    mesh.scenes.append(myscene)
+    mesh.scene = myscene
+    return mesh
+
+class FillGuttersTester(unittest.TestCase):
+    def setUp(self):
+        self.image = (numpy.random.RandomState(0).rand(21, 30, 3) * 255).astype(numpy.uint8)
+
+    def test_pull_push(self):
+        covered = numpy.zeros(self.image.shape[:2], dtype=bool)
+        covered[3:9, 4:12] = True
+        filled = pullPushFill(self.image, covered)
+        self.assertEqual(filled.dtype, numpy.uint8)
+        self.assertTrue(numpy.array_equal(filled[covered], self.image[covered]))
+        # filled pixels are blends of the covered ones
+        inside = self.image[covered]
+        self.assertTrue(numpy.all(filled >= numpy.min(inside, axis=0)))
+        self.assertTrue(numpy.all(filled <= numpy.max(inside, axis=0)))
+
+        # a single covered pixel fills the whole image with its color
+        covered = numpy.zeros(self.image.shape[:2], dtype=bool)
+        covered[20, 29] = True
+        filled = pullPushFill(self.image[:,:,0], covered)
+        self.assertTrue(numpy.all(filled == self.image[20, 29, 0]))
+
+        # nothing to fill from
+        filled = pullPushFill(self.image, numpy.zeros(self.image.shape[:2], dtype=bool))
+        self.assertTrue(numpy.array_equal(filled, self.image))
+
+    def test_filter(self):
+        gutters = self.image.copy()
+        gutters[10:] = 0
+        mesh = make_textured_mesh([[0, 1], [1, 1], [0, 0.6]], Image.fromarray(gutters))
+        fillGutters(mesh)
+
+        filled = numpy.asarray(mesh.images[0].pilimage)
+        self.assertTrue(numpy.array_equal(filled[:4,:10], self.image[:4,:10]))
+        self.assertTrue(numpy.all(numpy.any(filled[12:] > 0, axis=2)))
+
+        # tiled textures are left alone
+        mesh = make_textured_mesh([[0, 1], [2, 1], [0, 0.6]], Image.fromarray(gutters))
+        fillGutters(mesh)
+        self.assertTrue(numpy.array_equal(numpy.asarray(mesh.images[0].pilimage), gutters))
+
+if __name__ == '__main__':
+    unittest.main()
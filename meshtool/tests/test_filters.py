@@ -0,0 +1,44 @@
+import unittest
+import os
+import sys
+import subprocess
+import meshtool.filters as filters
+
+CURDIR = os.path.dirname(os.path.abspath(__file__))
+ROOTDIR = os.path.dirname(os.path.dirname(CURDIR))
+
+# modules that are slow to import and should only be loaded
+# once a filter that needs them is actually run
+HEAVY_MODULES = ['numpy', 'collada', 'networkx', 'PIL', 'panda3d']
+
+class FilterRegistryTester(unittest.TestCase):
+
+    def test_manifest_matches_filters(self):
+        for filter_name in filters.factory.getFilterNames():
+            entry = filters.factory.getManifestEntry(filter_name)
+            self.assertIsNotNone(entry, filter_name)
+
+            inst = filters.factory.getInstance(filter_name)
+            if inst is None:
+                # optional dependency is missing, nothing to compare against
+                continue
+
+            self.assertEqual(inst.name, entry.name)
+            self.assertEqual(inst.CATEGORY, entry.category, filter_name)
+            self.assertEqual(inst.description, entry.description, filter_name)
+            self.assertEqual([arg.name for arg in inst.arguments],
+                             [arg.name for arg in entry.arguments], filter_name)
+
+    def test_unknown_filter(self):
+        self.assertIsNone(filters.factory.getInstance('not_a_filter'))
+        self.assertIsNone(filters.factory.getManifestEntry('not_a_filter'))
+
+    def test_startup_imports(self):
+        # building the parser (which is all that --help needs) must not
+        # import any of the filter modules or their dependencies
+        code = ("import sys; from meshtool.__main__ import build_parser; build_parser(); "
+                "print(' '.join(sorted(m for m in sys.modules if m.startswith('meshtool.filters.') "
+                "or m.split('.')[0] in %r)))" % (HEAVY_MODULES,))
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=ROOTDIR)
+        loaded = output.decode('utf8').split()
+        self.assertEqual(loaded, ['meshtool.filters.base_filters'])
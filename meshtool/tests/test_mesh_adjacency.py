@@ -0,0 +1,169 @@
+import unittest
+import itertools
+import numpy
+from meshtool.filters.simplify_filters.mesh_adjacency import MeshAdjacency, count_components, shared_vertex_counts, vertex_corners
+from meshtool.filters.simplify_filters.graph_utils import edge_topology, VertexSubgraph
+from meshes import make_grid
+
+def reference_face_graph(tris):
+    """The face graph built one edge and one pair of faces at a time, the
+    way the simplifier used to. Returns the set of neighbors of each face
+    and the set of invalid edges."""
+    tris = tris.tolist()
+    vertex_faces = {}
+    edges = set()
+    for f, tri in enumerate(tris):
+        for a, b in zip(tri, tri[1:] + tri[:1]):
+            edges.add((min(a, b), max(a, b)))
+        for v in tri:
+            vertex_faces.setdefault(v, set()).add(f)
+    neighbors = [set() for tri in tris]
+    invalid_edges = set()
+    for (v1, v2) in edges:
+        numadded = 0
+        for (f1, f2) in itertools.combinations(sorted(vertex_faces[v1] & vertex_faces[v2]), 2):
+            t1 = tris[f1]
+            t2 = tris[f2]
+            if sorted(t1) == sorted(t2):
+                continue
+            # an edge traversed in the same direction by both faces
+            if any(a in t2 and b in t2 and t2[(t2.index(a) + 1) % 3] == b for a, b in zip(t1, t1[1:] + t1[:1])):
+                continue
+            numadded += 1
+            neighbors[f1].add(f2)
+            neighbors[f2].add(f1)
+        if numadded > 2:
+            invalid_edges.add((v1, v2))
+    return neighbors, invalid_edges
+
+class MeshAdjacencyTester(unittest.TestCase):
+    def setUp(self):
+        # a unit square of two triangles, a third triangle hanging off the
+        # diagonal making it non-manifold, and a degenerate triangle
+        self.vertices = numpy.array([[0,0,0], [1,0,0], [1,1,0], [0,1,0],
+                                     [0.5,0.5,1], [2,2,2], [3,3,3]], dtype=numpy.float32)
+        self.tris = numpy.array([[0,1,2], [0,2,3], [0,4,2], [5,5,6]], dtype=numpy.int32)
+        self.adj = MeshAdjacency(self.tris, len(self.vertices))
+
+    def test_edges(self):
+        self.assertEqual(self.adj.edges.tolist(),
+                         [[0,1], [0,2], [0,3], [0,4], [1,2], [2,3], [2,4], [5,6]])
+        self.assertEqual(self.adj.edge_id(2, 0), 1)
+        self.assertEqual(self.adj.edge_id(1, 3), -1)
+        self.assertEqual(self.adj.edge_ids([[4,2], [6,5], [3,4]]).tolist(), [6, 7, -1])
+        # the half-edge from 5 back to 5 doesn't belong to an edge
+        self.assertEqual(self.adj.half_edge[9:].tolist(), [-1, 7, 7])
+        self.assertEqual(self.adj.degenerate.tolist(), [False, False, False, True])
+
+    def test_edge_faces(self):
+        self.assertEqual(self.adj.edge_faces(self.adj.edge_id(0, 2)).tolist(), [0, 1, 2])
+        self.assertEqual(self.adj.edge_faces(self.adj.edge_id(0, 1)).tolist(), [0])
+        self.assertEqual(self.adj.edge_faces(self.adj.edge_id(5, 6)).tolist(), [3])
+        self.assertEqual(self.adj.edge_half_edges(self.adj.edge_id(5, 6)).tolist(), [10, 11])
+        self.assertEqual(self.adj.face_pairs().tolist(), [[0,1], [0,2], [1,2]])
+        self.assertEqual(self.adj.face_neighbors(2).tolist(), [0, 1])
+        self.assertEqual(self.adj.face_neighbors(3).tolist(), [])
+
+    def test_face_graph(self):
+        # faces 0 and 2 traverse the diagonal in the same direction
+        offsets, neighbors, invalid_edges = self.adj.face_graph()
+        self.assertEqual([neighbors[offsets[f]:offsets[f+1]].tolist() for f in range(4)],
+                         [[1], [0, 2], [1], []])
+        self.assertEqual(invalid_edges.tolist(), [])
+
+        # four faces around one edge, and a copy of a face with its winding reversed
+        tris = numpy.array([[0,1,2], [1,0,3], [1,0,4], [0,1,5], [5,1,0]])
+        offsets, neighbors, invalid_edges = MeshAdjacency(tris, 6).face_graph()
+        self.assertEqual([neighbors[offsets[f]:offsets[f+1]].tolist() for f in range(5)],
+                         [[1, 2, 4], [0, 3], [0, 3], [1, 2], [0]])
+        self.assertEqual(invalid_edges.tolist(), [[0, 1]])
+
+    def test_face_graph_reference(self):
+        rng = numpy.random.RandomState(0)
+        vertices, grid = make_grid(6, 8)
+        meshes = [self.tris, grid,
+                  # with a few flipped, duplicated and degenerate triangles
+                  numpy.concatenate((grid, grid[:5,::-1], grid[10:15], grid[20:25,(0,0,1)]))]
+        # and triangle soups over a few vertices
+        meshes.extend(rng.randint(0, 8, size=(30, 3)) for i in range(20))
+        for tris in meshes:
+            offsets, neighbors, invalid_edges = MeshAdjacency(tris, int(tris.max()) + 1).face_graph()
+            expected_neighbors, expected_invalid = reference_face_graph(tris)
+            face_neighbors = [neighbors[offsets[f]:offsets[f+1]].tolist() for f in range(len(tris))]
+            self.assertEqual([set(n) for n in face_neighbors], expected_neighbors)
+            # and no neighbor is listed twice
+            self.assertEqual(len(neighbors), sum(map(len, expected_neighbors)))
+            self.assertEqual(set(map(tuple, invalid_edges.tolist())), expected_invalid)
+
+    def test_shared_vertex_counts(self):
+        counts = shared_vertex_counts(self.tris, numpy.array([0, 1, 3]), numpy.array([1, 2, 3]), len(self.vertices))
+        self.assertEqual(counts.tolist(), [2, 0, 2, 0, 0, 1, 1])
+
+    def test_vertex_corners(self):
+        offsets, corners = vertex_corners(self.tris, len(self.vertices))
+        self.assertEqual(corners[offsets[0]:offsets[1]].tolist(), [0, 3, 6])
+        self.assertEqual(corners[offsets[2]:offsets[3]].tolist(), [2, 4, 8])
+        self.assertEqual(corners[offsets[5]:offsets[6]].tolist(), [9, 10])
+
+    def test_vertex_queries(self):
+        self.assertEqual(self.adj.vertex_faces(0).tolist(), [0, 1, 2])
+        self.assertEqual(self.adj.vertex_faces(5).tolist(), [3])
+        self.assertEqual(self.adj.vertex_neighbors(2).tolist(), [0, 1, 3, 4])
+        self.assertEqual(self.adj.vertex_neighbors(5).tolist(), [6])
+
+        self.adj.compute_edge_lengths(self.vertices)
+        lengths = self.adj.vertex_neighbor_lengths(0)
+        self.assertAlmostEqual(lengths[0], 1.0)
+        self.assertAlmostEqual(lengths[1], numpy.sqrt(2), places=5)
+
+    def test_boundary(self):
+        boundary = [tuple(self.adj.edges[e]) for e in self.adj.boundary_edges()]
+        self.assertEqual(boundary, [(0,1), (0,3), (0,4), (1,2), (2,3), (2,4), (5,6)])
+        self.assertEqual(self.adj.boundary_vertices().tolist(), [True] * 7)
+
+    def test_components(self):
+        self.assertEqual(self.adj.vertex_components(), 2)
+        self.assertEqual(self.adj.face_components(), 2)
+        self.assertEqual(count_components(5, numpy.zeros((0, 2))), 5)
+        self.assertEqual(count_components(6, [[5,4], [4,3], [3,2], [2,1], [1,0]]), 1)
+
+    def test_vertex_subgraph(self):
+        self.adj.compute_edge_lengths(self.vertices)
+        graph = VertexSubgraph(self.adj, numpy.array([0, 1, 2, 3]))
+        self.assertEqual(graph.local([3, 4, 0]).tolist(), [3, -1, 0])
+        # the edges to vertex 4 are left out
+        self.assertEqual(graph.neighbors[graph.offsets[0]:graph.offsets[1]].tolist(), [1, 2, 3])
+        allowed = numpy.ones(4, dtype=bool)
+        allowed[[0, 2]] = False
+        seeds = graph.mask([1])
+        self.assertEqual(graph.flood_fill(seeds, allowed).tolist(), [False, True, False, False])
+        allowed[2] = True
+        self.assertEqual(graph.flood_fill(seeds, allowed).tolist(), [False, True, True, True])
+
+    def test_shortest_path(self):
+        self.adj.compute_edge_lengths(self.vertices)
+        graph = VertexSubgraph(self.adj, numpy.array([0, 1, 2, 3]))
+        allowed = numpy.ones(4, dtype=bool)
+        heuristic = graph.distances(self.vertices, 3)
+        self.assertEqual(graph.shortest_path(1, 3, allowed), [1, 0, 3])
+        self.assertEqual(graph.shortest_path(1, 3, allowed, heuristic), [1, 0, 3])
+        self.assertEqual(graph.shortest_path(1, 1, allowed), [1])
+        allowed[0] = False
+        self.assertEqual(graph.shortest_path(1, 3, allowed, heuristic), [1, 2, 3])
+        # the target can always be entered
+        allowed[3] = False
+        self.assertEqual(graph.shortest_path(1, 3, allowed), [1, 2, 3])
+        allowed[2] = False
+        self.assertIsNone(graph.shortest_path(1, 3, allowed))
+
+        # vertex 0 isn't part of this subgraph, so the path through it can't be taken
+        graph = VertexSubgraph(self.adj, numpy.array([1, 2, 3, 4]))
+        allowed = numpy.ones(4, dtype=bool)
+        allowed[graph.local([2])] = False
+        self.assertIsNone(graph.shortest_path(graph.local([1])[0], graph.local([4])[0], allowed))
+
+    def test_edge_topology(self):
+        self.assertEqual(edge_topology([]), (0, 0))
+        self.assertEqual(edge_topology([(0,1), (1,2), (2,0)]), (1, 1))
+        self.assertEqual(edge_topology([(0,1), (1,2), (2,0), (0,3), (3,2)]), (1, 2))
+        self.assertEqual(edge_topology([(0,1)], nodes=[0, 5]), (2, 0))
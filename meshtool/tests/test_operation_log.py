@@ -0,0 +1,59 @@
+import pickle
+import unittest
+import numpy
+from meshtool.filters.simplify_filters import operation_log
+from meshtool.filters.simplify_filters.operation_log import OperationLog
+
+class OperationLogTester(unittest.TestCase):
+    def test_undo(self):
+        tris = numpy.array([[0, 1, 2], [2, 1, 3], [2, 3, 4]], dtype=numpy.int32)
+        normals = tris + 10
+        uvs = tris + 20
+        original = (tris.copy(), normals.copy(), uvs.copy())
+
+        log = OperationLog()
+        #collapse 1 -> 2, removing triangle 0 and moving a corner of triangle 1
+        log.begin_operation()
+        log.add_triangle(0, tris[0], normals[0], uvs[0])
+        log.update_index(1, 1, 1, 11, 21)
+        tris[1, 1], normals[1, 1], uvs[1, 1] = 2, 12, 22
+        #collapse 2 -> 4, removing triangle 1 and moving two corners
+        log.begin_operation()
+        log.update_index(1, 0, 2, 12, 22)
+        log.update_index(1, 1, 2, 12, 22)
+        log.update_index(2, 0, 2, 12, 22)
+        tris[1, :2], normals[1, :2], uvs[1, :2] = 4, 14, 24
+        tris[2, 0], normals[2, 0], uvs[2, 0] = 4, 14, 24
+        log.add_triangles(numpy.array([1]), tris[[1]], normals[[1]], uvs[[1]])
+
+        self.assertEqual(len(log), 6)
+        self.assertEqual(log.boundaries.tolist(), [0, 2])
+        self.assertEqual(log.groups().tolist(), [1, 1, 2, 2, 2, 2])
+        self.assertEqual(log.removed_triangles().tolist(), [0, 1])
+        self.assertEqual(log.removed_triangles(2).tolist(), [1])
+
+        #undoing just the second collapse
+        partial = (tris.copy(), normals.copy(), uvs.copy())
+        log.undo_updates(*partial, start=2)
+        self.assertEqual(partial[0].tolist(), [[0, 1, 2], [2, 2, 3], [2, 3, 4]])
+
+        log.undo_updates(tris, normals, uvs)
+        for undone, orig in zip((tris, normals, uvs), original):
+            self.assertTrue(numpy.array_equal(undone, orig))
+
+    def test_grow(self):
+        log = OperationLog()
+        for i in range(operation_log.INITIAL_CAPACITY + 10):
+            log.begin_operation()
+            log.update_index(i, i % 3, i, i, i)
+        self.assertEqual(len(log), operation_log.INITIAL_CAPACITY + 10)
+        self.assertEqual(log.records['tri'][-1], operation_log.INITIAL_CAPACITY + 9)
+
+        restored = pickle.loads(pickle.dumps(log))
+        self.assertEqual(len(restored._records), len(log))
+        self.assertTrue(numpy.array_equal(restored.records, log.records))
+        restored.update_index(0, 0, 0, 0, 0)
+        self.assertEqual(len(restored), len(log) + 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import numpy
+from meshtool.filters.simplify_filters.mesh_adjacency import MeshAdjacency
+from meshtool.filters.simplify_filters import parameterize
+from meshtool.filters.simplify_filters.parameterize import tutte_system, solve_tutte
+from meshes import make_grid
+
+class ParameterizeTester(unittest.TestCase):
+    def setUp(self):
+        # a flat grid with its boundary fixed at its own xy coordinates is
+        # reproduced exactly, since the edge length weights are symmetric
+        vertices, tris = make_grid(6, 8)
+        self.adj = MeshAdjacency(tris, len(vertices))
+        self.adj.compute_edge_lengths(vertices)
+        on_boundary = self.adj.boundary_vertices()
+        self.interior = numpy.nonzero(~on_boundary)[0]
+        boundary = numpy.nonzero(on_boundary)[0]
+        self.expected = vertices[self.interior, :2]
+        self.system = tutte_system(self.adj, self.interior, boundary, vertices[boundary, :2])
+
+    def test_system(self):
+        rows, cols, weights, diagonal, rhs = self.system
+        self.assertEqual(len(diagonal), len(self.interior))
+        self.assertEqual(rhs.shape, (len(self.interior), 2))
+        self.assertTrue(numpy.all(cols < len(self.interior)))
+        # diagonally dominant, strictly so next to the boundary
+        off_diagonal = numpy.bincount(rows, weights=weights, minlength=len(diagonal))
+        self.assertTrue(numpy.all(diagonal >= off_diagonal - 1e-9))
+        self.assertTrue(numpy.any(diagonal > off_diagonal + 1e-3))
+
+    def test_solvers(self):
+        for solver in ['dense', 'cg']:
+            uvs, used, nbytes = solve_tutte(*self.system, solver=solver)
+            self.assertEqual(used, solver)
+            self.assertGreater(nbytes, 0)
+            numpy.testing.assert_allclose(uvs, self.expected, atol=1e-6)
+        uvs, used, nbytes = solve_tutte(*self.system)
+        numpy.testing.assert_allclose(uvs, self.expected, atol=1e-6)
+
+    @unittest.skipIf(parameterize.scipy is None, 'SciPy is not installed')
+    def test_sparse(self):
+        uvs, used, nbytes = solve_tutte(*self.system, solver='sparse')
+        self.assertEqual(used, 'sparse')
+        self.assertGreater(nbytes, 0)
+        numpy.testing.assert_allclose(uvs, self.expected, atol=1e-6)
+
+        # a bumpy grid with its boundary on a circle, which has uneven weights
+        vertices, tris = make_grid(6, 8, noise=2.0)
+        adj = MeshAdjacency(tris, len(vertices))
+        adj.compute_edge_lengths(vertices)
+        on_boundary = adj.boundary_vertices()
+        boundary = numpy.nonzero(on_boundary)[0]
+        angles = numpy.arctan2(vertices[boundary, 1] - 3, vertices[boundary, 0] - 4)
+        system = tutte_system(adj, numpy.nonzero(~on_boundary)[0], boundary,
+                              numpy.column_stack((numpy.cos(angles), numpy.sin(angles))))
+        sparse_uvs, used, nbytes = solve_tutte(*system, solver='sparse')
+        dense_uvs, used, nbytes = solve_tutte(*system, solver='dense')
+        numpy.testing.assert_allclose(sparse_uvs, dense_uvs, rtol=0, atol=1e-10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import io
+import unittest
+import numpy
+from meshtool.filters.panda_filters import pdae_utils
+from meshtool.filters.panda_filters.pdae_utils import PM_OP
+from meshtool.filters.panda_filters.pdae_utils.pdae_arrays import PythonPDAEParser
+try:
+    from meshtool.filters.panda_filters.pdae_utils import pdae_cython
+except ImportError:
+    pdae_cython = None
+
+TEXT_PDAE = """PDAE
+3
+3
+v 1 2 3 0 0 1 0.5 0.25
+t 0 1 3
+u 4 3
+1
+u 2 0
+2
+v -1.5 0 0 0 1 0 1 1
+t 3 4 2
+"""
+
+class BPDAETester(unittest.TestCase):
+    def setUp(self):
+        self.ops = pdae_utils.readPDAE(io.StringIO(TEXT_PDAE))
+        self.buf = io.BytesIO()
+        self.size = pdae_utils.convertPDAE(io.StringIO(TEXT_PDAE), self.buf)
+        self.buf.seek(0)
+
+    def test_round_trip(self):
+        self.assertEqual(self.size, 3)
+        self.assertEqual(pdae_utils.loadPDAE(self.buf), self.ops)
+        self.assertEqual(pdae_utils.loadPDAE(io.BytesIO(TEXT_PDAE.encode('ascii'))), self.ops)
+
+        refinements = pdae_utils.readBPDAE(io.BytesIO(self.buf.getvalue()))
+        self.assertEqual(refinements[0].vertices.tolist(), [[1, 2, 3, 0, 0, 1, 0.5, 0.25]])
+        self.assertEqual(refinements[0].triangles.tolist(), [[0, 1, 3]])
+        self.assertEqual(refinements[1].vertices.shape, (0, 8))
+        self.assertEqual(refinements[1].updates.tolist(), [[2, 0]])
+        self.assertEqual(pdae_utils.refinementOps(refinements[2])[0][0], PM_OP.VERTEX_ADDITION)
+
+    def test_random_access(self):
+        reader = pdae_utils.BPDAEReader(self.buf)
+        self.assertEqual(len(reader), 3)
+        self.assertEqual(reader[-1].triangles.tolist(), [[3, 4, 2]])
+        self.assertEqual(reader[1].updates.tolist(), [[2, 0]])
+        self.assertEqual([r.updates.tolist() for r in reader.read(1)], [[[2, 0]], []])
+        self.assertEqual(reader.read(2, 2), [])
+        self.assertEqual(int(reader.index[-1]), len(self.buf.getvalue()))
+        self.assertRaises(IndexError, reader.__getitem__, 3)
+
+    def test_arrays(self):
+        reader = pdae_utils.openPDAE(io.BytesIO(TEXT_PDAE.encode('ascii')))
+        self.assertEqual(len(reader), 3)
+        first = reader.read(0, 1)
+        self.assertEqual(first[0].updates.tolist(), [[4, 3]])
+        self.assertRaises(ValueError, reader.read, 0, 2)
+        rest = reader.read(1, 3, join=True)
+        self.assertEqual(rest.vertices.tolist(), [[-1.5, 0, 0, 0, 1, 0, 1, 1]])
+        self.assertEqual(rest.triangles.tolist(), [[3, 4, 2]])
+        self.assertEqual(rest.updates.tolist(), [[2, 0]])
+
+        reader = pdae_utils.openPDAE(self.buf)
+        joined = reader.read(0, 3, join=True)
+        expected = pdae_utils.joinRefinements(reader.read())
+        for a, b in zip(joined, expected):
+            self.assertEqual(a.tolist(), b.tolist())
+        self.assertEqual(joined.updates.tolist(), [[4, 3], [2, 0]])
+        self.assertEqual(reader.read(1, 1, join=True).vertices.shape, (0, 8))
+
+    def test_parser(self):
+        data = TEXT_PDAE.encode('ascii')
+        for chunk_size in [1, 5, 32, len(data)]:
+            parser = pdae_utils.PDAEParser()
+            refinements = []
+            for start in range(0, len(data), chunk_size):
+                refinements.extend(parser.feed(data[start:start+chunk_size]))
+            self.assertTrue(parser.done)
+            self.assertEqual(parser.refinements_read, 3)
+            self.assertEqual([pdae_utils.refinementOps(r) for r in refinements], self.ops)
+        self.assertEqual(parser.feed(b'1\n'), [])
+
+        parser = pdae_utils.PDAEParser()
+        self.assertEqual(parser.feed(data[:data.index(b'u 4 3')]), [])
+        self.assertEqual(parser.num_refinements, 3)
+        self.assertRaises(ValueError, parser.feed, b'x 4 3\n1\n')
+
+    @unittest.skipIf(pdae_cython is None, 'pdae_cython is not built')
+    def test_compiled_parser(self):
+        data = TEXT_PDAE.encode('ascii')
+        for chunk_size in [1, 5, 32]:
+            parsers = [pdae_cython.PDAEParser(), PythonPDAEParser()]
+            results = [[], []]
+            for start in range(0, len(data), chunk_size):
+                for parser, refinements in zip(parsers, results):
+                    refinements.append(parser.feed(data[start:start+chunk_size]))
+            compiled, python = results
+            # the same refinements are completed by the same chunks
+            self.assertEqual([len(r) for r in compiled], [len(r) for r in python])
+            for compiled_refinement, python_refinement in zip(sum(compiled, []), sum(python, [])):
+                for a, b in zip(compiled_refinement, python_refinement):
+                    self.assertEqual(a.dtype, b.dtype)
+                    self.assertEqual(a.shape, b.shape)
+                    self.assertEqual(a.tolist(), b.tolist())
+            for parser in parsers:
+                self.assertTrue(parser.done)
+                self.assertEqual(parser.num_refinements, 3)
+                self.assertEqual(parser.refinements_read, 3)
+
+    def test_snapshots(self):
+        base = (numpy.zeros((3, 8)), numpy.array([0, 1, 2, 2, 1, 0], dtype=numpy.uint32))
+        refinements = pdae_utils.readBPDAE(self.buf)
+        expected = [base]
+        for r in refinements:
+            expected.append(pdae_utils.applyRefinement(expected[-1][0], expected[-1][1], r))
+        self.assertEqual(expected[1][1].tolist(), [0, 1, 2, 2, 3, 0, 0, 1, 3])
+        self.assertEqual(expected[2][1].tolist(), [0, 1, 0, 2, 3, 0, 0, 1, 3])
+
+        buf = io.BytesIO()
+        snapshots = [pdae_utils.Snapshot(2, *expected[2]), pdae_utils.Snapshot(1, *expected[1])]
+        size = pdae_utils.writeBPDAE(refinements, buf, snapshots)
+        self.assertEqual(size, len(buf.getvalue()))
+        buf.seek(0)
+        self.assertEqual(pdae_utils.loadPDAE(buf), self.ops)
+
+        buf.seek(0)
+        reader = pdae_utils.BPDAEReader(buf)
+        self.assertEqual(reader.snapshots['level'].tolist(), [1, 2])
+        self.assertIsNone(reader.snapshot(0))
+        self.assertEqual(reader.snapshot(5).level, 2)
+        for level in range(4):
+            vertices, indices = pdae_utils.readLevel(reader, level, base)
+            self.assertEqual(vertices.tolist(), expected[level][0].tolist())
+            self.assertEqual(indices.tolist(), expected[level][1].tolist())
+        self.assertRaises(ValueError, pdae_utils.readLevel, reader, 0)
+
+        text_reader = pdae_utils.openPDAE(io.BytesIO(TEXT_PDAE.encode('ascii')))
+        self.assertEqual(pdae_utils.readLevel(text_reader, 3, base)[1].tolist(), expected[3][1].tolist())
+
+    def test_invalid(self):
+        self.assertIsNone(pdae_utils.readBPDAE(io.BytesIO(TEXT_PDAE.encode('ascii'))))
+        data = bytearray(self.buf.getvalue())
+        data[6] = 9
+        self.assertRaises(ValueError, pdae_utils.BPDAEReader, io.BytesIO(bytes(data)))
+        reader = pdae_utils.BPDAEReader(io.BytesIO(self.buf.getvalue()[:-4]))
+        self.assertRaises(ValueError, reader.read)
+
+if __name__ == '__main__':
+    unittest.main()
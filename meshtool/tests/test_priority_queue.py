@@ -0,0 +1,28 @@
+import unittest
+from meshtool.filters.simplify_filters import priority_queue
+from meshtool.filters.simplify_filters.priority_queue import PriorityQueue
+
+class PriorityQueueTester(unittest.TestCase):
+    def test_order(self):
+        queue = PriorityQueue([(3.0, (1, 2)), (1.0, (2, 1)), (2.0, (0, 5)), (1.0, (0, 9))])
+        queue.push(0.5, (1, 2))
+        queue.discard((0, 5))
+        self.assertFalse(queue.discard((7, 7)))
+        self.assertEqual(len(queue), 3)
+        self.assertFalse((0, 5) in queue)
+        self.assertEqual(queue.priority((1, 2)), 0.5)
+        # ties are broken by key
+        self.assertEqual([queue.pop() for _ in range(3)], [(0.5, (1, 2)), (1.0, (0, 9)), (1.0, (2, 1))])
+        self.assertRaises(IndexError, queue.pop)
+
+    def test_compaction(self):
+        queue = PriorityQueue((float(i), i) for i in range(10))
+        for repeat in range(1000):
+            for i in range(10):
+                queue.push(float(repeat + i), i)
+        self.assertEqual(len(queue), 10)
+        self.assertTrue(len(queue.heap) <= priority_queue.COMPACT_RATIO * 10 + priority_queue.COMPACT_MINIMUM + 1)
+        self.assertEqual(queue.pop(), (999.0, 0))
+
+if __name__ == '__main__':
+    unittest.main()
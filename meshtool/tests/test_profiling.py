@@ -0,0 +1,90 @@
+import unittest
+import os
+import json
+import shutil
+import tempfile
+from unittest import mock
+from meshtool.__main__ import main
+from meshtool.chain import FilterStep, resolve_chain, run_chain
+from meshtool.filters import factory
+from meshtool.filters.base_filters import MetaFilter
+from meshtool.profiling import FilterProfiler, profile_filter
+from meshes import make_triangle_mesh
+
+class ProfiledMetaFilter(MetaFilter):
+    def __init__(self):
+        super(ProfiledMetaFilter, self).__init__('test_meta_filter', 'Runs triangulate and combine_effects')
+    def apply(self, mesh):
+        for f in ['triangulate', 'combine_effects']:
+            mesh = profile_filter(f, factory.getInstance(f), mesh)
+        return mesh
+
+class ProfilingTester(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp(prefix='meshtool-test-profiling')
+        self.dae = os.path.join(self.tempdir, 'triangle.dae')
+        make_triangle_mesh(self.dae)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+
+    def make_chain(self):
+        # the meta filter isn't registered with the factory, so insert it directly
+        steps = resolve_chain([('load_collada', [self.dae]),
+                               ('print_textures', [])])
+        steps.insert(1, FilterStep(1, 'test_meta_filter', ProfiledMetaFilter(), []))
+        steps[2].index = 2
+        return steps
+
+    def test_profile_chain(self):
+        steps = self.make_chain()
+        profiler = FilterProfiler()
+        run_chain(steps, profiler=profiler)
+
+        profile_file = os.path.join(self.tempdir, 'profile.json')
+        profiler.save(profile_file)
+        with open(profile_file) as f:
+            report = json.load(f)
+
+        entries = report['filters']
+        self.assertEqual([e['filter'] for e in entries], ['load_collada', 'test_meta_filter', 'print_textures'])
+        self.assertIsNone(entries[0]['before'])
+        for entry in entries:
+            self.assertGreaterEqual(entry['wall_seconds'], 0)
+            self.assertGreaterEqual(entry['cpu_seconds'], 0)
+            self.assertEqual(entry['after']['triangles'], 1)
+            self.assertEqual(entry['after']['vertices'], 3)
+            self.assertEqual(entry['after']['primitives'], 1)
+            self.assertEqual(entry['after']['images'], 0)
+
+        children = entries[1]['children']
+        self.assertEqual([c['filter'] for c in children], ['triangulate', 'combine_effects'])
+        self.assertEqual(children[0]['before']['triangles'], 1)
+
+    def test_no_active_profiler(self):
+        # meta filters still work when nothing is being profiled
+        steps = self.make_chain()
+        mesh = run_chain(steps)
+        self.assertEqual(len(mesh.geometries), 1)
+
+    def test_profile_option(self):
+        # the real meta filter from the command line, its filters as children
+        profile_file = os.path.join(self.tempdir, 'profile.json')
+        out = os.path.join(self.tempdir, 'out.dae')
+        argv = ['meshtool', '--profile', profile_file, '--load_collada', self.dae,
+                '--medium_optimizations', '--save_collada', out]
+        with mock.patch('sys.argv', argv):
+            main()
+        with open(profile_file) as f:
+            report = json.load(f)
+
+        entries = report['filters']
+        self.assertEqual([e['filter'] for e in entries], ['load_collada', 'medium_optimizations', 'save_collada'])
+        children = entries[1]['children']
+        self.assertEqual([c['filter'] for c in children],
+                         ['triangulate', 'generate_normals', 'combine_effects', 'combine_materials',
+                          'combine_primitives', 'optimize_sources', 'strip_unused_sources', 'optimize_textures'])
+        for child in children:
+            self.assertGreaterEqual(child['wall_seconds'], 0)
+            self.assertEqual(child['after']['triangles'], 1)
+        self.assertTrue(os.path.isfile(out))
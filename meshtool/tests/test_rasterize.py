@@ -0,0 +1,43 @@
+import unittest
+import numpy
+from meshtool.filters.simplify_filters.rasterize import rasterize_triangles, resample_triangles
+
+class RasterizeTester(unittest.TestCase):
+    def setUp(self):
+        self.width, self.height = 37, 23
+        w, h = self.width, self.height
+        self.square = numpy.array([[[0,0], [w,0], [w,h]], [[0,0], [w,h], [0,h]]], dtype=numpy.float64)
+        self.image = (numpy.random.RandomState(0).rand(h, w, 3) * 255).astype(numpy.uint8)
+
+    def test_coverage(self):
+        pixels, tri_ids, bary = rasterize_triangles(self.square, self.width, self.height)
+        self.assertEqual(pixels.tolist(), list(range(self.width * self.height)))
+        numpy.testing.assert_allclose(numpy.sum(bary, axis=1), 1)
+        # the pixel in the top right corner is only in the first triangle
+        self.assertEqual(tri_ids[self.width - 1], 0)
+
+        # degenerate triangles draw nothing, and a thin one still covers the pixels it touches
+        tris = numpy.array([[[1,1], [5,5], [3,3]], [[2.2,0.5], [2.3,9.5], [2.25,0.5]]])
+        pixels, tri_ids, bary = rasterize_triangles(tris, 10, 10)
+        self.assertEqual(set(tri_ids.tolist()), set([1]))
+        self.assertEqual(sorted(pixels % 10), [2] * 10)
+
+    def test_resample(self):
+        image, covered = resample_triangles(self.square, self.square, [0, 0], [self.image], self.width, self.height)
+        self.assertTrue(numpy.all(covered))
+        self.assertTrue(numpy.array_equal(image, self.image))
+
+        # texture coordinates wrap around the source image
+        shifted = self.square + [self.width, -self.height]
+        image, covered = resample_triangles(self.square, shifted, [0, 0], [self.image], self.width, self.height)
+        self.assertTrue(numpy.array_equal(image, self.image))
+
+        # only the first triangle drawn, from a second source
+        black = numpy.zeros_like(self.image)
+        image, covered = resample_triangles(self.square[:1], self.square[:1], [1], [black, self.image],
+                                            self.width, self.height)
+        self.assertFalse(covered[-1, 0])
+        self.assertTrue(numpy.array_equal(image[0, -1], self.image[0, -1]))
+
+if __name__ == '__main__':
+    unittest.main()
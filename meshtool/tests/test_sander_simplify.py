@@ -0,0 +1,416 @@
+import os
+import copy
+import math
+import heapq
+import random
+import hashlib
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+import numpy
+import meshtool.filters as filters
+from meshtool.filters.panda_filters import pdae_utils
+from meshtool.filters.simplify_filters import sander_simplify
+from meshtool.filters.simplify_filters.add_back_pm import add_back_pm
+from meshtool.filters.simplify_filters.mesh_adjacency import MeshAdjacency
+from meshes import make_grid, make_grid_mesh
+
+def chart_assignment(simplifier):
+    """The chart of each triangle, with charts numbered in the order of
+    their lowest triangle"""
+    charts = sorted(sorted(chart['tris']) for chart in simplifier.charts.values())
+    assignment = numpy.zeros(len(simplifier.all_vert_indices), dtype=numpy.int32)
+    for i, tris in enumerate(charts):
+        assignment[tris] = i
+    return assignment
+
+def count_chart_adjacency(simplifier):
+    """Counts the pairs of adjacent charts around every vertex from
+    scratch, from the chart each triangle is in"""
+    vertex_charts = [set() for v in range(len(simplifier.all_vertices))]
+    for chart, chartdata in simplifier.charts.items():
+        for tri in chartdata['tris']:
+            for v in simplifier.all_vert_indices[tri].tolist():
+                vertex_charts[v].add(chart)
+    return [sum(1 for c1 in charts for c2 in charts if c1 < c2 and c2 in simplifier.chart_neighbors[c1])
+            for charts in vertex_charts]
+
+def reference_optimize_chart(shared, task):
+    """optimizeChart the way it used to be done: the triangles around each
+    vertex found with masks over the whole chart, and the samples along
+    the line scored one at a time"""
+    stretch_metric = sander_simplify.stretch_metric
+    face, tris, border_verts, deadline = task
+    rng = random.Random(face)
+    chart_tris = shared.all_vert_indices[tris]
+    tri_3d = shared.all_vertices[chart_tris]
+    tri_2d = shared.new_uvs[shared.new_uv_indices[tris]]
+    uvs = shared.new_uvs.copy()
+    vert2uv = dict(zip(chart_tris.reshape(-1).tolist(), shared.new_uv_indices[tris].reshape(-1).tolist()))
+    unique_verts, index_map = numpy.unique(chart_tris, return_inverse=True)
+    index_map.shape = chart_tris.shape
+
+    for iteration in range(1, 5):
+        L2 = stretch_metric(tri_3d, tri_2d)
+        neighborhood_stretch = numpy.zeros(unique_verts.shape, dtype=numpy.float32)
+        for i in range(3):
+            neighborhood_stretch[index_map[:,i]] += L2
+        vert_stretch_heap = list(zip(-1 * neighborhood_stretch, unique_verts.tolist()))
+        heapq.heapify(vert_stretch_heap)
+
+        while len(vert_stretch_heap) > 0:
+            stretch, vert = heapq.heappop(vert_stretch_heap)
+            if vert in border_verts:
+                continue
+            ucoord, vcoord = uvs[vert2uv[vert]]
+            vert_tri = [chart_tris[:,i] == vert for i in range(3)]
+            neighborhood_selector = vert_tri[0] | vert_tri[1] | vert_tri[2]
+            neighborhood_tri3d = tri_3d[neighborhood_selector]
+            bestL2, origA2d = stretch_metric(neighborhood_tri3d, tri_2d[neighborhood_selector],
+                                             return_A2d=True, normalize=True)
+
+            randslope = math.tan(rng.uniform(0, 2 * math.pi))
+            yfromx = lambda x: randslope * (x - ucoord) + vcoord
+            xfromy = lambda y: ((y - vcoord) / randslope) + ucoord
+            minx = 0.0 if 0 <= yfromx(0) <= 1 else min(xfromy(0), xfromy(1))
+            maxx = 1.0 if 0 <= yfromx(1) <= 1 else max(xfromy(0), xfromy(1))
+            minx, maxx = tuple(sorted([minx, maxx]))
+            rangesize = (maxx-minx) / iteration
+            rangemin = ucoord - rangesize / 2.0
+            rangemax = ucoord + rangesize / 2.0
+            if rangemax > maxx:
+                rangemin -= (maxx-rangemax)
+                rangemax -= (maxx-rangemax)
+            if rangemin < minx:
+                rangemax += (minx-rangemin)
+                rangemin += (minx-rangemin)
+            rangemin, rangemax = sorted([max(rangemin, minx), min(rangemax, maxx)])
+
+            step = (rangemax - rangemin) / 10.0
+            bestu, bestv = ucoord, vcoord
+            if step > 0:
+                for xval in numpy.arange(rangemin, rangemax, step):
+                    yval = yfromx(xval)
+                    for i in range(3):
+                        tri_2d[vert_tri[i],i] = (xval, yval)
+                    sample_L2 = stretch_metric(neighborhood_tri3d, tri_2d[neighborhood_selector],
+                                               flippedCheck=origA2d, normalize=True)
+                    if sample_L2 < bestL2:
+                        bestL2 = sample_L2
+                        bestu, bestv = xval, yval
+            for i in range(3):
+                tri_2d[vert_tri[i],i] = (bestu, bestv)
+            uvs[vert2uv[vert]] = (bestu, bestv)
+
+    return uvs, stretch_metric(tri_3d, tri_2d, normalize=True)
+
+def reference_add_back(triset, refinements):
+    """The vertex data and indices of triset, with its distinct vertices in
+    order of first use, after applying the operations of each refinement
+    one at a time"""
+    vertex_numbers = {}
+    data = []
+    indices = []
+    corners = zip(triset.vertex_index.ravel().tolist(), triset.normal_index.ravel().tolist(),
+                  triset.texcoord_indexset[0].ravel().tolist())
+    for corner in corners:
+        if corner not in vertex_numbers:
+            vertex_numbers[corner] = len(data)
+            v, n, t = corner
+            data.append(triset.vertex[v].tolist() + triset.normal[n].tolist() + triset.texcoordset[0][t].tolist())
+        indices.append(vertex_numbers[corner])
+    for refinement in refinements:
+        for op in refinement:
+            if op[0] == pdae_utils.PM_OP.VERTEX_ADDITION:
+                data.append(list(map(float, op[1:])))
+            elif op[0] == pdae_utils.PM_OP.TRIANGLE_ADDITION:
+                indices.extend(map(int, op[1:]))
+            elif op[0] == pdae_utils.PM_OP.INDEX_UPDATE:
+                indices[int(op[1])] = int(op[2])
+    return numpy.array(data), numpy.array(indices)
+
+class SanderSimplifyTester(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp(prefix='meshtool-test-sander')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+
+    def simplify_to_stream(self, filter_name, *args, **kwargs):
+        pm_file = os.path.join(self.tempdir, kwargs.get('pm_name', filter_name) + kwargs.get('extension', '.bpdae'))
+        rows, cols = kwargs.get('grid', (30, 40))
+        # the grid is far below the size a stream is normally made for
+        with mock.patch.object(sander_simplify, 'TRIANGLE_MINIMUM', 100), \
+             mock.patch.object(sander_simplify, 'TRIANGLE_MAXIMUM', 500):
+            mesh = filters.factory.getInstance(filter_name).apply(make_grid_mesh(rows, cols, noise=2.5), pm_file, *args)
+        return mesh, pm_file
+
+    def simplifier(self):
+        s = sander_simplify.SanderSimplify(make_grid_mesh(20, 30, noise=2.5), None, workers=1)
+        s.uniqify_list()
+        return s
+
+    def test_charts(self):
+        s = self.simplifier()
+        s.build_vertex_graph()
+        s.build_face_graph()
+        s.initialize_chart_merge_errors()
+        s.merge_charts()
+
+        assignment = chart_assignment(s)
+        self.assertEqual(len(s.charts), 712)
+        # number of charts of each size
+        self.assertEqual(numpy.bincount(numpy.bincount(assignment)).tolist(), [0, 245, 446, 21])
+        self.assertEqual(assignment[:40].tolist(), [0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6, 6, 7, 7, 8, 8, 9, 9,
+                                                    10, 10, 11, 11, 12, 13, 14, 12, 15, 15, 16, 16, 17, 16, 18, 18,
+                                                    19, 19, 20, 20])
+        self.assertEqual(hashlib.sha1(assignment.astype('<i4').tobytes()).hexdigest(),
+                         'bd0e5cb2ca56cc1aa5eca906497bd2a29cb1aa20')
+
+    def test_corners(self):
+        s = self.simplifier()
+        s.build_vertex_graph()
+        s.build_face_graph()
+        self.assertEqual(s.vert_chart_adjacency, count_chart_adjacency(s))
+        s.initialize_chart_merge_errors()
+        s.merge_charts()
+        counts = count_chart_adjacency(s)
+        self.assertEqual(s.vert_chart_adjacency, counts)
+
+        s.update_corners()
+        for chart in s.charts.values():
+            vertices = set(s.all_vert_indices[chart['tris']].reshape(-1).tolist())
+            self.assertEqual(chart['corners'], set(v for v in vertices if counts[v] >= 3))
+
+        s.calc_edge_length()
+        s.straighten_chart_boundaries()
+        self.assertEqual(s.vert_chart_adjacency, count_chart_adjacency(s))
+
+    def test_straighten_boundary(self):
+        # a flat 4x6 grid split into two charts along x=2, except that the
+        # left chart juts out to x=4 for the two middle rows
+        rows, cols = 4, 6
+        s = sander_simplify.SanderSimplify(make_grid_mesh(rows, cols), None, workers=1)
+        s.uniqify_list()
+        s.build_vertex_graph()
+        s.build_face_graph()
+        s.calc_edge_length()
+
+        quad_tris = lambda quads: sorted(t for (r, c) in quads for t in (2 * (r * cols + c), 2 * (r * cols + c) + 1))
+        left = quad_tris((r, c) for r in range(rows) for c in range(cols) if c < 2)
+        bump = quad_tris((r, c) for r in (1, 2) for c in (2, 3))
+        right = quad_tris((r, c) for r in range(rows) for c in range(cols) if c >= 2)
+
+        diffuse = s.charts[0]['diffuse']
+        for chart in list(s.charts):
+            s.remove_chart(chart)
+        for chart, tris in enumerate((left + bump, sorted(set(right) - set(bump)))):
+            edges = set()
+            for tri in numpy.sort(s.all_vert_indices[tris], axis=1).tolist():
+                edges ^= set([(tri[0], tri[1]), (tri[1], tri[2]), (tri[0], tri[2])])
+            s.add_chart(chart, tris, edges, diffuse)
+        s.link_charts(0, 1)
+
+        # the vertex at grid point (x, y), since uniqifying renumbered them
+        grid_vertex = numpy.zeros((rows + 1) * (cols + 1), dtype=numpy.int64)
+        grid_vertex[make_grid(rows, cols)[1].ravel()] = s.all_vert_indices.ravel()
+        vertex = lambda x, y: int(grid_vertex[y * (cols + 1) + x])
+        # the ends of the boundary would be corners next to other charts
+        for chart in s.charts.values():
+            chart['corners'] = set([vertex(2, 0), vertex(2, rows)])
+
+        s.straighten_chart_boundaries()
+        self.assertEqual(sorted(s.charts[0]['tris']), left)
+        self.assertEqual(sorted(s.charts[1]['tris']), right)
+        self.assertEqual(s.charts[0]['edges'] & s.charts[1]['edges'],
+                         set(tuple(sorted((vertex(2, y), vertex(2, y+1)))) for y in range(rows)))
+        self.assertEqual(s.vert_chart_adjacency, count_chart_adjacency(s))
+        for v, charts in enumerate(s.vert2charts):
+            self.assertEqual(charts, set(chart for chart in s.charts if v in s.chart_vertices(chart)))
+
+    def test_optimize_chart(self):
+        # a single chart of a bumpy grid, with its interior uvs jittered
+        vertices, tris = make_grid(5, 6, noise=1.0)
+        uvs = vertices[:,:2] / numpy.array([6, 5], dtype=numpy.float32)
+        adjacency = MeshAdjacency(tris, len(vertices))
+        interior = ~adjacency.boundary_vertices()
+        rng = numpy.random.RandomState(0)
+        uvs[interior] += (rng.rand(numpy.sum(interior), 2) - 0.5) * 0.1
+        shared = SimpleNamespace(all_vertices=vertices.astype(numpy.float64), all_vert_indices=tris,
+                                 new_uvs=uvs.astype(numpy.float64), new_uv_indices=tris)
+        task = (7, numpy.arange(len(tris)), set(numpy.nonzero(~interior)[0].tolist()), None)
+
+        uv_locs, chart_uvs, L2, truncated = sander_simplify.optimizeChart(shared, task)
+        expected_uvs, expected_L2 = reference_optimize_chart(shared, task)
+        self.assertFalse(truncated)
+        self.assertFalse(numpy.allclose(chart_uvs, shared.new_uvs[uv_locs]))
+        numpy.testing.assert_allclose(chart_uvs, expected_uvs[uv_locs], rtol=0, atol=1e-12)
+        self.assertAlmostEqual(L2, expected_L2, places=12)
+
+    def test_edge_collapse_errors(self):
+        s = self.simplifier()
+        s.build_vertex_graph()
+        s.build_face_graph()
+        s.initialize_chart_merge_errors()
+        s.merge_charts()
+        s.update_corners()
+        s.calc_edge_length()
+        s.straighten_chart_boundaries()
+        s.update_corners(True)
+        s.parameterize_charts()
+        s.initialize_simplification_errors()
+
+        v1s = s.adjacency.edges.ravel()
+        v2s = s.adjacency.edges[:,::-1].ravel()
+        errors = s.evaluate_edge_collapses(v1s, v2s)
+
+        allowed = ~s.vert_is_corner[v2s] & ~(s.vert_is_edge[v2s] & ~s.vert_is_edge[v1s])
+        self.assertEqual(numpy.isnan(errors).tolist(), (~allowed).tolist())
+
+        # with every collapse allowed and no texture stretch, as for
+        # color-only charts, each costs its length plus the quadric error
+        # at v1
+        s.vert_is_corner[:] = False
+        s.vert_is_edge[:] = False
+        s.tri_textured[:] = False
+        errors = s.evaluate_edge_collapses(v1s, v2s)
+        vertices = s.all_vertices.astype(numpy.float64)
+        for v1, v2, error in zip(v1s.tolist(), v2s.tolist(), errors.tolist()):
+            A = s.vert_quadric_A[v1].astype(numpy.float64) + s.vert_quadric_A[v2]
+            b = s.vert_quadric_b[v1].astype(numpy.float64) + s.vert_quadric_b[v2]
+            c = float(s.vert_quadric_c[v1]) + float(s.vert_quadric_c[v2])
+            pt = vertices[v1]
+            edge = pt - vertices[v2]
+            terms = (pt.dot(A).dot(pt), 2 * b.dot(pt), c)
+            expected = math.sqrt(edge.dot(edge)) + sum(terms)
+            # the quadric terms mostly cancel, so float32 rounding is
+            # relative to their size rather than to the error
+            tolerance = 1e-6 * sum(abs(term) for term in terms)
+            self.assertTrue(abs(error - expected) <= tolerance, (v1, v2, error, expected))
+
+    def test_lods(self):
+        mesh = make_grid_mesh(60, 100, noise=2.5)
+        lods_filter = filters.factory.getInstance('sander_simplify_lods')
+        mesh = lods_filter.apply(mesh, '20000,5000,0.5')
+
+        self.assertEqual(len(mesh.geometries), 3)
+        self.assertEqual(len(mesh.scenes), 3)
+        self.assertIs(mesh.scene, mesh.scenes[0])
+        counts = [sum(len(prim) for prim in geom.primitives) for geom in mesh.geometries]
+        self.assertEqual(counts, [12000, 4999, 2736])
+        for scene in mesh.scenes:
+            self.assertEqual(len(list(scene.objects('geometry'))), 1)
+
+    def test_snapshots(self):
+        plain_mesh, plain_file = self.simplify_to_stream('sander_simplify')
+        snap_mesh, snap_file = self.simplify_to_stream('sander_simplify_snapshots', '0,0.25,0.5')
+
+        with open(plain_file, 'rb') as plain, open(snap_file, 'rb') as snap:
+            plain_reader = pdae_utils.openPDAE(plain)
+            snap_reader = pdae_utils.openPDAE(snap)
+            num_refinements = len(plain_reader)
+            self.assertGreater(num_refinements, 0)
+            self.assertEqual(len(snap_reader), num_refinements)
+            self.assertEqual(snap_reader.snapshots['level'].tolist(),
+                             [0, int(round(num_refinements * 0.25)), int(round(num_refinements * 0.5))])
+
+            # the snapshot of level 0 is the base mesh the plain stream starts from
+            base = pdae_utils.readLevel(snap_reader, 0)
+            for percent in range(10, 101, 10):
+                level = int(round(num_refinements * percent / 100.0))
+                plain_vertices, plain_indices = pdae_utils.readLevel(plain_reader, level, base)
+                snap_vertices, snap_indices = pdae_utils.readLevel(snap_reader, level)
+                numpy.testing.assert_array_equal(snap_indices, plain_indices)
+                numpy.testing.assert_array_equal(snap_vertices, plain_vertices)
+
+        for percent in range(10, 101, 10):
+            with open(plain_file, 'rb') as plain, open(snap_file, 'rb') as snap:
+                plain_triset = add_back_pm(copy.deepcopy(plain_mesh), plain, percent).geometries[0].primitives[0]
+                snap_triset = add_back_pm(copy.deepcopy(snap_mesh), snap, percent).geometries[0].primitives[0]
+            numpy.testing.assert_array_equal(snap_triset.vertex_index, plain_triset.vertex_index)
+            numpy.testing.assert_array_equal(snap_triset.vertex, plain_triset.vertex)
+
+    def test_text_stream(self):
+        binary_mesh, binary_file = self.simplify_to_stream('sander_simplify')
+        text_mesh, text_file = self.simplify_to_stream('sander_simplify', extension='.pdae')
+
+        triset = binary_mesh.geometries[0].primitives[0]
+        text_triset = text_mesh.geometries[0].primitives[0]
+        numpy.testing.assert_array_equal(text_triset.vertex_index, triset.vertex_index)
+        numpy.testing.assert_array_equal(text_triset.vertex, triset.vertex)
+
+        with open(binary_file, 'rb') as binary:
+            refinements = pdae_utils.BPDAEReader(binary).read()
+        with open(text_file, 'rb') as text:
+            text_refinements = pdae_utils.openPDAE(text).read()
+        self.assertGreater(len(refinements), 0)
+        self.assertEqual(len(text_refinements), len(refinements))
+        for refinement, text_refinement in zip(refinements, text_refinements):
+            # the text stream only keeps 7 significant digits of each value
+            numpy.testing.assert_allclose(text_refinement.vertices, refinement.vertices, rtol=1e-6, atol=1e-6)
+            numpy.testing.assert_array_equal(text_refinement.triangles, refinement.triangles)
+            numpy.testing.assert_array_equal(text_refinement.updates, refinement.updates)
+
+        with open(binary_file, 'rb') as binary, open(text_file, 'rb') as text:
+            full_triset = add_back_pm(binary_mesh, binary, 100).geometries[0].primitives[0]
+            text_full_triset = add_back_pm(text_mesh, text, 100).geometries[0].primitives[0]
+        self.assertGreater(len(full_triset), len(triset))
+        numpy.testing.assert_array_equal(text_full_triset.vertex_index, full_triset.vertex_index)
+        numpy.testing.assert_allclose(text_full_triset.vertex, full_triset.vertex, rtol=1e-6, atol=1e-6)
+
+    def test_add_back_text(self):
+        # a grid large enough that some locations are updated more than once
+        mesh, pm_file = self.simplify_to_stream('sander_simplify', extension='.pdae', grid=(40, 60))
+        with open(pm_file, 'r') as pmin:
+            refinements = pdae_utils.readPDAE(pmin)
+        updated = [op[1] for refinement in refinements for op in refinement if op[0] == pdae_utils.PM_OP.INDEX_UPDATE]
+        self.assertLess(len(set(updated)), len(updated))
+        base_triset = mesh.geometries[0].primitives[0]
+
+        for percent in (20, 60, 100):
+            num_to_load = int(round(len(refinements) * percent / 100.0))
+            self.assertGreater(num_to_load, 0)
+            data, indices = reference_add_back(base_triset, refinements[:num_to_load])
+            with open(pm_file, 'rb') as pmin:
+                triset = add_back_pm(copy.deepcopy(mesh), pmin, percent).geometries[0].primitives[0]
+            numpy.testing.assert_array_equal(triset.vertex_index.ravel(), indices)
+            numpy.testing.assert_array_equal(triset.vertex, data[:,0:3])
+            numpy.testing.assert_array_equal(triset.normal, data[:,3:6])
+            numpy.testing.assert_array_equal(triset.texcoordset[0], data[:,6:8])
+
+    def test_stream_closed(self):
+        # the stream file is closed even if simplifying fails
+        streams = []
+        def crash(simplifier):
+            streams.append(simplifier.pmbuf)
+            raise RuntimeError('crash')
+        with mock.patch.object(sander_simplify.SanderSimplify, 'simplify', autospec=True, side_effect=crash):
+            for filter_name, args in [('sander_simplify', ()), ('sander_simplify_snapshots', ('0.5',))]:
+                pm_file = os.path.join(self.tempdir, filter_name + '.bpdae')
+                self.assertRaises(RuntimeError, filters.factory.getInstance(filter_name).apply,
+                                  make_grid_mesh(2, 2), pm_file, *args)
+        self.assertEqual(len(streams), 2)
+        self.assertTrue(all(stream.closed for stream in streams))
+
+    def test_resume(self):
+        mesh, pm_file = self.simplify_to_stream('sander_simplify')
+        checkpoints = os.path.join(self.tempdir, 'checkpoints')
+        with mock.patch.dict(os.environ, {'MESHTOOL_RESUME': checkpoints}):
+            with mock.patch.object(sander_simplify.SanderSimplify, 'create_atlas', side_effect=RuntimeError('crash')):
+                self.assertRaises(RuntimeError, self.simplify_to_stream, 'sander_simplify', pm_name='crashed')
+            self.assertEqual(len(os.listdir(checkpoints)), 1)
+            resumed_mesh, resumed_file = self.simplify_to_stream('sander_simplify', pm_name='resumed')
+        self.assertEqual(os.listdir(checkpoints), [])
+
+        with open(pm_file, 'rb') as f, open(resumed_file, 'rb') as resumed:
+            self.assertEqual(f.read(), resumed.read())
+        triset = mesh.geometries[0].primitives[0]
+        resumed_triset = resumed_mesh.geometries[0].primitives[0]
+        numpy.testing.assert_array_equal(resumed_triset.vertex_index, triset.vertex_index)
+        numpy.testing.assert_array_equal(resumed_triset.texcoord_indexset[0], triset.texcoord_indexset[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+import os
+import shutil
+import signal
+import tempfile
+import threading
+from queue import Full
+from meshtool.serve import JobServer, ServeClient, make_server, parse_chain
+from meshes import make_triangle_mesh
+
+class ServeTester(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp(prefix='meshtool-test-serve')
+        self.inputs = []
+        for i in range(4):
+            path = os.path.join(self.tempdir, 'tri%d.dae' % i)
+            make_triangle_mesh(path)
+            self.inputs.append(path)
+        self.chain = [['load_collada', '{input}'],
+                      ['triangulate'],
+                      ['save_collada', os.path.join(self.tempdir, 'out', '{name}.dae')]]
+
+        self.jobs = JobServer(workers=2, queue_size=8)
+        self.address = os.path.join(self.tempdir, 'meshtool.sock')
+        self.server = make_server(self.address, self.jobs)
+        self.jobs.start()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.client = ServeClient(self.address, timeout=30)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.jobs.stop()
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+
+    def test_concurrent_jobs(self):
+        results = [None] * len(self.inputs)
+        def submit(i):
+            results[i] = self.client.submit(self.inputs[i], self.chain)
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(self.inputs))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for i, (status, record) in enumerate(results):
+            self.assertEqual(status, 200, record)
+            self.assertEqual(record['status'], 'ok')
+            self.assertTrue(os.path.isfile(os.path.join(self.tempdir, 'out', 'tri%d.dae' % i)))
+
+        health = self.client.health()
+        self.assertEqual(health['queue_depth'], 0)
+        self.assertEqual(health['jobs']['completed'], len(self.inputs))
+        self.assertEqual(sorted(health['filters'].keys()), ['load_collada', 'save_collada', 'triangulate'])
+        self.assertEqual(health['filters']['triangulate']['count'], len(self.inputs))
+
+    def test_errors(self):
+        status, record = self.client.submit(self.inputs[0], [['triangulate']])
+        self.assertEqual(status, 400)
+
+        status, record = self.client.submit(os.path.join(self.tempdir, 'missing.dae'), self.chain)
+        self.assertEqual(status, 500)
+        self.assertEqual(record['filter'], 'load_collada')
+
+    def test_timeout(self):
+        status, record = self.client.submit(self.inputs[0], self.chain, timeout=0.000001)
+        self.assertEqual(status, 504)
+        self.assertEqual(record['status'], 'timeout')
+        # the worker is replaced and keeps taking jobs
+        status, record = self.client.submit(self.inputs[0], self.chain)
+        self.assertEqual(status, 200)
+        self.assertEqual(self.client.health()['jobs']['timeouts'], 1)
+
+    def test_worker_killed(self):
+        jobs = JobServer(workers=1)
+        jobs.start()
+        try:
+            # a worker that dies while idle is replaced when it's next sent
+            # a job, which its replacement runs
+            os.kill(jobs.workers[0].process.pid, signal.SIGKILL)
+            jobs.workers[0].process.join()
+            job = jobs.submit(parse_chain(self.chain), self.inputs[0])
+            self.assertTrue(job.done.wait(30))
+            self.assertEqual(job.record['status'], 'ok')
+
+            job = jobs.submit(parse_chain(self.chain), self.inputs[1])
+            self.assertTrue(job.done.wait(30))
+            self.assertEqual(job.record['status'], 'ok')
+            health = jobs.health()
+            self.assertEqual(health['running'], 0)
+            self.assertEqual(health['jobs']['failed'], 0)
+            self.assertEqual(health['jobs']['completed'], 2)
+        finally:
+            jobs.stop()
+
+    def test_backpressure(self):
+        # no workers are started, so nothing takes jobs off the queue
+        jobs = JobServer(workers=1, queue_size=1)
+        ordered_args = [('load_collada', ['{input}'])]
+        jobs.submit(ordered_args, self.inputs[0])
+        self.assertRaises(Full, jobs.submit, ordered_args, self.inputs[1])
+        health = jobs.health()
+        self.assertEqual(health['queue_depth'], 1)
+        self.assertEqual(health['jobs']['rejected'], 1)
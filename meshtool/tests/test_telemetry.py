@@ -0,0 +1,72 @@
+import io
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from meshtool.filters.simplify_filters.telemetry import PhaseTelemetry, sidecar_path, telemetry_enabled
+
+class TelemetryTester(unittest.TestCase):
+    def test_phases(self):
+        telemetry = PhaseTelemetry(verbose=False)
+        telemetry.begin('merge', 'Merging...')
+        for reason in ('stale', 'stale', 'corners'):
+            telemetry.count('rejected', reason=reason)
+        telemetry.count('pops', 3)
+        telemetry.end()
+        # counters set between phases go to the last one
+        telemetry.set('charts', 7)
+        telemetry.begin('merge')
+        telemetry.end()
+
+        self.assertEqual([p['phase'] for p in telemetry.phases], ['merge', 'merge'])
+        first = telemetry.phases[0]
+        self.assertEqual(first['counters'], {'rejected': {'stale': 2, 'corners': 1}, 'pops': 3, 'charts': 7})
+        self.assertTrue(first['wall_seconds'] >= 0 and first['cpu_seconds'] >= 0)
+        self.assertEqual(telemetry.get('merge', 'charts'), None)
+        self.assertEqual(telemetry.get('merge', 'charts', 0), 0)
+
+        tempdir = tempfile.mkdtemp(prefix='meshtool-test-telemetry')
+        try:
+            path = sidecar_path(os.path.join(tempdir, 'model.pdae'))
+            self.assertEqual(path, os.path.join(tempdir, 'model.telemetry.json'))
+            telemetry.save(path, workers=2)
+            with open(path) as f:
+                report = json.load(f)
+            self.assertEqual(report['workers'], 2)
+            self.assertEqual(report['phases'][0]['counters']['pops'], 3)
+        finally:
+            shutil.rmtree(tempdir)
+
+    def test_reported(self):
+        out = io.StringIO()
+        with mock.patch('sys.stdout', out):
+            telemetry = PhaseTelemetry()
+            telemetry.begin('merge', 'Merging...')
+            telemetry.set('charts', 7, 'number of charts')
+            telemetry.set('pops', 3)
+            telemetry.end()
+            telemetry.set('components', 1, 'connected components')
+            quiet = PhaseTelemetry(verbose=False)
+            quiet.begin('merge', 'Merging...')
+            quiet.set('charts', 7, 'number of charts')
+            quiet.end()
+        # labelled counters are printed after the time of their phase
+        self.assertEqual(out.getvalue(), 'Merging... 0s\nnumber of charts = 7\nconnected components = 1\n')
+        self.assertEqual(telemetry.phases[0]['counters'], {'charts': 7, 'pops': 3, 'components': 1})
+        self.assertEqual(quiet.phases[0]['counters'], {'charts': 7})
+
+    def test_enabled(self):
+        previous = os.environ.pop('MESHTOOL_TELEMETRY', None)
+        try:
+            self.assertFalse(telemetry_enabled())
+            os.environ['MESHTOOL_TELEMETRY'] = '1'
+            self.assertTrue(telemetry_enabled())
+        finally:
+            os.environ.pop('MESHTOOL_TELEMETRY', None)
+            if previous is not None:
+                os.environ['MESHTOOL_TELEMETRY'] = previous
+
+if __name__ == '__main__':
+    unittest.main()
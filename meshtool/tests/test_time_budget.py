@@ -0,0 +1,41 @@
+import os
+import time
+import unittest
+from meshtool.filters.simplify_filters.time_budget import TimeBudget, default_time_budget
+
+class TimeBudgetTester(unittest.TestCase):
+    def test_deadlines(self):
+        budget = TimeBudget(10.0, [('first', 0.5), ('second', 0.25), ('third', 0.0)])
+        self.assertAlmostEqual(budget.deadline('first') - budget.start, 5.0)
+        self.assertAlmostEqual(budget.deadline('second') - budget.start, 7.5)
+        self.assertEqual(budget.deadline('second'), budget.deadline('third'))
+        self.assertFalse(budget.expired('first'))
+
+        budget = TimeBudget(0.001, [('first', 0.0), ('second', 1.0)])
+        time.sleep(0.01)
+        self.assertTrue(budget.expired('second'))
+        self.assertTrue(budget.expired('second'))
+        self.assertTrue(budget.expired('first'))
+        self.assertEqual(budget.truncated, ['second', 'first'])
+
+    def test_unlimited(self):
+        budget = TimeBudget(None, [('first', 0.5)])
+        self.assertIsNone(budget.deadline('first'))
+        self.assertFalse(budget.expired('first'))
+        self.assertEqual(budget.truncated, [])
+
+    def test_default(self):
+        previous = os.environ.get('MESHTOOL_TIME_BUDGET')
+        try:
+            os.environ['MESHTOOL_TIME_BUDGET'] = '90.5'
+            self.assertEqual(default_time_budget(), 90.5)
+            os.environ['MESHTOOL_TIME_BUDGET'] = 'soon'
+            self.assertIsNone(default_time_budget())
+            del os.environ['MESHTOOL_TIME_BUDGET']
+            self.assertIsNone(default_time_budget())
+        finally:
+            if previous is not None:
+                os.environ['MESHTOOL_TIME_BUDGET'] = previous
+
+if __name__ == '__main__':
+    unittest.main()